@@ -10,21 +10,25 @@ import fitz # PyMuPDF for page byte extraction
 import concurrent.futures
 
 # 각 모듈에서 필요한 함수들을 임포트합니다.
+from src.config import settings
 from src.rag_pipeline.loader import load_pdf_as_documents
 from src.rag_pipeline.thumbnail import create_thumbnails
 from src.rag_pipeline.parser import parse_page_multimodal
-from src.rag_pipeline.vector_db import get_vector_store, add_page_content_to_vector_db
+from src.rag_pipeline.vector_db import get_vector_store, build_page_documents, add_documents_to_vector_db, count_chunks
+from src.rag_pipeline.continuation import detect_continuations
+from src.rag_pipeline.near_dup import collapse_ingested_chunks
 from src.api.services import get_indexed_documents
-from src.rag_pipeline.retriever import get_retriever
+from src.rag_pipeline.retriever import get_retriever, add_documents_to_keyword_index
 from src.rag_pipeline.generator import generate_answer_with_rag
 
 # Typer 앱 생성
 app = typer.Typer(help="Multimodal RAG CLI 애플리케이션")
 
-def process_page_task(page_num, page_bytes, thumbnail_path, vector_store, doc_name):
+def process_page_task(page_num, page_bytes, thumbnail_path, doc_name):
     """
-    개별 페이지를 파싱하고 벡터 스토어에 저장하는 작업 단위 함수입니다.
-    스레드 풀에서 실행됩니다.
+    개별 페이지를 파싱하는 작업 단위 함수입니다.
+    스레드 풀에서 실행되며, 파싱 결과(PageContent)를 반환합니다.
+    청크 생성과 벡터 스토어 적재는 모든 페이지가 파싱된 뒤 페이지 간 연속 감지와 함께 메인 스레드에서 수행합니다.
     """
     try:
         # 1. 사전 검사 (Pre-check): 빈 페이지 또는 의미 없는 페이지 건너뛰기
@@ -37,22 +41,17 @@ def process_page_task(page_num, page_bytes, thumbnail_path, vector_store, doc_na
             # 조건: 텍스트가 50자 미만이고 이미지가 없는 경우 스킵
             # (이 조건은 문서의 특성에 따라 조절 가능)
             if len(text.strip()) < 50 and not images:
-                return False, page_num, "SKIPPED: 내용 부족 (텍스트 < 50자, 이미지 없음)"
+                return False, page_num, None, "SKIPPED: 내용 부족 (텍스트 < 50자, 이미지 없음)"
 
         # 2. 멀티모달 파싱 (API 호출 - 병목 구간 또는 로컬 JSON 로드)
         parsed_content = parse_page_multimodal(page_bytes, doc_name=doc_name, page_num=page_num)
 
         if parsed_content and thumbnail_path:
-            # 벡터 스토어에 적재
-            # ChromaDB add_documents는 스레드 안전하지 않을 수 있으므로 주의가 필요하나, 
-            # 일반적인 사용에서는 락이 걸리거나 순차 처리됨. 
-            # 만약 문제가 생기면 Lock을 사용해야 함. 여기서는 일단 진행.
-            add_page_content_to_vector_db(parsed_content, page_num, thumbnail_path, vector_store)
-            return True, page_num, None
+            return True, page_num, parsed_content, None
         else:
-            return False, page_num, "파싱 실패 또는 썸네일 없음"
+            return False, page_num, None, "파싱 실패 또는 썸네일 없음"
     except Exception as e:
-        return False, page_num, str(e)
+        return False, page_num, None, str(e)
 
 @app.command(name="ingest", help="PDF 문서를 데이터베이스에 업로드하고 처리합니다.")
 def ingest_pdf(
@@ -95,15 +94,16 @@ def ingest_pdf(
 
         # 3. Chroma 벡터 스토어 가져오기
         vector_store = get_vector_store()
-        initial_count = vector_store._collection.count()
+        initial_count = count_chunks(vector_store)
         typer.echo(f"Chroma 벡터 스토어 준비 완료. (현재 데이터: {initial_count}개)")
 
         # 4. 페이지별 파싱 및 적재 (병렬 처리)
-        typer.echo("페이지별 파싱 및 벡터 스토어 적재를 시작합니다 (병렬 처리)...")
+        typer.echo("페이지별 파싱을 시작합니다 (병렬 처리)...")
         
         success_count = 0
         fail_count = 0
         skip_count = 0
+        parsed_pages = {}  # page_num -> (thumbnail_path, PageContent)
         
         # 스레드 풀 실행자 생성
         with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
@@ -125,8 +125,8 @@ def ingest_pdf(
                     page_thumbnail_path = next((p for p in thumbnail_paths if f"page_{page_num:03d}" in p), None)
 
                     # 작업 제출
-                    future = executor.submit(process_page_task, page_num, page_bytes, page_thumbnail_path, vector_store, doc_name)
-                    future_to_page[future] = page_num
+                    future = executor.submit(process_page_task, page_num, page_bytes, page_thumbnail_path, doc_name)
+                    future_to_page[future] = (page_num, page_thumbnail_path)
                 
                 except Exception as e:
                     tqdm.write(f"페이지 바이트 추출 오류 ({page_num}페이지): {e}")
@@ -137,11 +137,12 @@ def ingest_pdf(
             # 결과 처리 루프 (tqdm 연동)
             with tqdm(total=len(future_to_page), desc="문서 처리 중", unit="page") as pbar:
                 for future in concurrent.futures.as_completed(future_to_page):
-                    page_num = future_to_page[future]
+                    page_num, page_thumbnail_path = future_to_page[future]
                     try:
-                        is_success, p_num, error_msg = future.result()
+                        is_success, p_num, parsed_content, error_msg = future.result()
                         if is_success:
                             success_count += 1
+                            parsed_pages[p_num] = (page_thumbnail_path, parsed_content)
                         elif error_msg and error_msg.startswith("SKIPPED"):
                             skip_count += 1
                             # tqdm.write(f"스킵 ({p_num}페이지): {error_msg}")
@@ -154,16 +155,38 @@ def ingest_pdf(
                     finally:
                         pbar.update(1)
 
+        # 페이지 간 연속(여러 페이지에 걸친 표/절차) 감지: 연결된 페이지 쌍을 청크 메타데이터로 저장
+        continuations = detect_continuations([(p_num, content) for p_num, (_, content) in parsed_pages.items()])
+        typer.echo(f"페이지 연속 감지: {len(continuations)}건")
+
+        # 청크 생성 후 벡터 스토어에 배치 적재
+        page_documents = []
+        for p_num in sorted(parsed_pages):
+            page_thumbnail_path, parsed_content = parsed_pages[p_num]
+            page_documents.extend(
+                build_page_documents(
+                    parsed_content, p_num, page_thumbnail_path,
+                    continues_to_next=p_num in continuations,
+                    continues_from_prev=(p_num - 1) in continuations
+                )
+            )
+
+        # 근사 중복 청크(반복되는 경고문/표) 병합: 대표 청크 하나에 등장 페이지 목록을 기록
+        if settings.NEAR_DUP_ENABLED:
+            page_documents, collapsed = collapse_ingested_chunks(page_documents)
+            typer.echo(f"근사 중복 청크 병합: {collapsed}개 (남은 청크 {len(page_documents)}개)")
+        ingested_documents = add_documents_to_vector_db(page_documents, vector_store)
+
         typer.secho(f"\n'{file_path.name}' 파일 처리가 완료되었습니다.", fg=typer.colors.GREEN)
         typer.echo(f"성공: {success_count} 페이지, 스킵: {skip_count} 페이지, 실패: {fail_count} 페이지")
         
-        final_count = vector_store._collection.count()
+        final_count = count_chunks(vector_store)
         added_count = final_count - initial_count
         typer.echo(f"이번 작업으로 {added_count}개 데이터 추가 완료. 현재 총 데이터: {final_count}개")
 
-        # 5. 검색 인덱스 갱신 (BM25)
+        # 5. 검색 인덱스 갱신 (BM25, 새로 추가된 청크만 증분 반영)
         typer.echo("검색 인덱스(BM25)를 갱신합니다...")
-        get_retriever(force_update=True)
+        add_documents_to_keyword_index("default", ingested_documents)
         typer.echo("검색 인덱스 갱신 완료.")
 
     except Exception as e:
@@ -194,7 +217,6 @@ def ask_question(
         
         # 2. Query Expander 준비
         from src.rag_pipeline.query_expansion import QueryExpander
-        from src.config import settings
         query_expander = QueryExpander(model_name=settings.GEMINI_MODEL)
         
         # 3. RAG 체인을 사용하여 답변 생성
@@ -0,0 +1,146 @@
+"""
+BM25 키워드 검색 쿼리당 지연 시간 벤치마크입니다.
+
+Zipf 분포를 따르는 합성 코퍼스(10k / 100k / 1M 청크)를 CSR 행렬로 직접 생성하여
+KeywordIndex(NumPy/SciPy 벡터화 채점)의 쿼리 지연 시간을 측정합니다.
+작은 코퍼스에서는 기존 rank_bm25(BM25Okapi)와의 비교 결과도 함께 출력합니다.
+--cold-load를 지정하면 메모리 매핑 형식으로 저장한 뒤 콜드 로드 시간도 측정합니다.
+
+실행:
+    PYTHONPATH=. poetry run python scripts/benchmarks/bench_bm25.py --sizes 10000 100000 1000000
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+from scipy import sparse
+
+from src.rag_pipeline.keyword_index import KeywordIndex
+
+VOCAB_SIZE = 50_000
+BUILD_BATCH = 100_000
+
+
+def make_corpus(num_docs: int, avg_len: int, rng: np.random.Generator):
+    """Zipf 분포의 용어로 구성된 합성 용어-문서 CSR 행렬을 생성합니다."""
+    blocks, doc_lens = [], []
+    for start in range(0, num_docs, BUILD_BATCH):
+        n = min(BUILD_BATCH, num_docs - start)
+        lens = np.maximum(rng.poisson(avg_len, n), 1)
+        terms = (rng.zipf(1.3, int(lens.sum())) - 1) % VOCAB_SIZE
+        cols = np.repeat(np.arange(n), lens)
+        # 중복 (term, doc) 쌍은 합산되어 tf가 됩니다.
+        block = sparse.csr_matrix(
+            (np.ones(len(terms), dtype=np.int32), (terms.astype(np.int32), cols.astype(np.int32))),
+            shape=(VOCAB_SIZE, n)
+        )
+        block.sum_duplicates()
+        blocks.append(block)
+        doc_lens.append(lens.astype(np.int32))
+    matrix = sparse.hstack(blocks, format="csr", dtype=np.int32)
+    return matrix, np.concatenate(doc_lens)
+
+
+def make_queries(num_queries: int, rng: np.random.Generator):
+    """흔한 용어와 드문 용어(에러 코드 등)가 섞인 3~6 용어 쿼리를 생성합니다."""
+    queries = []
+    for _ in range(num_queries):
+        n_terms = int(rng.integers(3, 7))
+        terms = (rng.zipf(1.3, n_terms) - 1) % VOCAB_SIZE
+        terms[0] = rng.integers(100, VOCAB_SIZE)  # 드문 용어 1개 포함
+        queries.append([f"t{t}" for t in terms])
+    return queries
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q) * 1000)
+
+
+def bench_keyword_index(num_docs: int, queries, k: int, avg_len: int, rng: np.random.Generator):
+    build_start = time.perf_counter()
+    matrix, doc_lens = make_corpus(num_docs, avg_len, rng)
+    index = KeywordIndex.from_term_matrix(
+        str.split,
+        terms=[f"t{i}" for i in range(VOCAB_SIZE)],
+        ids=[f"chunk_{i}" for i in range(num_docs)],
+        matrix=matrix,
+        doc_lens=doc_lens
+    )
+    build_time = time.perf_counter() - build_start
+
+    index.search_terms(queries[0], k=k)  # 워밍업
+    samples = []
+    for terms in queries:
+        start = time.perf_counter()
+        index.search_terms(terms, k=k)
+        samples.append(time.perf_counter() - start)
+    return index, matrix, build_time, samples
+
+
+def bench_cold_load(index: KeywordIndex, queries, k: int):
+    """인덱스를 저장한 뒤 메모리 매핑 로드 시간과 로드 직후 첫 쿼리 시간을 측정합니다."""
+    with tempfile.TemporaryDirectory() as index_dir:
+        index.save(index_dir, compact=True)
+        start = time.perf_counter()
+        loaded = KeywordIndex.load(index_dir, preprocess_func=str.split)
+        load_time = time.perf_counter() - start
+        start = time.perf_counter()
+        loaded.search_terms(queries[0], k=k)
+        first_query_time = time.perf_counter() - start
+    return load_time, first_query_time
+
+
+def bench_rank_bm25(matrix: sparse.csr_matrix, queries, k: int):
+    """비교용: 기존 BM25Retriever가 사용하는 rank_bm25의 전체 문서 순회 채점."""
+    from rank_bm25 import BM25Okapi
+
+    csc = matrix.tocsc()
+    corpus = []
+    for col in range(csc.shape[1]):
+        start, end = csc.indptr[col], csc.indptr[col + 1]
+        corpus.append([f"t{t}" for t, tf in zip(csc.indices[start:end], csc.data[start:end]) for _ in range(tf)])
+    bm25 = BM25Okapi(corpus)
+
+    samples = []
+    for terms in queries:
+        start = time.perf_counter()
+        scores = bm25.get_scores(terms)
+        np.argsort(scores)[::-1][:k]
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BM25 키워드 검색 지연 시간 벤치마크")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000], help="코퍼스 청크 수")
+    parser.add_argument("--queries", type=int, default=50, help="측정할 쿼리 수")
+    parser.add_argument("--k", type=int, default=40, help="반환할 상위 결과 수 (get_retriever 기본값)")
+    parser.add_argument("--avg-len", type=int, default=120, help="청크당 평균 토큰 수")
+    parser.add_argument("--cold-load", action="store_true", help="저장 후 메모리 매핑 콜드 로드 시간도 측정")
+    parser.add_argument("--baseline-max", type=int, default=10_000, help="rank_bm25 비교를 수행할 최대 코퍼스 크기")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    queries = make_queries(args.queries, rng)
+
+    print(f"{'chunks':>10} | {'engine':<12} | {'build(s)':>8} | {'p50(ms)':>8} | {'p95(ms)':>8} | {'mean(ms)':>8}")
+    print("-" * 70)
+    for size in args.sizes:
+        index, matrix, build_time, samples = bench_keyword_index(size, queries, args.k, args.avg_len, rng)
+        print(f"{size:>10,} | {'sparse':<12} | {build_time:>8.2f} | {percentile_ms(samples, 50):>8.2f} | "
+              f"{percentile_ms(samples, 95):>8.2f} | {np.mean(samples) * 1000:>8.2f}")
+
+        if args.cold_load:
+            load_time, first_query_time = bench_cold_load(index, queries, args.k)
+            print(f"{size:>10,} | {'cold load':<12} | {'-':>8} | load {load_time * 1000:.1f}ms, "
+                  f"first query {first_query_time * 1000:.1f}ms")
+
+        if size <= args.baseline_max:
+            samples = bench_rank_bm25(matrix, queries, args.k)
+            print(f"{size:>10,} | {'rank_bm25':<12} | {'-':>8} | {percentile_ms(samples, 50):>8.2f} | "
+                  f"{percentile_ms(samples, 95):>8.2f} | {np.mean(samples) * 1000:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+ANN 인덱스 벡터 양자화(int8 / PQ)의 recall / 메모리 / 지연 시간 벤치마크입니다.
+
+인덱싱된 컬렉션(--uid)의 임베딩을 Chroma에서 읽어 float32 / int8 / pq 인덱스를 각각 만들고,
+골든 데이터셋(tests/evaluation/golden_dataset.json) 질문 임베딩으로 검색하여
+    - recall@k : float32 전수 검색 상위 k개 대비 양자화 인덱스(재점수 포함) 상위 k개의 겹침 비율
+    - 상주 메모리 : 검색 시 메모리에 있어야 하는 배열 크기 (양자화 시 원본 벡터는 디스크 매핑)
+    - 검색 지연 시간 : 질문당 p50 / p95
+를 비교합니다. 인덱스는 임시 디렉토리에 저장한 뒤 메모리 매핑으로 다시 로드하여 실제 재점수 경로를 측정합니다.
+
+필요 조건: 인덱싱된 컬렉션(--uid), GOOGLE_API_KEY(쿼리 임베딩)
+
+실행:
+    PYTHONPATH=. poetry run python scripts/benchmarks/bench_quantization.py --uid default --k 10
+"""
+import argparse
+import json
+import tempfile
+import time
+
+import numpy as np
+
+from src.config import settings
+from src.rag_pipeline.ann_index import AnnIndex
+from src.rag_pipeline.vector_db import embed_queries, get_vector_store
+
+DEFAULT_DATASET = "tests/evaluation/golden_dataset.json"
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q) * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ANN 인덱스 벡터 양자화 recall/메모리 벤치마크")
+    parser.add_argument("--dataset", default=DEFAULT_DATASET, help="골든 데이터셋 경로")
+    parser.add_argument("--uid", default="default", help="검색할 사용자 컬렉션")
+    parser.add_argument("--k", type=int, default=10, help="recall@k의 k")
+    parser.add_argument("--rescore-factor", type=int, default=settings.ANN_RESCORE_FACTOR, help="재점수 후보 배수")
+    args = parser.parse_args()
+    settings.ANN_RESCORE_FACTOR = args.rescore_factor
+
+    with open(args.dataset, "r", encoding="utf-8") as f:
+        questions = [item["question"] for item in json.load(f)]
+
+    vector_store = get_vector_store(uid=args.uid)
+    chroma = getattr(vector_store, "store", vector_store)
+    data = chroma.get(include=["embeddings", "metadatas"])
+    if not len(data["ids"]):
+        raise SystemExit(f"인덱싱된 청크가 없습니다. (UID: {args.uid})")
+    vectors = np.asarray(data["embeddings"], dtype=np.float32)
+    queries = np.asarray(embed_queries(questions, chroma.embeddings), dtype=np.float32)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for quantization in ("none", "int8", "pq"):
+            index = AnnIndex(quantization=quantization)
+            start = time.perf_counter()
+            index.add(data["ids"], vectors, data["metadatas"])
+            build_seconds = time.perf_counter() - start
+            index.save(f"{tmp_dir}/{quantization}")
+            index = AnnIndex.load(f"{tmp_dir}/{quantization}")
+
+            latencies, hits = [], []
+            for query in queries:
+                start = time.perf_counter()
+                hits.append([chunk_id for chunk_id, _ in index.search(query[None, :], args.k)[0]])
+                latencies.append(time.perf_counter() - start)
+            results[quantization] = (hits, index.memory_bytes(), build_seconds, latencies)
+
+    truth = results["none"][0]
+    float_bytes = results["none"][1]
+    print(f"chunks={len(vectors)} dim={vectors.shape[1]} questions={len(questions)} k={args.k} "
+          f"rescore_factor={args.rescore_factor} pq_sub_dim={settings.ANN_PQ_SUB_DIM}")
+    print(f"{'index':<8} | {f'recall@{args.k}':>9} | {'resident MB':>11} | {'ratio':>6} | {'build s':>7} | {'p50 ms':>7} | {'p95 ms':>7}")
+    print("-" * 74)
+    for quantization, (hits, memory_bytes, build_seconds, latencies) in results.items():
+        recall = np.mean([len(set(found) & set(expected)) / max(len(expected), 1) for found, expected in zip(hits, truth)])
+        print(f"{quantization:<8} | {recall:>9.3f} | {memory_bytes / 2**20:>11.2f} | {float_bytes / memory_bytes:>5.1f}x | "
+              f"{build_seconds:>7.2f} | {percentile_ms(latencies, 50):>7.2f} | {percentile_ms(latencies, 95):>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+크로스 인코더 재순위화의 지연 시간 / 품질 벤치마크입니다.
+
+골든 데이터셋(tests/evaluation/golden_dataset.json)의 각 질문에 대해
+실제 하이브리드 검색(서브 쿼리 + 융합)으로 후보를 만든 뒤,
+    - fusion : 융합 순서 상위 N개
+    - rerank : 크로스 인코더 재순위화 상위 N개
+를 비교합니다. 품질 지표는 정답(ground_truth) 바이그램 토큰이 상위 N개 컨텍스트에 포함된 비율(recall)이며,
+컨텍스트 글자 수(LLM 입력 크기)와 재순위화 지연 시간(p50/p95)도 함께 출력합니다.
+
+필요 조건: 인덱싱된 컬렉션(--uid), GOOGLE_API_KEY(쿼리 임베딩), sentence-transformers
+
+실행:
+    PYTHONPATH=. poetry run python scripts/benchmarks/bench_rerank.py --uid default --top-n 12
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from src.config import settings
+from src.rag_pipeline import reranker
+from src.rag_pipeline.fusion import fuse
+from src.rag_pipeline.retrieval_planner import plan_sub_queries, retrieve_ranked_lists
+from src.rag_pipeline.retriever import get_retriever
+from src.rag_pipeline.tokenizer import char_ngram_tokenizer
+
+DEFAULT_DATASET = "tests/evaluation/golden_dataset.json"
+
+
+def answer_recall(ground_truth: str, docs) -> float:
+    """정답 토큰 중 컨텍스트에 등장하는 토큰의 비율"""
+    truth = set(char_ngram_tokenizer(ground_truth))
+    if not truth:
+        return 0.0
+    context = set()
+    for doc in docs:
+        context.update(char_ngram_tokenizer(doc.page_content))
+    return len(truth & context) / len(truth)
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q) * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="크로스 인코더 재순위화 지연 시간/품질 벤치마크")
+    parser.add_argument("--dataset", default=DEFAULT_DATASET, help="골든 데이터셋 경로")
+    parser.add_argument("--uid", default="default", help="검색할 사용자 컬렉션")
+    parser.add_argument("--candidates", type=int, default=100, help="재순위화할 융합 후보 수")
+    parser.add_argument("--top-n", type=int, default=settings.RERANK_TOP_N, help="남길 상위 청크 수")
+    parser.add_argument("--batch-size", type=int, default=settings.RERANK_BATCH_SIZE, help="크로스 인코더 배치 크기")
+    args = parser.parse_args()
+
+    with open(args.dataset, "r", encoding="utf-8") as f:
+        dataset = json.load(f)
+
+    model = reranker.get_cross_encoder()
+    if model is None:
+        raise SystemExit("크로스 인코더를 로드할 수 없습니다. (poetry install -E rerank)")
+    retriever = get_retriever(uid=args.uid)
+
+    rows, latencies = [], []
+    for item in dataset:
+        query = item["question"]
+        ranked_lists = retrieve_ranked_lists(retriever, plan_sub_queries(query, query))
+        candidates = fuse(ranked_lists, retriever.fusion_params, top_n=args.candidates)
+
+        start = time.perf_counter()
+        reranked = reranker.rerank(
+            query, candidates, top_n=args.top_n,
+            scorer=lambda q, docs: reranker.score_pairs(q, docs, model=model, batch_size=args.batch_size)
+        )
+        latencies.append(time.perf_counter() - start)
+
+        baseline = candidates[:args.top_n]
+        rows.append((
+            answer_recall(item["ground_truth"], candidates),
+            answer_recall(item["ground_truth"], baseline),
+            answer_recall(item["ground_truth"], reranked),
+            sum(len(doc.page_content) for doc in candidates),
+            sum(len(doc.page_content) for doc in reranked),
+        ))
+
+    rows = np.array(rows)
+    print(f"questions={len(dataset)} candidates={args.candidates} top_n={args.top_n} "
+          f"model={settings.RERANK_MODEL} backend={settings.RERANK_BACKEND} int8={settings.RERANK_INT8}")
+    print(f"{'setting':<22} | {'answer recall':>13} | {'context chars':>13}")
+    print("-" * 56)
+    print(f"{f'fusion top-{args.candidates}':<22} | {rows[:, 0].mean():>13.3f} | {rows[:, 3].mean():>13,.0f}")
+    print(f"{f'fusion top-{args.top_n}':<22} | {rows[:, 1].mean():>13.3f} | {'-':>13}")
+    print(f"{f'rerank top-{args.top_n}':<22} | {rows[:, 2].mean():>13.3f} | {rows[:, 4].mean():>13,.0f}")
+    print(f"rerank latency: p50 {percentile_ms(latencies, 50):.1f}ms, p95 {percentile_ms(latencies, 95):.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+멀티테넌트 벡터 저장소 배치(STORAGE_LAYOUT) 벤치마크입니다.
+
+합성 테넌트(기본 1k / 10k 유저, 유저당 청크 --chunks개, 무작위 벡터)를 두 배치로 만들어 비교합니다.
+    - per_user : 유저마다 {dir}/{uid}/ Chroma 디렉토리와 클라이언트 (기존 방식)
+    - shared   : {dir}/_shared/ 공유 클라이언트 하나 + 유저별 컬렉션 파티션 (세그먼트 캐시 LRU)
+측정 항목:
+    - open s     : 모든 유저의 벡터 스토어를 여는 데 걸린 시간
+    - RSS MB     : 모든 유저를 연 뒤 쿼리까지 수행한 프로세스의 상주 메모리
+    - fds        : 열린 파일 디스크립터 수
+    - p50/p95 ms : 무작위 유저에 대한 쿼리당 지연 시간 (세그먼트 첫 로드 포함)
+    - files / disk MB : 배치의 파일 수와 디스크 사용량 (GCS 동기화 대상)
+메모리/파일 핸들을 공정하게 비교하기 위해 측정은 배치마다 새 프로세스에서 수행합니다.
+
+실행:
+    PYTHONPATH=. poetry run python scripts/benchmarks/bench_tenant_storage.py --tenants 1000 10000 --chunks 50
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+
+from src.config import settings
+from src.rag_pipeline.shared_store import get_shared_client, tenant_collection_name
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q) * 1000)
+
+
+def tenant_uid(i: int) -> str:
+    return f"tenant{i:06d}"
+
+
+def open_client(layout: str, root: str, uid: str):
+    if layout == "shared":
+        return get_shared_client(), tenant_collection_name(settings.COLLECTION_NAME, uid)
+    return chromadb.PersistentClient(path=os.path.join(root, uid)), settings.COLLECTION_NAME
+
+
+def build(layout: str, root: str, num_tenants: int, num_chunks: int, dim: int, rng: np.random.Generator) -> float:
+    """합성 테넌트를 만들고 걸린 시간(초)을 반환합니다."""
+    start = time.perf_counter()
+    for i in range(num_tenants):
+        uid = tenant_uid(i)
+        client, name = open_client(layout, root, uid)
+        collection = client.create_collection(name, metadata={"uid": uid})
+        collection.add(
+            ids=[f"doc_p{j}_chunk_0" for j in range(num_chunks)],
+            embeddings=rng.standard_normal((num_chunks, dim), dtype=np.float32),
+            metadatas=[{"doc_name": "doc", "page": j} for j in range(num_chunks)],
+            documents=[f"chunk {j}" for j in range(num_chunks)]
+        )
+        if layout != "shared":
+            client.close()
+    return time.perf_counter() - start
+
+
+def measure(layout: str, root: str, num_tenants: int, num_queries: int, dim: int, k: int):
+    """모든 유저를 연 뒤 무작위 유저 쿼리를 수행하고 한 줄 결과를 출력합니다. (하위 프로세스에서 실행)"""
+    rng = np.random.default_rng(1)
+    start = time.perf_counter()
+    collections = []
+    for i in range(num_tenants):
+        uid = tenant_uid(i)
+        client, name = open_client(layout, root, uid)
+        collections.append(client.get_collection(name))
+    open_seconds = time.perf_counter() - start
+
+    latencies = []
+    for tenant in rng.integers(0, num_tenants, num_queries):
+        query = rng.standard_normal((1, dim), dtype=np.float32)
+        start = time.perf_counter()
+        collections[tenant].query(query_embeddings=query, n_results=k, include=["metadatas", "distances"])
+        latencies.append(time.perf_counter() - start)
+
+    with open("/proc/self/status", "r") as f:
+        rss_kb = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+    fds = len(os.listdir("/proc/self/fd"))
+    print(f"{open_seconds} {rss_kb / 1024} {fds} {percentile_ms(latencies, 50)} {percentile_ms(latencies, 95)}")
+
+
+def disk_usage(root: str):
+    files, size = 0, 0
+    for dir_path, _, names in os.walk(root):
+        for name in names:
+            files += 1
+            size += os.path.getsize(os.path.join(dir_path, name))
+    return files, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="멀티테넌트 벡터 저장소 배치 벤치마크")
+    parser.add_argument("--tenants", type=int, nargs="+", default=[1000, 10000], help="유저 수")
+    parser.add_argument("--chunks", type=int, default=50, help="유저당 청크 수")
+    parser.add_argument("--dim", type=int, default=768, help="임베딩 차원")
+    parser.add_argument("--queries", type=int, default=500, help="측정할 쿼리 수")
+    parser.add_argument("--k", type=int, default=10, help="쿼리당 결과 수")
+    parser.add_argument("--layouts", nargs="+", default=["per_user", "shared"], choices=["per_user", "shared"])
+    parser.add_argument("--measure", nargs=2, metavar=("LAYOUT", "DIR"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        layout, root = args.measure
+        settings.CHROMA_DB_DIR = root
+        measure(layout, root, args.tenants[0], args.queries, args.dim, args.k)
+        return
+
+    print(f"chunks/tenant={args.chunks} dim={args.dim} queries={args.queries} k={args.k} "
+          f"segment_cache={settings.SHARED_STORE_SEGMENT_CACHE_MB}MB")
+    print(f"{'tenants':>7} | {'layout':<8} | {'build s':>8} | {'open s':>7} | {'RSS MB':>8} | {'fds':>6} | "
+          f"{'p50 ms':>7} | {'p95 ms':>7} | {'files':>7} | {'disk MB':>8}")
+    print("-" * 100)
+    for num_tenants in args.tenants:
+        for layout in args.layouts:
+            with tempfile.TemporaryDirectory() as root:
+                settings.CHROMA_DB_DIR = root
+                build_seconds = build(layout, root, num_tenants, args.chunks, args.dim, np.random.default_rng(0))
+                files, size = disk_usage(root)
+                result = subprocess.run(
+                    [sys.executable, __file__, "--measure", layout, root, "--tenants", str(num_tenants),
+                     "--queries", str(args.queries), "--dim", str(args.dim), "--k", str(args.k)],
+                    capture_output=True, text=True
+                )
+                if result.returncode != 0:
+                    print(f"{num_tenants:>7} | {layout:<8} | {build_seconds:>8.1f} | 측정 실패: {result.stderr.strip().splitlines()[-1:]}")
+                    continue
+                open_seconds, rss_mb, fds, p50, p95 = map(float, result.stdout.split()[-5:])
+                print(f"{num_tenants:>7} | {layout:<8} | {build_seconds:>8.1f} | {open_seconds:>7.2f} | {rss_mb:>8.1f} | "
+                      f"{int(fds):>6} | {p50:>7.2f} | {p95:>7.2f} | {files:>7} | {size / 2**20:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+검색 파라미터 오프라인 튜너입니다. (지연 시간 / recall Pareto 탐색)
+
+파싱 캐시(PARSED_DATA_DIR/{doc_name}/page_NNN.json)의 페이지를 청크 크기/중첩 조합마다 임시 디렉토리에 다시 인제스트한 뒤
+(실제 인제스트 경로: 청킹 → 페이지 연속 감지 → 근사 중복 병합 → 벡터 스토어 → 키워드/정확 일치/페이지 인덱스),
+골든 데이터셋(tests/evaluation/golden_dataset.json)의 질문으로 실제 검색 경로(retrieve_documents)를 실행하여
+    - CHUNK_SIZE / CHUNK_OVERLAP          : 청크 크기 / 중첩
+    - RETRIEVAL_K                         : 레그별 검색 수
+    - ENSEMBLE_WEIGHTS                    : [키워드, 벡터] 융합 가중치
+    - CONTEXT_MAX_DOCS                    : 컨텍스트 패킹 후보 최대 청크 수
+    - CONTEXT_TOKEN_BUDGET                : 컨텍스트 토큰 예산
+    - CONTEXT_EXPANSION_RADIUS            : 주변 페이지 확장 거리
+의 격자를 탐색하고 recall@k, MRR, 컨텍스트 토큰 수, 검색 지연 시간(p50/p95)을 출력합니다.
+Pareto 최적 설정에는 *를 표시하고, 그중 품질 우선으로 고른 설정을 .env 형식 프로필(--output)로 저장합니다.
+
+기본값(--embedding local)은 외부 API 없이 로컬 해싱 임베딩을 사용하고, 쿼리 확장(LLM)은 원본 질문을 그대로 사용합니다.
+로컬 임베딩의 벡터 레그 품질과 지연 시간은 Google 임베딩과 다르므로, 최종 확인은 --embedding google로 하는 것이 좋습니다.
+
+필요 조건: 파싱 캐시(한 번 인제스트한 문서), --embedding google이면 GOOGLE_API_KEY
+
+실행:
+    PYTHONPATH=. poetry run python scripts/benchmarks/tune_retrieval.py --chunk-sizes 500 800 1200 --k 20 40 --output tuned.env
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import tempfile
+import time
+
+from src.config import settings
+from src.rag_pipeline import vector_db
+from src.rag_pipeline.autotune import (
+    HashingEmbeddings,
+    first_relevant_rank,
+    format_metrics,
+    pareto_front,
+    recommend,
+    summarize_trial,
+    to_profile,
+)
+from src.rag_pipeline.context_packer import pack_context
+from src.rag_pipeline.continuation import detect_continuations
+from src.rag_pipeline.generator import retrieve_documents
+from src.rag_pipeline.near_dup import collapse_ingested_chunks
+from src.rag_pipeline.retriever import add_documents_to_keyword_index, get_retriever
+from src.rag_pipeline.schema import PageContent
+from src.rag_pipeline.vector_db import add_documents_to_vector_db, build_page_documents, get_vector_store
+
+DEFAULT_DATASET = "tests/evaluation/golden_dataset.json"
+
+
+def load_parsed_pages(doc_names):
+    """파싱 캐시에서 문서별 (페이지 번호, PageContent) 리스트를 읽습니다."""
+    root = settings.PARSED_DATA_DIR
+    doc_names = doc_names or sorted(name for name in os.listdir(root) if os.path.isdir(os.path.join(root, name)))
+    pages_by_doc = {}
+    for doc_name in doc_names:
+        pages = []
+        for file_name in sorted(os.listdir(os.path.join(root, doc_name))):
+            if not (file_name.startswith("page_") and file_name.endswith(".json")):
+                continue
+            with open(os.path.join(root, doc_name, file_name), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            page_num = int(file_name[len("page_"):-len(".json")])
+            pages.append((page_num, PageContent(**{key: value for key, value in data.items() if key in PageContent.model_fields})))
+        if pages:
+            pages_by_doc[doc_name] = pages
+    return pages_by_doc
+
+
+def ingest(uid: str, pages_by_doc) -> int:
+    """인제스트 경로(routes.process_document_background)와 같은 순서로 청크를 만들어 인덱싱하고 청크 수를 반환합니다."""
+    vector_store = get_vector_store(uid=uid)
+    total = 0
+    for doc_name, pages in pages_by_doc.items():
+        continuations = detect_continuations(pages)
+        documents = []
+        for page_num, page_content in pages:
+            thumbnail_path = os.path.join("assets/images", doc_name, f"page_{page_num:03d}.png")
+            documents.extend(build_page_documents(
+                page_content, page_num, thumbnail_path,
+                continues_to_next=page_num in continuations,
+                continues_from_prev=(page_num - 1) in continuations
+            ))
+        if settings.NEAR_DUP_ENABLED:
+            documents, _ = collapse_ingested_chunks(documents)
+        add_documents_to_keyword_index(uid, add_documents_to_vector_db(documents, vector_store))
+        total += len(documents)
+    return total
+
+
+def run_questions(dataset, uid: str, retriever, threshold: float, repeat: int = 1, token_budget: int = 0):
+    """질문별 (패킹된 컨텍스트의 첫 정답 순위, 컨텍스트 토큰 수)와 검색 지연 시간(질문 x repeat회)을 반환합니다."""
+    ranks, tokens, latencies = [], [], []
+    for item in dataset:
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(repeat):
+                start = time.perf_counter()
+                docs = retrieve_documents(item["question"], item["question"], retriever, uid=uid)
+                latencies.append(time.perf_counter() - start)
+        packed = pack_context(docs, token_budget)
+        ranks.append(first_relevant_rank(packed.documents, item["ground_truth"], threshold))
+        tokens.append(packed.tokens)
+    return ranks, tokens, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="검색 파라미터 오프라인 튜너 (recall / MRR / 토큰 / 지연 시간 Pareto 탐색)")
+    parser.add_argument("--dataset", default=DEFAULT_DATASET, help="골든 데이터셋 경로")
+    parser.add_argument("--docs", nargs="*", help="파싱 캐시에서 사용할 문서 이름 (기본: 전체)")
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[500, 800, 1200])
+    parser.add_argument("--chunk-overlaps", type=int, nargs="+", default=[50, 100, 200])
+    parser.add_argument("--k", type=int, nargs="+", default=[20, 40, 80], help="레그별 검색 수 후보")
+    parser.add_argument("--keyword-weights", type=float, nargs="+", default=[0.3, 0.5, 0.7], help="키워드 레그 가중치 후보 (벡터 = 1 - 값)")
+    parser.add_argument("--max-docs", type=int, nargs="+", default=[30, 60, 100], help="컨텍스트 패킹 후보 최대 청크 수 후보")
+    parser.add_argument("--token-budgets", type=int, nargs="+", default=[8000, 16000], help="컨텍스트 토큰 예산 후보 (0이면 제한 없음)")
+    parser.add_argument("--radius", type=int, nargs="+", default=[0, 1, 2], help="주변 페이지 확장 거리 후보")
+    parser.add_argument("--recall-at", type=int, nargs="+", default=[5, 10], help="recall@k를 계산할 k")
+    parser.add_argument("--relevance-threshold", type=float, default=0.8, help="정답 청크로 볼 정답 토큰 포함 비율")
+    parser.add_argument("--repeat", type=int, default=3, help="지연 시간 측정을 위해 질문당 반복할 검색 횟수")
+    parser.add_argument("--embedding", choices=["local", "google"], default="local", help="청크/쿼리 임베딩 (local: 해싱 임베딩)")
+    parser.add_argument("--output", default="tuned_profile.env", help="추천 설정 프로필(.env) 저장 경로")
+    args = parser.parse_args()
+
+    with open(args.dataset, "r", encoding="utf-8") as f:
+        dataset = json.load(f)
+    pages_by_doc = load_parsed_pages(args.docs)
+    if not pages_by_doc:
+        print(f"파싱 캐시가 없습니다: {settings.PARSED_DATA_DIR} (문서를 한 번 인제스트해야 합니다)")
+        return
+
+    if args.embedding == "local":
+        vector_db._embedding_function = HashingEmbeddings()
+    # 임시 디렉토리의 유저별 저장소만 사용 (공유 저장소/코퍼스, 검색 캐시는 사용하지 않음)
+    settings.STORAGE_LAYOUT = "per_user"
+    settings.SHARED_CORPUS_ENABLED = False
+    settings.RETRIEVAL_CACHE_ENABLED = False
+    settings.CHROMA_DB_DIR = tempfile.mkdtemp(prefix="tune_retrieval_")
+
+    num_pages = sum(len(pages) for pages in pages_by_doc.values())
+    print(f"questions={len(dataset)} docs={len(pages_by_doc)} pages={num_pages} embedding={args.embedding} db={settings.CHROMA_DB_DIR}")
+    results = []
+    for chunk_size, chunk_overlap in itertools.product(args.chunk_sizes, args.chunk_overlaps):
+        if chunk_overlap >= chunk_size:
+            continue
+        settings.CHUNK_SIZE, settings.CHUNK_OVERLAP = chunk_size, chunk_overlap
+        uid = f"tune-{chunk_size}-{chunk_overlap}"
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            num_chunks = ingest(uid, pages_by_doc)
+        print(f"[build] CHUNK_SIZE={chunk_size} CHUNK_OVERLAP={chunk_overlap}: {num_chunks} chunks in {time.perf_counter() - start:.1f}s")
+
+        # 인덱스 로드 / 쿼리 토크나이저 캐시 워밍업 (측정에서 제외)
+        run_questions(dataset, uid, get_retriever(uid=uid), args.relevance_threshold)
+        grid = itertools.product(args.k, args.keyword_weights, args.max_docs, args.token_budgets, args.radius)
+        for k, keyword_weight, max_docs, token_budget, radius in grid:
+            settings.CONTEXT_MAX_DOCS, settings.CONTEXT_EXPANSION_RADIUS = max_docs, radius
+            weights = [keyword_weight, round(1.0 - keyword_weight, 4)]
+            retriever = get_retriever(uid=uid, search_kwargs={"k": k}, ensemble_weights=weights)
+            ranks, tokens, latencies = run_questions(dataset, uid, retriever, args.relevance_threshold, args.repeat, token_budget)
+            params = {
+                "CHUNK_SIZE": chunk_size,
+                "CHUNK_OVERLAP": chunk_overlap,
+                "RETRIEVAL_K": k,
+                "ENSEMBLE_WEIGHTS": weights,
+                "CONTEXT_MAX_DOCS": max_docs,
+                "CONTEXT_TOKEN_BUDGET": token_budget,
+                "CONTEXT_EXPANSION_RADIUS": radius,
+            }
+            results.append(summarize_trial(params, ranks, tokens, latencies, args.recall_at))
+
+    front = pareto_front(results)
+    front_ids = {id(result) for result in front}
+    print(f"\n{'':1} {'size':>5} {'ovl':>4} {'k':>4} {'weights':>11} {'max':>4} {'budget':>6} {'rad':>3} | metrics")
+    print("-" * 117)
+    for result in sorted(results, key=lambda r: (-r.recall[max(r.recall)], -r.mrr, r.tokens)):
+        p = result.params
+        mark = "*" if id(result) in front_ids else " "
+        weights = "/".join(f"{w:g}" for w in p["ENSEMBLE_WEIGHTS"])
+        print(f"{mark} {p['CHUNK_SIZE']:>5} {p['CHUNK_OVERLAP']:>4} {p['RETRIEVAL_K']:>4} {weights:>11} "
+              f"{p['CONTEXT_MAX_DOCS']:>4} {p['CONTEXT_TOKEN_BUDGET']:>6} {p['CONTEXT_EXPANSION_RADIUS']:>3} | {format_metrics(result)}")
+
+    best = recommend(front)
+    comment = (
+        f"검색 파라미터 튜닝 결과 (tune_retrieval.py, 질문 {len(dataset)}개, embedding={args.embedding}, Pareto 최적 {len(front)}개 중 품질 우선)\n"
+        f"CHUNK_SIZE / CHUNK_OVERLAP 변경은 문서를 다시 인제스트해야 적용됩니다."
+    )
+    with open(args.output, "w", encoding="utf-8") as f:
+        f.write(to_profile(best, front, comment))
+    print(f"\n추천 설정 ({format_metrics(best)}) -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
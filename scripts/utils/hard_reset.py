@@ -1,6 +1,7 @@
 import os
 import shutil
 from src.services.storage import storage_manager
+from src.rag_pipeline.shared_store import delete_tenant_collections
 from src.config import settings
 
 def reset_all_data(uid: str = "default"):
@@ -11,6 +12,9 @@ def reset_all_data(uid: str = "default"):
     if os.path.exists(local_db_path):
         shutil.rmtree(local_db_path)
         print(f"Local DB deleted: {local_db_path}")
+    if settings.STORAGE_LAYOUT == "shared":
+        deleted = delete_tenant_collections(uid)
+        print(f"Shared store collections deleted: {deleted}")
         
     local_assets_path = os.path.join("assets/images", uid)
     if os.path.exists(local_assets_path):
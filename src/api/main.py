@@ -4,6 +4,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from src.api.routes import router as api_router, ws_router
 from src.rag_pipeline.retriever import get_retriever
+from src.rag_pipeline.tenant_cache import tenant_cache
 from src.rag_pipeline.query_expansion import QueryExpander
 from src.config import settings
 
@@ -39,8 +40,9 @@ print("Initializing Query Expander...")
 app.state.query_expander = QueryExpander(model_name=settings.GEMINI_MODEL)
 print("Query Expander initialized.")
 
-# 유저별 리트리버 캐시 (UID: EnsembleRetriever)
+# 유저별 리트리버 캐시 (UID: HybridRetriever). 테넌트 캐시가 벡터 스토어/인덱스와 함께 LRU/유휴 TTL로 제거합니다.
 app.state.retrievers = {}
+tenant_cache.register("retriever", app.state.retrievers)
 
 # 비동기 작업 상태를 저장하기 위한 딕셔너리
 app.state.job_status = {}
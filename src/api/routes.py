@@ -3,7 +3,7 @@ import time
 import os
 import uuid
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks, Depends, Request, WebSocket, WebSocketDisconnect, Query
 from fastapi.responses import JSONResponse
@@ -21,9 +21,15 @@ import uuid
 from src.rag_pipeline.loader import load_pdf_as_documents
 from src.rag_pipeline.thumbnail import create_thumbnails
 from src.rag_pipeline.parser import parse_page_multimodal_async
-from src.rag_pipeline.vector_db import get_vector_store, add_page_content_to_vector_db
-from src.rag_pipeline.retriever import get_retriever
+from src.rag_pipeline.vector_db import get_vector_store, build_page_documents, add_documents_to_vector_db
+from src.rag_pipeline.near_dup import collapse_ingested_chunks
+from src.rag_pipeline.continuation import detect_continuations
+from src.rag_pipeline.retriever import get_retriever, add_documents_to_keyword_index
 from src.rag_pipeline.generator import generate_answer_with_rag, generate_answer_with_rag_streaming, generate_session_title
+from src.rag_pipeline.fusion import FusionParams
+from src.rag_pipeline.retrieval_cache import retrieval_cache, invalidate_tenant
+from src.rag_pipeline.shared_corpus import CorpusInfo, corpus_uid_for_file, read_corpus_info, subscribe, subscribed_corpora, subscribers_path, unsubscribe, write_corpus_info
+from src.rag_pipeline.tenant_cache import tenant_cache
 from src.config import settings
 from src.services.storage import storage_manager
 import fitz
@@ -33,6 +39,38 @@ router = APIRouter()
 # WebSocket 엔드포인트용 라우터 (별도 인증)
 ws_router = APIRouter()
 
+# 이 프로세스에서 인덱싱 중인 공유 코퍼스 UID (같은 PDF의 동시 업로드가 중복 인덱싱하지 않도록)
+_corpus_ingests = set()
+
+def get_tenant_retriever(app_state: Any, uid: str):
+    """
+    유저별 리트리버를 반환합니다. 처음 요청했거나 테넌트 캐시에서 제거된 유저는 GCS 동기화 후 다시 로드합니다.
+    """
+    if not hasattr(app_state, "retrievers"):
+        app_state.retrievers = {}
+        tenant_cache.register("retriever", app_state.retrievers)
+    tenant_cache.touch(uid)
+    if uid not in app_state.retrievers:
+        try: storage_manager.sync_db_from_gcs(uid)
+        except: pass
+        # 구독한 공유 코퍼스 중 로컬에 없는 코퍼스도 내려받음
+        if settings.SHARED_CORPUS_ENABLED:
+            for corpus_uid in subscribed_corpora(uid):
+                if read_corpus_info(corpus_uid) is None:
+                    try: storage_manager.sync_db_from_gcs(corpus_uid)
+                    except: pass
+        app_state.retrievers[uid] = get_retriever(uid=uid)
+    return app_state.retrievers[uid]
+
+def sync_corpus_subscribers(corpus_uid: str):
+    """코퍼스 구독자 목록만 GCS에 올립니다. (구독 변경마다 코퍼스 전체를 다시 올리지 않도록)"""
+    try: storage_manager.upload_file(subscribers_path(corpus_uid), f"{corpus_uid}/vector_db/{os.path.basename(subscribers_path(corpus_uid))}")
+    except Exception as e: print(f"코퍼스 구독자 목록 GCS 업로드 실패: {e}")
+
+def tenant_lease_uids(uid: str) -> List[str]:
+    """질의 처리 중 임대할 UID: 유저 자신과 구독한 공유 코퍼스"""
+    return [uid] + (subscribed_corpora(uid) if settings.SHARED_CORPUS_ENABLED else [])
+
 # --- Background Task ---
 
 async def process_document_background(
@@ -41,14 +79,20 @@ async def process_document_background(
     filename: str,
     job_status_db: Dict[str, Any],
     app_state: Any,
-    uid: str = None
+    uid: str = None,
+    corpus_uid: Optional[str] = None
 ):
     """
     PDF 문서 처리 백그라운드 작업 (비동기 병렬 처리).
     완료 후에는 메모리에 캐시된 리트리버를 업데이트합니다. (성능 로깅 포함)
+    corpus_uid가 주어지면 유저 대신 공유 코퍼스에 인덱싱한 뒤 유저를 구독자로 등록합니다.
     """
+    # 인덱스/썸네일/GCS 경로에 사용할 UID (공유 코퍼스이면 코퍼스 UID)
+    index_uid = corpus_uid or uid
     print(f"\n--- Parallel Ingestion Pipeline Benchmark for {filename} ---")
     total_start_time = time.time()
+    # 인덱싱 도중 테넌트 캐시가 벡터 스토어/인덱스를 닫지 않도록 작업이 끝날 때까지 임대
+    tenant_cache.acquire(index_uid, uid)
     try:
         job_status_db[job_id] = {
             "job_id": job_id, "status": "processing", "message": "문서 처리 시작",
@@ -67,18 +111,18 @@ async def process_document_background(
             raise ValueError("PDF 파일을 읽을 수 없거나 빈 파일입니다.")
 
         # GCS에서 기존 DB 다운로드 (기존 인덱스가 있는 경우 확보)
-        if uid:
+        if index_uid:
             try:
-                storage_manager.sync_db_from_gcs(uid)
+                storage_manager.sync_db_from_gcs(index_uid)
             except Exception as e:
                 print(f"GCS DB 다운로드 실패 (신규 유저일 수 있음): {e}")
 
-        vector_store = get_vector_store(uid=uid)
+        vector_store = get_vector_store(uid=index_uid)
         original_pdf_doc = fitz.open(file_path)
         
         # 2. 썸네일 생성
         thumb_start_time = time.time()
-        thumbnail_paths = create_thumbnails(original_pdf_doc, doc_name, uid=uid)
+        thumbnail_paths = create_thumbnails(original_pdf_doc, doc_name, uid=index_uid)
         thumb_time = time.time() - thumb_start_time
         print(f"[2] Thumbnail Creation Time: {thumb_time:.4f}s")
 
@@ -133,29 +177,57 @@ async def process_document_background(
                  print(f"Extracted Document Title: {extracted_title}")
                  break
         
-        # DB 저장 (추출된 타이틀을 모든 청크에 메타데이터로 적용)
+        # 페이지 간 연속(여러 페이지에 걸친 표/절차) 감지: 연결된 페이지 쌍을 청크 메타데이터로 저장
+        continuations = detect_continuations([(page_num, parsed_content) for page_num, _, parsed_content in sorted_results])
+        print(f"Detected page continuations: {len(continuations)} ({', '.join(f'p{p}->{p + 1}' for p in sorted(continuations)[:20])})")
+
+        # 청크 생성 (추출된 타이틀을 모든 청크에 메타데이터로 적용)
         success_count = 0
-        for page_num, thumbnail_path, parsed_content in results:
+        page_documents = []
+        for page_num, thumbnail_path, parsed_content in sorted_results:
             if parsed_content:
                 try:
-                    add_page_content_to_vector_db(parsed_content, page_num, thumbnail_path, vector_store, document_title=extracted_title)
+                    page_documents.extend(
+                        build_page_documents(
+                            parsed_content, page_num, thumbnail_path, document_title=extracted_title,
+                            continues_to_next=page_num in continuations,
+                            continues_from_prev=(page_num - 1) in continuations
+                        )
+                    )
                     success_count += 1
                 except Exception as e:
-                    print(f"Error adding page {page_num} to DB: {e}")
+                    print(f"Error building chunks for page {page_num}: {e}")
+
+        # 근사 중복 청크(반복되는 경고문/표) 병합: 대표 청크 하나에 등장 페이지 목록을 기록
+        if settings.NEAR_DUP_ENABLED:
+            page_documents, collapsed = collapse_ingested_chunks(page_documents)
+            print(f"Near-duplicate chunks collapsed: {collapsed} (kept {len(page_documents)})")
+
+        # DB 저장 (배치 단위)
+        ingested_documents = add_documents_to_vector_db(page_documents, vector_store)
 
         page_processing_time = time.time() - page_processing_start_time
         print(f"[3] Parallel Pages Processing Time ({total_pages} pages): {page_processing_time:.4f}s")
 
         original_pdf_doc.close()
         
-        # 4. 디스크의 인덱스 업데이트
-        get_retriever(uid=uid, force_update=True)
+        # 4. 디스크의 인덱스 업데이트 (새로 추가된 청크만 증분 반영)
+        index_start_time = time.time()
+        add_documents_to_keyword_index(index_uid, ingested_documents)
+        print(f"[4] Keyword Index Update Time ({len(ingested_documents)} chunks): {time.time() - index_start_time:.4f}s")
+
+        # 공유 코퍼스: 인덱싱 완료를 기록하고 업로드한 유저를 구독자로 등록
+        if corpus_uid:
+            write_corpus_info(corpus_uid, CorpusInfo(doc_name=doc_name, title=extracted_title, total_pages=total_pages))
+            subscribe(uid, doc_name, corpus_uid)
+            invalidate_tenant(uid)
+            print(f"Shared corpus indexed: {corpus_uid} (subscribed UID: {uid})")
         
-        # 4.1 GCS로 업데이트된 DB 업로드 (영구 저장)
-        if uid:
+        # 4.1 GCS로 업데이트된 DB 업로드 (영구 저장, 공유 코퍼스이면 코퍼스와 유저 구독 목록)
+        for sync_uid in dict.fromkeys(filter(None, (index_uid, uid))):
             try:
-                storage_manager.sync_db_to_gcs(uid)
-                print(f"GCS DB 업로드 완료 (UID: {uid})")
+                storage_manager.sync_db_to_gcs(sync_uid)
+                print(f"GCS DB 업로드 완료 (UID: {sync_uid})")
             except Exception as e:
                 print(f"GCS DB 업로드 실패: {e}")
 
@@ -167,11 +239,11 @@ async def process_document_background(
         print(f"[5] In-Memory Retriever Updated (UID: {uid})")
 
         # 6. 생성된 썸네일 GCS 업로드 (영구 저장)
-        if uid:
+        if index_uid:
             try:
-                local_thumb_dir = os.path.join("assets/images", uid, doc_name)
-                storage_manager.upload_directory(local_thumb_dir, f"{uid}/thumbnails/{doc_name}")
-                print(f"Thumbnails uploaded for {doc_name} (UID: {uid})")
+                local_thumb_dir = os.path.join("assets/images", index_uid, doc_name)
+                storage_manager.upload_directory(local_thumb_dir, f"{index_uid}/thumbnails/{doc_name}")
+                print(f"Thumbnails uploaded for {doc_name} (UID: {index_uid})")
             except Exception as e:
                 print(f"Thumbnail GCS upload failed: {e}")
 
@@ -186,6 +258,8 @@ async def process_document_background(
             "details": {"filename": filename}
         }
     finally:
+        tenant_cache.release(index_uid, uid)
+        _corpus_ingests.discard(corpus_uid)
         if os.path.exists(file_path):
             os.remove(file_path)
         total_time = time.time() - total_start_time
@@ -200,11 +274,14 @@ async def ingest_document(
     background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     force: bool = Query(False, description="이미 존재하는 문서라도 강제로 다시 인제스트할지 여부"),
+    share: bool = Query(False, description="공유 코퍼스로 인덱싱/구독할지 여부 (벤더 매뉴얼처럼 공개 문서만, SHARED_CORPUS_ENABLED일 때)"),
     current_user: dict = Depends(get_current_user)
 ):
     """
     PDF 파일을 업로드하여 RAG 시스템에 등록하는 작업을 시작합니다.
     GCS의 유저별 격리 폴더에 저장됩니다.
+    SHARED_CORPUS_ENABLED이고 share=true이면 같은 내용의 PDF가 공유 코퍼스에 이미 있을 때 인덱싱 없이 구독만 등록하고,
+    없거나 force=true이면 공유 코퍼스에 (다시) 인덱싱한 뒤 구독합니다. share를 생략하면 공유 코퍼스를 조회하지 않고 개인 인덱스에만 인덱싱합니다.
     """
     uid = current_user.get("sub")
     if not file.filename.lower().endswith(".pdf"):
@@ -231,17 +308,57 @@ async def ingest_document(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"파일 저장 실패: {e}")
 
+    job_id = str(uuid.uuid4())
+    job_status_db = request.app.state.job_status
+
+    # 공유 코퍼스 (share=true로 명시한 업로드만): 같은 PDF가 이미 인덱싱되어 있으면 파싱/임베딩 없이 구독만 등록
+    corpus_uid = None
+    ingest_filename = file.filename
+    if settings.SHARED_CORPUS_ENABLED and share:
+        corpus_uid = corpus_uid_for_file(str(file_path))
+        if corpus_uid in _corpus_ingests:
+            os.remove(file_path)
+            raise HTTPException(status_code=409, detail="같은 문서가 공유 코퍼스에 인덱싱 중입니다. 잠시 후 다시 시도하세요.")
+        info = read_corpus_info(corpus_uid)
+        if info is None:
+            try: storage_manager.sync_db_from_gcs(corpus_uid)
+            except: pass
+            info = read_corpus_info(corpus_uid)
+        if info is not None and any(d["filename"] == info.doc_name and not d.get("shared") for d in indexed_docs):
+            os.remove(file_path)
+            raise HTTPException(status_code=409, detail=f"이미 '{info.doc_name}' 이름의 개인 문서가 인덱싱되어 있습니다.")
+        if info is not None and not force:
+            os.remove(file_path)
+            subscribe(uid, info.doc_name, corpus_uid)
+            if read_corpus_info(corpus_uid) is None:
+                # 구독 직전에 마지막 구독자가 해제하여 코퍼스가 회수됨
+                unsubscribe(uid, info.doc_name)
+                raise HTTPException(status_code=409, detail="공유 문서가 삭제되는 중입니다. 잠시 후 다시 시도하세요.")
+            invalidate_tenant(uid)
+            # 다음 요청에서 구독 목록을 반영한 리트리버를 다시 로드
+            getattr(request.app.state, "retrievers", {}).pop(uid, None)
+            try: storage_manager.sync_db_to_gcs(uid)
+            except Exception as e: print(f"GCS DB 업로드 실패: {e}")
+            sync_corpus_subscribers(corpus_uid)
+            job_status_db[job_id] = {
+                "job_id": job_id, "status": "completed",
+                "message": f"공유 문서 '{info.doc_name}'를 구독했습니다. (이미 인덱싱됨, {info.total_pages}페이지)",
+                "details": {"filename": file.filename, "total_pages": info.total_pages, "shared": True}
+            }
+            return AsyncIngestResponse(job_id=job_id, message="동일한 공유 문서가 이미 인덱싱되어 있어 바로 구독했습니다.")
+        if info is not None:
+            # force: 기존 코퍼스를 같은 문서 이름으로 다시 인덱싱 (청크 ID 유지)
+            ingest_filename = f"{info.doc_name}.pdf"
+        _corpus_ingests.add(corpus_uid)
+
     # GCS 업로드
     try:
-        remote_path = f"{uid}/uploads/{file_id}_{file.filename}"
+        remote_path = f"{corpus_uid or uid}/uploads/{file_id}_{file.filename}"
         storage_manager.upload_file(str(file_path), remote_path)
     except Exception as e:
         print(f"GCS 업로드 실패: {e}")
         # 로컬에는 저장되어 있으므로 계속 진행 (추후 GCS 기반 인제스션 고려)
 
-    job_id = str(uuid.uuid4())
-    job_status_db = request.app.state.job_status
-    
     job_status_db[job_id] = {
         "job_id": job_id,
         "status": "pending",
@@ -253,10 +370,11 @@ async def ingest_document(
         process_document_background,
         job_id,
         str(file_path),
-        file.filename,
+        ingest_filename,
         job_status_db,
         request.app.state,
-        uid # UID 전달
+        uid, # UID 전달
+        corpus_uid
     )
 
     return AsyncIngestResponse(
@@ -301,9 +419,15 @@ async def delete_document_endpoint(request: Request, doc_name: str, current_user
     """
     try:
         uid = current_user.get("sub")
-        result = delete_document(uid, doc_name, request.app.state)
-        # 삭제 후 GCS에도 반영
-        storage_manager.sync_db_to_gcs(uid)
+        with tenant_cache.use(uid):
+            result = delete_document(uid, doc_name, request.app.state)
+            # 삭제 후 GCS에도 반영 (공유 코퍼스이면 구독자 목록, 마지막 구독자였으면 코퍼스 전체)
+            storage_manager.sync_db_to_gcs(uid)
+            corpus_uid = result.pop("corpus_uid", None)
+            if result.pop("corpus_deleted", False):
+                storage_manager.delete_directory(f"{corpus_uid}/")
+            elif corpus_uid:
+                sync_corpus_subscribers(corpus_uid)
         return DeleteDocumentResponse(**result)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
@@ -322,6 +446,14 @@ async def receive_feedback(feedback: FeedbackRequest, current_user: dict = Depen
     except Exception as e:
         return JSONResponse(status_code=500, content={"message": str(e)})
 
+@router.get("/cache/stats")
+async def get_cache_stats(current_user: dict = Depends(get_current_user)):
+    """
+    검색 결과 캐시의 적중률과 메모리 사용량, 유저 리소스 캐시의 로드된 유저 수와 추정 메모리를 반환합니다. (전체 + 현재 유저)
+    """
+    uid = current_user.get("sub")
+    return {**retrieval_cache.stats(uid=uid), "tenant_cache": tenant_cache.stats(uid=uid)}
+
 # --- 세션 관리 API ---
 
 @router.get("/sessions", response_model=SessionListResponse)
@@ -371,22 +503,14 @@ async def ask_question(request: Request, qa_request: QARequest, current_user: di
             session_id = str(uuid.uuid4())
             is_new_session = True
             
-        # 유저별 리트리버 관리
-        if not hasattr(request.app.state, "retrievers"):
-            request.app.state.retrievers = {}
-        
-        if uid not in request.app.state.retrievers:
-            # GCS 동기화 후 리트리버 생성
-            try: storage_manager.sync_db_from_gcs(uid)
-            except: pass
-            request.app.state.retrievers[uid] = get_retriever(uid=uid)
-
-        retriever = request.app.state.retrievers[uid]
-        query_expander = request.app.state.query_expander
-        if retriever is None or query_expander is None:
-            raise HTTPException(status_code=503, detail="Retriever or Query Expander is not available.")
-
-        result = generate_answer_with_rag(qa_request.query, retriever, query_expander, qa_request.filters, qa_request.history, qa_request.user_profile)
+        # 유저별 리트리버 관리 (테넌트 캐시에서 제거된 경우 GCS 동기화 후 다시 로드, 답변 생성 중에는 제거되지 않도록 임대)
+        with tenant_cache.use(*tenant_lease_uids(uid)):
+            retriever = get_tenant_retriever(request.app.state, uid)
+            query_expander = request.app.state.query_expander
+            if retriever is None or query_expander is None:
+                raise HTTPException(status_code=503, detail="Retriever or Query Expander is not available.")
+
+            result = generate_answer_with_rag(qa_request.query, retriever, query_expander, qa_request.filters, qa_request.history, qa_request.user_profile, uid=uid, fusion_params=qa_request.fusion)
         
         # 새 세션인 경우 제목 생성
         if is_new_session:
@@ -425,15 +549,7 @@ async def websocket_qa(websocket: WebSocket, token: str = Query(None)):
     await websocket.accept()
     uid = user_info.get("sub")
     
-    if not hasattr(websocket.app.state, "retrievers"):
-        websocket.app.state.retrievers = {}
-        
-    if uid not in websocket.app.state.retrievers:
-        try: storage_manager.sync_db_from_gcs(uid)
-        except: pass
-        websocket.app.state.retrievers[uid] = get_retriever(uid=uid)
-
-    retriever = websocket.app.state.retrievers[uid]
+    retriever = get_tenant_retriever(websocket.app.state, uid)
     query_expander = websocket.app.state.query_expander
 
     if retriever is None or query_expander is None:
@@ -447,6 +563,8 @@ async def websocket_qa(websocket: WebSocket, token: str = Query(None)):
             query = data.get("query")
             filters_dict = data.get("filters")
             filters = QAFilters(**filters_dict) if filters_dict else None
+            fusion_dict = data.get("fusion")
+            fusion_params = FusionParams(**fusion_dict) if fusion_dict else None
 
             if not query:
                 await websocket.send_json({"type": "error", "payload": "Query not provided"})
@@ -463,26 +581,29 @@ async def websocket_qa(websocket: WebSocket, token: str = Query(None)):
                 user_profile_dict = data.get("user_profile")
                 user_profile = UserProfile(**user_profile_dict) if user_profile_dict else None
                 
-                final_answer = ""
-                async for chunk in generate_answer_with_rag_streaming(query, retriever, query_expander, filters, history, user_profile):
-                    # 세션 ID를 메타데이터에 포함시켜 전송
-                    if chunk["type"] == "metadata":
-                        chunk["payload"]["session_id"] = session_id
-                        final_answer = chunk["payload"].get("final_answer", "")
+                # 연결이 오래 유지되는 동안 테넌트 캐시에서 제거되었을 수 있으므로 메시지마다 다시 조회 (스트리밍 중에는 임대)
+                with tenant_cache.use(*tenant_lease_uids(uid)):
+                    retriever = get_tenant_retriever(websocket.app.state, uid)
+                    final_answer = ""
+                    async for chunk in generate_answer_with_rag_streaming(query, retriever, query_expander, filters, history, user_profile, uid=uid, fusion_params=fusion_params):
+                        # 세션 ID를 메타데이터에 포함시켜 전송
+                        if chunk["type"] == "metadata":
+                            chunk["payload"]["session_id"] = session_id
+                            final_answer = chunk["payload"].get("final_answer", "")
                         
-                        # 새 세션인 경우 제목 생성 및 메타데이터 업데이트
-                        if is_new_session:
-                            title = generate_session_title(query, final_answer)
-                            update_session_metadata(uid, session_id, title=title)
-                            chunk["payload"]["session_title"] = title
-                            is_new_session = False # 제목은 한 번만 생성
+                            # 새 세션인 경우 제목 생성 및 메타데이터 업데이트
+                            if is_new_session:
+                                title = generate_session_title(query, final_answer)
+                                update_session_metadata(uid, session_id, title=title)
+                                chunk["payload"]["session_title"] = title
+                                is_new_session = False # 제목은 한 번만 생성
                         
-                        # 대화 로그 기록
-                        trace_id = uuid.uuid4()
-                        log_qa_history(uid, session_id, str(trace_id), query, final_answer, filters.dict() if filters else None)
-                        chunk["payload"]["trace_id"] = str(trace_id)
+                            # 대화 로그 기록
+                            trace_id = uuid.uuid4()
+                            log_qa_history(uid, session_id, str(trace_id), query, final_answer, filters.dict() if filters else None)
+                            chunk["payload"]["trace_id"] = str(trace_id)
 
-                    await websocket.send_json(chunk)
+                        await websocket.send_json(chunk)
 
             except Exception as e:
                 error_message = f"An error occurred: {e}"
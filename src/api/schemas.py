@@ -2,6 +2,8 @@ from pydantic import BaseModel, Field
 from typing import List, Optional, Any, Dict
 from uuid import UUID
 
+from src.rag_pipeline.fusion import FusionParams
+
 class QAFilters(BaseModel):
     doc_name: Optional[str] = Field(None, description="검색 범위를 제한할 문서 이름")
 
@@ -17,6 +19,7 @@ class QARequest(BaseModel):
     history: Optional[List[Dict[str, str]]] = Field(None, description="이전 대화 내역 ( [{'role': 'user', 'content': '...'}, {'role': 'assistant', 'content': '...'}] )")
     user_profile: Optional[UserProfile] = Field(None, description="사용자 개인화 프로필 정보")
     filters: Optional[QAFilters] = None
+    fusion: Optional[FusionParams] = Field(None, description="검색 결과 융합 파라미터 (없으면 서버 기본값)")
 
 class QAResponse(BaseModel):
     answer: str
@@ -44,6 +47,7 @@ class JobStatusResponse(BaseModel):
 class DocumentInfo(BaseModel):
     filename: str
     title: Optional[str] = None
+    shared: bool = Field(False, description="구독한 공유 코퍼스 문서 여부")
 
 class DocumentListResponse(BaseModel):
     documents: List[DocumentInfo]
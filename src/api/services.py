@@ -2,18 +2,25 @@ import os
 import shutil
 from typing import List, Dict, Any
 
-from src.rag_pipeline.vector_db import get_vector_store
-from src.rag_pipeline.retriever import get_retriever
+from src.rag_pipeline.vector_db import get_vector_store, delete_document_chunks
+from src.rag_pipeline.retriever import get_retriever, remove_document_from_keyword_index
+from src.rag_pipeline.retrieval_cache import invalidate_tenant
+from src.rag_pipeline.shared_corpus import claim_orphaned_corpus, corpus_subscribers, read_corpus_info, read_subscriptions, unsubscribe
+from src.rag_pipeline.shared_store import delete_tenant_collections
+from src.rag_pipeline.tenant_cache import tenant_cache
+from src.config import settings
 
 def get_indexed_documents(uid: str = "default") -> List[Dict[str, Any]]:
     """
     특정 유저의 벡터 스토어에 인덱싱된 모든 문서의 목록을 반환합니다.
+    공유 코퍼스를 사용하면 구독한 코퍼스 문서도 함께 반환합니다. (shared=True)
     """
     vector_store = get_vector_store(uid=uid)
     results = vector_store.get(include=["metadatas"])
     
     metadatas = results.get("metadatas", [])
-    if not metadatas:
+    subscribed = read_subscriptions(uid).documents if settings.SHARED_CORPUS_ENABLED else {}
+    if not metadatas and not subscribed:
         return []
 
     # doc_name을 키로 하고, title을 값으로 하는 딕셔너리 생성 (중복 제거)
@@ -31,25 +38,54 @@ def get_indexed_documents(uid: str = "default") -> List[Dict[str, Any]]:
         {"filename": doc_name, "title": title} 
         for doc_name, title in docs_map.items()
     ]
+    for doc_name, corpus_uid in subscribed.items():
+        if doc_name not in docs_map:
+            info = read_corpus_info(corpus_uid)
+            document_list.append({"filename": doc_name, "title": info.title if info else None, "shared": True})
     
     return sorted(document_list, key=lambda x: x["filename"])
 
+def delete_corpus_data(corpus_uid: str) -> bool:
+    """
+    구독자가 없는 공유 코퍼스의 로컬 데이터(벡터 스토어/인덱스, 썸네일)를 삭제합니다.
+    코퍼스가 질의에 사용 중이거나 다른 유저가 다시 구독했으면 삭제하지 않고 False를 반환합니다.
+    """
+    if corpus_subscribers(corpus_uid) or not tenant_cache.evict(corpus_uid):
+        return False
+    if not claim_orphaned_corpus(corpus_uid):
+        return False
+    if settings.STORAGE_LAYOUT == "shared":
+        delete_tenant_collections(corpus_uid)
+    for path in (os.path.join(settings.CHROMA_DB_DIR, corpus_uid), os.path.join("assets/images", corpus_uid)):
+        shutil.rmtree(path, ignore_errors=True)
+    print(f"Orphaned shared corpus deleted: {corpus_uid}")
+    return True
+
 def delete_document(uid: str, doc_name: str, app_state: Any) -> Dict[str, Any]:
     """
     지정된 유저의 문서 데이터를 삭제합니다.
+    구독한 공유 코퍼스 문서이면 구독을 해제하고, 마지막 구독자였으면 코퍼스 데이터도 삭제합니다.
+    (corpus_uid, corpus_deleted 키로 호출자가 GCS에 반영할 수 있도록 반환)
     """
-    # 1. ChromaDB에서 데이터 삭제
+    corpus_uid = read_subscriptions(uid).documents.get(doc_name) if settings.SHARED_CORPUS_ENABLED else None
+    if corpus_uid and unsubscribe(uid, doc_name):
+        invalidate_tenant(uid)
+        if hasattr(app_state, 'retrievers'):
+            app_state.retrievers[uid] = get_retriever(uid=uid)
+        corpus_deleted = delete_corpus_data(corpus_uid)
+        return {
+            "message": f"'{doc_name}' 공유 문서 구독이 해제되었습니다." + (" (구독자가 없어 공유 데이터도 삭제됨)" if corpus_deleted else ""),
+            "deleted_db_entries": 0,
+            "thumbnail_deleted": corpus_deleted,
+            "corpus_uid": corpus_uid,
+            "corpus_deleted": corpus_deleted
+        }
+
+    # 1. ChromaDB에서 데이터 삭제 (문서별 샤드 구성이면 샤드 컬렉션 삭제)
     vector_store = get_vector_store(uid=uid)
-    collection = vector_store._collection
-    
-    # 삭제 전 문서 개수 확인
-    initial_count = collection.count()
-    existing_docs = collection.get(where={"doc_name": doc_name})
-    if not existing_docs or not existing_docs.get("ids"):
+    deleted_count = delete_document_chunks(vector_store, doc_name)
+    if not deleted_count:
         raise ValueError(f"'{doc_name}' 문서를 찾을 수 없습니다.")
-        
-    collection.delete(where={"doc_name": doc_name})
-    deleted_count = initial_count - collection.count()
 
     # 2. 썸네일 에셋 디렉토리 삭제 (UID 자동 반영)
     thumbnail_dir = os.path.join("assets/images", uid, doc_name)
@@ -59,12 +95,12 @@ def delete_document(uid: str, doc_name: str, app_state: Any) -> Dict[str, Any]:
     else:
         thumbnail_deleted = False
 
-    # 3. 검색 인덱스 및 메모리 리트리버 갱신
-    get_retriever(uid=uid, force_update=True)
+    # 3. 검색 인덱스 및 메모리 리트리버 갱신 (삭제된 문서의 청크만 증분 제거)
+    remove_document_from_keyword_index(uid, doc_name)
     # app_state 업데이트는 멀티유저 환경에서는 유저별 캐시가 필요할 수 있으나,
     # 현재는 요청 시점에 get_retriever를 호출하는 방식으로 전환하거나 app_state를 유저별 dict로 관리해야 함.
     if hasattr(app_state, 'retrievers'):
-        app_state.retrievers[uid] = get_retriever(uid=uid, force_update=False)
+        app_state.retrievers[uid] = get_retriever(uid=uid)
 
     return {
         "message": f"'{doc_name}' 문서가 성공적으로 삭제되었습니다.",
@@ -1,4 +1,6 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
+from typing import List
+
 from pydantic import SecretStr, Field
 
 class Settings(BaseSettings):
@@ -24,6 +26,82 @@ class Settings(BaseSettings):
     PARSED_DATA_DIR: str = Field("data/parsed", description="파싱된 페이지 JSON 데이터 저장 경로")
     GCS_BUCKET_NAME: str = Field(..., description="GCS 버킷 이름")
 
+    # 키워드(BM25) 인덱스 설정
+    KEYWORD_TOKENIZER: str = Field("okt", description="BM25 토크나이저 모드 (okt: 형태소 분석, ngram: JVM 없는 문자 바이그램)")
+    TOKENIZER_WORKERS: int = Field(4, description="인덱스 빌드 시 병렬 토크나이징 프로세스 수 (1이면 순차 처리)")
+    TOKENIZER_POOL_MIN_BATCH: int = Field(256, description="프로세스 풀을 사용할 최소 청크 수 (이보다 작으면 순차 처리)")
+
+    # 청킹 설정 (변경 시 재인제스트 필요)
+    CHUNK_SIZE: int = Field(800, description="본문 텍스트 청크 크기 (글자 수, 한국어 고려)")
+    CHUNK_OVERLAP: int = Field(100, description="인접 본문 청크 간 중첩 글자 수 (문맥 유지)")
+
+    # 검색 설정
+    RETRIEVAL_K: int = Field(40, description="필터가 없을 때 키워드·벡터 레그별 검색 수")
+    ENSEMBLE_WEIGHTS: List[float] = Field([0.5, 0.5], description="[키워드, 벡터] 레그의 융합 가중치")
+    CONTEXT_MAX_DOCS: int = Field(100, description="주변 페이지 확장 후 컨텍스트 패킹 후보로 넘길 최대 청크 수")
+    CONTEXT_TOKEN_BUDGET: int = Field(16000, description="LLM 컨텍스트로 채울 최대 토큰 수 (검색 순위 순, 0이면 제한 없음)")
+    FILTERED_SEARCH_K: int = Field(20, description="문서명/페이지 필터가 있을 때 키워드·벡터 레그별 검색 수")
+    RETRIEVAL_WORKERS: int = Field(8, description="서브 쿼리별 키워드/벡터 레그를 동시에 실행할 스레드 수")
+    PAGE_ROUTER_RADIUS: int = Field(0, description="페이지 지정 질문에서 함께 가져올 앞뒤 페이지 수 (0이면 해당 페이지만)")
+    ADAPTIVE_K_ENABLED: bool = Field(False, description="융합 후보의 레그 원 점수 분포(점수 간격 / 누적 점수)로 검색 결과 수를 질문마다 조절할지 여부 (골든 데이터셋 검증 전까지 기본 꺼짐)")
+    ADAPTIVE_K_MIN: int = Field(8, description="적응형 k의 하한 (정답이 뚜렷한 질문에서도 남길 최소 청크 수)")
+    ADAPTIVE_K_MAX: int = Field(100, description="적응형 k의 상한 (포괄적 질문에서 남길 최대 청크 수, 기존 융합 후보 수 100 이상 권장)")
+    ADAPTIVE_K_GAP_RATIO: float = Field(0.3, description="인접 점수 차이가 전체 점수 범위의 이 비율 이상이면 그 위치에서 자름")
+    ADAPTIVE_K_SCORE_MASS: float = Field(0.85, description="(점수 - 최저 점수) 누적 합이 전체의 이 비율에 도달하면 자름")
+    CONTEXT_EXPANSION_TOP_K: int = Field(10, description="주변 페이지 컨텍스트를 덧붙일 상위 결과 수")
+    CONTEXT_EXPANSION_DIRECTION: str = Field("next", description="주변 페이지 확장 방향 (next / previous / both)")
+    CONTEXT_EXPANSION_RADIUS: int = Field(1, description="주변 페이지 확장 거리 (페이지 수, 0이면 확장하지 않음)")
+    CONTEXT_EXPANSION_FOLLOW_LINKS: bool = Field(True, description="인제스트 시 감지한 페이지 연속 연결(표/절차)이 있는 페이지만 확장 (False면 항상 확장)")
+    PAGE_SUMMARY_ENABLED: bool = Field(False, description="페이지 요약 벡터로 상위 페이지를 먼저 고른 뒤 그 안에서만 청크를 검색하는 2단계 벡터 검색 사용 여부")
+    PAGE_SUMMARY_TOP_PAGES: int = Field(20, description="2단계 검색에서 청크 검색 범위로 남길 상위 페이지 수")
+    PAGE_SUMMARY_MIN_CHUNKS: int = Field(5000, description="2단계 검색을 적용할 최소 청크 수 (작은 테넌트는 전체 청크 검색)")
+    EXACT_MATCH_MAX_CHUNKS: int = Field(10, description="질문의 코드/파라미터/모델명과 정확히 일치하는 청크를 조회할 최대 수")
+    EXACT_MATCH_PIN_LIMIT: int = Field(3, description="정확 일치 청크 중 BM25 점수 상위 몇 개를 결과 맨 앞에 고정할지 (나머지는 융합 후보로 경쟁)")
+
+    # 인제스트 근사 중복 청크 병합 설정 (MinHash + LSH)
+    NEAR_DUP_ENABLED: bool = Field(True, description="인제스트 시 문서 안의 근사 중복 청크(반복 경고문/표)를 대표 청크 하나로 병합할지 여부")
+    NEAR_DUP_THRESHOLD: float = Field(0.9, description="병합할 추정 Jaccard 유사도 하한 (문자 shingle 기준)")
+    NEAR_DUP_SHINGLE_SIZE: int = Field(5, description="MinHash에 사용할 문자 n-gram 크기")
+    NEAR_DUP_NUM_PERM: int = Field(64, description="MinHash 서명 길이 (해시 순열 수)")
+    NEAR_DUP_BANDS: int = Field(16, description="LSH 밴드 수 (서명 길이를 나누어 떨어져야 함)")
+
+    # 벡터 검색 백엔드 설정 (Chroma는 항상 기록 시스템으로 유지)
+    STORAGE_LAYOUT: str = Field("per_user", description="벡터 저장소 배치 (per_user: 유저별 Chroma 디렉토리, shared: 공유 Chroma 클라이언트 + 유저별 컬렉션 파티션)")
+    SHARED_STORE_SEGMENT_CACHE_MB: int = Field(2048, description="공유 저장소에서 메모리에 올려 둘 HNSW 세그먼트 크기 상한(MB). 넘으면 Chroma가 LRU 세그먼트를 내림")
+    SHARED_CORPUS_ENABLED: bool = Field(False, description="업로드 시 share=true로 공유를 명시한 PDF를 내용 해시로 공유 코퍼스에 한 번만 인덱싱하고 유저는 구독하여 개인 인덱스와 함께 검색할지 여부 (구독자가 없어지면 코퍼스 삭제)")
+    INDEX_SHARDING: str = Field("none", description="벡터 인덱스 샤딩 방식 (none: 유저당 컬렉션 하나, document: 문서별 컬렉션 + 라우터)")
+    VECTOR_BACKEND: str = Field("chroma", description="벡터 유사도 검색 경로 (chroma: Chroma 질의, ann: 인프로세스 NumPy/hnswlib 인덱스)")
+    ANN_HNSW_MIN_SIZE: int = Field(20000, description="HNSW 그래프를 사용할 최소 청크 수 (미만이면 NumPy 전수 계산, hnswlib 미설치 시 항상 전수 계산)")
+    ANN_HNSW_M: int = Field(16, description="HNSW 그래프 노드당 연결 수")
+    ANN_HNSW_EF_CONSTRUCTION: int = Field(200, description="HNSW 그래프 생성 시 탐색 폭")
+    ANN_HNSW_EF_SEARCH: int = Field(64, description="HNSW 검색 시 탐색 폭 (클수록 recall 증가, 지연 증가)")
+    ANN_COMPACT_RATIO: float = Field(0.2, description="삭제 표시된 행 비율이 이 값을 넘으면 저장 시 압축")
+    ANN_QUANTIZATION: str = Field("none", description="메모리에 상주시킬 벡터 형식 (none: float32, int8: 스칼라 양자화 4배 압축, pq: 곱 양자화)")
+    ANN_PQ_SUB_DIM: int = Field(4, description="곱 양자화 서브벡터 차원 수 (서브벡터당 1바이트, float32 대비 4 × 이 값 배 압축)")
+    ANN_QUANTIZATION_TRAIN_SIZE: int = Field(20000, description="양자화기(min/max, PQ 코드북) 학습에 사용할 최대 벡터 수")
+    ANN_RESCORE_FACTOR: int = Field(4, description="양자화 거리로 고른 k × 이 값개의 후보를 원본 벡터로 다시 계산")
+
+    # 유저별 리소스(벡터 스토어 / 인덱스 / 리트리버) 캐시 설정
+    TENANT_CACHE_MEMORY_BUDGET_MB: int = Field(4096, description="로드된 유저 리소스의 추정 메모리 합계 상한(MB). 넘으면 LRU 유저부터 제거")
+    TENANT_CACHE_IDLE_TTL_SECONDS: float = Field(1800.0, description="이 시간(초) 동안 요청이 없는 유저의 리소스를 제거")
+    TENANT_CACHE_MAX_TENANTS: int = Field(200, description="동시에 메모리에 둘 최대 유저 수")
+    TENANT_CACHE_MIN_IDLE_SECONDS: float = Field(5.0, description="최근 이 시간(초) 안에 사용된 유저는 처리 중인 요청이 있을 수 있으므로 LRU 제거에서 제외")
+
+    # 검색 결과 캐시 설정 (유저별, 인덱스 버전 기준 무효화)
+    RETRIEVAL_CACHE_ENABLED: bool = Field(True, description="같은 유저의 동일(정규화) 질문 검색 결과를 캐시할지 여부")
+    RETRIEVAL_CACHE_MAX_ENTRIES: int = Field(1024, description="검색 캐시 최대 항목 수 (초과 시 LRU 제거)")
+    RETRIEVAL_CACHE_TTL_SECONDS: float = Field(600.0, description="검색 캐시 항목 유효 시간(초)")
+
+    # 재순위화(Cross-encoder Rerank) 설정 (sentence-transformers 선택 의존성)
+    RERANK_ENABLED: bool = Field(False, description="융합 후보를 CPU 크로스 인코더로 재순위화할지 여부")
+    RERANK_MODEL: str = Field("cross-encoder/mmarco-mMiniLMv2-L12-H384-v1", description="재순위화에 사용할 (다국어) 크로스 인코더 모델")
+    RERANK_TOP_N: int = Field(12, description="재순위화 후 LLM 컨텍스트로 남길 상위 청크 수")
+    RERANK_BATCH_SIZE: int = Field(32, description="크로스 인코더 배치 크기")
+    RERANK_MAX_LENGTH: int = Field(512, description="(질문, 청크) 쌍의 최대 토큰 길이")
+    RERANK_BACKEND: str = Field("torch", description="크로스 인코더 백엔드 (torch: 동적 int8 양자화, onnx: 양자화 ONNX 파일)")
+    RERANK_INT8: bool = Field(True, description="int8 양자화 모델 사용 여부")
+    RERANK_ONNX_FILE: str = Field("onnx/model_qint8_avx512_vnni.onnx", description="onnx 백엔드에서 로드할 int8 ONNX 파일 경로 (모델 저장소 기준)")
+
     # .env 파일 로드 설정
     model_config = SettingsConfigDict(
         env_file=".env", 
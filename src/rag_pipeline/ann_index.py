@@ -0,0 +1,618 @@
+"""
+인프로세스 ANN(근사 최근접 이웃) 벡터 인덱스 모듈입니다.
+
+LangChain → Chroma → SQLite 경로는 결과마다 파이썬 객체 오버헤드가 커서,
+유사도 검색만 프로세스 내부의 NumPy / hnswlib 인덱스로 처리하는 읽기 경로를 제공합니다.
+Chroma는 기록 시스템(System of Record)으로 유지되며, 인덱스는 매니페스트 버전이 바뀔 때 Chroma로부터 증분 동기화됩니다.
+
+    - 작은 테넌트, 또는 필터가 있는 검색 : NumPy 전수 계산 (행렬 곱 한 번으로 배치 쿼리)
+    - 큰 테넌트(ANN_HNSW_MIN_SIZE 이상) : hnswlib HNSW 그래프 (선택 의존성, 없으면 전수 계산)
+    - 메타데이터 필터 : 문서명별 비트셋(np.packbits) + 페이지 열 비교로 마스크 계산
+                        (근사 중복 병합된 대표 청크는 필터의 doc_id 목록으로 별칭 페이지에 포함)
+    - 양자화(ANN_QUANTIZATION=int8/pq) : 메모리에는 압축 코드만 두고 근사 거리로 후보를 고른 뒤,
+      상위 후보(k × ANN_RESCORE_FACTOR)만 디스크의 원본 벡터로 다시 계산 (HNSW 그래프는 사용하지 않음)
+
+디스크 구조 ({CHROMA_DB_DIR}/{uid}/ann_index/, pickle 없이 .npy만 사용, 메모리 매핑 로드):
+    vectors.npy  : (N, D) float32 임베딩
+    sq_norms.npy : 행별 제곱 노름 (L2 거리 계산용)
+    ids.npy      : 청크 ID (고정 폭 유니코드)
+    doc_codes.npy / pages.npy / alive.npy : 메타데이터 열과 삭제 표시
+    bitsets.npy  : (문서 수, ceil(N/8)) 문서명별 행 비트셋
+    codes.npy / quant_*.npy : 양자화 코드와 양자화 파라미터 (양자화 사용 시)
+    hnsw.bin     : HNSW 그래프 (hnswlib 사용 시)
+    meta.json    : 버전 / 차원 / 문서명 테이블 (마지막에 원자적으로 교체)
+
+거리는 Chroma 기본값과 같은 제곱 L2 거리이므로 기존 점수(-거리)와 호환됩니다.
+"""
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from src.config import settings
+from src.rag_pipeline.index_manifest import read_manifest
+from src.rag_pipeline.quantization import QUANTIZER_ARRAYS, quantizer_from_arrays, train_quantizer
+
+ANN_DIRNAME = "ann_index"
+META_FILENAME = "meta.json"
+HNSW_FILENAME = "hnsw.bin"
+SYNC_BATCH = 5000
+NO_PAGE = -1
+
+
+def _load_hnswlib():
+    try:
+        import hnswlib
+        return hnswlib
+    except ImportError:
+        return None
+
+
+def _save_array(path: Path, array: np.ndarray):
+    """임시 파일에 쓴 뒤 교체합니다. 기존 파일을 메모리 매핑 중인 인덱스가 있어도 안전합니다."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        np.save(f, array, allow_pickle=False)
+    os.replace(tmp_path, path)
+
+
+def _page_of(metadata: Dict[str, Any]) -> int:
+    try:
+        return int(metadata.get("page"))
+    except (TypeError, ValueError):
+        return NO_PAGE
+
+
+def _top_k(distances: np.ndarray, k: int) -> np.ndarray:
+    """행별 거리 오름차순 상위 k개 열 번호 (Q, min(k, 열 수)). 동점은 열 번호 순서를 유지합니다."""
+    k = min(k, distances.shape[1])
+    if k < distances.shape[1]:
+        top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    else:
+        top = np.tile(np.arange(distances.shape[1]), (len(distances), 1))
+    return np.stack([row_top[np.argsort(row[row_top], kind="stable")] for row, row_top in zip(distances, top)])
+
+
+class AnnIndex:
+    """청크 벡터 행렬 + 메타데이터 열 + (선택) HNSW 그래프. 행 번호가 HNSW 라벨입니다."""
+
+    def __init__(self, dim: int = 0, version: int = 0, quantization: Optional[str] = None):
+        self.dim = dim
+        self.version = version
+        self.quantization = quantization or settings.ANN_QUANTIZATION
+        self.quantizer = None
+        self.codes: Optional[np.ndarray] = None
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+        self.sq_norms = np.zeros(0, dtype=np.float32)
+        self.ids: List[str] = []
+        self.doc_codes = np.zeros(0, dtype=np.int32)
+        self.pages = np.zeros(0, dtype=np.int32)
+        self.alive = np.zeros(0, dtype=bool)
+        self._doc_names: List[str] = []
+        self._doc_name_codes: Dict[str, int] = {}
+        self._bitsets: Optional[np.ndarray] = None
+        self._rows: Optional[Dict[str, int]] = None
+        self._hnsw = None
+
+    def __len__(self) -> int:
+        return int(self.alive.sum())
+
+    @property
+    def rows(self) -> Dict[str, int]:
+        """살아있는 청크 ID → 행 번호 (지연 생성)"""
+        if self._rows is None:
+            self._rows = {self.ids[row]: int(row) for row in np.flatnonzero(self.alive)}
+        return self._rows
+
+    def _doc_name_code(self, doc_name: Optional[str]) -> int:
+        if not doc_name:
+            return -1
+        code = self._doc_name_codes.get(doc_name)
+        if code is None:
+            code = self._doc_name_codes[doc_name] = len(self._doc_names)
+            self._doc_names.append(doc_name)
+        return code
+
+    # --- 갱신 ---
+
+    def add(self, ids: Sequence[str], vectors: np.ndarray, metadatas: Sequence[Dict[str, Any]]) -> int:
+        """청크를 추가합니다. 이미 있는 ID는 이전 행을 삭제 표시한 뒤 새 행으로 추가합니다."""
+        if not len(ids):
+            return 0
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.dim == 0:
+            self.dim = vectors.shape[1]
+            self.vectors = np.zeros((0, self.dim), dtype=np.float32)
+        self.remove(ids)
+
+        start = len(self.ids)
+        self.vectors = np.concatenate([np.asarray(self.vectors), vectors])
+        self.sq_norms = np.concatenate([np.asarray(self.sq_norms), np.einsum("ij,ij->i", vectors, vectors)])
+        self.doc_codes = np.concatenate([
+            np.asarray(self.doc_codes),
+            np.asarray([self._doc_name_code((metadata or {}).get("doc_name")) for metadata in metadatas], dtype=np.int32)
+        ])
+        self.pages = np.concatenate([
+            np.asarray(self.pages), np.asarray([_page_of(metadata or {}) for metadata in metadatas], dtype=np.int32)
+        ])
+        self.alive = np.concatenate([np.asarray(self.alive), np.ones(len(ids), dtype=bool)])
+        self.ids.extend(ids)
+        if self.quantization != "none":
+            if self.quantizer is None:
+                self.quantize()
+            else:
+                self.codes = np.concatenate([np.asarray(self.codes), self.quantizer.encode(vectors)])
+        rows = self.rows
+        for offset, chunk_id in enumerate(ids):
+            rows[chunk_id] = start + offset
+        self._bitsets = None
+
+        if self._hnsw is not None:
+            self._hnsw.resize_index(len(self.ids))
+            self._hnsw.add_items(vectors, np.arange(start, len(self.ids)))
+        return len(ids)
+
+    def remove(self, ids: Iterable[str]) -> int:
+        removed = 0
+        rows = self.rows
+        for chunk_id in ids:
+            row = rows.pop(chunk_id, None)
+            if row is None:
+                continue
+            if not self.alive.flags.writeable:
+                self.alive = np.array(self.alive)
+            self.alive[row] = False
+            if self._hnsw is not None:
+                self._hnsw.mark_deleted(row)
+            removed += 1
+        return removed
+
+    def quantize(self, quantization: Optional[str] = None):
+        """양자화기를 현재 벡터로 (다시) 학습하고 모든 행을 인코딩합니다. none이면 코드를 버립니다."""
+        self.quantization = quantization or self.quantization
+        vectors = np.asarray(self.vectors)
+        self.quantizer = train_quantizer(
+            self.quantization, vectors, settings.ANN_QUANTIZATION_TRAIN_SIZE, sub_dim=settings.ANN_PQ_SUB_DIM
+        )
+        if self.quantizer is None:
+            self.codes = None
+            return
+        self.codes = np.concatenate([
+            self.quantizer.encode(vectors[start:start + SYNC_BATCH]) for start in range(0, len(vectors), SYNC_BATCH)
+        ])
+        self._hnsw = None
+
+    def memory_bytes(self) -> int:
+        """
+        검색 시 메모리에 상주해야 하는 배열 크기(바이트).
+        양자화를 사용하면 원본 벡터는 재점수 후보 행만 디스크에서 읽으므로 제외합니다.
+        """
+        resident = [self.doc_codes, self.pages, self.alive]
+        resident.extend([self.vectors, self.sq_norms] if self.codes is None else [self.codes])
+        if self._bitsets is not None:
+            resident.append(self._bitsets)
+        return int(sum(np.asarray(array).nbytes for array in resident))
+
+    def build_hnsw(self):
+        """
+        살아있는 행이 ANN_HNSW_MIN_SIZE 이상이고 hnswlib가 설치되어 있으면 HNSW 그래프를 만듭니다.
+        양자화를 사용하면 그래프가 원본 벡터를 메모리에 복제하므로 만들지 않습니다.
+        """
+        hnswlib = _load_hnswlib()
+        if hnswlib is None or self.codes is not None or len(self) < settings.ANN_HNSW_MIN_SIZE:
+            self._hnsw = None
+            return
+        graph = hnswlib.Index(space="l2", dim=self.dim)
+        graph.init_index(max_elements=len(self.ids), ef_construction=settings.ANN_HNSW_EF_CONSTRUCTION, M=settings.ANN_HNSW_M)
+        alive_rows = np.flatnonzero(self.alive)
+        graph.add_items(np.asarray(self.vectors)[alive_rows], alive_rows)
+        graph.set_ef(settings.ANN_HNSW_EF_SEARCH)
+        self._hnsw = graph
+
+    # --- 검색 ---
+
+    def _doc_bitsets(self) -> np.ndarray:
+        """문서명별 행 비트셋 (문서 수, ceil(N/8)). 행이 추가되면 다시 계산합니다."""
+        if self._bitsets is None:
+            codes = np.asarray(self.doc_codes)
+            self._bitsets = np.stack([
+                np.packbits(codes == code) for code in range(len(self._doc_names))
+            ]) if self._doc_names else np.zeros((0, (len(codes) + 7) // 8), dtype=np.uint8)
+        return self._bitsets
+
+    def _mask(
+        self,
+        doc_name: Optional[str] = None,
+        page: Optional[int] = None,
+        pages: Optional[Sequence[Tuple[str, int]]] = None,
+        alias_ids: Sequence[str] = ()
+    ) -> Optional[np.ndarray]:
+        """
+        필터 조건의 행 마스크. 조건이 없으면 None입니다. pages는 (doc_name, page) 목록 중 하나에 속하는 행입니다.
+        alias_ids(근사 중복 병합으로 해당 페이지에도 등장하는 대표 청크)의 행은 페이지 조건을 만족하는 것으로 봅니다.
+        """
+        if doc_name is None and page is None and pages is None:
+            return None
+        mask = np.array(self.alive)
+        page_mask = None
+        if pages is not None:
+            # (문서명 코드, 페이지)를 64비트 키 하나로 묶어 한 번에 비교
+            wanted = [
+                (self._doc_name_codes[name] << 32) | (int(number) & 0xFFFFFFFF)
+                for name, number in pages if name in self._doc_name_codes
+            ]
+            keys = (np.asarray(self.doc_codes).astype(np.int64) << 32) | (np.asarray(self.pages).astype(np.int64) & 0xFFFFFFFF)
+            page_mask = np.isin(keys, wanted)
+        if page is not None:
+            page_mask = np.asarray(self.pages) == int(page)
+        if page_mask is not None:
+            rows = self.rows
+            page_mask[[rows[chunk_id] for chunk_id in alias_ids if chunk_id in rows]] = True
+            mask &= page_mask
+        if doc_name is not None:
+            code = self._doc_name_codes.get(doc_name)
+            if code is None:
+                return np.zeros(len(self.ids), dtype=bool)
+            mask &= np.unpackbits(self._doc_bitsets()[code], count=len(self.ids)).astype(bool)
+        return mask
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int,
+        doc_name: Optional[str] = None,
+        page: Optional[int] = None,
+        pages: Optional[Sequence[Tuple[str, int]]] = None,
+        alias_ids: Sequence[str] = ()
+    ) -> List[List[Tuple[str, float]]]:
+        """
+        쿼리 벡터 배치 (Q, D)에 대해 쿼리별 (chunk_id, 제곱 L2 거리) 리스트를 거리 오름차순으로 반환합니다.
+        필터가 없고 HNSW 그래프가 있으면 그래프를, 그 밖에는 후보 행에 대한 전수 계산을 사용합니다.
+        양자화를 사용하면 코드로 근사 거리를 계산한 뒤 상위 후보만 원본 벡터로 다시 계산합니다.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        mask = self._mask(doc_name, page, pages, alias_ids)
+        if mask is None and self._hnsw is not None:
+            k = min(k, len(self))
+            if k == 0:
+                return [[] for _ in queries]
+            labels, distances = self._hnsw.knn_query(queries, k=k)
+            return [
+                [(self.ids[label], float(distance)) for label, distance in zip(row_labels, row_distances)]
+                for row_labels, row_distances in zip(labels, distances)
+            ]
+
+        rows = np.flatnonzero(self.alive if mask is None else mask)
+        if len(rows) == 0:
+            return [[] for _ in queries]
+        if self.codes is not None:
+            return self._search_quantized(queries, rows, k)
+
+        candidates = np.asarray(self.vectors)[rows]
+        distances = (
+            np.asarray(self.sq_norms)[rows][None, :]
+            - 2.0 * queries @ candidates.T
+            + np.einsum("ij,ij->i", queries, queries)[:, None]
+        )
+        results = []
+        for query_distances, order in zip(distances, _top_k(distances, k)):
+            results.append([(self.ids[rows[i]], max(float(query_distances[i]), 0.0)) for i in order])
+        return results
+
+    def _search_quantized(self, queries: np.ndarray, rows: np.ndarray, k: int) -> List[List[Tuple[str, float]]]:
+        """양자화 코드로 k × ANN_RESCORE_FACTOR개 후보를 고른 뒤, 원본 벡터(메모리 매핑)로 정확한 거리를 다시 계산합니다."""
+        approx = self.quantizer.distances(queries, np.asarray(self.codes), rows)
+        vectors = np.asarray(self.vectors)
+        results = []
+        for query, candidates in zip(queries, _top_k(approx, k * max(settings.ANN_RESCORE_FACTOR, 1))):
+            # 디스크에서 순차적으로 읽도록 행 번호 순으로 가져옴
+            candidate_rows = np.sort(rows[candidates])
+            diff = vectors[candidate_rows] - query
+            exact = np.einsum("ij,ij->i", diff, diff)
+            order = _top_k(exact[None, :], k)[0]
+            results.append([(self.ids[candidate_rows[i]], float(exact[i])) for i in order])
+        return results
+
+    # --- 영속화 ---
+
+    def save(self, index_dir: str):
+        """삭제 표시된 행이 많으면 압축한 뒤 배열과 그래프를 저장합니다. meta.json은 마지막에 교체합니다."""
+        path = Path(index_dir) / ANN_DIRNAME
+        path.mkdir(parents=True, exist_ok=True)
+        if len(self.ids) and len(self) < len(self.ids) * (1 - settings.ANN_COMPACT_RATIO):
+            self._compact()
+
+        arrays = {
+            "vectors": np.asarray(self.vectors), "sq_norms": np.asarray(self.sq_norms),
+            "ids": np.asarray(self.ids, dtype=str) if self.ids else np.zeros(0, dtype="<U1"),
+            "doc_codes": np.asarray(self.doc_codes), "pages": np.asarray(self.pages),
+            "alive": np.asarray(self.alive), "bitsets": self._doc_bitsets(),
+        }
+        if self.quantizer is not None:
+            arrays["codes"] = np.asarray(self.codes)
+            arrays.update({f"quant_{key}": array for key, array in self.quantizer.arrays().items()})
+        for key, array in arrays.items():
+            _save_array(path / f"{key}.npy", array)
+        if self._hnsw is not None:
+            self._hnsw.save_index(str(path / HNSW_FILENAME))
+        elif (path / HNSW_FILENAME).exists():
+            os.remove(path / HNSW_FILENAME)
+
+        tmp_path = path / f"{META_FILENAME}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": self.version, "dim": self.dim, "doc_names": self._doc_names,
+                "quantization": self.quantization if self.quantizer is not None else "none",
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, path / META_FILENAME)
+
+        if self.quantizer is not None:
+            # 원본 벡터는 재점수 시에만 읽으므로 메모리에서 내리고 디스크 매핑으로 교체
+            self.vectors = np.load(path / "vectors.npy", mmap_mode="r", allow_pickle=False).view(np.ndarray)
+
+    def _compact(self):
+        """삭제 표시된 행을 제거합니다. 행 번호가 바뀌므로 HNSW 그래프도 다시 만듭니다."""
+        keep = np.flatnonzero(self.alive)
+        self.vectors = np.asarray(self.vectors)[keep]
+        self.sq_norms = np.asarray(self.sq_norms)[keep]
+        self.doc_codes = np.asarray(self.doc_codes)[keep]
+        self.pages = np.asarray(self.pages)[keep]
+        self.ids = [self.ids[row] for row in keep]
+        self.alive = np.ones(len(keep), dtype=bool)
+        self._rows = None
+        self._bitsets = None
+        if self.quantizer is not None:
+            # 남은 벡터 분포로 양자화기를 다시 학습
+            self.quantize()
+        if self._hnsw is not None:
+            self.build_hnsw()
+
+    @classmethod
+    def load(cls, index_dir: str) -> Optional["AnnIndex"]:
+        """디스크의 인덱스를 메모리 매핑으로 읽습니다. 없으면 None을 반환합니다."""
+        path = Path(index_dir) / ANN_DIRNAME
+        try:
+            with open(path / META_FILENAME, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return None
+
+        quantization = meta.get("quantization", "none")
+        index = cls(dim=meta["dim"], version=meta["version"], quantization=quantization)
+        arrays = {
+            key: np.load(path / f"{key}.npy", mmap_mode="r", allow_pickle=False).view(np.ndarray)
+            for key in ("vectors", "sq_norms", "doc_codes", "pages", "alive", "bitsets")
+        }
+        index.vectors, index.sq_norms = arrays["vectors"], arrays["sq_norms"]
+        index.doc_codes, index.pages, index.alive = arrays["doc_codes"], arrays["pages"], arrays["alive"]
+        index._bitsets = arrays["bitsets"]
+        index.ids = np.load(path / "ids.npy", allow_pickle=False).tolist()
+        index._doc_names = list(meta["doc_names"])
+        index._doc_name_codes = {name: code for code, name in enumerate(index._doc_names)}
+        if quantization != "none":
+            index.codes = np.load(path / "codes.npy", allow_pickle=False)
+            index.quantizer = quantizer_from_arrays(quantization, {
+                key: np.load(path / f"quant_{key}.npy", allow_pickle=False) for key in QUANTIZER_ARRAYS[quantization]
+            })
+
+        hnswlib = _load_hnswlib()
+        if hnswlib is not None and (path / HNSW_FILENAME).exists():
+            graph = hnswlib.Index(space="l2", dim=index.dim)
+            graph.load_index(str(path / HNSW_FILENAME), max_elements=len(index.ids))
+            graph.set_ef(settings.ANN_HNSW_EF_SEARCH)
+            index._hnsw = graph
+        return index
+
+
+def _parse_alias_condition(condition: Dict[str, Any]) -> Optional[Tuple[int, List[str]]]:
+    """{"$or": [{"page": p}, {"doc_id": {"$in": ids}}]} 형식(별칭 대표 청크를 포함한 페이지 조건)이면 (p, ids)를 반환합니다."""
+    branches = condition.get("$or") if list(condition) == ["$or"] else None
+    if not branches or len(branches) != 2 or list(branches[1]) != ["doc_id"]:
+        return None
+    page, ids = parse_search_filter(branches[0]), branches[1]["doc_id"]
+    if page is None or list(page) != ["page"] or not isinstance(ids, dict) or list(ids) != ["$in"]:
+        return None
+    return page["page"], list(ids["$in"])
+
+
+def parse_search_filter(search_filter: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    build_search_filter 형식의 Chroma where 필터를 {doc_name, page, alias_ids} 조건으로,
+    build_pages_filter 형식의 페이지 목록($or) 필터를 {pages: [(doc_name, page), ...], alias_ids} 조건으로 변환합니다.
+    이 인덱스가 처리할 수 없는 조건이 있으면 None을 반환합니다. (Chroma로 위임)
+    """
+    if not search_filter:
+        return {}
+    if list(search_filter) == ["$or"] and _parse_alias_condition(search_filter) is None:
+        pages = [parse_search_filter(condition) for condition in search_filter["$or"]]
+        if any(page is None or set(page) - {"alias_ids"} != {"doc_name", "page"} for page in pages):
+            return None
+        parsed = {"pages": [(page["doc_name"], page["page"]) for page in pages]}
+        alias_ids = [chunk_id for page in pages for chunk_id in page.get("alias_ids", ())]
+        if alias_ids:
+            parsed["alias_ids"] = alias_ids
+        return parsed
+    conditions = search_filter.get("$and", [search_filter]) if len(search_filter) == 1 else None
+    if conditions is None:
+        return None
+    parsed: Dict[str, Any] = {}
+    for condition in conditions:
+        if len(condition) != 1:
+            return None
+        alias = _parse_alias_condition(condition)
+        if alias is not None:
+            parsed["page"], parsed["alias_ids"] = alias
+            continue
+        (key, value), = condition.items()
+        if isinstance(value, dict):
+            if list(value) != ["$eq"]:
+                return None
+            value = value["$eq"]
+        if key not in ("doc_name", "page"):
+            return None
+        parsed[key] = value
+    return parsed
+
+
+class _ReadWriteLock:
+    """
+    검색(읽기)끼리는 동시에 실행하고, 동기화(쓰기)는 진행 중인 검색이 끝난 뒤 단독으로 실행하는 락입니다.
+    쓰기 대기 중에는 새 검색을 받지 않으므로 검색이 계속 들어와도 동기화가 굶지 않습니다.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writing = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self):
+        with self._condition:
+            while self._writing or self._waiting_writers:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._condition:
+            self._waiting_writers += 1
+            while self._writing or self._readers:
+                self._condition.wait()
+            self._waiting_writers -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writing = False
+                self._condition.notify_all()
+
+
+class AnnVectorStore:
+    """
+    Chroma를 기록 시스템으로 두고, 벡터 유사도 검색만 인프로세스 AnnIndex로 처리하는 래퍼입니다.
+    get / add_documents / embeddings / _collection 등 나머지 속성은 Chroma에 그대로 위임하므로
+    get_vector_store를 사용하는 코드는 그대로 동작합니다.
+    인덱스는 동기화 시 제자리에서 갱신되므로(배열 교체, HNSW resize_index / add_items),
+    검색은 읽기 락, 동기화 / 재양자화 / 저장은 쓰기 락을 잡고 실행합니다.
+    """
+
+    def __init__(self, store: Any, uid: str, index_dir: str):
+        self.store = store
+        self.uid = uid
+        self.index_dir = index_dir
+        self._index: Optional[AnnIndex] = None
+        # _lock: 동기화할 스레드 하나를 고름, _rw: 검색과 동기화를 서로 배제
+        self._lock = threading.Lock()
+        self._rw = _ReadWriteLock()
+        # 이 프로세스에서 다시 쓰인 청크 ID (같은 ID로 재인제스트된 경우 벡터를 다시 가져옴)
+        self._dirty_ids: set = set()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.store, name)
+
+    def add_documents(self, documents: List[Document], ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        added_ids = self.store.add_documents(documents=documents, ids=ids, **kwargs)
+        self._dirty_ids.update(ids or added_ids or [])
+        return added_ids
+
+    def get_index(self) -> AnnIndex:
+        """매니페스트 버전과 맞는 인덱스를 반환합니다. 버전이 다르면 Chroma로부터 증분 동기화 후 저장합니다."""
+        version = read_manifest(self.index_dir).version
+        index = self._index
+        if index is not None and index.version == version and not self._dirty_ids:
+            return index
+        with self._lock:
+            if self._index is None:
+                try:
+                    self._index = AnnIndex.load(self.index_dir)
+                except Exception as e:
+                    print(f"ANN 인덱스 로드 실패 (재생성 진행): {e}")
+                self._index = self._index or AnnIndex()
+            index = self._index
+            requantized = index.quantization != settings.ANN_QUANTIZATION
+            if index.version == version and not self._dirty_ids and not requantized:
+                return index
+            self._sync(index, version, requantized)
+        return index
+
+    def _sync(self, index: AnnIndex, version: int, requantize: bool = False):
+        """
+        Chroma의 청크 ID와 비교하여 사라진 청크는 삭제하고, 새로 생겼거나 다시 쓰인 청크의 벡터만 가져옵니다.
+        Chroma 조회는 락 없이 먼저 끝내고, 인덱스 변경과 저장만 쓰기 락 안에서 실행합니다.
+        """
+        store_ids = self.store.get(include=[]).get("ids", [])
+        store_id_set = set(store_ids)
+        dirty, self._dirty_ids = self._dirty_ids, set()
+        stale = [chunk_id for chunk_id in index.rows if chunk_id not in store_id_set or chunk_id in dirty]
+        stale_set = set(stale)
+        missing = [chunk_id for chunk_id in store_ids if chunk_id not in index.rows or chunk_id in stale_set]
+        batches = [
+            self.store.get(ids=missing[start:start + SYNC_BATCH], include=["embeddings", "metadatas"])
+            for start in range(0, len(missing), SYNC_BATCH)
+        ]
+
+        with self._rw.write():
+            if requantize:
+                # 저장된 인덱스와 양자화 설정이 다르면 현재 벡터로 다시 인코딩
+                index.quantize(settings.ANN_QUANTIZATION)
+            index.remove(stale)
+            for batch in batches:
+                if len(batch["ids"]):
+                    index.add(batch["ids"], np.asarray(batch["embeddings"], dtype=np.float32), batch["metadatas"])
+            if index._hnsw is None:
+                index.build_hnsw()
+            index.version = version
+            try:
+                index.save(self.index_dir)
+            except Exception as e:
+                print(f"ANN 인덱스 저장 실패: {e}")
+        print(f"ANN 인덱스 동기화: 추가 {len(missing)}개, 삭제 {len(stale)}개 (UID: {self.uid}, 총 {len(index)}개)")
+
+    def similarity_search_by_vectors_with_relevance_scores(
+        self,
+        embeddings: Sequence[Sequence[float]],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[List[Tuple[Document, float]]]:
+        """여러 쿼리 벡터를 한 번에 검색하여 쿼리별 (Document, 거리) 리스트를 반환합니다."""
+        conditions = parse_search_filter(filter)
+        if conditions is None:
+            return [
+                self.store.similarity_search_by_vector_with_relevance_scores(embedding, k=k, filter=filter)
+                for embedding in embeddings
+            ]
+        index = self.get_index()
+        with self._rw.read():
+            results = index.search(np.asarray(embeddings, dtype=np.float32), k, **conditions)
+
+        # 본문/메타데이터는 메모리의 키워드 인덱스에서 한 번에 복원 (순환 import 방지를 위해 지연 import)
+        from src.rag_pipeline.retriever import get_keyword_index
+        unique_ids = list(dict.fromkeys(chunk_id for hits in results for chunk_id, _ in hits))
+        documents = {doc.metadata["doc_id"]: doc for doc in get_keyword_index(uid=self.uid).get_documents(unique_ids)}
+        return [
+            [(documents[chunk_id], distance) for chunk_id, distance in hits if chunk_id in documents]
+            for hits in results
+        ]
+
+    def similarity_search_by_vector_with_relevance_scores(
+        self,
+        embedding: Sequence[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vectors_with_relevance_scores([embedding], k=k, filter=filter)[0]
@@ -0,0 +1,143 @@
+"""
+검색 파라미터 오프라인 튜닝(auto-tuner) 모듈입니다.
+
+청크 크기/중첩, 레그별 검색 수(k), [키워드, 벡터] 융합 가중치, 컨텍스트 최대 청크 수 / 토큰 예산, 주변 페이지 확장 거리는
+수작업으로 정한 값입니다. 튜너(scripts/benchmarks/tune_retrieval.py)는 골든 데이터셋 질문으로 이 값들을 격자 탐색하고,
+설정마다 다음 지표를 계산한 뒤 서로 지배되지 않는(Pareto 최적) 설정을 설정 프로필(.env)로 출력합니다.
+    - recall@k  : 상위 k개 컨텍스트 안에 정답 청크가 있는 질문 비율
+    - MRR       : 첫 정답 청크 순위의 역수 평균 (없으면 0)
+    - tokens    : 질문당 LLM 컨텍스트 토큰 수 평균 (pack_context 결과 기준 추정치)
+    - p50/p95   : 질문당 검색(retrieve_documents) 지연 시간
+골든 데이터셋에는 정답 청크 ID가 없으므로 정답(ground_truth)이 공백을 무시하고 그대로 포함되거나,
+정답 바이그램 토큰의 일정 비율 이상이 들어 있는 청크를 정답 청크로 봅니다.
+프로필의 키는 src/config.py 설정 이름과 같습니다.
+"""
+import json
+import zlib
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from pydantic import BaseModel, Field
+
+from src.rag_pipeline.tokenizer import char_ngram_tokenizer
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    외부 API 없이 동작하는 로컬 임베딩입니다. (튜닝/벤치마크용)
+    문자 바이그램 토큰을 부호 있는 해시로 dim 차원에 누적한 뒤 L2 정규화하므로,
+    같은 토큰을 공유하는 텍스트일수록 코사인 유사도가 높습니다.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in char_ngram_tokenizer(text):
+            h = zlib.crc32(token.encode("utf-8"))
+            vector[h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm > 0 else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+def _compact(text: str) -> str:
+    return "".join(text.split()).lower()
+
+
+def is_relevant(doc: Document, ground_truth: str, threshold: float = 0.8) -> bool:
+    """청크가 정답을 담고 있는지 판별합니다. (공백 무시 포함, 또는 정답 토큰 비율 >= threshold)"""
+    if _compact(ground_truth) in _compact(doc.page_content):
+        return True
+    truth = set(char_ngram_tokenizer(ground_truth))
+    if not truth:
+        return False
+    return len(truth & set(char_ngram_tokenizer(doc.page_content))) / len(truth) >= threshold
+
+
+def first_relevant_rank(docs: List[Document], ground_truth: str, threshold: float = 0.8) -> Optional[int]:
+    """첫 정답 청크의 순위(1부터)를 반환합니다. 정답 청크가 없으면 None"""
+    return next((rank for rank, doc in enumerate(docs, start=1) if is_relevant(doc, ground_truth, threshold)), None)
+
+
+class TrialResult(BaseModel):
+    params: Dict[str, Any] = Field(..., description="설정 이름 -> 값 (src/config.py 설정 이름)")
+    recall: Dict[int, float] = Field(..., description="k -> recall@k")
+    mrr: float = Field(..., description="Mean Reciprocal Rank")
+    tokens: float = Field(..., description="질문당 컨텍스트 토큰 수 평균")
+    p50_ms: float = Field(..., description="검색 지연 시간 중앙값(ms)")
+    p95_ms: float = Field(..., description="검색 지연 시간 95퍼센타일(ms)")
+
+
+def summarize_trial(
+    params: Dict[str, Any],
+    ranks: List[Optional[int]],
+    tokens: List[int],
+    latencies: List[float],
+    recall_at: List[int]
+) -> TrialResult:
+    """질문별 첫 정답 순위 / 컨텍스트 토큰 수 / 지연 시간(초)으로 한 설정의 지표를 계산합니다."""
+    return TrialResult(
+        params=params,
+        recall={k: sum(1 for rank in ranks if rank is not None and rank <= k) / len(ranks) for k in recall_at},
+        mrr=sum(1.0 / rank for rank in ranks if rank is not None) / len(ranks),
+        tokens=float(np.mean(tokens)),
+        p50_ms=float(np.percentile(latencies, 50) * 1000),
+        p95_ms=float(np.percentile(latencies, 95) * 1000)
+    )
+
+
+def _objectives(result: TrialResult) -> List[float]:
+    """클수록 좋은 목표값 목록 (recall@k들, MRR, -토큰 수, -p95 지연 시간)"""
+    return [*(result.recall[k] for k in sorted(result.recall)), result.mrr, -result.tokens, -result.p95_ms]
+
+
+def pareto_front(results: List[TrialResult]) -> List[TrialResult]:
+    """다른 어떤 설정에도 지배되지 않는(모든 목표에서 같거나 나쁘고 하나 이상에서 나쁜 경우가 없는) 설정 목록 (입력 순서 유지)"""
+    objectives = [_objectives(result) for result in results]
+    front = []
+    for i, own in enumerate(objectives):
+        dominated = any(
+            all(a >= b for a, b in zip(other, own)) and any(a > b for a, b in zip(other, own))
+            for j, other in enumerate(objectives) if j != i
+        )
+        if not dominated:
+            front.append(results[i])
+    return front
+
+
+def recommend(front: List[TrialResult]) -> TrialResult:
+    """Pareto 최적 설정 중 품질 우선(가장 큰 k의 recall → MRR → 토큰 수 → p95 지연 시간)으로 하나를 고릅니다."""
+    return max(front, key=lambda result: (result.recall[max(result.recall)], result.mrr, -result.tokens, -result.p95_ms))
+
+
+def format_metrics(result: TrialResult) -> str:
+    recall = " ".join(f"recall@{k}={value:.2f}" for k, value in sorted(result.recall.items()))
+    return f"{recall} MRR={result.mrr:.3f} tokens={result.tokens:.0f} p50={result.p50_ms:.1f}ms p95={result.p95_ms:.1f}ms"
+
+
+def _env_value(value: Any) -> str:
+    return json.dumps(value) if isinstance(value, (list, dict, bool)) else str(value)
+
+
+def to_profile(result: TrialResult, alternatives: List[TrialResult] = (), comment: str = "") -> str:
+    """튜닝 결과를 .env 형식 설정 프로필 문자열로 만듭니다. (나머지 Pareto 최적 설정은 주석으로 덧붙임)"""
+    lines = [f"# {line}" for line in comment.splitlines()]
+    lines.append(f"# {format_metrics(result)}")
+    lines.extend(f"{key}={_env_value(value)}" for key, value in result.params.items())
+    others = [other for other in alternatives if other is not result]
+    if others:
+        lines.append("")
+        lines.append("# 그 밖의 Pareto 최적 설정")
+        for other in others:
+            params = " ".join(f"{key}={_env_value(value)}" for key, value in other.params.items())
+            lines.append(f"# {params} | {format_metrics(other)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,103 @@
+"""
+토큰 예산 기반 LLM 컨텍스트 패커 모듈입니다.
+
+format_docs는 최대 100개 청크를 이어 붙이면서 청크마다 문서명 / 페이지 / 전체 이미지 경로 헤더를 반복하고,
+토큰 수를 확인하지 않아 질문마다 프롬프트 크기와 Gemini 지연 시간이 크게 달라졌습니다.
+pack_context는 검색 순위대로 청크를 CONTEXT_TOKEN_BUDGET 토큰까지만 채우고,
+같은 페이지의 청크를 한 묶음으로 모아 헤더를 한 번만 쓰며, 이미지 경로 대신 짧은 인용 ID(S1, S2, ...)를 붙입니다.
+
+    [S1] manual p.12
+    (12페이지 청크들)
+
+    [S2] manual p.3, 12, 37
+    (근사 중복 병합 청크)
+
+청크 토큰 수는 인제스트 시 메타데이터(token_count)에 저장된 값을 사용하고, 없으면(이전 인덱스) 그 자리에서 추정합니다.
+답변 생성 후 resolve_citations가 [[Cited Images: S1, S3]] 태그의 인용 ID를 이미지 경로로 되돌립니다.
+"""
+import re
+from typing import Dict, List, NamedTuple, Tuple
+
+from langchain_core.documents import Document
+
+from src.rag_pipeline.tokenizer import estimate_tokens
+
+CITATION_PREFIX = "S"
+GROUP_SEPARATOR = "\n\n"
+
+_CITED_IMAGES_PATTERN = re.compile(r"\[\[Cited Images: (.*?)\]\]", re.DOTALL)
+_CITATION_ID_PATTERN = re.compile(rf"^{CITATION_PREFIX}\d+$")
+
+
+class PackedContext(NamedTuple):
+    """패킹된 컨텍스트 문자열, 인용 ID -> 이미지 경로, 포함된 청크(순위 순), 추정 토큰 수"""
+    text: str
+    citations: Dict[str, str]
+    documents: List[Document]
+    tokens: int
+
+
+def chunk_tokens(doc: Document) -> int:
+    """청크 본문의 토큰 수 (인제스트 시 저장한 token_count, 없으면 추정)"""
+    token_count = doc.metadata.get("token_count")
+    return int(token_count) if token_count is not None else estimate_tokens(doc.page_content)
+
+
+def _page_label(doc: Document) -> str:
+    # 인제스트 시 병합된 근사 중복 청크는 같은 내용이 등장하는 모든 페이지를 표시
+    return str(doc.metadata.get("duplicate_pages") or doc.metadata.get("page", "N/A"))
+
+
+def pack_context(docs: List[Document], token_budget: int) -> PackedContext:
+    """
+    검색 순위대로 청크를 token_budget 토큰까지 채워 컨텍스트를 만듭니다.
+    예산을 넘는 청크는 건너뛰고 다음(더 작은) 청크로 계속 채우며, 1순위 청크는 예산과 무관하게 항상 포함합니다.
+    페이지 묶음은 처음 포함된 청크의 순위 순서로, 묶음 안의 청크도 순위 순서로 배치합니다.
+    token_budget이 0 이하이면 모든 청크를 포함합니다.
+    """
+    groups: Dict[Tuple[str, str], List[Document]] = {}
+    headers: Dict[Tuple[str, str], str] = {}
+    citations: Dict[str, str] = {}
+    packed: List[Document] = []
+    used = 0
+    for doc in docs:
+        key = (str(doc.metadata.get("doc_name", "N/A")), _page_label(doc))
+        cost = chunk_tokens(doc)
+        header = None
+        if key not in groups:
+            header = f"[{CITATION_PREFIX}{len(groups) + 1}] {key[0]} p.{key[1]}"
+            cost += estimate_tokens(header + GROUP_SEPARATOR)
+        if packed and token_budget > 0 and used + cost > token_budget:
+            continue
+        if header is not None:
+            groups[key] = []
+            headers[key] = header
+            citations[f"{CITATION_PREFIX}{len(groups)}"] = doc.metadata.get("image_path") or ""
+        groups[key].append(doc)
+        packed.append(doc)
+        used += cost
+
+    text = GROUP_SEPARATOR.join(
+        "\n".join([headers[key]] + [doc.page_content for doc in group_docs])
+        for key, group_docs in groups.items()
+    )
+    return PackedContext(text=text, citations=citations, documents=packed, tokens=used)
+
+
+def resolve_citations(response: str, citations: Dict[str, str]) -> Tuple[str, List[str]]:
+    """
+    답변 끝의 [[Cited Images: S1, S3]] 태그를 제거하고 (답변, 인용된 이미지 경로 리스트)를 반환합니다.
+    인용 ID는 이미지 경로로 바꾸고, 모르는 ID는 버리며, 경로가 그대로 적힌 항목은 그대로 사용합니다.
+    """
+    match = _CITED_IMAGES_PATTERN.search(response)
+    if not match:
+        return response, []
+    image_paths = set()
+    entries = match.group(1).strip()
+    if entries.lower() != "none":
+        for entry in (item.strip().strip("[]") for item in entries.split(",")):
+            if _CITATION_ID_PATTERN.match(entry):
+                entry = citations.get(entry)
+            if entry:
+                image_paths.add(entry)
+    return response.replace(match.group(0), "").strip(), sorted(image_paths)
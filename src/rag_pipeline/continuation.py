@@ -0,0 +1,87 @@
+"""
+페이지 간 연속(Continuation) 감지 모듈입니다.
+
+가로로 긴 표나 절차가 다음 페이지로 이어지는 경우를 인제스트 시점에 감지하여
+페이지 쌍 (p → p+1) 연결 정보를 청크 메타데이터(continues_to_next / continues_from_prev)로 저장합니다.
+검색 시 주변 페이지 확장은 이 연결만 따라가므로, 이어지는 내용이 없는 페이지까지 컨텍스트에 붙이지 않습니다.
+
+감지 규칙:
+    - table_unterminated : 이전 페이지가 표 행으로 끝나고, 다음 페이지 첫 표에 헤더 구분선(|---|)이 없음
+    - table_header       : 이전 페이지 마지막 표와 다음 페이지 첫 표의 헤더 행이 같음 (헤더 반복)
+    - marker             : 명시적인 연속 표시만 인정
+                           이전 페이지: 줄 끝의 "다음 페이지에 계속(됩니다)", "continued on next page"
+                           다음 페이지: 괄호 표시 "(계속)" / "(continued)", 또는 줄 처음의 "앞 페이지에서 계속"
+                           ("동작이 계속됩니다", "이어서 ..." 같은 일반 문장은 연속 표시가 아님)
+"""
+import re
+from typing import Dict, List, Optional, Tuple
+
+from src.rag_pipeline.schema import PageContent
+
+# 이전 페이지 끝에 오는 연속 표시 (줄 끝, 닫는 괄호/마침표 허용)
+_END_MARKER = re.compile(
+    r"(다음\s*(페이지|쪽)에\s*계속(\s*됩니다)?|continued\s+on\s+(the\s+)?next\s+page|to\s+be\s+continued)[\s).\]…]*$",
+    re.IGNORECASE | re.MULTILINE
+)
+# 다음 페이지 시작에 오는 연속 표시 (괄호 표시, 또는 줄 처음의 문구)
+_START_MARKER = re.compile(
+    r"(\(\s*(계속|cont(inued|'d)\.?)\s*\)|^[\s(\[]*(앞\s*(페이지|쪽)에서\s*계속|continued\s+from\b))",
+    re.IGNORECASE | re.MULTILINE
+)
+_SEPARATOR_ROW = re.compile(r"^\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?$")
+_MARKER_WINDOW = 200
+
+
+def _lines(text: str) -> List[str]:
+    return [line.strip() for line in (text or "").splitlines() if line.strip()]
+
+
+def _is_table_row(line: str) -> bool:
+    return line.startswith("|") and line.endswith("|")
+
+
+def _header_row(table: str) -> Optional[str]:
+    """마크다운 표의 헤더 행을 정규화(공백 제거)하여 반환합니다. 헤더 구분선이 없으면 None입니다."""
+    lines = _lines(table)
+    if len(lines) >= 2 and _SEPARATOR_ROW.match(lines[1]):
+        return re.sub(r"\s+", "", lines[0])
+    return None
+
+
+def detect_continuation(previous: PageContent, following: PageContent) -> Optional[str]:
+    """이전 페이지의 내용이 다음 페이지로 이어지면 감지 사유를, 아니면 None을 반환합니다."""
+    previous_end = previous.text[-_MARKER_WINDOW:] if previous.text else ""
+    if previous.tables:
+        previous_end = previous_end + "\n" + previous.tables[-1][-_MARKER_WINDOW:]
+    following_start = following.text[:_MARKER_WINDOW] if following.text else ""
+    if following.tables:
+        following_start = following.tables[0][:_MARKER_WINDOW] + "\n" + following_start
+
+    if previous.tables and following.tables:
+        previous_header = _header_row(previous.tables[-1])
+        following_header = _header_row(following.tables[0])
+        if previous_header and previous_header == following_header:
+            return "table_header"
+        previous_lines = _lines(previous.tables[-1])
+        if previous_lines and _is_table_row(previous_lines[-1]) and following_header is None:
+            return "table_unterminated"
+
+    if _END_MARKER.search(previous_end) or _START_MARKER.search(following_start):
+        return "marker"
+    return None
+
+
+def detect_continuations(pages: List[Tuple[int, PageContent]]) -> Dict[int, str]:
+    """
+    (페이지 번호, PageContent) 리스트에서 연속된 페이지 쌍을 검사하여
+    {다음 페이지로 이어지는 페이지 번호: 감지 사유}를 반환합니다. 파싱에 실패한(None) 페이지는 건너뜁니다.
+    """
+    parsed = sorted(((page_num, content) for page_num, content in pages if content is not None), key=lambda item: item[0])
+    links = {}
+    for (page_num, content), (next_num, next_content) in zip(parsed, parsed[1:]):
+        if next_num != page_num + 1:
+            continue
+        reason = detect_continuation(content, next_content)
+        if reason:
+            links[page_num] = reason
+    return links
@@ -0,0 +1,171 @@
+"""
+에러 코드 / 파라미터 번호 / 모델명 정확 일치(Exact-match) 인덱스 모듈입니다.
+
+인제스트 시 청크 본문에서 알람 코드(E1236), 파라미터 번호(Pr.22), 모델명(QD77MS16, MR-J4-70A)을 추출하여
+토큰 → {chunk_id: (doc_name, page)} 딕셔너리에 저장합니다.
+질문에 코드가 있으면 BM25 순위에 기대지 않고 O(1) 딕셔너리 조회로 해당 코드가 등장하는 페이지를 바로 찾습니다.
+
+저장 형식: {CHROMA_DB_DIR}/{uid}/exact_index.json (인덱스 매니페스트 버전 포함, 원자적 교체)
+"""
+import json
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from src.rag_pipeline.near_dup import alias_pages
+
+EXACT_INDEX_FILENAME = "exact_index.json"
+
+# 영숫자 경계 (한글 조사가 바로 붙는 "E1236이" 같은 경우도 추출되도록 \b 대신 사용)
+_START, _END = r"(?<![A-Za-z0-9])", r"(?![A-Za-z0-9])"
+# 알람 코드 / 모델명: 대문자로 시작하고 숫자를 포함하는 토큰 (하이픈 연결 허용)
+_CODE_PATTERN = re.compile(_START + r"[A-Z][A-Z0-9]*(?:-[A-Z0-9]+)*" + _END)
+# 파라미터 번호: Pr.22, PA.01, Pn 100 같은 접두어 + 번호
+_PARAM_PATTERN = re.compile(_START + r"([A-Za-z]{1,3})\.\s?(\d{1,4})" + _END)
+# 파라미터 패턴과 형태가 같은 일반 약어
+_PARAM_STOPWORDS = {"NO", "FIG", "VER", "VOL", "P", "PP", "CH", "SEC", "EX", "EQ", "TAB", "REF"}
+_MIN_CODE_LEN = 3
+
+
+class ExactHit(NamedTuple):
+    doc_name: Optional[str]
+    page: Optional[int]
+    chunk_id: str
+
+
+def extract_codes(text: str) -> List[str]:
+    """
+    본문에서 코드 토큰을 추출하여 정규화(대문자, 공백 제거)된 고유 토큰 리스트를 등장 순서대로 반환합니다.
+    쿼리는 대소문자가 섞여 입력되므로 호출 측에서 upper()한 뒤 넘기면 됩니다.
+    """
+    tokens = []
+    for match in _CODE_PATTERN.finditer(text):
+        token = match.group(0)
+        if len(token) >= _MIN_CODE_LEN and any(ch.isdigit() for ch in token):
+            tokens.append(token)
+    for prefix, number in _PARAM_PATTERN.findall(text):
+        if prefix.upper() not in _PARAM_STOPWORDS:
+            tokens.append(f"{prefix.upper()}.{number}")
+    return list(dict.fromkeys(tokens))
+
+
+class ExactMatchIndex:
+    """
+    코드 토큰 → 청크 위치 딕셔너리.
+    청크별 토큰 목록도 함께 보관하여 삭제/교체를 해당 청크의 토큰만으로 처리합니다.
+    """
+
+    def __init__(self, version: int = 0):
+        self.version = version
+        self._postings: Dict[str, Dict[str, Tuple[Optional[str], Optional[int]]]] = {}
+        self._chunk_tokens: Dict[str, List[str]] = {}
+        # 근사 중복 병합된 대표 청크의 별칭 페이지 (page 조건에 함께 일치)
+        self._aliases: Dict[str, List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._postings)
+
+    def __contains__(self, token: str) -> bool:
+        return token in self._postings
+
+    def add_documents(self, documents: Iterable[Document]) -> int:
+        """doc_id 메타데이터가 있는 청크의 코드 토큰을 인덱싱합니다. (같은 ID는 교체) 추가된 청크 수를 반환합니다."""
+        added = 0
+        for doc in documents:
+            chunk_id = doc.metadata.get("doc_id")
+            if not chunk_id:
+                continue
+            self.remove_documents([chunk_id])
+            tokens = extract_codes(doc.page_content)
+            if not tokens:
+                continue
+            location = (doc.metadata.get("doc_name"), doc.metadata.get("page"))
+            for token in tokens:
+                self._postings.setdefault(token, {})[chunk_id] = location
+            self._chunk_tokens[chunk_id] = tokens
+            aliases = alias_pages(doc.metadata)
+            if aliases:
+                self._aliases[chunk_id] = aliases
+            added += 1
+        return added
+
+    def remove_documents(self, ids: Iterable[str]) -> int:
+        removed = 0
+        for chunk_id in ids:
+            tokens = self._chunk_tokens.pop(chunk_id, None)
+            if tokens is None:
+                continue
+            self._aliases.pop(chunk_id, None)
+            for token in tokens:
+                postings = self._postings.get(token)
+                if postings is not None:
+                    postings.pop(chunk_id, None)
+                    if not postings:
+                        del self._postings[token]
+            removed += 1
+        return removed
+
+    def lookup(self, token: str) -> List[ExactHit]:
+        """토큰이 등장하는 청크 위치를 인제스트 순서대로 반환합니다. (O(1) 딕셔너리 조회)"""
+        postings = self._postings.get(token, {})
+        return [ExactHit(doc_name, page, chunk_id) for chunk_id, (doc_name, page) in postings.items()]
+
+    def lookup_many(
+        self,
+        tokens: Iterable[str],
+        doc_name: Optional[str] = None,
+        page: Optional[int] = None
+    ) -> List[ExactHit]:
+        """
+        여러 토큰을 조회하여 문서명/페이지 조건에 맞는 청크를 반환합니다.
+        더 많은 질문 토큰을 포함한 청크가 앞에 오며, 동점은 인제스트 순서를 유지합니다.
+        """
+        matched: Dict[str, int] = {}
+        hits: Dict[str, ExactHit] = {}
+        for token in dict.fromkeys(tokens):
+            for hit in self.lookup(token):
+                if doc_name and hit.doc_name != doc_name:
+                    continue
+                if page is not None and hit.page != page and page not in self._aliases.get(hit.chunk_id, ()):
+                    continue
+                matched[hit.chunk_id] = matched.get(hit.chunk_id, 0) + 1
+                hits.setdefault(hit.chunk_id, hit)
+        order = sorted(hits, key=lambda chunk_id: -matched[chunk_id])
+        return [hits[chunk_id] for chunk_id in order]
+
+    # --- 영속화 ---
+
+    def save(self, index_dir: str):
+        path = Path(index_dir)
+        path.mkdir(parents=True, exist_ok=True)
+        chunks = {
+            chunk_id: {"tokens": tokens, "location": self._postings[tokens[0]][chunk_id]}
+            for chunk_id, tokens in self._chunk_tokens.items()
+        }
+        for chunk_id, aliases in self._aliases.items():
+            chunks[chunk_id]["alias_pages"] = aliases
+        tmp_path = path / f"{EXACT_INDEX_FILENAME}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": self.version, "chunks": chunks}, f, ensure_ascii=False)
+        os.replace(tmp_path, path / EXACT_INDEX_FILENAME)
+
+    @classmethod
+    def load(cls, index_dir: str) -> Optional["ExactMatchIndex"]:
+        """디스크의 인덱스를 읽습니다. 파일이 없으면 None을 반환합니다."""
+        try:
+            with open(Path(index_dir) / EXACT_INDEX_FILENAME, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        index = cls(version=data.get("version", 0))
+        for chunk_id, chunk in data.get("chunks", {}).items():
+            location = tuple(chunk["location"])
+            for token in chunk["tokens"]:
+                index._postings.setdefault(token, {})[chunk_id] = location
+            index._chunk_tokens[chunk_id] = chunk["tokens"]
+            if chunk.get("alias_pages"):
+                index._aliases[chunk_id] = chunk["alias_pages"]
+        return index
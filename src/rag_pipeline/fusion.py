@@ -0,0 +1,196 @@
+"""
+하이브리드 검색 결과 융합(Fusion) 모듈입니다.
+
+여러 레그(키워드/벡터)와 여러 서브 쿼리에서 나온 순위 리스트를 한 번에 합칩니다.
+    - rrf   : 가중 Reciprocal Rank Fusion (weight / (rrf_k + rank))
+    - score : 리스트별 min-max 정규화 점수의 가중합 (CombSUM)
+청크 ID(doc_id) 기준으로 중복을 제거하며, 순위 깊이(depth) 단위로 누적하다가
+남은 깊이에서 얻을 수 있는 점수의 상한으로도 상위 N개 집합이 바뀔 수 없으면 누적을 멈춥니다.
+융합 후보의 레그 원 점수 분포(raw_score_profile)로 반환할 개수를 정해 원 점수 상위 청크만 남기는 적응형 k(adaptive_cutoff / adaptive_truncate)도 제공합니다.
+"""
+import heapq
+from typing import Dict, List, Literal, NamedTuple, Optional, Tuple
+
+from langchain_core.documents import Document
+from pydantic import BaseModel, Field
+
+
+class FusionParams(BaseModel):
+    method: Literal["rrf", "score"] = Field("rrf", description="융합 방식 (rrf: 가중 RRF, score: 정규화 점수 가중합)")
+    rrf_k: int = Field(60, description="RRF 순위 상수 (클수록 하위 순위의 기여가 평탄해짐)")
+    weights: Dict[str, float] = Field(
+        default_factory=lambda: {"keyword": 0.5, "vector": 0.5},
+        description="레그 이름별 가중치 (없는 레그는 1.0)"
+    )
+    top_n: Optional[int] = Field(None, description="반환할 결과 수 (None이면 리트리버의 k)")
+    early_stop: bool = Field(True, description="상위 N개가 확정되면 하위 순위 누적을 생략")
+
+
+class RankedList(NamedTuple):
+    """한 레그가 한 쿼리에 대해 반환한 (Document, 점수) 리스트. 점수 내림차순으로 정렬되어 있어야 합니다."""
+    leg: str
+    hits: List[Tuple[Document, float]]
+
+
+def chunk_key(doc: Document) -> str:
+    """중복 제거용 청크 식별자 (doc_id 메타데이터 → Document.id → 원문 순으로 사용)"""
+    return doc.metadata.get("doc_id") or getattr(doc, "id", None) or doc.page_content
+
+
+def _contributions(ranked: RankedList, params: FusionParams) -> List[float]:
+    """리스트의 각 순위가 융합 점수에 기여하는 값을 계산합니다."""
+    weight = params.weights.get(ranked.leg, 1.0)
+    if params.method == "rrf":
+        return [weight / (params.rrf_k + rank) for rank in range(1, len(ranked.hits) + 1)]
+    scores = [score for _, score in ranked.hits]
+    low, high = min(scores), max(scores)
+    span = high - low
+    return [weight * ((score - low) / span if span > 0 else 1.0) for score in scores]
+
+
+def fuse_with_scores(
+    ranked_lists: List[RankedList],
+    params: Optional[FusionParams] = None,
+    top_n: Optional[int] = None
+) -> List[Tuple[Document, float]]:
+    """
+    순위 리스트들을 융합하여 (Document, 융합 점수)를 점수 내림차순으로 최대 top_n개 반환합니다.
+    동점은 먼저 등장한(더 얕은 순위의) 청크가 앞에 옵니다.
+    """
+    params = params or FusionParams()
+    top_n = top_n or params.top_n
+    lists = [(ranked.hits, _contributions(ranked, params)) for ranked in ranked_lists if ranked.hits]
+    if not lists:
+        return []
+    max_depth = max(len(hits) for hits, _ in lists)
+
+    scores: Dict[str, float] = {}
+    docs: Dict[str, Document] = {}
+    stopped_at = max_depth
+    for depth in range(max_depth):
+        for hits, contributions in lists:
+            if depth < len(hits):
+                doc = hits[depth][0]
+                key = chunk_key(doc)
+                scores[key] = scores.get(key, 0.0) + contributions[depth]
+                if key not in docs:
+                    docs[key] = doc
+
+        if not params.early_stop or not top_n or len(scores) < top_n:
+            continue
+        # 남은 깊이에서 어떤 청크가 더 얻을 수 있는 점수의 상한 (리스트마다 최대 한 번 등장)
+        potential = sum(
+            contributions[depth + 1] for hits, contributions in lists if depth + 1 < len(hits)
+        )
+        if potential == 0:
+            continue
+        best = heapq.nlargest(top_n + 1, scores.values())
+        outside = best[top_n] if len(best) > top_n else 0.0
+        if best[top_n - 1] > outside + potential:
+            stopped_at = depth + 1
+            break
+
+    if stopped_at < max_depth:
+        # 상위 N개 집합은 확정되었으므로, 순서를 정확히 맞추기 위해 해당 청크들의 남은 기여만 더함
+        selected = heapq.nlargest(top_n, scores, key=scores.get)
+        final = {key: scores[key] for key in selected}
+        for hits, contributions in lists:
+            for depth in range(stopped_at, len(hits)):
+                key = chunk_key(hits[depth][0])
+                if key in final:
+                    final[key] += contributions[depth]
+        scores = {key: final[key] for key in scores if key in final}
+
+    ranked = sorted(scores.items(), key=lambda item: -item[1])
+    if top_n:
+        ranked = ranked[:top_n]
+    return [(docs[key], score) for key, score in ranked]
+
+
+def fuse(
+    ranked_lists: List[RankedList],
+    params: Optional[FusionParams] = None,
+    top_n: Optional[int] = None
+) -> List[Document]:
+    """순위 리스트들을 융합한 Document 리스트를 반환합니다."""
+    return [doc for doc, _ in fuse_with_scores(ranked_lists, params, top_n)]
+
+
+def raw_score_profile(
+    ranked_lists: List[RankedList],
+    fused: List[Tuple[Document, float]],
+    params: Optional[FusionParams] = None
+) -> List[float]:
+    """
+    융합 결과 청크별로 레그 원 점수(리스트별 min-max 정규화)의 가중합을 fused와 같은 순서로 반환합니다. (적응형 k 입력용)
+    RRF 점수는 weight / (rrf_k + rank)라 순위만 반영하여 항상 완만하게 감소하므로 점수 간격/누적 점수 기준이 동작하지 않습니다.
+    원 점수(BM25 점수, 벡터 유사도)에는 "정답 하나가 압도적인" 질문의 간격이 그대로 남아 있습니다.
+    """
+    params = params or FusionParams()
+    score_params = params.model_copy(update={"method": "score"})
+    totals = dict.fromkeys((chunk_key(doc) for doc, _ in fused), 0.0)
+    for ranked in ranked_lists:
+        if not ranked.hits:
+            continue
+        for (doc, _), contribution in zip(ranked.hits, _contributions(ranked, score_params)):
+            key = chunk_key(doc)
+            if key in totals:
+                totals[key] += contribution
+    return [totals[chunk_key(doc)] for doc, _ in fused]
+
+
+def adaptive_cutoff(
+    scores: List[float],
+    min_k: int,
+    max_k: int,
+    gap_ratio: float = 0.3,
+    score_mass: float = 0.85
+) -> int:
+    """
+    점수 내림차순 리스트에서 남길 개수 k를 고릅니다. (min_k <= k <= max_k)
+        - 점수 간격(gap) : 인접 점수 차이가 전체 점수 범위의 gap_ratio 이상인 첫 위치에서 자름 (엘보)
+        - 누적 점수(mass) : (점수 - 최저 점수)의 누적 합이 전체의 score_mass에 도달하는 위치에서 자름
+    둘 중 먼저 걸리는 위치를 사용하므로, 정답이 뚜렷한 질문(예: 에러 코드)은 하한 근처로 줄고
+    점수가 고르게 퍼진 포괄적 질문은 상한 근처까지 유지됩니다.
+    """
+    n = min(len(scores), max_k)
+    if n <= min_k:
+        return n
+    span = scores[0] - scores[-1]
+    if span <= 0:
+        return n
+
+    cut = n
+    for i in range(1, n):
+        if (scores[i - 1] - scores[i]) / span >= gap_ratio:
+            cut = i
+            break
+
+    weights = [score - scores[-1] for score in scores]
+    total = sum(weights)
+    accumulated = 0.0
+    for i, weight in enumerate(weights[:cut]):
+        accumulated += weight
+        if accumulated >= score_mass * total:
+            cut = i + 1
+            break
+    return max(min_k, min(cut, n))
+
+
+def adaptive_truncate(
+    fused: List[Tuple[Document, float]],
+    profile: List[float],
+    min_k: int,
+    max_k: int,
+    gap_ratio: float = 0.3,
+    score_mass: float = 0.85
+) -> List[Tuple[Document, float]]:
+    """
+    원 점수 분포(profile, fused 순서)로 k를 정하고, 원 점수 상위 k개 청크만 fused 순서를 유지해 반환합니다.
+    k는 원 점수 내림차순 분포에서 계산되므로 자르는 대상도 원 점수 순위여야 합니다.
+    (융합 순위로 자르면 원 점수가 압도적이지만 융합 순위가 중간인 청크가 잘리고 원 점수가 낮은 청크가 남음)
+    """
+    order = sorted(range(len(fused)), key=lambda i: -profile[i])
+    k = adaptive_cutoff([profile[i] for i in order], min_k, max_k, gap_ratio=gap_ratio, score_mass=score_mass)
+    keep = set(order[:k])
+    return [item for i, item in enumerate(fused) if i in keep]
@@ -1,18 +1,26 @@
 import re 
 import os
+import asyncio
 import time
 from datetime import datetime
-from typing import List, Dict, Any, AsyncIterator, Optional
+from typing import List, Dict, Any, AsyncIterator, Callable, Optional, Tuple
 
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnablePassthrough, RunnableLambda
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.retrievers import BaseRetriever
+from langchain_core.documents import Document
 from langchain_google_genai import ChatGoogleGenerativeAI
 
 from src.rag_pipeline.query_expansion import QueryExpander
 from src.config import settings
-from src.rag_pipeline.vector_db import get_vector_store
+from src.rag_pipeline.retriever import HybridRetriever, get_filtered_retriever, get_search_version, get_documents_by_ids, get_exact_match_documents, get_page_documents, get_neighbor_documents
+from src.rag_pipeline.fusion import FusionParams, RankedList, adaptive_truncate, chunk_key, fuse_with_scores, raw_score_profile
+from src.rag_pipeline.retrieval_planner import plan_sub_queries, retrieve_ranked_lists, invoke_concurrently
+from src.rag_pipeline.reranker import rerank
+from src.rag_pipeline.near_dup import localize
+from src.rag_pipeline.context_packer import pack_context, resolve_citations
+from src.rag_pipeline.retrieval_cache import make_cache_key, retrieval_cache
 from src.api.schemas import QAFilters, UserProfile
 
 def is_general_query(query: str) -> bool:
@@ -74,12 +82,16 @@ def format_docs(docs: List[Any]) -> str:
     """
     검색된 문서들을 단일 문자열 컨텍스트로 포맷합니다.
     각 문서의 내용 앞에 출처(문서명, 페이지, 이미지 경로)를 명시합니다.
+    (답변 생성은 토큰 예산과 짧은 인용 ID를 사용하는 context_packer.pack_context로 대체됨)
     """
     formatted_docs = []
     for doc in docs:
         image_path = doc.metadata.get('image_path', 'N/A')
         doc_name = doc.metadata.get('doc_name', 'N/A')
         page_num = doc.metadata.get('page', 'N/A')
+        # 인제스트 시 병합된 근사 중복 청크는 같은 내용이 등장하는 모든 페이지를 표시
+        if doc.metadata.get('duplicate_pages'):
+            page_num = doc.metadata['duplicate_pages']
         content = f"[Document: {doc_name}, Page: {page_num}, Image Source: {image_path}]\n{doc.page_content}"
         formatted_docs.append(content)
     return "\n\n".join(formatted_docs)
@@ -96,6 +108,137 @@ def get_image_paths(docs: List[Any]) -> List[str]:
     return sorted(list(image_paths))
 
 
+def retrieve_documents(query: str, expanded_query: str, retriever: BaseRetriever, filters: QAFilters = None, uid: str = "default", fusion_params: FusionParams = None) -> List[Document]:
+    """
+    정제 쿼리 + 확장 쿼리 + 원본 쿼리로 문서를 동시에 검색하고, 상위 결과의 주변 페이지 컨텍스트를 덧붙입니다.
+    주변 페이지(기본: 다음 1페이지)는 인제스트 시 감지한 연속 연결을 따라 페이지 인덱스로 한 번에 조회합니다.
+    ADAPTIVE_K_ENABLED이면 후보의 레그 원 점수 분포(점수 간격 / 누적 점수)로 후보 수를 ADAPTIVE_K_MIN~MAX 사이에서 정합니다.
+    RERANK_ENABLED이면 융합 후보를 크로스 인코더로 재순위화하여 상위 RERANK_TOP_N개만 남깁니다.
+    질문의 코드가 정확 일치 인덱스에 있으면 BM25 점수 상위 EXACT_MATCH_PIN_LIMIT개 청크를 결과 맨 앞에 고정하고,
+    나머지 정확 일치 청크는 "exact" 레그로 융합 후보에 넣어 다른 검색 결과와 경쟁시킵니다.
+    쿼리에 페이지 번호가 있으면 페이지 라우터가 페이지 인덱스에서 해당 페이지 청크를 바로 가져오며,
+    페이지가 인덱스에 없거나 문서명 필터만 있으면 같은 범위로 제한된 하이브리드(BM25 + 벡터) 리트리버를 사용합니다.
+    fusion_params가 주어지면 리트리버 기본값 대신 요청별 융합 파라미터를 사용합니다.
+    """
+    # 스마트 라우팅: 페이지 번호 추출 및 필터 구성
+    page_filter = extract_page_number(query)
+    doc_name_filter = filters.doc_name if filters and filters.doc_name else None
+    if page_filter:
+        print(f"Smart Routing: Detected page filter {page_filter}")
+
+    # 코드 정확 일치: 질문의 에러 코드/파라미터/모델명이 등장하는 청크를 딕셔너리 조회로 먼저 확보
+    exact_hits = get_exact_match_documents(
+        uid, query, doc_name=doc_name_filter, page=page_filter, limit=settings.EXACT_MATCH_MAX_CHUNKS
+    )
+    exact_docs = [doc for doc, _ in exact_hits[:settings.EXACT_MATCH_PIN_LIMIT]]
+    if exact_hits:
+        print(f"Exact Match: {len(exact_docs)} of {len(exact_hits)} chunks pinned for codes in query")
+
+    # 페이지 라우터: 페이지 지정 질문은 페이지 인덱스 조회로 바로 해석 (쿼리 임베딩/벡터 검색 생략)
+    routed_docs = []
+    if page_filter:
+        routed_docs = get_page_documents(
+            uid, query, page_filter, doc_name=doc_name_filter, radius=settings.PAGE_ROUTER_RADIUS
+        )
+
+    if routed_docs:
+        print(f"Page Router: {len(routed_docs)} chunks for page {page_filter} (vector search skipped)")
+        docs = routed_docs
+    else:
+        # 서브 쿼리 계획: 정제 쿼리(에러 코드) / 확장 쿼리 / 원본 쿼리를 정규화하여 중복 제거
+        # 코드가 정확 일치로 해석되었으면 코드 전용 BM25 쿼리는 생략
+        sub_queries = plan_sub_queries(query, expanded_query, include_codes=not exact_docs)
+
+        if doc_name_filter or page_filter:
+            print(f"Applying search filters: doc_name={doc_name_filter}, page={page_filter}")
+            # 키워드 레그도 같은 범위로 제한되므로 k=100까지 늘리지 않아도 정확 일치 결과가 유지됨
+            search_retriever = get_filtered_retriever(uid=uid, doc_name=doc_name_filter, page=page_filter)
+        else:
+            search_retriever = retriever
+
+        # 모든 서브 쿼리 x 레그를 동시에 실행하고, 후보를 한 번에 융합 (청크 ID 기준 중복 제거)
+        if isinstance(search_retriever, HybridRetriever):
+            fusion_params = fusion_params or search_retriever.fusion_params
+            ranked_lists = retrieve_ranked_lists(search_retriever, sub_queries)
+        else:
+            ranked_lists = invoke_concurrently(search_retriever, sub_queries)
+        if len(exact_hits) > len(exact_docs):
+            # 고정하지 않은 정확 일치 청크는 BM25 점수 순 리스트로 융합에 참여
+            ranked_lists.append(RankedList("exact", exact_hits[len(exact_docs):]))
+        fused = fuse_with_scores(ranked_lists, fusion_params, top_n=100)
+        if settings.ADAPTIVE_K_ENABLED:
+            # 점수 분포로 결과 수를 조절 (정답이 뚜렷한 질문은 컨텍스트/재순위화/주변 페이지 확장 비용 감소)
+            # RRF 점수는 순위만 반영하여 간격이 생기지 않으므로 레그 원 점수(정규화 가중합) 분포로 k를 정하고 그 상위 k개를 남김
+            truncated = adaptive_truncate(
+                fused, raw_score_profile(ranked_lists, fused, fusion_params), settings.ADAPTIVE_K_MIN, settings.ADAPTIVE_K_MAX,
+                gap_ratio=settings.ADAPTIVE_K_GAP_RATIO, score_mass=settings.ADAPTIVE_K_SCORE_MASS
+            )
+            print(f"Adaptive k: {len(fused)} -> {len(truncated)} chunks")
+            fused = truncated
+        docs = [doc for doc, _ in fused]
+
+    # (선택) 크로스 인코더로 후보를 재순위화하여 상위 N개만 컨텍스트로 사용
+    if settings.RERANK_ENABLED:
+        docs = rerank(query, docs, top_n=settings.RERANK_TOP_N)
+
+    # 상위 정확 일치 청크는 순위와 무관하게 맨 앞에 고정
+    if exact_docs:
+        exact_keys = {chunk_key(doc) for doc in exact_docs}
+        docs = exact_docs + [doc for doc in docs if chunk_key(doc) not in exact_keys]
+    seen_chunks = {chunk_key(doc) for doc in docs}
+
+    # 상위 결과의 주변 페이지 컨텍스트 추가 (가로 펼침 표/연속 정보 대응)
+    # 인제스트 시 감지한 연속 연결이 있는 페이지만 따라가며, 필요한 페이지를 페이지 인덱스에서 한 번에 조회하여 각 결과 바로 뒤에 이어 붙임
+    top_docs = docs[:settings.CONTEXT_EXPANSION_TOP_K]
+    neighbors = get_neighbor_documents(
+        uid, top_docs,
+        direction=settings.CONTEXT_EXPANSION_DIRECTION,
+        radius=settings.CONTEXT_EXPANSION_RADIUS,
+        follow_links=settings.CONTEXT_EXPANSION_FOLLOW_LINKS
+    )
+    extended_docs = []
+    for doc, neighbor_docs in zip(top_docs, neighbors):
+        extended_docs.append(doc)
+        for new_doc in neighbor_docs:
+            if chunk_key(new_doc) not in seen_chunks:
+                extended_docs.append(new_doc)
+                seen_chunks.add(chunk_key(new_doc))
+
+    # 나머지 중복되지 않은 문서들 추가
+    extended_docs.extend(docs[len(top_docs):])
+
+    # 컨텍스트 패킹 후보 수 제한 (실제 LLM 컨텍스트 크기는 pack_context가 CONTEXT_TOKEN_BUDGET으로 제한)
+    return extended_docs[:settings.CONTEXT_MAX_DOCS]
+
+def retrieve_with_cache(query: str, expand: Callable[[], str], retriever: BaseRetriever, filters: QAFilters = None, uid: str = "default", fusion_params: FusionParams = None, history_context: str = "") -> Tuple[List[Document], str]:
+    """
+    유저별 검색 캐시를 거쳐 (검색 문서 리스트, 확장 쿼리)를 반환합니다.
+    캐시 적중 시 쿼리 확장(expand)과 검색을 모두 건너뛰고, 저장된 청크 ID를 키워드 인덱스에서 바로 복원합니다.
+    별칭 페이지로 반환되었던 근사 중복 대표 청크는 저장된 페이지로 다시 localize하여 미적중 시와 같은 page / image_path를 갖습니다.
+    키에 인덱스 버전이 포함되므로 인제스트/삭제 이후에는 이전 결과가 사용되지 않습니다.
+    """
+    if not settings.RETRIEVAL_CACHE_ENABLED:
+        expanded_query = expand()
+        return retrieve_documents(query, expanded_query, retriever, filters, uid, fusion_params), expanded_query
+
+    doc_name = filters.doc_name if filters and filters.doc_name else None
+    key = make_cache_key(uid, query, get_search_version(uid), doc_name, fusion_params, history_context)
+    cached = retrieval_cache.get(key)
+    if cached is not None:
+        docs = get_documents_by_ids(uid, cached.chunk_ids)
+        if len(docs) == len(cached.chunk_ids):
+            if cached.pages:
+                docs = [localize(doc, [page]) if page is not None else doc for doc, page in zip(docs, cached.pages)]
+            print(f"Retrieval cache hit: {len(docs)} chunks (UID: {uid})")
+            return docs, cached.expanded_query
+
+    expanded_query = expand()
+    docs = retrieve_documents(query, expanded_query, retriever, filters, uid, fusion_params)
+    chunk_ids = [doc.metadata.get("doc_id") for doc in docs]
+    if all(chunk_ids):
+        retrieval_cache.put(key, chunk_ids, expanded_query, pages=[doc.metadata.get("page") for doc in docs])
+    return docs, expanded_query
+
 def get_rag_chain(retriever: BaseRetriever) -> Any: # Returns a Runnable object
     """
     LangChain Expression Language (LCEL)을 사용하여 RAG 체인을 생성합니다.
@@ -138,7 +281,7 @@ def get_rag_chain(retriever: BaseRetriever) -> Any: # Returns a Runnable object
     )
     return rag_chain
 
-def generate_answer_with_rag(query: str, retriever: BaseRetriever, query_expander: QueryExpander, filters: QAFilters = None, history: List[Dict[str, str]] = None, user_profile: UserProfile = None) -> Dict[str, Any]:
+def generate_answer_with_rag(query: str, retriever: BaseRetriever, query_expander: QueryExpander, filters: QAFilters = None, history: List[Dict[str, str]] = None, user_profile: UserProfile = None, uid: str = "default", fusion_params: FusionParams = None) -> Dict[str, Any]:
     """
     RAG 체인을 사용하여 사용자 질문에 답변을 생성하고,
     답변에 실제 인용된 이미지 경로만 추출하여 반환합니다.
@@ -147,110 +290,23 @@ def generate_answer_with_rag(query: str, retriever: BaseRetriever, query_expande
         query (str): 사용자 질문.
         retriever (BaseRetriever): 문서 검색을 위한 검색기 객체.
         query_expander (QueryExpander): 쿼리 확장을 위한 객체.
+        filters (QAFilters): 검색 범위 필터 (문서명).
         history (List[Dict[str, str]]): 이전 대화 내역.
         user_profile (UserProfile): 사용자 개인화 프로필 정보.
+        uid (str): 검색할 유저(테넌트) UID.
+        fusion_params (FusionParams): 요청별 검색 결과 융합 파라미터 (없으면 리트리버 기본값).
 
     Returns:
         Dict[str, Any]: 생성된 답변, 인용된 이미지 경로 리스트, 확장된 쿼리.
     """
-    # 1. 쿼리 확장 (Query Expansion)
-    expanded_query = query_expander.expand(query)
-    
-    # 2. 다중 쿼리 기반 문서 검색 (정제된 쿼리 + 확장 쿼리)
-    # 정제 로직: 고유 코드(예: E1236)가 있으면 해당 코드에 집중하도록 쿼리 생성
-    codes = re.findall(r'[A-Z]\d{3,4}', query.upper())
-    refined_query = " ".join(codes) if codes else query
-    
-    vector_store = get_vector_store()
-    
-    # 3. 스마트 라우팅: 페이지 번호 추출 및 필터 구성
-    page_filter = extract_page_number(query)
-    
-    search_filter = {}
-    if filters and filters.doc_name:
-        search_filter["doc_name"] = filters.doc_name
-    
-    if page_filter:
-        print(f"Smart Routing: Detected page filter {page_filter}")
-        # ChromaDB $and 조건 구성 (문서명 필터가 있는 경우)
-        if "doc_name" in search_filter:
-            search_filter = {"$and": [
-                {"doc_name": {"$eq": search_filter["doc_name"]}},
-                {"page": {"$eq": page_filter}}
-            ]}
-        else:
-            search_filter = {"page": {"$eq": page_filter}}
-    
-    # 4. 필터가 적용된 검색 수행
-    if search_filter:
-        print(f"Applying search filters: {search_filter}")
-        # 필터가 걸린 경우 k를 조절하거나 해당 페이지의 모든 청크를 가져오도록 함
-        filtered_retriever = vector_store.as_retriever(
-            search_kwargs={'filter': search_filter, 'k': 50 if page_filter else 100}
-        )
-        docs_orig = filtered_retriever.invoke(refined_query)
-        docs_exp = filtered_retriever.invoke(expanded_query)
-        docs_raw = filtered_retriever.invoke(refined_query) if refined_query != query else []
-    else:
-        docs_orig = retriever.invoke(refined_query)
-        docs_exp = retriever.invoke(expanded_query)
-        docs_raw = retriever.invoke(refined_query) if refined_query != query else []
-    
-    # 모든 결과 병합 및 중복 제거
-    all_docs = docs_orig + docs_exp + docs_raw
-    seen_contents = set()
-    docs = []
-    for doc in all_docs:
-        if doc.page_content not in seen_contents:
-            docs.append(doc)
-            seen_contents.add(doc.page_content)
-    
-    # [추가] 상위 5개 페이지에 대해 자동으로 다음 페이지 컨텍스트 추가 (가로 펼침 표/연속 정보 대응)
-    extended_docs = []
-    processed_pages = set()
-    
-    # 상위 결과들 우선 유지
-    for doc in docs[:10]:
-        extended_docs.append(doc)
-        doc_name = doc.metadata.get("doc_name")
-        page_num = doc.metadata.get("page")
-        if doc_name and page_num:
-            processed_pages.add(f"{doc_name}_{page_num}")
-            
-            # 다음 페이지 후보군 탐색 (간단한 필터링 사용)
-            next_page_num = page_num + 1
-            if f"{doc_name}_{next_page_num}" not in processed_pages:
-                try:
-                    # 벡터 스토어에서 해당 페이지 직접 조회
-                    next_page_docs = vector_store.get(
-                        where={"$and": [{"doc_name": {"$eq": doc_name}}, {"page": {"$eq": int(next_page_num)}}]}
-                    )
-                    if next_page_docs and next_page_docs.get("documents"):
-                        from langchain_core.documents import Document
-                        for i, content in enumerate(next_page_docs["documents"]):
-                            # Document 객체 재구성
-                            new_doc = Document(
-                                page_content=content,
-                                metadata=next_page_docs["metadatas"][i]
-                            )
-                            if new_doc.page_content not in seen_contents:
-                                extended_docs.append(new_doc)
-                                seen_contents.add(new_doc.page_content)
-                        processed_pages.add(f"{doc_name}_{next_page_num}")
-                except Exception as e:
-                    print(f"Error fetching next page context: {e}")
-
-    # 나머지 중복되지 않은 문서들 추가
-    for doc in docs[10:]:
-        if doc.page_content not in seen_contents:
-            extended_docs.append(doc)
-            seen_contents.add(doc.page_content)
-    
-    docs = extended_docs
-    
-    # 최대 검색 결과 수 제한 (속도와 정확도의 균형을 위해 100개로 설정)
-    docs = docs[:100]
-    context_text = format_docs(docs)
+    # 1~2. 쿼리 확장 + 다중 쿼리 기반 문서 검색 (정제된 쿼리 + 확장 쿼리, 필터 라우팅, 다음 페이지 확장)
+    # 같은 유저의 동일 질문은 검색 캐시에서 바로 복원
+    docs, expanded_query = retrieve_with_cache(
+        query, lambda: query_expander.expand(query), retriever, filters, uid, fusion_params
+    )
+    # 토큰 예산만큼 검색 순위대로 채우고 페이지별로 묶어 짧은 인용 ID(S1, S2, ...)를 부여
+    packed = pack_context(docs, settings.CONTEXT_TOKEN_BUDGET)
+    context_text = packed.text
 
     # 3. 답변 생성 (원본 질문 + 검색된 컨텍스트 + 대화 내역 + 사용자 프로필)
     # 프롬프트: 답변 마지막에 인용된 이미지 소스를 리스트업 하도록 지시
@@ -279,7 +335,7 @@ def generate_answer_with_rag(query: str, retriever: BaseRetriever, query_expande
     2. **암묵적 개인화**: 프로필 정보는 답변의 스타일을 결정하는 참고용으로만 사용하고 직접 언급하지 마세요.
     3. **정확한 정보 제공**: 제공된 컨텍스트를 최우선으로 참고하여 핵심 내용을 답변하세요.
     4. **문맥 유지**: 이전 대화 내역에 맞춰 자연스럽게 대화를 이어가세요.
-    5. **출처 명시**: 문서 기반 답변 시 마지막에 [[Cited Images: 경로]]를 반드시 포함하세요.
+    5. **출처 명시**: 문서 기반 답변 시 마지막에 참고한 컨텍스트 묶음의 인용 ID를 [[Cited Images: S1, S3]] 형식으로 반드시 포함하세요.
 
     **이전 대화 내역:**
     {chat_history}
@@ -310,23 +366,9 @@ def generate_answer_with_rag(query: str, retriever: BaseRetriever, query_expande
         "current_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     })
     
-    # 4. 답변과 이미지 경로 분리 (Regex Parsing)
-    # 예상 포맷: ... 답변 내용 ... [[Cited Images: path/to/img1.png, path/to/img2.png]]
-    cited_images = []
-    final_answer = full_response
-
-    match = re.search(r"\[\[Cited Images: (.*?)\]\]", full_response, re.DOTALL)
-    if match:
-        images_str = match.group(1)
-        if images_str.lower() != "none":
-            # 쉼표로 구분된 경로 추출, 공백 제거 및 중복 제거
-            raw_images = [img.strip() for img in images_str.split(',')]
-            cited_images = sorted(list(set(img for img in raw_images if img)))
-        
-        # 답변 텍스트에서 메타데이터 태그 제거 (깔끔하게 보여주기 위해)
-        final_answer = full_response.replace(match.group(0), "").strip()
-    else:
-        cited_images = []
+    # 4. 답변과 이미지 경로 분리
+    # 예상 포맷: ... 답변 내용 ... [[Cited Images: S1, S3]] (인용 ID를 패킹 시 기록한 이미지 경로로 변환)
+    final_answer, cited_images = resolve_citations(full_response, packed.citations)
 
     return {
         "answer": final_answer, 
@@ -334,7 +376,7 @@ def generate_answer_with_rag(query: str, retriever: BaseRetriever, query_expande
         "expanded_query": expanded_query
     }
 
-async def generate_answer_with_rag_streaming(query: str, retriever: BaseRetriever, query_expander: QueryExpander, filters: QAFilters = None, history: List[Dict[str, str]] = None, user_profile: UserProfile = None) -> AsyncIterator[Dict[str, Any]]:
+async def generate_answer_with_rag_streaming(query: str, retriever: BaseRetriever, query_expander: QueryExpander, filters: QAFilters = None, history: List[Dict[str, str]] = None, user_profile: UserProfile = None, uid: str = "default", fusion_params: FusionParams = None) -> AsyncIterator[Dict[str, Any]]:
     """
     RAG 체인을 사용하여 사용자 질문에 대한 답변을 스트리밍하고,
     마지막에 인용된 이미지 경로를 반환합니다. (성능 로깅 포함)
@@ -350,105 +392,30 @@ async def generate_answer_with_rag_streaming(query: str, retriever: BaseRetrieve
     if history:
         history_context = "\n".join([f"{'User' if m['role']=='user' else 'Assistant'}: {m['content']}" for m in history[-3:]]) # 최근 3개만 참고
         
-    expanded_query = query_expander.expand(query, history_context)
-    expansion_time = time.time() - expansion_start_time
-    print(f"[1] Query Expansion Time: {expansion_time:.4f}s")
+    expansion_time = 0.0
 
-    # 2. 다중 쿼리 기반 문서 검색 (정제된 쿼리 + 확장 쿼리)
-    retrieval_start_time = time.time()
-    codes = re.findall(r'[A-Z]\d{3,4}', query.upper())
-    refined_query = " ".join(codes) if codes else query
-
-    vector_store = get_vector_store()
+    def expand() -> str:
+        nonlocal expansion_time
+        expanded = query_expander.expand(query, history_context)
+        expansion_time = time.time() - expansion_start_time
+        return expanded
 
-    # 스마트 라우팅: 페이지 번호 추출 및 필터 구성
-    page_filter = extract_page_number(query)
-    
-    search_filter = {}
-    if filters and filters.doc_name:
-        search_filter["doc_name"] = filters.doc_name
-    
-    if page_filter:
-        print(f"Smart Routing (Streaming): Detected page filter {page_filter}")
-        if "doc_name" in search_filter:
-            search_filter = {"$and": [
-                {"doc_name": {"$eq": search_filter["doc_name"]}},
-                {"page": {"$eq": page_filter}}
-            ]}
-        else:
-            search_filter = {"page": {"$eq": page_filter}}
-
-    if search_filter:
-        print(f"Applying search filters (Streaming): {search_filter}")
-        filtered_retriever = vector_store.as_retriever(
-            search_kwargs={'filter': search_filter, 'k': 50 if page_filter else 100}
-        )
-        docs_orig = filtered_retriever.invoke(refined_query)
-        docs_exp = filtered_retriever.invoke(expanded_query)
-        docs_raw = filtered_retriever.invoke(refined_query) if refined_query != query else []
-    else:
-        docs_orig = retriever.invoke(refined_query)
-        docs_exp = retriever.invoke(expanded_query)
-        docs_raw = retriever.invoke(refined_query) if refined_query != query else []
-    
-    # 결과 병합 및 중복 제거
-    all_docs = docs_orig + docs_exp + docs_raw
-    seen_contents = set()
-    docs = []
-    for doc in all_docs:
-        if doc.page_content not in seen_contents:
-            docs.append(doc)
-            seen_contents.add(doc.page_content)
-    
-    # [추가] 상위 5개 페이지에 대해 자동으로 다음 페이지 컨텍스트 추가 (가로 펼침 표/연속 정보 대응)
-    extended_docs = []
-    processed_pages = set()
-    
-    # 상위 결과들 우선 유지
-    for doc in docs[:10]:
-        extended_docs.append(doc)
-        doc_name = doc.metadata.get("doc_name")
-        page_num = doc.metadata.get("page")
-        if doc_name and page_num:
-            processed_pages.add(f"{doc_name}_{page_num}")
-            
-            # 다음 페이지 후보군 탐색
-            next_page_num = page_num + 1
-            if f"{doc_name}_{next_page_num}" not in processed_pages:
-                try:
-                    # 벡터 스토어에서 해당 페이지 직접 조회
-                    next_page_docs = vector_store.get(
-                        where={"$and": [{"doc_name": {"$eq": doc_name}}, {"page": {"$eq": int(next_page_num)}}]}
-                    )
-                    if next_page_docs and next_page_docs.get("documents"):
-                        from langchain_core.documents import Document
-                        for i, content in enumerate(next_page_docs["documents"]):
-                            new_doc = Document(
-                                page_content=content,
-                                metadata=next_page_docs["metadatas"][i]
-                            )
-                            if new_doc.page_content not in seen_contents:
-                                extended_docs.append(new_doc)
-                                seen_contents.add(new_doc.page_content)
-                        processed_pages.add(f"{doc_name}_{next_page_num}")
-                except Exception as e:
-                    print(f"Error fetching next page context: {e}")
-
-    # 나머지 중복되지 않은 문서들 추가
-    for doc in docs[10:]:
-        if doc.page_content not in seen_contents:
-            extended_docs.append(doc)
-            seen_contents.add(doc.page_content)
-    
-    docs = extended_docs[:100] # 최대 검색 결과 수 제한 (속도와 정확도의 균형을 위해 100개로 설정)
-    retrieval_time = time.time() - retrieval_start_time
+    # 2. 다중 쿼리 기반 문서 검색 (정제된 쿼리 + 확장 쿼리)
+    # 블로킹 검색(레그별 스레드 풀 실행)이 이벤트 루프를 막지 않도록 별도 스레드에서 실행
+    # 같은 유저·같은 대화 맥락의 동일 질문은 검색 캐시에서 복원하여 확장/검색을 건너뜀
+    docs, expanded_query = await asyncio.to_thread(
+        retrieve_with_cache, query, expand, retriever, filters, uid, fusion_params, history_context
+    )
+    retrieval_time = time.time() - expansion_start_time - expansion_time
+    print(f"[1] Query Expansion Time: {expansion_time:.4f}s")
     print(f"[2] Retrieval Time (including extensions): {retrieval_time:.4f}s")
 
-    # 3. 컨텍스트 포맷팅
+    # 3. 컨텍스트 패킹 (토큰 예산, 페이지별 묶음, 짧은 인용 ID)
     format_start_time = time.time()
-    context_text = format_docs(docs)
+    packed = pack_context(docs, settings.CONTEXT_TOKEN_BUDGET)
+    context_text = packed.text
     format_time = time.time() - format_start_time
-    print(f"[3] Context Formatting Time: {format_time:.4f}s")
+    print(f"[3] Context Packing Time: {format_time:.4f}s ({len(packed.documents)}/{len(docs)} chunks, ~{packed.tokens}/{settings.CONTEXT_TOKEN_BUDGET} tokens)")
     
     # 4. 답변 생성 (LLM 스트리밍)
     history_text = ""
@@ -477,7 +444,7 @@ async def generate_answer_with_rag_streaming(query: str, retriever: BaseRetrieve
     2. **암묵적 개인화**: 프로필 정보는 답변의 스타일을 결정하는 참고용으로만 사용하고 직접 언급하지 마세요. (예: 개발자에게는 기술적으로 설명하되 그 이유를 설명 문구에 넣지 마세요.)
     3. **정확한 정보 제공**: 제공된 컨텍스트를 최우선으로 참고하여 핵심 내용을 답변하세요.
     4. **문맥 유지**: 이전 대화 내역에 맞춰 자연스럽게 대화를 이어가세요.
-    5. **출처 명시**: 문서 기반 답변 시 마지막에 [[Cited Images: 경로]]를 반드시 포함하세요.
+    5. **출처 명시**: 문서 기반 답변 시 마지막에 참고한 컨텍스트 묶음의 인용 ID를 [[Cited Images: S1, S3]] 형식으로 반드시 포함하세요.
 
     **이전 대화 내역:**
     {chat_history}
@@ -518,18 +485,7 @@ async def generate_answer_with_rag_streaming(query: str, retriever: BaseRetrieve
 
     # 5. 답변과 이미지 경로 분리 (Regex Parsing)
     parsing_start_time = time.time()
-    cited_images = []
-    final_answer = full_response
-
-    match = re.search(r"\[\[Cited Images: (.*?)\]\]", full_response, re.DOTALL)
-    if match:
-        images_str = match.group(1)
-        if images_str.lower() != "none":
-            # 쉼표로 구분된 경로 추출, 공백 제거 및 중복 제거
-            raw_images = [img.strip() for img in images_str.split(',')]
-            cited_images = sorted(list(set(img for img in raw_images if img)))
-        
-        final_answer = full_response.replace(match.group(0), "").strip()
+    final_answer, cited_images = resolve_citations(full_response, packed.citations)
     parsing_time = time.time() - parsing_start_time
     print(f"[5] Metadata Parsing Time: {parsing_time:.4f}s")
     
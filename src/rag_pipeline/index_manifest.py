@@ -0,0 +1,134 @@
+"""
+유저(테넌트)별 인덱스 버전 매니페스트 모듈입니다.
+
+모든 쓰기/삭제 시 단조 증가하는 version과 내용 다이제스트(digest)를 갱신하여,
+인덱스 최신 여부를 전체 컬렉션 조회나 ID 집합 비교 없이 O(1) 파일 읽기로 판단합니다.
+
+digest는 (chunk_id, 원문) 해시의 XOR 누적값이므로 순서와 무관하고,
+추가/삭제된 청크만으로 증분 갱신할 수 있습니다.
+"""
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+try:
+    import fcntl
+except ImportError:  # Windows 등 fcntl이 없는 환경에서는 프로세스 내 락만 사용
+    fcntl = None
+
+MANIFEST_FILENAME = "index_manifest.json"
+_DIGEST_BITS = 160
+
+_lock = threading.Lock()
+
+
+class IndexManifest(BaseModel):
+    version: int = Field(0, description="쓰기/삭제마다 1씩 증가하는 인덱스 버전")
+    digest: str = Field("0" * (_DIGEST_BITS // 4), description="(chunk_id, 원문) 해시의 XOR 누적값")
+    chunk_count: int = Field(0, description="인덱싱된 청크 수")
+    updated_at: Optional[str] = Field(None, description="마지막 갱신 시각 (UTC ISO 8601)")
+
+
+def chunk_digest(chunk_id: str, text: str) -> int:
+    """청크 하나의 (ID, 원문) 해시값을 정수로 반환합니다."""
+    return int(hashlib.sha1(f"{chunk_id}\0{text}".encode("utf-8")).hexdigest(), 16)
+
+
+def read_manifest(index_dir: str) -> IndexManifest:
+    """매니페스트를 읽습니다. 파일이 없으면(기존 유저) 버전 0의 빈 매니페스트를 반환합니다."""
+    path = Path(index_dir) / MANIFEST_FILENAME
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return IndexManifest(**json.load(f))
+    except FileNotFoundError:
+        return IndexManifest()
+    except Exception as e:
+        print(f"인덱스 매니페스트 읽기 실패 (빈 매니페스트 사용): {e}")
+        return IndexManifest()
+
+
+def _write_manifest(index_dir: Path, manifest: IndexManifest):
+    tmp_path = index_dir / f"{MANIFEST_FILENAME}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest.model_dump(), f, ensure_ascii=False)
+    os.replace(tmp_path, index_dir / MANIFEST_FILENAME)
+
+
+class _ManifestLock:
+    """프로세스 내 락 + (가능하면) 파일 락으로 매니페스트 갱신을 직렬화합니다."""
+
+    def __init__(self, index_dir: Path):
+        self.index_dir = index_dir
+
+    def __enter__(self):
+        _lock.acquire()
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        self.lock_file = open(self.index_dir / f"{MANIFEST_FILENAME}.lock", "w")
+        # 여러 워커 프로세스가 같은 유저 디렉토리에 쓰는 경우를 대비한 파일 락
+        if fcntl is not None:
+            fcntl.flock(self.lock_file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        self.lock_file.close()
+        _lock.release()
+
+
+def bump_manifest(
+    index_dir: str,
+    added: Iterable[Tuple[str, str]] = (),
+    removed: Iterable[Tuple[str, str]] = ()
+) -> IndexManifest:
+    """
+    청크 추가/삭제를 반영하여 버전을 1 올리고 다이제스트를 증분 갱신합니다.
+    added / removed는 (chunk_id, 원문) 튜플의 목록입니다. (교체된 청크는 양쪽에 모두 포함)
+    """
+    index_dir = Path(index_dir)
+    with _ManifestLock(index_dir):
+        manifest = read_manifest(str(index_dir))
+        digest = int(manifest.digest, 16)
+        added_count = removed_count = 0
+        for chunk_id, text in added:
+            digest ^= chunk_digest(chunk_id, text)
+            added_count += 1
+        for chunk_id, text in removed:
+            digest ^= chunk_digest(chunk_id, text)
+            removed_count += 1
+
+        manifest = IndexManifest(
+            version=manifest.version + 1,
+            digest=f"{digest:0{_DIGEST_BITS // 4}x}",
+            chunk_count=max(0, manifest.chunk_count + added_count - removed_count),
+            updated_at=datetime.utcnow().isoformat()
+        )
+        _write_manifest(index_dir, manifest)
+        return manifest
+
+
+def rebuild_manifest(index_dir: str, chunks: Iterable[Tuple[str, str]]) -> IndexManifest:
+    """
+    전체 청크 목록으로 다이제스트를 처음부터 다시 계산하고 버전을 1 올립니다.
+    벡터 스토어로부터 인덱스를 전체 재생성한 경우(또는 매니페스트가 없던 기존 유저)에 사용합니다.
+    """
+    index_dir = Path(index_dir)
+    with _ManifestLock(index_dir):
+        previous = read_manifest(str(index_dir))
+        digest = 0
+        count = 0
+        for chunk_id, text in chunks:
+            digest ^= chunk_digest(chunk_id, text)
+            count += 1
+        manifest = IndexManifest(
+            version=previous.version + 1,
+            digest=f"{digest:0{_DIGEST_BITS // 4}x}",
+            chunk_count=count,
+            updated_at=datetime.utcnow().isoformat()
+        )
+        _write_manifest(index_dir, manifest)
+        return manifest
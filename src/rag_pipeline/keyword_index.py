@@ -0,0 +1,740 @@
+"""
+BM25 키워드 검색을 위한 증분형 역색인(Inverted Index) 모듈입니다.
+
+기존에는 인제스트/삭제 때마다 Chroma의 전체 문서를 다시 토크나이징하여
+BM25Retriever를 처음부터 재생성했습니다. 이 모듈은 용어별 포스팅(postings)과
+문서 길이 통계를 직접 유지하므로, 청크 추가/삭제 비용이 변경된 청크 수에만 비례합니다.
+
+포스팅은 불변(immutable) 세그먼트 단위의 CSR 용어-문서 행렬(scipy.sparse)로 저장됩니다.
+    - 추가: 새 청크 묶음으로 작은 세그먼트를 하나 만들어 덧붙입니다.
+    - 삭제: 세그먼트의 alive 마스크만 끕니다. (tombstone)
+    - 병합: 세그먼트 수나 삭제 비율이 커지면 살아있는 열만 모아 하나로 합칩니다.
+검색 시에는 쿼리 용어의 CSR 행(포스팅)만 NumPy로 벡터화 채점하고,
+np.argpartition으로 상위 k개를 선택하므로 코퍼스 전체를 Python으로 순회하지 않습니다.
+doc_name / page 필터는 세그먼트별 메타데이터 열로 만든 마스크로 후보를 제한합니다.
+근사 중복 병합으로 여러 페이지를 대표하는 청크는 별칭 페이지의 page 필터에도 포함됩니다.
+
+저장 형식 ({index_dir}/keyword_index/, pickle 미사용):
+    - meta.json                     : 파라미터, 토크나이저, 매니페스트 버전, 세그먼트 목록, 문서명 테이블,
+                                      근사 중복 병합 청크의 별칭 페이지
+    - vocab.bin / vocab_offsets.npy : UTF-8 용어 블롭 + 오프셋 테이블 (용어 ID 순)
+    - seg_XXXXXX/                   : 세그먼트별 NumPy 배열
+        indptr/indices/data.npy          : CSR 포스팅
+        doc_lens/doc_codes/pages.npy     : 청크 길이 및 메타데이터 열 (문서명 코드, 페이지)
+        ids.bin + ids_offsets.npy        : 청크 ID 블롭 + 오프셋 테이블
+        docs.bin + docs_offsets.npy      : 청크별 {"text", "metadata"} JSON 블롭 + 오프셋 테이블
+        alive.npy                        : 삭제 마스크 (저장 후 유일하게 바뀌는 파일)
+세그먼트 배열은 np.load(mmap_mode="r")로 메모리 매핑하므로 콜드 로드가 파일 크기와 무관하게 빠르고,
+같은 인덱스를 여는 워커 프로세스들은 OS 페이지 캐시를 공유합니다.
+원문과 메타데이터는 검색 결과로 선택된 청크만 블롭에서 디코딩합니다.
+"""
+import json
+import math
+import os
+import shutil
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from src.rag_pipeline.near_dup import alias_pages
+
+INDEX_DIRNAME = "keyword_index"
+META_FILENAME = "meta.json"
+FORMAT_VERSION = 2
+
+# 페이지 메타데이터가 없는 청크의 pages 열 값
+NO_PAGE = -1
+
+_EMPTY_INT = np.zeros(0, dtype=np.int32)
+# 메모리 추정용 딕셔너리 항목당 평균 크기 (키 문자열 + 값 + 해시 슬롯)
+_DICT_ENTRY_BYTES = 120
+
+
+def _pack_strings(values: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """문자열 리스트를 (UTF-8 바이트 블롭, int64 오프셋 테이블)로 변환합니다."""
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    if encoded:
+        np.cumsum([len(item) for item in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def _unpack_string(blob: np.ndarray, offsets: np.ndarray, i: int) -> str:
+    return blob[offsets[i]:offsets[i + 1]].tobytes().decode("utf-8")
+
+
+def _unpack_all(blob: np.ndarray, offsets: np.ndarray) -> List[str]:
+    data = blob.tobytes()
+    offsets = offsets.tolist()
+    return [data[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+
+
+def _map_blob(path: Path) -> np.ndarray:
+    # 크기가 0인 파일은 메모리 매핑할 수 없으므로 빈 배열로 대체
+    if path.stat().st_size == 0:
+        return np.zeros(0, dtype=np.uint8)
+    # np.memmap 서브클래스의 인덱싱 오버헤드를 피하기 위해 일반 ndarray 뷰로 사용 (매핑은 base가 유지)
+    return np.memmap(path, dtype=np.uint8, mode="r").view(np.ndarray)
+
+
+def _map_array(path: Path) -> np.ndarray:
+    return np.load(path, mmap_mode="r", allow_pickle=False).view(np.ndarray)
+
+
+def _page_of(metadata: Dict[str, Any]) -> int:
+    try:
+        return int(metadata.get("page"))
+    except (TypeError, ValueError):
+        return NO_PAGE
+
+
+class _Segment:
+    """
+    불변 CSR 포스팅 세그먼트. 행은 용어 ID, 열은 세그먼트 내 청크 위치입니다.
+    메모리에서 만든 세그먼트와 디스크에서 메모리 매핑한 세그먼트가 같은 표현을 사용합니다.
+    """
+
+    ARRAY_KEYS = ("indptr", "indices", "data", "doc_lens", "doc_codes", "pages", "ids_offsets", "docs_offsets")
+
+    def __init__(
+        self,
+        matrix: sparse.csr_matrix,
+        doc_lens: np.ndarray,
+        doc_codes: np.ndarray,
+        pages: np.ndarray,
+        ids: Tuple[np.ndarray, np.ndarray],
+        docs: Tuple[np.ndarray, np.ndarray],
+        alive: Optional[np.ndarray] = None,
+        name: Optional[str] = None
+    ):
+        self.matrix = matrix
+        self.doc_lens = doc_lens
+        self.doc_codes = doc_codes
+        self.pages = pages
+        self.ids_blob, self.ids_offsets = ids
+        self.docs_blob, self.docs_offsets = docs
+        self.alive = alive if alive is not None else np.ones(len(doc_lens), dtype=bool)
+        # 디스크 상의 세그먼트 디렉토리 이름 (None이면 아직 저장되지 않음)
+        self.name = name
+        self.alive_dirty = False
+
+    def __len__(self) -> int:
+        return len(self.doc_lens)
+
+    def chunk_id(self, col: int) -> str:
+        return _unpack_string(self.ids_blob, self.ids_offsets, col)
+
+    def chunk_ids(self) -> List[str]:
+        return _unpack_all(self.ids_blob, self.ids_offsets)
+
+    def raw_entry(self, col: int) -> str:
+        return _unpack_string(self.docs_blob, self.docs_offsets, col)
+
+    def entry(self, col: int) -> Dict[str, Any]:
+        """청크의 원문과 메타데이터를 블롭에서 디코딩합니다."""
+        raw = self.raw_entry(col)
+        return json.loads(raw) if raw else {"text": "", "metadata": {}}
+
+    def nbytes(self) -> int:
+        """세그먼트 배열과 블롭의 크기(바이트). 메모리 매핑된 경우 접근 시 페이지 캐시에 올라오는 최대 크기입니다."""
+        arrays = (
+            self.matrix.indptr, self.matrix.indices, self.matrix.data, self.doc_lens, self.doc_codes, self.pages,
+            self.ids_blob, self.ids_offsets, self.docs_blob, self.docs_offsets, self.alive,
+        )
+        return int(sum(np.asarray(array).nbytes for array in arrays))
+
+    def postings(self, term_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        """용어 ID의 (열 위치, tf) 배열을 반환합니다. 세그먼트 생성 이후 추가된 용어는 빈 배열입니다."""
+        if term_id >= self.matrix.shape[0]:
+            return _EMPTY_INT, _EMPTY_INT
+        start, end = self.matrix.indptr[term_id], self.matrix.indptr[term_id + 1]
+        return self.matrix.indices[start:end], self.matrix.data[start:end]
+
+    def save(self, path: Path):
+        """세그먼트 배열을 디렉토리에 기록합니다. (allow_pickle=False)"""
+        path.mkdir(parents=True, exist_ok=True)
+        arrays = {
+            "indptr": self.matrix.indptr, "indices": self.matrix.indices, "data": self.matrix.data,
+            "doc_lens": self.doc_lens, "doc_codes": self.doc_codes, "pages": self.pages,
+            "ids_offsets": self.ids_offsets, "docs_offsets": self.docs_offsets, "alive": self.alive,
+        }
+        for key, array in arrays.items():
+            np.save(path / f"{key}.npy", np.asarray(array), allow_pickle=False)
+        np.asarray(self.ids_blob, dtype=np.uint8).tofile(path / "ids.bin")
+        np.asarray(self.docs_blob, dtype=np.uint8).tofile(path / "docs.bin")
+        self.name = path.name
+        self.alive_dirty = False
+
+    def save_alive(self, path: Path):
+        tmp_path = path / "alive.tmp.npy"
+        np.save(tmp_path, self.alive, allow_pickle=False)
+        os.replace(tmp_path, path / "alive.npy")
+        self.alive_dirty = False
+
+    @classmethod
+    def load(cls, path: Path) -> "_Segment":
+        """세그먼트 배열을 메모리 매핑으로 엽니다. alive 마스크만 쓰기 가능한 복사본으로 읽습니다."""
+        arrays = {key: _map_array(path / f"{key}.npy") for key in cls.ARRAY_KEYS}
+        # 세그먼트 생성 당시의 용어 수(행 수)는 indptr 길이로 결정됩니다.
+        matrix = sparse.csr_matrix(
+            (arrays["data"], arrays["indices"], arrays["indptr"]),
+            shape=(len(arrays["indptr"]) - 1, len(arrays["doc_lens"])),
+            copy=False
+        )
+        return cls(
+            matrix=matrix,
+            doc_lens=arrays["doc_lens"],
+            doc_codes=arrays["doc_codes"],
+            pages=arrays["pages"],
+            ids=(_map_blob(path / "ids.bin"), arrays["ids_offsets"]),
+            docs=(_map_blob(path / "docs.bin"), arrays["docs_offsets"]),
+            alive=np.load(path / "alive.npy", allow_pickle=False).copy(),
+            name=path.name
+        )
+
+
+class KeywordIndex:
+    """
+    CSR 포스팅 세그먼트와 문서 길이 통계를 유지하는 BM25(Okapi) 인덱스입니다.
+    add_documents / remove_documents로 인덱스를 제자리(in-place)에서 갱신합니다.
+    """
+
+    # 세그먼트가 이 개수를 넘거나 삭제된 청크 비율이 이 값을 넘으면 병합합니다.
+    MAX_SEGMENTS = 8
+    MAX_DELETED_RATIO = 0.3
+
+    def __init__(self, preprocess_func: Callable[[str], List[str]], k1: float = 1.5, b: float = 0.75, tokenizer_name: str = "default"):
+        self.preprocess_func = preprocess_func
+        # 저장된 용어 빈도를 만든 토크나이저 (모드가 바뀌면 재토크나이징 필요)
+        self.tokenizer_name = tokenizer_name
+        self.k1 = k1
+        self.b = b
+        # term -> term_id (모든 세그먼트가 공유하는 어휘 사전)
+        self.vocab: Dict[str, int] = {}
+        self._terms: List[str] = []
+        # doc_name <-> code (세그먼트의 doc_codes 열이 참조하는 문서명 테이블)
+        self._doc_names: List[str] = []
+        self._doc_name_codes: Dict[str, int] = {}
+        self.segments: List[_Segment] = []
+        # chunk_id -> (segment, column). 디스크에서 로드한 경우 ID 조회가 처음 필요할 때 만듭니다.
+        self._location_map: Optional[Dict[str, Tuple[_Segment, int]]] = {}
+        # chunk_id -> 별칭 페이지 (근사 중복 병합된 대표 청크만, 자기 페이지 제외)
+        self._page_aliases: Dict[str, List[int]] = {}
+        self.total_len = 0
+        self._num_alive = 0
+        # 이 인덱스가 반영하고 있는 인덱스 매니페스트 버전
+        self.version = 0
+        self._next_segment_id = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return self._num_alive
+
+    @property
+    def _locations(self) -> Dict[str, Tuple[_Segment, int]]:
+        if self._location_map is None:
+            locations = {}
+            for segment in self.segments:
+                for col in np.flatnonzero(segment.alive):
+                    locations[segment.chunk_id(col)] = (segment, int(col))
+            self._location_map = locations
+        return self._location_map
+
+    # --- 갱신 ---
+
+    def add_documents(
+        self,
+        documents: Iterable[Document],
+        ids: Optional[List[str]] = None,
+        tokens: Optional[List[List[str]]] = None
+    ) -> int:
+        """
+        Document 리스트를 새 세그먼트로 인덱스에 추가합니다.
+        tokens가 주어지면(예: tokenize_batch 결과) 다시 토크나이징하지 않습니다.
+        이미 존재하는 ID는 교체(upsert)됩니다. 추가된 청크 수를 반환합니다.
+        """
+        documents = list(documents)
+        if ids is None:
+            ids = [doc.metadata.get("doc_id") for doc in documents]
+        if tokens is None:
+            tokens = [self.preprocess_func(doc.page_content) for doc in documents]
+
+        entries = {}
+        for chunk_id, doc, doc_tokens in zip(ids, documents, tokens):
+            if not chunk_id:
+                continue
+            entries[chunk_id] = {"text": doc.page_content, "metadata": doc.metadata, "tf": dict(Counter(doc_tokens))}
+        return self.add_tokenized(entries)
+
+    def add_tokenized(self, entries: Dict[str, Dict[str, Any]]) -> int:
+        """
+        이미 토크나이징된 청크({chunk_id: {"text", "metadata", "tf"}}) 묶음으로 CSR 세그먼트 하나를 만들어 추가합니다.
+        """
+        if not entries:
+            return 0
+        with self._lock:
+            for chunk_id in entries:
+                self._remove(chunk_id)
+
+            rows, cols, data, doc_lens, doc_codes, pages, docs = [], [], [], [], [], [], []
+            for col, (chunk_id, entry) in enumerate(entries.items()):
+                tf = entry["tf"]
+                for term, freq in tf.items():
+                    term_id = self.vocab.get(term)
+                    if term_id is None:
+                        term_id = self.vocab[term] = len(self._terms)
+                        self._terms.append(term)
+                    rows.append(term_id)
+                    cols.append(col)
+                    data.append(freq)
+                metadata = entry["metadata"]
+                doc_lens.append(sum(tf.values()))
+                doc_codes.append(self._doc_name_code(metadata.get("doc_name")))
+                pages.append(_page_of(metadata))
+                aliases = alias_pages(metadata)
+                if aliases:
+                    self._page_aliases[chunk_id] = aliases
+                docs.append(json.dumps({"text": entry["text"], "metadata": metadata}, ensure_ascii=False))
+
+            ids = list(entries)
+            matrix = sparse.csr_matrix(
+                (np.asarray(data, dtype=np.int32), (np.asarray(rows, dtype=np.int32), np.asarray(cols, dtype=np.int32))),
+                shape=(len(self._terms), len(ids))
+            )
+            self._append_segment(_Segment(
+                matrix=matrix,
+                doc_lens=np.asarray(doc_lens, dtype=np.int32),
+                doc_codes=np.asarray(doc_codes, dtype=np.int32),
+                pages=np.asarray(pages, dtype=np.int32),
+                ids=_pack_strings(ids),
+                docs=_pack_strings(docs)
+            ), ids=ids)
+            self._maybe_merge()
+        return len(entries)
+
+    def remove_documents(self, ids: Iterable[str]) -> int:
+        """지정한 청크 ID들을 인덱스에서 제거합니다. 제거된 청크 수를 반환합니다."""
+        with self._lock:
+            count = sum(1 for chunk_id in ids if self._remove(chunk_id))
+            self._maybe_merge()
+        return count
+
+    def remove_where(self, **metadata_filter: Any) -> int:
+        """메타데이터가 모두 일치하는 청크를 제거합니다. (예: remove_where(doc_name="manual"))"""
+        with self._lock:
+            return self.remove_documents([chunk_id for chunk_id, _ in self.iter_entries(**metadata_filter)])
+
+    def _doc_name_code(self, doc_name: Optional[str]) -> int:
+        if not doc_name:
+            return -1
+        code = self._doc_name_codes.get(doc_name)
+        if code is None:
+            code = self._doc_name_codes[doc_name] = len(self._doc_names)
+            self._doc_names.append(doc_name)
+        return code
+
+    @classmethod
+    def from_term_matrix(
+        cls,
+        preprocess_func: Callable[[str], List[str]],
+        terms: List[str],
+        ids: List[str],
+        matrix: sparse.csr_matrix,
+        doc_lens: np.ndarray
+    ) -> "KeywordIndex":
+        """
+        이미 집계된 CSR 용어-문서 행렬(행: terms, 열: ids)로 인덱스를 생성합니다.
+        원문이 없으므로 빈 본문의 Document가 반환됩니다. (벤치마크/대량 적재용)
+        """
+        index = cls(preprocess_func)
+        index._terms = list(terms)
+        index.vocab = {term: term_id for term_id, term in enumerate(index._terms)}
+        ids = list(ids)
+        index._append_segment(_Segment(
+            matrix=matrix.tocsr(),
+            doc_lens=np.asarray(doc_lens, dtype=np.int32),
+            doc_codes=np.full(len(ids), -1, dtype=np.int32),
+            pages=np.full(len(ids), NO_PAGE, dtype=np.int32),
+            ids=_pack_strings(ids),
+            docs=(np.zeros(0, dtype=np.uint8), np.zeros(len(ids) + 1, dtype=np.int64))
+        ), ids=ids)
+        return index
+
+    def _append_segment(self, segment: _Segment, ids: Optional[List[str]] = None):
+        self.segments.append(segment)
+        alive_cols = np.flatnonzero(segment.alive)
+        self._num_alive += len(alive_cols)
+        self.total_len += int(np.asarray(segment.doc_lens)[alive_cols].sum())
+        if self._location_map is not None:
+            ids = ids if ids is not None else segment.chunk_ids()
+            for col in alive_cols:
+                self._location_map[ids[col]] = (segment, int(col))
+
+    def _remove(self, chunk_id: str) -> bool:
+        location = self._locations.pop(chunk_id, None)
+        if location is None:
+            return False
+        segment, col = location
+        self._page_aliases.pop(chunk_id, None)
+        segment.alive[col] = False
+        segment.alive_dirty = True
+        self._num_alive -= 1
+        self.total_len -= int(segment.doc_lens[col])
+        return True
+
+    def _maybe_merge(self):
+        """세그먼트가 많아지거나 삭제된 청크가 많이 쌓이면 살아있는 청크만 모아 병합합니다."""
+        total = sum(len(segment) for segment in self.segments)
+        deleted = total - self._num_alive
+        if len(self.segments) <= self.MAX_SEGMENTS and (total == 0 or deleted / total <= self.MAX_DELETED_RATIO):
+            return
+        self.merge_segments()
+
+    def merge_segments(self):
+        """모든 세그먼트를 살아있는 청크만 포함하는 단일 세그먼트로 병합합니다. (C 레벨 행렬 연산)"""
+        with self._lock:
+            num_terms = len(self._terms)
+            matrices, doc_lens, doc_codes, pages, ids, docs = [], [], [], [], [], []
+            for segment in self.segments:
+                alive = segment.alive
+                if not alive.any():
+                    continue
+                matrix = segment.matrix[:, alive] if not alive.all() else segment.matrix.copy()
+                matrix.resize((num_terms, matrix.shape[1]))
+                matrices.append(matrix)
+                doc_lens.append(np.asarray(segment.doc_lens)[alive])
+                doc_codes.append(np.asarray(segment.doc_codes)[alive])
+                pages.append(np.asarray(segment.pages)[alive])
+                cols = np.flatnonzero(alive)
+                ids.extend(segment.chunk_id(col) for col in cols)
+                docs.extend(segment.raw_entry(col) for col in cols)
+
+            self.segments = []
+            self._location_map = {}
+            self._num_alive = 0
+            self.total_len = 0
+            if matrices:
+                self._append_segment(_Segment(
+                    matrix=sparse.hstack(matrices, format="csr", dtype=np.int32),
+                    doc_lens=np.concatenate(doc_lens).astype(np.int32),
+                    doc_codes=np.concatenate(doc_codes).astype(np.int32),
+                    pages=np.concatenate(pages).astype(np.int32),
+                    ids=_pack_strings(ids),
+                    docs=_pack_strings(docs)
+                ), ids=ids)
+
+    # --- 조회 ---
+
+    def memory_bytes(self) -> int:
+        """세그먼트 크기 합과 어휘 사전 / 청크 위치 맵의 대략적인 크기(바이트)"""
+        dict_bytes = (len(self.vocab) + len(self._location_map or ())) * _DICT_ENTRY_BYTES
+        return sum(segment.nbytes() for segment in self.segments) + dict_bytes
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return chunk_id in self._locations
+
+    def get_postings(self, term: str) -> Dict[str, int]:
+        """용어의 살아있는 포스팅을 {chunk_id: tf} 형태로 반환합니다. (디버깅/검증용)"""
+        term_id = self.vocab.get(term)
+        if term_id is None:
+            return {}
+        postings = {}
+        for segment in self.segments:
+            cols, freqs = segment.postings(term_id)
+            for col, freq in zip(cols, freqs):
+                if segment.alive[col]:
+                    postings[segment.chunk_id(col)] = int(freq)
+        return postings
+
+    def get_text(self, chunk_id: str) -> Optional[str]:
+        """청크 원문을 반환합니다. 인덱스에 없으면 None을 반환합니다."""
+        location = self._locations.get(chunk_id)
+        if location is None:
+            return None
+        segment, col = location
+        return segment.entry(col)["text"]
+
+    @property
+    def page_aliases(self) -> Dict[str, List[int]]:
+        """chunk_id -> 별칭 페이지 (근사 중복 병합된 대표 청크)"""
+        return dict(self._page_aliases)
+
+    def alias_ids(self, page: int, doc_name: Optional[str] = None) -> List[str]:
+        """page를 별칭 페이지로 가진 (doc_name이 주어지면 해당 문서의) 대표 청크 ID 리스트"""
+        chunk_ids = [chunk_id for chunk_id, pages in self._page_aliases.items() if int(page) in pages]
+        if doc_name is None or not chunk_ids:
+            return chunk_ids
+        code = self._doc_name_codes.get(doc_name, -2)
+        locations = self._locations
+        return [
+            chunk_id for chunk_id in chunk_ids
+            if chunk_id in locations and int(locations[chunk_id][0].doc_codes[locations[chunk_id][1]]) == code
+        ]
+
+    def _metadata_mask(self, segment: _Segment, doc_name: Optional[str] = None, page: Optional[int] = None) -> np.ndarray:
+        """doc_name / page 조건을 만족하는 살아있는 열의 마스크를 메타데이터 열에서 계산합니다."""
+        mask = segment.alive.copy()
+        if doc_name is not None:
+            mask &= np.asarray(segment.doc_codes) == self._doc_name_codes.get(doc_name, -2)
+        if page is not None:
+            page_mask = np.asarray(segment.pages) == int(page)
+            for chunk_id in self.alias_ids(page):
+                location = self._locations.get(chunk_id)
+                if location is not None and location[0] is segment:
+                    page_mask[location[1]] = True
+            mask &= page_mask
+        return mask
+
+    def iter_entries(self, **metadata_filter: Any) -> Iterator[Tuple[str, str]]:
+        """
+        메타데이터가 모두 일치하는 살아있는 청크의 (chunk_id, 원문)을 순회합니다.
+        doc_name / page는 메타데이터 열 마스크로 거르고, 그 밖의 키는 디코딩한 메타데이터와 비교합니다.
+        """
+        doc_name = metadata_filter.pop("doc_name", None)
+        page = metadata_filter.pop("page", None)
+        for segment in list(self.segments):
+            for col in np.flatnonzero(self._metadata_mask(segment, doc_name, page)):
+                entry = segment.entry(col)
+                if all(entry["metadata"].get(key) == value for key, value in metadata_filter.items()):
+                    yield segment.chunk_id(col), entry["text"]
+
+    def iter_locations(self) -> Iterator[Tuple[str, Optional[str], Optional[int]]]:
+        """살아있는 청크의 (chunk_id, doc_name, page)를 메타데이터 열에서 순회합니다. (원문 디코딩 없음)"""
+        for segment in list(self.segments):
+            ids = segment.chunk_ids()
+            codes, pages = np.asarray(segment.doc_codes), np.asarray(segment.pages)
+            for col in np.flatnonzero(segment.alive):
+                code, page = int(codes[col]), int(pages[col])
+                yield ids[col], self._doc_names[code] if code >= 0 else None, page if page != NO_PAGE else None
+
+    def get_documents(self, ids: Iterable[str]) -> List[Document]:
+        """청크 ID 순서대로 Document 객체를 복원합니다. (없는 ID는 건너뜀)"""
+        documents = []
+        for chunk_id in ids:
+            location = self._locations.get(chunk_id)
+            if location is not None:
+                documents.append(self._to_document(*location, chunk_id=chunk_id))
+        return documents
+
+    @staticmethod
+    def _to_document(segment: _Segment, col: int, chunk_id: Optional[str] = None) -> Document:
+        entry = segment.entry(col)
+        return Document(page_content=entry["text"], metadata={**entry["metadata"], "doc_id": chunk_id or segment.chunk_id(col)})
+
+    # --- 검색 ---
+
+    def search(self, query: str, k: int = 4, doc_name: Optional[str] = None, page: Optional[int] = None) -> List[Tuple[str, float]]:
+        """
+        쿼리 용어의 CSR 포스팅만 NumPy로 벡터화 채점합니다.
+        (chunk_id, score) 튜플을 점수 내림차순으로 최대 k개 반환합니다.
+        doc_name / page가 주어지면 메타데이터 열 마스크로 해당 범위의 청크만 후보로 남깁니다.
+        """
+        return self.search_terms(self.preprocess_func(query), k=k, doc_name=doc_name, page=page)
+
+    def search_terms(
+        self, terms: List[str], k: int = 4, doc_name: Optional[str] = None, page: Optional[int] = None
+    ) -> List[Tuple[str, float]]:
+        """토크나이징된 쿼리 용어로 BM25 검색을 수행합니다."""
+        return [(segment.chunk_id(col), score) for segment, col, score in self._top_hits(terms, k, doc_name, page)]
+
+    def search_documents(
+        self, query: str, k: int = 4, doc_name: Optional[str] = None, page: Optional[int] = None
+    ) -> List[Document]:
+        """BM25 검색 결과를 Document 리스트로 반환합니다. 선택된 청크만 블롭에서 디코딩합니다."""
+        return [doc for doc, _ in self.search_with_scores(query, k=k, doc_name=doc_name, page=page)]
+
+    def search_with_scores(
+        self, query: str, k: int = 4, doc_name: Optional[str] = None, page: Optional[int] = None
+    ) -> List[Tuple[Document, float]]:
+        """BM25 검색 결과를 (Document, 점수) 리스트로 반환합니다. (fusion 엔진의 키워드 레그 입력)"""
+        hits = self._top_hits(self.preprocess_func(query), k, doc_name, page)
+        return [(self._to_document(segment, col), score) for segment, col, score in hits]
+
+    def score_documents(self, query: str, ids: Iterable[str]) -> Dict[str, float]:
+        """주어진 청크만 후보로 BM25 채점하여 chunk_id -> 점수를 반환합니다. (쿼리 용어가 없는 청크는 제외)"""
+        ids = list(dict.fromkeys(ids))
+        hits = self._top_hits(self.preprocess_func(query), len(ids), ids=ids)
+        return {segment.chunk_id(col): score for segment, col, score in hits}
+
+    def _id_mask(self, segment: _Segment, ids: List[str]) -> np.ndarray:
+        """주어진 청크 ID 중 이 세그먼트에 살아있는 열의 마스크"""
+        mask = np.zeros(len(segment), dtype=bool)
+        for chunk_id in ids:
+            location = self._locations.get(chunk_id)
+            if location is not None and location[0] is segment:
+                mask[location[1]] = True
+        return mask & segment.alive
+
+    def _top_hits(
+        self,
+        terms: List[str],
+        k: int,
+        doc_name: Optional[str] = None,
+        page: Optional[int] = None,
+        ids: Optional[List[str]] = None
+    ) -> List[Tuple[_Segment, int, float]]:
+        # 락은 통계/세그먼트 스냅샷에만 사용하고, 채점은 락 밖에서 수행 (여러 서브 쿼리 레그의 동시 검색 허용)
+        with self._lock:
+            n_docs = self._num_alive
+            if n_docs == 0 or k <= 0:
+                return []
+            if doc_name is not None and doc_name not in self._doc_name_codes:
+                return []
+            avgdl = self.total_len / n_docs or 1.0
+            query_terms = [
+                (self.vocab[term], qtf) for term, qtf in Counter(terms).items() if term in self.vocab
+            ]
+            if not query_terms:
+                return []
+            filtered = doc_name is not None or page is not None
+            snapshot = [
+                (segment, self._metadata_mask(segment, doc_name, page) if filtered else segment.alive.copy(), segment.alive.copy())
+                for segment in self.segments
+            ]
+            if ids is not None:
+                snapshot = [(segment, mask & self._id_mask(segment, ids), alive) for segment, mask, alive in snapshot]
+
+        # 1) 살아있는 청크 기준 문서 빈도(df) 계산 -> IDF
+        idfs = []
+        for term_id, _ in query_terms:
+            df = 0
+            for segment, _, alive in snapshot:
+                cols, _ = segment.postings(term_id)
+                df += int(alive[cols].sum())
+            idfs.append(math.log(1 + (n_docs - df + 0.5) / (df + 0.5)) if df else 0.0)
+
+        # 2) 세그먼트별 포스팅 벡터화 채점
+        candidate_scores, candidates = [], []
+        for segment, mask, _ in snapshot:
+            scores = None
+            for (term_id, qtf), idf in zip(query_terms, idfs):
+                if idf == 0.0:
+                    continue
+                cols, freqs = segment.postings(term_id)
+                if len(cols) == 0:
+                    continue
+                if scores is None:
+                    scores = np.zeros(len(segment), dtype=np.float64)
+                freqs = freqs.astype(np.float64)
+                norm = self.k1 * (1 - self.b + self.b * segment.doc_lens[cols] / avgdl)
+                scores[cols] += qtf * idf * freqs * (self.k1 + 1) / (freqs + norm)
+            if scores is None:
+                continue
+            # IDF/avgdl은 전체 코퍼스 기준을 유지하고, 필터는 후보 마스크로만 적용
+            hit_cols = np.flatnonzero((scores > 0) & mask)
+            candidate_scores.append(scores[hit_cols])
+            candidates.append((segment, hit_cols))
+
+        if not candidate_scores:
+            return []
+        all_scores = np.concatenate(candidate_scores)
+        offsets = np.cumsum([0] + [len(cols) for _, cols in candidates])
+
+        # 3) argpartition으로 상위 k개만 부분 정렬
+        if len(all_scores) > k:
+            top = np.argpartition(-all_scores, k - 1)[:k]
+        else:
+            top = np.arange(len(all_scores))
+        top = top[np.argsort(-all_scores[top], kind="stable")]
+
+        hits = []
+        for pos in top:
+            seg_idx = int(np.searchsorted(offsets, pos, side="right") - 1)
+            segment, cols = candidates[seg_idx]
+            hits.append((segment, int(cols[pos - offsets[seg_idx]]), float(all_scores[pos])))
+        return hits
+
+    # --- 저장 및 로드 ---
+
+    def save(self, index_dir: str, compact: bool = False):
+        """
+        아직 저장되지 않은 세그먼트와 바뀐 삭제 마스크만 기록한 뒤, meta.json을 원자적으로 교체합니다.
+        meta.json이 가리키지 않는 세그먼트(병합으로 대체된 것)는 정리합니다.
+        compact=True이면 먼저 모든 세그먼트를 하나로 병합합니다.
+        """
+        root = Path(index_dir) / INDEX_DIRNAME
+        root.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            if compact and len(self.segments) > 1:
+                self.merge_segments()
+
+            for segment in self.segments:
+                if segment.name is None:
+                    segment.save(root / f"seg_{self._next_segment_id:06d}")
+                    self._next_segment_id += 1
+                elif segment.alive_dirty:
+                    segment.save_alive(root / segment.name)
+
+            # 어휘는 추가만 되므로 이전 meta.json은 새 파일의 앞부분(num_terms개)만 읽습니다.
+            vocab_blob, vocab_offsets = _pack_strings(self._terms)
+            vocab_blob.tofile(root / "vocab.bin.tmp")
+            os.replace(root / "vocab.bin.tmp", root / "vocab.bin")
+            np.save(root / "vocab_offsets.tmp.npy", vocab_offsets, allow_pickle=False)
+            os.replace(root / "vocab_offsets.tmp.npy", root / "vocab_offsets.npy")
+
+            meta = {
+                "format": FORMAT_VERSION, "k1": self.k1, "b": self.b,
+                "tokenizer": self.tokenizer_name, "version": self.version,
+                "num_terms": len(self._terms), "next_segment_id": self._next_segment_id,
+                "segments": [segment.name for segment in self.segments],
+                "doc_names": self._doc_names,
+                "page_aliases": self._page_aliases,
+            }
+            tmp_path = root / f"{META_FILENAME}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False)
+            os.replace(tmp_path, root / META_FILENAME)
+
+            live = set(meta["segments"])
+            for path in root.glob("seg_*"):
+                if path.name not in live:
+                    shutil.rmtree(path, ignore_errors=True)
+
+    @classmethod
+    def load(cls, index_dir: str, preprocess_func: Callable[[str], List[str]]) -> Optional["KeywordIndex"]:
+        """
+        meta.json과 세그먼트 배열을 메모리 매핑으로 엽니다. 인덱스가 없으면 None을 반환합니다.
+        """
+        root = Path(index_dir) / INDEX_DIRNAME
+        meta_path = root / META_FILENAME
+        if not meta_path.exists():
+            return None
+
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        index = cls(preprocess_func, k1=meta["k1"], b=meta["b"], tokenizer_name=meta["tokenizer"])
+        index.version = meta["version"]
+        index._next_segment_id = meta["next_segment_id"]
+
+        vocab_blob = _map_blob(root / "vocab.bin")
+        vocab_offsets = _map_array(root / "vocab_offsets.npy")
+        index._terms = _unpack_all(vocab_blob, vocab_offsets[:meta["num_terms"] + 1])
+        index.vocab = {term: term_id for term_id, term in enumerate(index._terms)}
+        index._doc_names = list(meta["doc_names"])
+        index._doc_name_codes = {name: code for code, name in enumerate(index._doc_names)}
+        index._page_aliases = {chunk_id: list(pages) for chunk_id, pages in meta.get("page_aliases", {}).items()}
+
+        # 청크 ID 위치 맵은 ID 조회가 처음 필요할 때 만듭니다. (검색만 하는 경우 불필요)
+        index._location_map = None
+        for name in meta["segments"]:
+            index._append_segment(_Segment.load(root / name))
+        return index
+
+
+class KeywordIndexRetriever(BaseRetriever):
+    """KeywordIndex를 LangChain 리트리버로 감싼 BM25 단독 검색기입니다. (하이브리드 검색은 retriever.HybridRetriever 사용)"""
+
+    index: Any
+    k: int = 4
+    # 검색 범위 제한 (doc_name / page 키 지원)
+    metadata_filter: Dict[str, Any] = {}
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self.index.search_documents(query, k=self.k, **self.metadata_filter)
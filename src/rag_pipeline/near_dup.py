@@ -0,0 +1,150 @@
+"""
+인제스트 시 근사 중복 청크 병합 모듈입니다.
+
+매뉴얼은 경고문, 안전 수칙, 파라미터 표가 여러 장(chapter)에 거의 그대로 반복되므로
+페이지마다 같은 내용의 청크가 따로 인덱싱되고, 검색 결과(컨텍스트)가 같은 경고문 사본으로 채워집니다.
+문서 하나의 청크를 모두 만든 뒤 MinHash 서명 + LSH 밴딩으로 근사 중복 후보를 찾고,
+추정 Jaccard 유사도가 NEAR_DUP_THRESHOLD 이상이면 처음 등장한 청크(대표 청크) 하나만 남깁니다.
+
+    - 대표 청크 메타데이터 duplicate_pages : 같은 내용이 등장한 페이지 목록 문자열 (예: "12, 37, 58")
+    - 대표 청크 메타데이터 duplicate_count : 병합된 청크 수 (대표 포함)
+    - 대표 청크 메타데이터 duplicate_image_paths : 페이지 -> 해당 페이지 이미지 경로 JSON 문자열
+    - 청크 종류(chunk_type)가 다르면 병합하지 않음 (본문 / 표 / 이미지 설명)
+
+병합된 사본의 페이지는 대표 청크의 별칭 페이지(alias_pages)로 키워드 / 페이지 / 정확 일치 인덱스와
+페이지 필터에 함께 등록되므로, "37페이지" 질문이나 37페이지 주변 확장에서도 대표 청크가 검색되고
+localize로 해당 페이지 위치(page, image_path)의 사본처럼 보이게 할 수 있습니다.
+
+대표 청크끼리만 비교하므로(그리디) A~B, B~C이지만 A와 C가 다른 경우처럼 연쇄적으로 묶이지 않습니다.
+"""
+import json
+import re
+import zlib
+from typing import Any, Dict, Iterable, List, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from src.config import settings
+
+# 2^31 - 1 (메르센 소수): (a * x + b) 계산이 uint64 범위를 넘지 않음
+_PRIME = np.uint64((1 << 31) - 1)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def shingle_hashes(text: str, size: int) -> np.ndarray:
+    """공백을 정리한 텍스트의 문자 n-gram(shingle) 해시 집합을 반환합니다. (한국어는 형태소 분석 없이 문자 단위)"""
+    normalized = _WHITESPACE.sub(" ", text).strip().lower()
+    if len(normalized) <= size:
+        shingles = {normalized}
+    else:
+        shingles = {normalized[i:i + size] for i in range(len(normalized) - size + 1)}
+    return np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles), dtype=np.uint64, count=len(shingles))
+
+
+class MinHasher:
+    """고정 시드의 해시 순열로 MinHash 서명을 만듭니다."""
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, int(_PRIME), num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, int(_PRIME), num_perm, dtype=np.uint64)
+
+    def signature(self, hashes: np.ndarray) -> np.ndarray:
+        values = hashes % _PRIME
+        return ((np.outer(values, self.a) + self.b) % _PRIME).min(axis=0)
+
+
+def collapse_near_duplicates(
+    documents: List[Document],
+    threshold: float = 0.9,
+    shingle_size: int = 5,
+    num_perm: int = 64,
+    bands: int = 16
+) -> Tuple[List[Document], int]:
+    """
+    근사 중복 청크를 대표 청크 하나로 병합합니다.
+    (남은 Document 리스트, 병합으로 제거된 청크 수)를 반환하며, 남은 청크의 순서는 입력 순서를 유지합니다.
+    """
+    if len(documents) < 2:
+        return list(documents), 0
+    rows = num_perm // bands
+    hasher = MinHasher(num_perm)
+    signatures = [hasher.signature(shingle_hashes(doc.page_content, shingle_size)) for doc in documents]
+
+    # 밴드별 버킷: (chunk_type, 밴드 번호, 밴드 값) -> 대표 청크 위치 리스트
+    buckets: Dict[Tuple, List[int]] = {}
+    canonical_of: Dict[int, int] = {}
+    members: Dict[int, List[int]] = {}
+    for i, signature in enumerate(signatures):
+        chunk_type = documents[i].metadata.get("chunk_type")
+        keys = [(chunk_type, band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(bands)]
+        candidates = dict.fromkeys(j for key in keys for j in buckets.get(key, ()))
+        match = next(
+            (j for j in candidates if float(np.mean(signatures[j] == signature)) >= threshold),
+            None
+        )
+        if match is not None:
+            canonical_of[i] = match
+            members[match].append(i)
+            continue
+        members[i] = [i]
+        for key in keys:
+            buckets.setdefault(key, []).append(i)
+
+    kept = []
+    for i, doc in enumerate(documents):
+        if i in canonical_of:
+            continue
+        if len(members[i]) > 1:
+            pages = sorted({int(documents[j].metadata["page"]) for j in members[i] if documents[j].metadata.get("page") is not None})
+            doc.metadata["duplicate_pages"] = ", ".join(str(page) for page in pages)
+            doc.metadata["duplicate_count"] = len(members[i])
+            image_paths = {}
+            for j in members[i]:
+                page, image_path = documents[j].metadata.get("page"), documents[j].metadata.get("image_path")
+                if page is not None and image_path:
+                    image_paths.setdefault(str(int(page)), image_path)
+            if image_paths:
+                doc.metadata["duplicate_image_paths"] = json.dumps(image_paths, ensure_ascii=False)
+        kept.append(doc)
+    return kept, len(canonical_of)
+
+
+def alias_pages(metadata: Dict[str, Any]) -> List[int]:
+    """병합된 대표 청크가 자기 페이지 외에 등장하는 페이지 목록 (병합되지 않은 청크는 빈 리스트)"""
+    own_page = metadata.get("page")
+    pages = [int(page) for page in str(metadata.get("duplicate_pages") or "").split(",") if page.strip().isdigit()]
+    return [page for page in pages if own_page is None or page != int(own_page)]
+
+
+def localize(doc: Document, pages: Iterable[int]) -> Document:
+    """
+    대표 청크가 pages 중 하나의 별칭 페이지로 검색된 경우, 가장 앞선 해당 페이지의 page / image_path를 가진 사본을 반환합니다.
+    자기 페이지가 pages에 있거나 해당하는 별칭 페이지가 없으면 그대로 반환합니다.
+    """
+    aliases = alias_pages(doc.metadata)
+    if not aliases:
+        return doc
+    pages = [int(page) for page in pages]
+    if doc.metadata.get("page") is not None and int(doc.metadata["page"]) in pages:
+        return doc
+    page = next((page for page in pages if page in aliases), None)
+    if page is None:
+        return doc
+    metadata = {**doc.metadata, "page": page}
+    image_path = json.loads(doc.metadata.get("duplicate_image_paths") or "{}").get(str(page))
+    if image_path:
+        metadata["image_path"] = image_path
+    return Document(page_content=doc.page_content, metadata=metadata)
+
+
+def collapse_ingested_chunks(documents: List[Document]) -> Tuple[List[Document], int]:
+    """설정값(NEAR_DUP_*)으로 인제스트 청크의 근사 중복을 병합합니다."""
+    return collapse_near_duplicates(
+        documents,
+        threshold=settings.NEAR_DUP_THRESHOLD,
+        shingle_size=settings.NEAR_DUP_SHINGLE_SIZE,
+        num_perm=settings.NEAR_DUP_NUM_PERM,
+        bands=settings.NEAR_DUP_BANDS
+    )
@@ -0,0 +1,128 @@
+"""
+(doc_name, page) → 청크 ID 메모리 인덱스 모듈입니다.
+
+"123페이지" 같은 페이지 지정 질문은 위치가 이미 정해져 있으므로,
+쿼리 임베딩과 벡터 검색 없이 딕셔너리 조회로 해당 페이지(와 필요하면 주변 페이지)의 청크를 바로 찾습니다.
+인덱스는 키워드 인덱스의 메타데이터 열(문서명 코드, 페이지)과 별칭 페이지(근사 중복 병합)로 만들며, 인제스트/삭제 시 증분 갱신합니다.
+"""
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+PageKey = Tuple[Optional[str], int]
+
+DIRECTIONS = ("next", "previous", "both")
+
+
+def neighbor_offsets(direction: str = "next", radius: int = 1) -> List[int]:
+    """
+    주변 페이지 오프셋을 가까운 순서로 반환합니다.
+    both는 표/절차가 주로 뒤로 이어지므로 같은 거리에서 다음 페이지를 먼저 둡니다. (+1, -1, +2, -2, ...)
+    """
+    if direction not in DIRECTIONS:
+        raise ValueError(f"지원하지 않는 확장 방향입니다: {direction} (next / previous / both)")
+    offsets = []
+    for distance in range(1, radius + 1):
+        if direction in ("next", "both"):
+            offsets.append(distance)
+        if direction in ("previous", "both"):
+            offsets.append(-distance)
+    return offsets
+
+
+class PageIndex:
+    """
+    (doc_name, page) → 청크 ID 리스트 (인제스트 순서 유지).
+    근사 중복 병합으로 여러 페이지를 대표하는 청크는 별칭 페이지에도 등록되며, 해당 페이지의 자체 청크 뒤에 옵니다.
+    """
+
+    def __init__(self, version: int = 0):
+        self.version = version
+        self._pages: Dict[PageKey, List[str]] = {}
+        # 별칭 페이지 → 병합된 대표 청크 ID (페이지 요약 대표 청크 선택에는 사용하지 않음)
+        self._aliases: Dict[PageKey, List[str]] = {}
+        # 청크 ID → [자기 페이지, 별칭 페이지...]
+        self._chunk_pages: Dict[str, List[PageKey]] = {}
+        # 페이지 번호 → 해당 페이지가 있는 문서명 (문서명 필터 없는 페이지 질문용, 등록 순서 유지)
+        self._docs_by_page: Dict[int, Dict[Optional[str], None]] = {}
+
+    def __len__(self) -> int:
+        return len(self._chunk_pages)
+
+    @classmethod
+    def from_locations(
+        cls,
+        locations: Iterable[Tuple[str, Optional[str], Optional[int]]],
+        version: int = 0,
+        page_aliases: Optional[Dict[str, List[int]]] = None
+    ) -> "PageIndex":
+        """(chunk_id, doc_name, page) 순회 결과와 청크별 별칭 페이지로 인덱스를 만듭니다."""
+        index = cls(version=version)
+        page_aliases = page_aliases or {}
+        for chunk_id, doc_name, page in locations:
+            index.add(chunk_id, doc_name, page, page_aliases.get(chunk_id, ()))
+        return index
+
+    def add(self, chunk_id: str, doc_name: Optional[str], page: Optional[int], alias_pages: Iterable[int] = ()):
+        """청크 위치를 등록합니다. 페이지 정보가 없는 청크는 무시하며, 같은 ID는 위치를 교체합니다."""
+        self.remove([chunk_id])
+        if page is None:
+            return
+        keys = [(doc_name, int(page))]
+        keys.extend((doc_name, int(alias)) for alias in dict.fromkeys(alias_pages) if int(alias) != int(page))
+        for n, key in enumerate(keys):
+            (self._pages if n == 0 else self._aliases).setdefault(key, []).append(chunk_id)
+            self._docs_by_page.setdefault(key[1], {})[doc_name] = None
+        self._chunk_pages[chunk_id] = keys
+
+    def remove(self, ids: Iterable[str]) -> int:
+        removed = 0
+        for chunk_id in ids:
+            keys = self._chunk_pages.pop(chunk_id, None)
+            if keys is None:
+                continue
+            for n, key in enumerate(keys):
+                table = self._pages if n == 0 else self._aliases
+                chunk_ids = table[key]
+                chunk_ids.remove(chunk_id)
+                if chunk_ids:
+                    continue
+                del table[key]
+                if key not in self._pages and key not in self._aliases:
+                    docs = self._docs_by_page[key[1]]
+                    docs.pop(key[0], None)
+                    if not docs:
+                        del self._docs_by_page[key[1]]
+            removed += 1
+        return removed
+
+    def iter_pages(self) -> Iterator[Tuple[PageKey, List[str]]]:
+        """((doc_name, page), 청크 ID 리스트)를 등록 순서대로 순회합니다."""
+        return iter(list(self._pages.items()))
+
+    def page_of(self, chunk_id: str) -> Optional[PageKey]:
+        keys = self._chunk_pages.get(chunk_id)
+        return keys[0] if keys else None
+
+    def get_chunks(self, doc_name: Optional[str], page: int) -> List[str]:
+        """한 페이지의 청크 ID 리스트(자체 청크 + 병합된 대표 청크)를 반환합니다. (O(1))"""
+        key = (doc_name, int(page))
+        return self._pages.get(key, []) + self._aliases.get(key, [])
+
+    def route(self, page: int, doc_name: Optional[str] = None, radius: int = 0) -> List[str]:
+        """
+        페이지 지정 질문을 청크 ID 리스트로 해석합니다.
+        doc_name이 없으면 해당 페이지가 있는 모든 문서를 대상으로 하며,
+        radius > 0이면 앞뒤 radius 페이지의 청크도 (요청 페이지 → 가까운 페이지 순으로) 포함합니다.
+        """
+        doc_names = [doc_name] if doc_name else list(self._docs_by_page.get(int(page), ()))
+        chunk_ids = []
+        for offset in [0] + neighbor_offsets("both", radius):
+            for name in doc_names:
+                chunk_ids.extend(self.get_chunks(name, int(page) + offset))
+        return list(dict.fromkeys(chunk_ids))
+
+    def neighbors(self, doc_name: Optional[str], page: int, direction: str = "next", radius: int = 1) -> List[str]:
+        """같은 문서에서 주변 페이지(direction / radius)의 청크 ID를 가까운 페이지 순으로 반환합니다."""
+        chunk_ids = []
+        for offset in neighbor_offsets(direction, radius):
+            chunk_ids.extend(self.get_chunks(doc_name, int(page) + offset))
+        return list(dict.fromkeys(chunk_ids))
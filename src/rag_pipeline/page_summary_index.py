@@ -0,0 +1,139 @@
+"""
+페이지 요약 벡터(Coarse) 인덱스 모듈입니다.
+
+파싱된 페이지마다 summary / keywords / chapter_path가 있지만 지금까지는 청크 메타데이터로만 복사되었습니다.
+이 모듈은 페이지당 벡터 하나(chapter_path + summary + keywords 임베딩)로 된 작은 인덱스를 만들어,
+벡터 검색을 2단계로 나눕니다.
+
+    1단계 : 페이지 요약 인덱스에서 상위 PAGE_SUMMARY_TOP_PAGES개 페이지 선택
+    2단계 : 선택된 페이지의 청크 안에서만 벡터 검색 (Chroma where 필터 / ANN 행 마스크)
+
+후보 집합이 전체 청크에서 수십 페이지 분량으로 줄어들어 큰 테넌트의 벡터 검색 지연을 낮춥니다.
+벡터 저장과 검색은 AnnIndex(NumPy 전수 계산)를 그대로 사용합니다.
+
+저장 형식: {CHROMA_DB_DIR}/{uid}/page_summaries/ (ann_index/ + pages.json)
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from src.rag_pipeline.ann_index import AnnIndex
+from src.rag_pipeline.page_index import PageIndex
+
+PAGE_SUMMARY_DIRNAME = "page_summaries"
+PAGES_FILENAME = "pages.json"
+
+PageKey = Tuple[Optional[str], int]
+
+# 요약/키워드/장 경로가 모두 없는 페이지는 첫 청크 앞부분으로 대신 임베딩
+_FALLBACK_CHARS = 500
+
+
+def page_summary_text(doc: Document) -> str:
+    """페이지 청크의 메타데이터로 페이지 요약 임베딩 입력(장 경로 + 요약 + 키워드)을 만듭니다."""
+    metadata = doc.metadata
+    parts = [metadata.get("chapter_path"), metadata.get("summary")]
+    if metadata.get("keywords"):
+        parts.append(f"Keywords: {metadata['keywords']}")
+    text = "\n".join(part for part in parts if part)
+    return text or doc.page_content[:_FALLBACK_CHARS]
+
+
+def _page_id(key: PageKey) -> str:
+    return f"{key[0] or ''}#p{key[1]}"
+
+
+class PageSummaryIndex:
+    """(doc_name, page) → 페이지 요약 벡터. 요약 텍스트 해시로 바뀐 페이지만 다시 임베딩합니다."""
+
+    def __init__(self, version: int = 0):
+        self.version = version
+        self._ann = AnnIndex(quantization="none")
+        # 페이지 ID → (doc_name, page, 요약 텍스트 해시)
+        self._pages: Dict[str, Tuple[Optional[str], int, str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._pages)
+
+    def memory_bytes(self) -> int:
+        return self._ann.memory_bytes()
+
+    def update(
+        self,
+        pages: Dict[PageKey, Document],
+        embed_documents: Callable[[List[str]], List[List[float]]],
+        page_index: Optional[PageIndex] = None
+    ) -> Tuple[int, int]:
+        """
+        pages({(doc_name, page): 대표 청크})의 요약 텍스트가 바뀌었거나 새로 생긴 페이지만 임베딩하여 반영합니다.
+        page_index를 주면 청크가 더 이상 없는 페이지를 삭제합니다. (갱신된 페이지 수, 삭제된 페이지 수)를 반환합니다.
+        """
+        removed = 0
+        if page_index is not None:
+            gone = [page_id for page_id, (doc_name, page, _) in self._pages.items() if not page_index.get_chunks(doc_name, page)]
+            self._ann.remove(gone)
+            for page_id in gone:
+                del self._pages[page_id]
+            removed = len(gone)
+
+        changed = []
+        for key, doc in pages.items():
+            text = page_summary_text(doc)
+            digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+            entry = self._pages.get(_page_id(key))
+            if entry is None or entry[2] != digest:
+                changed.append((key, text, digest))
+        if changed:
+            embeddings = np.asarray(embed_documents([text for _, text, _ in changed]), dtype=np.float32)
+            self._ann.add(
+                [_page_id(key) for key, _, _ in changed], embeddings,
+                [{"doc_name": key[0], "page": key[1]} for key, _, _ in changed]
+            )
+            for key, _, digest in changed:
+                self._pages[_page_id(key)] = (key[0], key[1], digest)
+        return len(changed), removed
+
+    def search(
+        self,
+        embeddings: Sequence[Sequence[float]],
+        top_pages: int,
+        doc_name: Optional[str] = None
+    ) -> List[List[PageKey]]:
+        """쿼리 벡터별 유사도 상위 페이지 (doc_name, page) 리스트를 반환합니다."""
+        if not self._pages:
+            return [[] for _ in embeddings]
+        results = self._ann.search(np.asarray(embeddings, dtype=np.float32), top_pages, doc_name=doc_name)
+        return [[self._pages[page_id][:2] for page_id, _ in hits] for hits in results]
+
+    # --- 영속화 ---
+
+    def save(self, index_dir: str):
+        path = Path(index_dir) / PAGE_SUMMARY_DIRNAME
+        self._ann.version = self.version
+        self._ann.save(str(path))
+        tmp_path = path / f"{PAGES_FILENAME}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": self.version, "pages": self._pages}, f, ensure_ascii=False)
+        os.replace(tmp_path, path / PAGES_FILENAME)
+
+    @classmethod
+    def load(cls, index_dir: str) -> Optional["PageSummaryIndex"]:
+        """디스크의 인덱스를 읽습니다. 없거나 벡터와 페이지 목록의 버전이 다르면 None을 반환합니다."""
+        path = Path(index_dir) / PAGE_SUMMARY_DIRNAME
+        try:
+            with open(path / PAGES_FILENAME, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        vectors = AnnIndex.load(str(path))
+        if vectors is None or vectors.version != data["version"]:
+            return None
+        index = cls(version=data["version"])
+        index._ann = vectors
+        index._pages = {page_id: tuple(entry) for page_id, entry in data["pages"].items()}
+        return index
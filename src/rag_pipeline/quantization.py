@@ -0,0 +1,165 @@
+"""
+임베딩 벡터 양자화 모듈입니다.
+
+ANN 인덱스가 검색 시 메모리에 상주시키는 벡터를 float32 대신 압축 코드로 보관하여
+멀티 테넌트 API 노드에서 로드된 테넌트당 메모리를 줄입니다.
+양자화 거리로 후보를 고른 뒤, 상위 후보만 디스크(메모리 매핑)의 원본 float32 벡터로 다시 계산(rescoring)합니다.
+
+    - int8 : 차원별 min/max 스칼라 양자화 (차원당 1바이트, float32 대비 4배 압축)
+    - pq   : 곱 양자화(Product Quantization), 서브벡터별 256개 중심점 코드북 (서브벡터당 1바이트, 4 × 서브벡터 차원 배 압축)
+
+거리는 모두 제곱 L2 거리이며, 코드 행렬은 블록 단위로 복원/조회하여 검색 중 임시 메모리를 제한합니다.
+"""
+from typing import Dict, Optional
+
+import numpy as np
+
+QUANTIZATIONS = ("none", "int8", "pq")
+
+# 거리 계산 시 한 번에 복원/조회할 코드 행 수 (임시 메모리 상한)
+_BLOCK_ROWS = 16384
+_PQ_CENTROIDS = 256
+_KMEANS_ITERATIONS = 10
+
+
+def _pairwise_sq_l2(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """(A, d) × (B, d) 제곱 L2 거리 행렬"""
+    return (
+        np.einsum("ij,ij->i", a, a)[:, None]
+        - 2.0 * a @ b.T
+        + np.einsum("ij,ij->i", b, b)[None, :]
+    )
+
+
+class ScalarQuantizer:
+    """차원별 [min, max] 구간을 256단계로 나누는 int8 스칼라 양자화"""
+
+    kind = "int8"
+
+    def __init__(self, offset: np.ndarray, scale: np.ndarray):
+        self.offset = np.asarray(offset, dtype=np.float32)
+        self.scale = np.asarray(scale, dtype=np.float32)
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, **kwargs) -> "ScalarQuantizer":
+        low, high = vectors.min(axis=0), vectors.max(axis=0)
+        scale = (high - low) / 255.0
+        scale[scale == 0] = 1.0
+        return cls(offset=low + 128.0 * scale, scale=scale)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.rint((vectors - self.offset) / self.scale)
+        return np.clip(codes, -128, 127).astype(np.int8)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return codes.astype(np.float32) * self.scale + self.offset
+
+    def distances(self, queries: np.ndarray, codes: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """쿼리 (Q, D)와 codes[rows] 사이의 근사 제곱 L2 거리 (Q, len(rows))"""
+        result = np.empty((len(queries), len(rows)), dtype=np.float32)
+        for start in range(0, len(rows), _BLOCK_ROWS):
+            block = self.decode(codes[rows[start:start + _BLOCK_ROWS]])
+            result[:, start:start + len(block)] = _pairwise_sq_l2(queries, block)
+        return result
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {"offset": self.offset, "scale": self.scale}
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> "ScalarQuantizer":
+        return cls(offset=arrays["offset"], scale=arrays["scale"])
+
+
+class ProductQuantizer:
+    """벡터를 M개 서브벡터로 나누고 서브벡터별 k-means 코드북 인덱스(uint8)로 저장하는 곱 양자화"""
+
+    kind = "pq"
+
+    def __init__(self, codebooks: np.ndarray):
+        # (M, 중심점 수, 서브벡터 차원)
+        self.codebooks = np.asarray(codebooks, dtype=np.float32)
+
+    @property
+    def sub_dim(self) -> int:
+        return self.codebooks.shape[2]
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, sub_dim: int = 4, seed: int = 0, **kwargs) -> "ProductQuantizer":
+        """
+        서브벡터별 k-means(고정 반복)로 코드북을 학습합니다.
+        서브벡터 차원은 전체 차원을 나누어떨어지게 하는 sub_dim 이하의 최댓값을 사용합니다.
+        """
+        dim = vectors.shape[1]
+        sub_dim = max(d for d in range(1, max(sub_dim, 1) + 1) if dim % d == 0)
+        n_centroids = min(_PQ_CENTROIDS, len(vectors))
+        rng = np.random.default_rng(seed)
+        subvectors = vectors.reshape(len(vectors), dim // sub_dim, sub_dim)
+
+        codebooks = np.empty((dim // sub_dim, n_centroids, sub_dim), dtype=np.float32)
+        for m in range(dim // sub_dim):
+            points = subvectors[:, m, :]
+            centroids = points[rng.choice(len(points), n_centroids, replace=False)].copy()
+            for _ in range(_KMEANS_ITERATIONS):
+                assignment = _pairwise_sq_l2(points, centroids).argmin(axis=1)
+                counts = np.bincount(assignment, minlength=n_centroids)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assignment, points)
+                filled = counts > 0
+                centroids[filled] = sums[filled] / counts[filled, None]
+            codebooks[m] = centroids
+        return cls(codebooks)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        n_sub = len(self.codebooks)
+        subvectors = vectors.reshape(len(vectors), n_sub, self.sub_dim)
+        codes = np.empty((len(vectors), n_sub), dtype=np.uint8)
+        for m in range(n_sub):
+            codes[:, m] = _pairwise_sq_l2(subvectors[:, m, :], self.codebooks[m]).argmin(axis=1)
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        n_sub = len(self.codebooks)
+        return self.codebooks[np.arange(n_sub), codes].reshape(len(codes), n_sub * self.sub_dim)
+
+    def distances(self, queries: np.ndarray, codes: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """비대칭 거리 계산(ADC): 쿼리별 (M, 중심점 수) 거리 표를 만든 뒤 코드로 조회하여 합산합니다."""
+        n_sub = len(self.codebooks)
+        query_subvectors = queries.reshape(len(queries), n_sub, self.sub_dim)
+        tables = ((query_subvectors[:, :, None, :] - self.codebooks[None]) ** 2).sum(axis=-1)
+        sub_index = np.arange(n_sub)
+        result = np.empty((len(queries), len(rows)), dtype=np.float32)
+        for start in range(0, len(rows), _BLOCK_ROWS):
+            block = codes[rows[start:start + _BLOCK_ROWS]]
+            for q, table in enumerate(tables):
+                result[q, start:start + len(block)] = table[sub_index, block].sum(axis=1)
+        return result
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {"codebooks": self.codebooks}
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> "ProductQuantizer":
+        return cls(codebooks=arrays["codebooks"])
+
+
+_QUANTIZERS = {"int8": ScalarQuantizer, "pq": ProductQuantizer}
+QUANTIZER_ARRAYS = {"int8": ("offset", "scale"), "pq": ("codebooks",)}
+
+
+def train_quantizer(kind: str, vectors: np.ndarray, train_size: int, sub_dim: int = 4):
+    """kind(int8 / pq)의 양자화기를 최대 train_size개 표본으로 학습합니다. none이면 None을 반환합니다."""
+    if kind not in QUANTIZATIONS:
+        raise ValueError(f"지원하지 않는 벡터 양자화 방식입니다: {kind} (none / int8 / pq)")
+    if kind == "none" or not len(vectors):
+        return None
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if len(vectors) > train_size:
+        sample = np.random.default_rng(0).choice(len(vectors), train_size, replace=False)
+        vectors = vectors[np.sort(sample)]
+    return _QUANTIZERS[kind].train(vectors, sub_dim=sub_dim)
+
+
+def quantizer_from_arrays(kind: str, arrays: Dict[str, np.ndarray]) -> Optional[object]:
+    if kind == "none":
+        return None
+    return _QUANTIZERS[kind].from_arrays(arrays)
@@ -0,0 +1,86 @@
+"""
+CPU 크로스 인코더 재순위화(Rerank) 모듈입니다.
+
+융합된 후보(최대 100개)를 (질문, 청크) 쌍으로 배치 채점하여 상위 N개(기본 12개)만 남기고,
+LLM에 전달하는 컨텍스트를 줄입니다. (다음 페이지 확장은 남은 상위 N개에 대해서만 수행)
+sentence-transformers는 선택 의존성이며, 설치되어 있지 않거나 모델 로드에 실패하면
+재순위화 없이 융합 순서를 그대로 사용합니다.
+
+int8 추론:
+    - torch 백엔드: Linear 레이어에 동적 양자화(torch.quantization.quantize_dynamic) 적용
+    - onnx 백엔드 : 모델 저장소의 int8 양자화 ONNX 파일(RERANK_ONNX_FILE)을 로드
+"""
+from typing import Any, Callable, List, Optional, Sequence
+
+from langchain_core.documents import Document
+
+from src.config import settings
+
+# 크로스 인코더 (프로세스 전역, 지연 로드. 로드 실패 시 "FAILED")
+_cross_encoder: Any = None
+
+
+def _load_cross_encoder() -> Any:
+    from sentence_transformers import CrossEncoder
+
+    if settings.RERANK_BACKEND == "onnx":
+        model_kwargs = {"file_name": settings.RERANK_ONNX_FILE} if settings.RERANK_INT8 else {}
+        return CrossEncoder(
+            settings.RERANK_MODEL, device="cpu", max_length=settings.RERANK_MAX_LENGTH,
+            backend="onnx", model_kwargs=model_kwargs
+        )
+
+    model = CrossEncoder(settings.RERANK_MODEL, device="cpu", max_length=settings.RERANK_MAX_LENGTH)
+    if settings.RERANK_INT8:
+        import torch
+        model.model = torch.quantization.quantize_dynamic(model.model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+
+def get_cross_encoder() -> Any:
+    """크로스 인코더를 지연 로드합니다. 사용할 수 없으면 None을 반환합니다."""
+    global _cross_encoder
+    if _cross_encoder is None:
+        try:
+            _cross_encoder = _load_cross_encoder()
+            print(f"Cross-encoder reranker 활성화: {settings.RERANK_MODEL} "
+                  f"(backend={settings.RERANK_BACKEND}, int8={settings.RERANK_INT8})")
+        except Exception as e:
+            # 로드 실패는 한 번만 출력하고, 이후에는 재순위화를 건너뜁니다.
+            print(f"Cross-encoder 로드 실패 (재순위화 생략): {e}")
+            _cross_encoder = "FAILED"
+            return None
+
+    if _cross_encoder == "FAILED":
+        return None
+    return _cross_encoder
+
+
+def score_pairs(query: str, docs: Sequence[Document], model: Any = None, batch_size: Optional[int] = None) -> List[float]:
+    """(질문, 청크 본문) 쌍을 batch_size 단위로 채점합니다. 점수가 높을수록 관련도가 높습니다."""
+    model = model or get_cross_encoder()
+    if model is None or not docs:
+        return []
+    pairs = [(query, doc.page_content) for doc in docs]
+    scores = model.predict(pairs, batch_size=batch_size or settings.RERANK_BATCH_SIZE, show_progress_bar=False)
+    return [float(score) for score in scores]
+
+
+def rerank(
+    query: str,
+    docs: List[Document],
+    top_n: Optional[int] = None,
+    scorer: Optional[Callable[[str, Sequence[Document]], List[float]]] = None
+) -> List[Document]:
+    """
+    후보 문서를 크로스 인코더 점수 내림차순으로 정렬하여 상위 top_n개를 반환합니다.
+    동점은 기존(융합) 순서를 유지하며, 모델을 사용할 수 없으면 입력을 그대로 반환합니다.
+    """
+    top_n = top_n or settings.RERANK_TOP_N
+    if len(docs) <= 1:
+        return docs
+    scores = (scorer or score_pairs)(query, docs)
+    if not scores:
+        return docs
+    order = sorted(range(len(docs)), key=lambda i: -scores[i])
+    return [docs[i] for i in order[:top_n]]
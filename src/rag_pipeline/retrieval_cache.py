@@ -0,0 +1,155 @@
+"""
+유저(테넌트)별 검색 결과 캐시 모듈입니다.
+
+같은 근무조의 작업자들이 같거나 거의 같은 질문을 반복할 때
+쿼리 확장 / 임베딩 / 하이브리드 검색 / 다음 페이지 확장을 다시 수행하지 않도록,
+최종 검색 결과의 청크 ID 목록과 확장 쿼리를 저장합니다.
+근사 중복 병합된 대표 청크가 별칭 페이지로 반환된 경우를 위해 청크별 반환 페이지도 함께 저장합니다.
+
+키: (uid, 정규화 쿼리, 필터, 인덱스 버전, 융합 파라미터, 대화 맥락)
+    - 인덱스 버전(매니페스트)이 키에 포함되므로, 다른 워커가 인제스트/삭제한 경우에도 이전 결과는 조회되지 않습니다.
+    - 같은 프로세스의 인제스트/삭제 시에는 invalidate(uid)로 해당 유저의 항목을 즉시 비웁니다.
+제거 정책: LRU(최대 항목 수) + TTL
+"""
+import hashlib
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from src.config import settings
+from src.rag_pipeline.retrieval_planner import normalize_query
+
+CacheKey = Tuple[str, str, Optional[str], int, str, str]
+
+
+class CacheEntry(NamedTuple):
+    chunk_ids: Tuple[str, ...]
+    expanded_query: str
+    created_at: float
+    nbytes: int
+    # 청크별 반환 페이지 (별칭 페이지로 localize된 청크를 적중 시 같은 페이지로 복원)
+    pages: Tuple[Optional[int], ...] = ()
+
+
+def make_cache_key(
+    uid: str,
+    query: str,
+    index_version: int,
+    doc_name: Optional[str] = None,
+    fusion_params: Any = None,
+    context: str = ""
+) -> CacheKey:
+    """검색 캐시 키를 만듭니다. 쿼리는 공백 정리 + 대소문자 무시로 정규화합니다."""
+    fusion_key = fusion_params.model_dump_json() if fusion_params is not None else ""
+    context_key = hashlib.sha1(context.encode("utf-8")).hexdigest() if context else ""
+    return (uid, normalize_query(query).casefold(), doc_name, index_version, fusion_key, context_key)
+
+
+def _entry_size(key: CacheKey, chunk_ids: Tuple[str, ...], expanded_query: str, pages: Tuple[Optional[int], ...] = ()) -> int:
+    """항목의 대략적인 메모리 사용량(바이트)"""
+    return (
+        sum(sys.getsizeof(part) for part in key if part is not None)
+        + sys.getsizeof(chunk_ids) + sum(sys.getsizeof(chunk_id) for chunk_id in chunk_ids)
+        + sys.getsizeof(expanded_query) + sys.getsizeof(pages)
+    )
+
+
+class RetrievalCache:
+    """LRU + TTL 검색 결과 캐시. 적중률과 메모리 사용량을 집계합니다. (스레드 안전)"""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 600.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[CacheKey, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.memory_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: CacheKey) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry.created_at > self.ttl_seconds:
+                self._pop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: CacheKey, chunk_ids: List[str], expanded_query: str, pages: Sequence[Optional[int]] = ()):
+        chunk_ids, pages = tuple(chunk_ids), tuple(pages)
+        entry = CacheEntry(
+            chunk_ids, expanded_query, time.monotonic(), _entry_size(key, chunk_ids, expanded_query, pages), pages
+        )
+        with self._lock:
+            if key in self._entries:
+                self._pop(key)
+            self._entries[key] = entry
+            self.memory_bytes += entry.nbytes
+            while len(self._entries) > self.max_entries:
+                self._pop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, uid: str) -> int:
+        """유저의 모든 항목을 제거하고 제거된 항목 수를 반환합니다."""
+        with self._lock:
+            keys = [key for key in self._entries if key[0] == uid]
+            for key in keys:
+                self._pop(key)
+            self.invalidations += len(keys)
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.memory_bytes = 0
+
+    def _pop(self, key: CacheKey):
+        entry = self._entries.pop(key)
+        self.memory_bytes -= entry.nbytes
+
+    def stats(self, uid: Optional[str] = None) -> Dict[str, Any]:
+        """적중률 / 항목 수 / 메모리 사용량을 반환합니다. uid를 주면 해당 유저의 항목 수와 메모리도 포함합니다."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "memory_bytes": self.memory_bytes,
+            }
+            if uid is not None:
+                tenant_entries = [entry for key, entry in self._entries.items() if key[0] == uid]
+                stats["tenant_entries"] = len(tenant_entries)
+                stats["tenant_memory_bytes"] = sum(entry.nbytes for entry in tenant_entries)
+        return stats
+
+
+# 프로세스 전역 검색 캐시
+retrieval_cache = RetrievalCache(
+    max_entries=settings.RETRIEVAL_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.RETRIEVAL_CACHE_TTL_SECONDS
+)
+
+
+def invalidate_tenant(uid: str) -> int:
+    """인제스트/삭제 후 해당 유저의 캐시 항목을 비웁니다."""
+    removed = retrieval_cache.invalidate(uid)
+    if removed:
+        print(f"검색 캐시 무효화: {removed}개 항목 (UID: {uid})")
+    return removed
@@ -0,0 +1,88 @@
+"""
+다중 쿼리 검색 플래너 모듈입니다.
+
+정제 쿼리 / 확장 쿼리 / 원본 쿼리를 정규화하여 중복을 제거하고,
+서브 쿼리들을 한 번의 배치 요청으로 임베딩한 뒤,
+모든 서브 쿼리의 키워드 레그와 벡터 레그를 스레드 풀에서 동시에 실행합니다.
+검색 시간은 레그 시간의 합이 아니라 가장 느린 레그(임베딩 포함) 수준이 됩니다.
+"""
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional
+
+from src.config import settings
+from src.rag_pipeline.fusion import RankedList
+
+# 검색 레그 실행용 스레드 풀 (프로세스 전역, 지연 생성)
+_executor: Optional[ThreadPoolExecutor] = None
+
+_CODE_PATTERN = re.compile(r'[A-Z]\d{3,4}')
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.RETRIEVAL_WORKERS, thread_name_prefix="retrieval")
+    return _executor
+
+
+def normalize_query(query: str) -> str:
+    """공백을 정리한 쿼리를 반환합니다. (검색에 사용하는 형태)"""
+    return " ".join(query.split())
+
+
+def plan_sub_queries(query: str, expanded_query: str, include_codes: bool = True) -> List[str]:
+    """
+    검색할 서브 쿼리 목록을 만듭니다.
+    고유 코드(예: E1236)가 있으면 코드만으로 정제한 쿼리를 먼저 두고, 확장 쿼리와 원본 쿼리를 뒤에 둡니다.
+    코드가 정확 일치 인덱스로 이미 해석된 경우(include_codes=False)에는 코드 전용 쿼리를 생략합니다.
+    공백/대소문자만 다른 쿼리와 빈 쿼리는 제거합니다.
+    """
+    codes = _CODE_PATTERN.findall(query.upper()) if include_codes else []
+    refined_query = " ".join(codes) if codes else query
+
+    sub_queries, seen = [], set()
+    for candidate in (refined_query, expanded_query, query):
+        normalized = normalize_query(candidate or "")
+        key = normalized.casefold()
+        if normalized and key not in seen:
+            seen.add(key)
+            sub_queries.append(normalized)
+    return sub_queries
+
+
+def retrieve_ranked_lists(retriever: Any, sub_queries: List[str]) -> List[RankedList]:
+    """
+    하이브리드 리트리버(keyword_hits / embed_queries / vector_hits_by_vector)로
+    모든 서브 쿼리의 키워드·벡터 레그를 동시에 실행합니다.
+    벡터 스토어가 배치 검색을 지원하면(batch_vector_search) 벡터 레그는 한 번의 배치 검색으로 처리합니다.
+    결과는 서브 쿼리 순서대로 [키워드, 벡터] 순위 리스트를 이어 붙여 반환합니다. (융합 결과의 동점 순서 고정)
+    """
+    if not sub_queries:
+        return []
+    executor = get_executor()
+    keyword_futures = [executor.submit(retriever.keyword_hits, query) for query in sub_queries]
+    # 키워드 레그가 도는 동안 서브 쿼리 임베딩을 한 번에 요청
+    embeddings = retriever.embed_queries(sub_queries)
+    if getattr(retriever, "batch_vector_search", False) is True:
+        # 인프로세스 ANN 백엔드: 모든 서브 쿼리 벡터를 한 번의 배치 검색으로 처리
+        vector_hits = retriever.vector_hits_batch(embeddings)
+    else:
+        vector_futures = [executor.submit(retriever.vector_hits_by_vector, embedding) for embedding in embeddings]
+        vector_hits = [future.result() for future in vector_futures]
+
+    ranked_lists = []
+    for keyword_future, hits in zip(keyword_futures, vector_hits):
+        ranked_lists.append(RankedList("keyword", keyword_future.result()))
+        ranked_lists.append(RankedList("vector", hits))
+    return ranked_lists
+
+
+def invoke_concurrently(retriever: Any, sub_queries: List[str]) -> List[RankedList]:
+    """일반 LangChain 리트리버를 서브 쿼리별로 동시에 호출하고, 순위를 점수로 삼은 리스트를 반환합니다."""
+    executor = get_executor()
+    futures = [executor.submit(retriever.invoke, query) for query in sub_queries]
+    return [
+        RankedList("retriever", [(doc, -rank) for rank, doc in enumerate(future.result())])
+        for future in futures
+    ]
@@ -1,163 +1,750 @@
+import hashlib
+import heapq
 import os
-import pickle
 from pathlib import Path
-from typing import List, Dict, Any
+from collections import Counter
+from typing import List, Dict, Any, Optional, Sequence, Tuple
 from langchain_chroma import Chroma
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
 from langchain_core.retrievers import BaseRetriever
-from langchain_community.retrievers import BM25Retriever
 from langchain_core.documents import Document
+from pydantic import Field
 from src.config import settings
-from src.rag_pipeline.vector_db import get_vector_store
+from src.rag_pipeline.vector_db import get_vector_store, get_embedding_function, embed_queries
+from src.rag_pipeline.keyword_index import KeywordIndex
+from src.rag_pipeline.exact_index import ExactMatchIndex, extract_codes
+from src.rag_pipeline.near_dup import alias_pages, localize
+from src.rag_pipeline.page_index import PageIndex, neighbor_offsets
+from src.rag_pipeline.page_summary_index import PageSummaryIndex
+from src.rag_pipeline.fusion import FusionParams, RankedList, fuse
+from src.rag_pipeline.retrieval_planner import retrieve_ranked_lists
+from src.rag_pipeline.index_manifest import read_manifest, bump_manifest, rebuild_manifest
+from src.rag_pipeline.retrieval_cache import invalidate_tenant
+from src.rag_pipeline.shared_corpus import is_corpus_uid, read_subscriptions
+from src.rag_pipeline.tenant_cache import tenant_cache
+from src.rag_pipeline.tokenizer import korean_tokenizer, tokenize_batch, tokenize_query  # korean_tokenizer: 하위 호환용 재노출
 
-try:
-    from tqdm import tqdm
-except ImportError:
-    def tqdm(iterable, *args, **kwargs):
-        return iterable
 
-try:
-    from langchain.retrievers import EnsembleRetriever  # type: ignore
-except ImportError:
+# --- BM25 한국어 토크나이저 설정 (전역) ---
+# 토크나이저 구현은 tokenizer 모듈에 있으며, 쿼리 토크나이징에는 LRU 캐시가 적용됩니다.
+BM25_PREPROCESS_FUNC = tokenize_query
+# --- 끝 ---
+
+BM25_INDEX_PATH = Path(settings.BM25_INDEX_PATH)
+# 이전 버전이 유저 디렉토리에 저장하던 BM25Retriever 피클 (키워드 인덱스 재생성 후 삭제)
+LEGACY_BM25_FILENAME = "bm25_index.pkl"
+
+# 유저별 키워드 인덱스 캐싱 (UID: KeywordIndex)
+_keyword_indexes: Dict[str, KeywordIndex] = {}
+# 유저별 코드 정확 일치 인덱스 캐싱 (UID: ExactMatchIndex)
+_exact_indexes: Dict[str, ExactMatchIndex] = {}
+# 유저별 (doc_name, page) → 청크 인덱스 캐싱 (UID: PageIndex)
+_page_indexes: Dict[str, PageIndex] = {}
+# 유저별 페이지 요약 벡터 인덱스 캐싱 (UID: PageSummaryIndex, 2단계 검색 사용 시)
+_page_summary_indexes: Dict[str, PageSummaryIndex] = {}
+# 공유 코퍼스별 리트리버 캐싱 (코퍼스 UID: HybridRetriever, 구독 유저의 검색 fan-out용)
+_corpus_retrievers: Dict[str, "HybridRetriever"] = {}
+
+# 유저별 캐시는 테넌트 캐시가 벡터 스토어와 함께 LRU/유휴 TTL로 제거합니다.
+tenant_cache.register("keyword_index", _keyword_indexes, size=lambda index: index.memory_bytes())
+tenant_cache.register("exact_index", _exact_indexes)
+tenant_cache.register("page_index", _page_indexes)
+tenant_cache.register("page_summary_index", _page_summary_indexes, size=lambda index: index.memory_bytes())
+tenant_cache.register("corpus_retriever", _corpus_retrievers)
+
+def _get_index_dir(uid: str) -> str:
+    return os.path.join(settings.CHROMA_DB_DIR, uid)
+
+def build_keyword_index_from_store(vector_store: Chroma, previous: Optional[KeywordIndex] = None) -> KeywordIndex:
+    """
+    벡터 스토어(Source of Truth)의 전체 청크에 맞춰 키워드 인덱스를 재구성합니다.
+    이전 인덱스(previous)가 같은 토크나이저로 만들어졌다면 그대로 맞춰 갱신(reconcile)합니다:
+    원문이 같은 청크는 유지하고, 사라진 청크는 삭제하며, 새로 생기거나 바뀐 청크만 일괄 토크나이징합니다.
+    """
+    collection_data = vector_store.get(include=["metadatas", "documents"])
+    ids = collection_data.get("ids", [])
+    texts = collection_data.get("documents", [])
+    metadatas = collection_data.get("metadatas", [])
+
+    tokenizer_name = settings.KEYWORD_TOKENIZER
+    if previous is not None and previous.tokenizer_name == tokenizer_name:
+        index = previous
+    else:
+        index = KeywordIndex(preprocess_func=BM25_PREPROCESS_FUNC, tokenizer_name=tokenizer_name)
+
+    indexed = dict(index.iter_entries())
+    store_ids = set(ids)
+    stale = [chunk_id for chunk_id in indexed if chunk_id not in store_ids]
+    missing = [i for i, chunk_id in enumerate(ids) if indexed.get(chunk_id) != texts[i]]
+
+    print(f"키워드 인덱스 생성을 시작합니다 ({len(ids)}개 문서, 토크나이징 필요: {len(missing)}개, 삭제: {len(stale)}개)...")
+    index.remove_documents(stale)
+    tokens = tokenize_batch([texts[i] for i in missing], mode=tokenizer_name)
+    # Chroma 순서를 유지하여 추가
+    index.add_tokenized({
+        ids[i]: {"text": texts[i], "metadata": metadatas[i] or {}, "tf": dict(Counter(doc_tokens))}
+        for i, doc_tokens in zip(missing, tokens)
+    })
+    return index
+
+def get_index_version(uid: str = "default") -> int:
+    """유저 인덱스의 현재 매니페스트 버전을 반환합니다. (O(1) 파일 읽기)"""
+    return read_manifest(_get_index_dir(uid)).version
+
+def get_search_uids(uid: str, doc_name: Optional[str] = None) -> List[str]:
+    """
+    검색할 인덱스 UID 목록을 반환합니다. (유저 개인 인덱스 + 구독한 공유 코퍼스)
+    문서명이 주어지면 해당 문서가 있는 인덱스 하나만 반환합니다.
+    """
+    if not settings.SHARED_CORPUS_ENABLED or is_corpus_uid(uid):
+        return [uid]
+    subscriptions = read_subscriptions(uid).documents
+    if doc_name:
+        return [subscriptions.get(doc_name, uid)]
+    return [uid] + list(dict.fromkeys(subscriptions.values()))
+
+def get_search_version(uid: str = "default") -> int:
+    """
+    유저가 검색하는 전체 범위의 버전을 반환합니다. (검색 캐시 키용)
+    공유 코퍼스를 사용하면 개인 인덱스 버전, 구독 목록 버전, 구독 코퍼스 버전을 묶은 해시값이므로
+    구독 변경이나 코퍼스 재인덱싱 후에는 이전 캐시 항목이 조회되지 않습니다.
+    """
+    if not settings.SHARED_CORPUS_ENABLED or is_corpus_uid(uid):
+        return get_index_version(uid)
+    subscriptions = read_subscriptions(uid)
+    parts = [f"{uid}:{get_index_version(uid)}", f"subscriptions:{subscriptions.version}"]
+    parts.extend(f"{corpus_uid}:{get_index_version(corpus_uid)}" for corpus_uid in sorted(set(subscriptions.documents.values())))
+    return int(hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:15], 16)
+
+def get_documents_by_ids(uid: str, chunk_ids: List[str]) -> List[Document]:
+    """청크 ID 순서대로 유저 개인 인덱스와 구독 코퍼스에서 Document를 복원합니다. (없는 ID는 건너뜀)"""
+    chunk_ids = list(chunk_ids)
+    found: Dict[str, Document] = {}
+    for search_uid in get_search_uids(uid):
+        missing = [chunk_id for chunk_id in chunk_ids if chunk_id not in found]
+        if not missing:
+            break
+        for doc in get_keyword_index(uid=search_uid).get_documents(missing):
+            found[doc.metadata["doc_id"]] = doc
+    return [found[chunk_id] for chunk_id in chunk_ids if chunk_id in found]
+
+def get_keyword_index(
+    uid: str = "default",
+    collection_name: str = settings.COLLECTION_NAME,
+    force_update: bool = False
+) -> KeywordIndex:
+    """
+    유저 UID별 키워드 인덱스를 반환합니다. (캐싱 사용)
+    최신 여부는 인덱스 매니페스트 버전 비교(O(1))로 판단하며,
+    메모리/디스크의 인덱스가 매니페스트 버전과 다르거나, force_update이거나,
+    토크나이저 모드가 바뀐 경우에만 벡터 스토어로부터 재생성합니다.
+    """
+    global _keyword_indexes
+    tenant_cache.touch(uid)
+    index_dir = _get_index_dir(uid)
+    manifest = read_manifest(index_dir)
+
+    def is_fresh(candidate: Optional[KeywordIndex]) -> bool:
+        return (
+            candidate is not None
+            and candidate.version == manifest.version
+            and candidate.tokenizer_name == settings.KEYWORD_TOKENIZER
+        )
+
+    cached = _keyword_indexes.get(uid)
+    if not force_update and is_fresh(cached):
+        return cached
+
+    # 다른 워커가 갱신한 경우 디스크의 인덱스를 다시 읽음
+    index = cached
+    if not force_update and not is_fresh(index):
+        try:
+            loaded = KeywordIndex.load(index_dir, preprocess_func=BM25_PREPROCESS_FUNC)
+            if loaded is not None:
+                index = loaded
+        except Exception as e:
+            print(f"키워드 인덱스 로드 실패 (재생성 진행): {e}")
+
+    # 버전이 맞지 않거나 강제 갱신인 경우 재생성 (저장된 토큰은 최대한 재사용)
+    if force_update or not is_fresh(index):
+        if index is not None:
+            print(f"키워드 인덱스 버전 불일치 (인덱스: v{index.version}, 매니페스트: v{manifest.version}). 재생성합니다. (UID: {uid})")
+        vector_store = get_vector_store(uid=uid, collection_name=collection_name, db_path=index_dir)
+        index = build_keyword_index_from_store(vector_store, previous=index)
+        # 재생성된 인덱스(Source of Truth 기준)로 다이제스트를 다시 계산하고 버전을 올림
+        manifest = rebuild_manifest(index_dir, index.iter_entries())
+        index.version = manifest.version
+        try:
+            index.save(index_dir, compact=True)
+            print(f"키워드 인덱스가 '{index_dir}'에 저장되었습니다. ({len(index)}개 문서, v{index.version})")
+            legacy_path = Path(index_dir) / LEGACY_BM25_FILENAME
+            if legacy_path.exists():
+                legacy_path.unlink()
+                print(f"이전 BM25 인덱스 파일을 삭제했습니다: {legacy_path}")
+        except Exception as e:
+            print(f"키워드 인덱스 저장 실패: {e}")
+
+    _keyword_indexes[uid] = index
+    return index
+
+def get_exact_index(uid: str = "default") -> ExactMatchIndex:
+    """
+    유저 UID별 코드 정확 일치 인덱스를 반환합니다. (캐싱 사용)
+    매니페스트 버전이 다르면 디스크에서 다시 읽고, 디스크의 인덱스도 오래되었으면 키워드 인덱스의 청크로 재생성합니다.
+    """
+    index_dir = _get_index_dir(uid)
+    version = read_manifest(index_dir).version
+
+    index = _exact_indexes.get(uid)
+    if index is not None and index.version == version:
+        return index
     try:
-        from langchain_classic.retrievers import EnsembleRetriever
-    except ImportError:
-         # Fallback or re-raise if strictly needed, or try another location
-         raise ImportError("EnsembleRetriever could not be imported from langchain.retrievers or langchain_classic.retrievers")
+        index = ExactMatchIndex.load(index_dir)
+    except Exception as e:
+        print(f"정확 일치 인덱스 로드 실패 (재생성 진행): {e}")
+        index = None
 
-# --- BM25 한국어 토크나이저 설정 (전역) ---
-_okt = None
+    if index is None or index.version != version:
+        keyword_index = get_keyword_index(uid=uid)
+        index = ExactMatchIndex(version=keyword_index.version)
+        index.add_documents(keyword_index.get_documents(chunk_id for chunk_id, _ in keyword_index.iter_entries()))
+        try:
+            index.save(index_dir)
+        except Exception as e:
+            print(f"정확 일치 인덱스 저장 실패: {e}")
+        print(f"정확 일치 인덱스 생성: {len(index)}개 코드 (UID: {uid}, v{index.version})")
+
+    _exact_indexes[uid] = index
+    return index
+
+def _update_exact_index(uid: str, version: int, added: List[Document] = (), removed_ids: List[str] = ()):
+    """키워드 인덱스와 같은 버전으로 정확 일치 인덱스를 증분 갱신합니다."""
+    index = _exact_indexes.get(uid)
+    if index is None or index.version != version - 1:
+        # 캐시가 없거나 중간 버전을 놓친 경우 다음 조회 시 재생성
+        _exact_indexes.pop(uid, None)
+        return
+    index.remove_documents(removed_ids)
+    index.add_documents(added)
+    index.version = version
+    index.save(_get_index_dir(uid))
+
+def get_page_index(uid: str = "default") -> PageIndex:
+    """
+    유저 UID별 (doc_name, page) → 청크 인덱스를 반환합니다. (캐싱 사용)
+    키워드 인덱스와 버전이 다르면 키워드 인덱스의 메타데이터 열로 다시 만듭니다. (원문 디코딩 없음)
+    """
+    keyword_index = get_keyword_index(uid=uid)
+    index = _page_indexes.get(uid)
+    if index is None or index.version != keyword_index.version:
+        index = PageIndex.from_locations(
+            keyword_index.iter_locations(), version=keyword_index.version, page_aliases=keyword_index.page_aliases
+        )
+        _page_indexes[uid] = index
+    return index
 
-def get_okt():
-    global _okt
-    if _okt is None:
+def _update_page_index(uid: str, version: int, added: List[Document] = (), removed_ids: List[str] = ()):
+    """키워드 인덱스와 같은 버전으로 페이지 인덱스를 증분 갱신합니다."""
+    index = _page_indexes.get(uid)
+    if index is None or index.version != version - 1:
+        _page_indexes.pop(uid, None)
+        return
+    index.remove(removed_ids)
+    for doc in added:
+        page = doc.metadata.get("page")
+        index.add(
+            doc.metadata["doc_id"], doc.metadata.get("doc_name"), int(page) if page is not None else None,
+            alias_pages(doc.metadata)
+        )
+    index.version = version
+
+def get_page_summary_index(uid: str = "default") -> PageSummaryIndex:
+    """
+    유저 UID별 페이지 요약 벡터 인덱스를 반환합니다. (캐싱 사용)
+    키워드 인덱스와 버전이 다르면 디스크에서 다시 읽고, 페이지별 대표 청크의 요약 텍스트가 바뀐 페이지만 다시 임베딩합니다.
+    """
+    keyword_index = get_keyword_index(uid=uid)
+    index = _page_summary_indexes.get(uid)
+    if index is not None and index.version == keyword_index.version:
+        return index
+
+    index_dir = _get_index_dir(uid)
+    if index is None:
         try:
-            from konlpy.tag import Okt
-            # KoNLPy 내부적으로 init_jvm()을 호출하므로 직접 jpype를 시작할 필요가 없습니다.
-            # Java 환경(Jar 파일 로출 등) 이슈로 에러 발생 시 조용히 폴백합니다.
-            _okt = Okt()
-            print("KoNLPy Okt 토크나이저 활성화.")
+            index = PageSummaryIndex.load(index_dir)
         except Exception as e:
-            # 에러 로그를 한 번만 출력하고, 다음부터는 'FAILED' 상태를 유지하여 재시도를 건너뜁니다.
-            print(f"KoNLPy 로드 실패 (기본 토크나이저 전환): {e}")
-            _okt = "FAILED"
-            return None
-    
-    if _okt == "FAILED":
-        return None
-    return _okt
-
-def korean_tokenizer(text: str) -> List[str]:
-    """Okt를 사용한 전역 한국어 토크나이저 (지연 로드 방식)"""
-    okt = get_okt()
-    if okt:
+            print(f"페이지 요약 인덱스 로드 실패 (재생성 진행): {e}")
+        index = index or PageSummaryIndex()
+
+    if index.version != keyword_index.version:
+        page_index = get_page_index(uid)
+        first_chunks = [chunk_ids[0] for _, chunk_ids in page_index.iter_pages()]
+        pages = {(doc.metadata.get("doc_name"), int(doc.metadata["page"])): doc for doc in keyword_index.get_documents(first_chunks)}
+        updated, removed = index.update(pages, get_embedding_function().embed_documents, page_index=page_index)
+        index.version = keyword_index.version
         try:
-            return okt.morphs(text)
+            index.save(index_dir)
         except Exception as e:
-            print(f"Okt 토크나이징 오류: {e}")
-            return text.split()
-    return text.split()
+            print(f"페이지 요약 인덱스 저장 실패: {e}")
+        print(f"페이지 요약 인덱스 동기화: 임베딩 {updated}개, 삭제 {removed}개 페이지 (UID: {uid}, 총 {len(index)}개, v{index.version})")
 
-BM25_PREPROCESS_FUNC = korean_tokenizer
-# --- 끝 ---
+    _page_summary_indexes[uid] = index
+    return index
 
-BM25_INDEX_PATH = Path(settings.BM25_INDEX_PATH)
+def _update_page_summary_index(uid: str, version: int, added: List[Document] = ()):
+    """
+    페이지 인덱스 갱신 후 같은 버전으로 페이지 요약 인덱스를 증분 갱신합니다.
+    추가된 청크의 페이지 중 요약이 바뀐 페이지만 임베딩하고, 청크가 모두 사라진 페이지는 삭제합니다.
+    """
+    index = _page_summary_indexes.get(uid)
+    if index is None or index.version != version - 1:
+        _page_summary_indexes.pop(uid, None)
+        return
+    pages = {}
+    for doc in added:
+        if doc.metadata.get("page") is not None:
+            pages.setdefault((doc.metadata.get("doc_name"), int(doc.metadata["page"])), doc)
+    try:
+        index.update(pages, get_embedding_function().embed_documents, page_index=get_page_index(uid))
+        index.version = version
+        index.save(_get_index_dir(uid))
+    except Exception as e:
+        # 임베딩 실패 시 다음 조회에서 다시 동기화
+        print(f"페이지 요약 인덱스 증분 갱신 실패: {e}")
+        _page_summary_indexes.pop(uid, None)
+
+def get_page_documents(
+    uid: str,
+    query: str,
+    page: int,
+    doc_name: Optional[str] = None,
+    radius: int = 0
+) -> List[Document]:
+    """
+    페이지 라우터: 페이지 지정 질문을 임베딩/벡터 검색 없이 페이지 인덱스 조회로 해석합니다.
+    요청 페이지의 청크는 해당 페이지 범위의 키워드(BM25) 점수 순으로 앞에 두고,
+    점수가 없는 청크와 주변 페이지(radius) 청크는 페이지 순서대로 뒤에 붙입니다.
+    해당 페이지가 인덱스에 없으면 빈 리스트를 반환합니다. 구독한 공유 코퍼스가 있으면 개인 인덱스 결과 뒤에 이어 붙입니다.
+    근사 중복 병합으로 이 페이지에도 등장하는 대표 청크는 요청 페이지(가장 가까운 페이지)의 page / image_path로 바꿔 반환합니다.
+    """
+    pages = [page + offset for offset in [0] + neighbor_offsets("both", radius)]
+    documents = []
+    for search_uid in get_search_uids(uid, doc_name):
+        keyword_index = get_keyword_index(uid=search_uid)
+        chunk_ids = get_page_index(search_uid).route(page, doc_name=doc_name, radius=radius)
+        if not chunk_ids:
+            continue
+        scored = [chunk_id for chunk_id, _ in keyword_index.search(query, k=len(chunk_ids), doc_name=doc_name, page=page)]
+        documents.extend(localize(doc, pages) for doc in keyword_index.get_documents(dict.fromkeys(scored + chunk_ids)))
+    return documents
+
+# 페이지 이동 방향별 연속 연결 메타데이터 키 (인제스트 시 continuation 모듈이 기록)
+_LINK_KEYS = {1: "continues_to_next", -1: "continues_from_prev"}
+
+def get_neighbor_documents(
+    uid: str,
+    docs: List[Document],
+    direction: str = "next",
+    radius: int = 1,
+    follow_links: bool = False
+) -> List[List[Document]]:
+    """
+    각 문서의 주변 페이지 청크를 반환합니다. 구독한 공유 코퍼스 문서의 주변 페이지는 해당 코퍼스 인덱스에서 찾습니다.
+    """
+    if len(get_search_uids(uid)) == 1:
+        return _get_neighbor_documents(uid, docs, direction, radius, follow_links)
+    subscriptions = read_subscriptions(uid).documents
+    groups: Dict[str, List[int]] = {}
+    for i, doc in enumerate(docs):
+        groups.setdefault(subscriptions.get(doc.metadata.get("doc_name"), uid), []).append(i)
+    results: List[List[Document]] = [[] for _ in docs]
+    for search_uid, positions in groups.items():
+        neighbors = _get_neighbor_documents(search_uid, [docs[i] for i in positions], direction, radius, follow_links)
+        for i, neighbor_docs in zip(positions, neighbors):
+            results[i] = neighbor_docs
+    return results
+
+def _get_neighbor_documents(
+    uid: str,
+    docs: List[Document],
+    direction: str = "next",
+    radius: int = 1,
+    follow_links: bool = False
+) -> List[List[Document]]:
+    """
+    각 문서의 주변 페이지(direction: next / previous / both, radius 페이지) 청크를 반환합니다.
+    거리(hop)마다 필요한 모든 페이지를 페이지 인덱스에서 찾은 뒤 키워드 인덱스에서 한 번에 복원하므로
+    문서마다 벡터 스토어를 조회하지 않습니다. 결과는 입력 문서 순서와 같은 리스트의 리스트입니다.
+    follow_links이면 인제스트 시 저장된 연속 연결(continues_to_next / continues_from_prev)이 있는 방향으로만
+    따라가며, 연결 정보가 없는 (이전에 인제스트된) 청크는 연결된 것으로 간주합니다.
+    """
+    page_index = get_page_index(uid)
+    keyword_index = get_keyword_index(uid=uid)
+    steps = neighbor_offsets(direction, 1)
+
+    results: List[List[Document]] = [[] for _ in docs]
+    # (결과 위치, 이동 방향, 현재 페이지, 현재 페이지의 메타데이터)
+    frontier = []
+    for i, doc in enumerate(docs):
+        if doc.metadata.get("doc_name") and doc.metadata.get("page") is not None:
+            frontier.extend((i, step, int(doc.metadata["page"]), doc.metadata) for step in steps)
+
+    for _ in range(radius):
+        targets = []
+        for i, step, page, metadata in frontier:
+            if follow_links and not metadata.get(_LINK_KEYS[step], True):
+                continue
+            chunk_ids = page_index.get_chunks(docs[i].metadata["doc_name"], page + step)
+            if chunk_ids:
+                targets.append((i, step, page + step, chunk_ids))
+        if not targets:
+            break
+
+        unique_ids = list(dict.fromkeys(chunk_id for *_, chunk_ids in targets for chunk_id in chunk_ids))
+        by_id = {doc.metadata["doc_id"]: doc for doc in keyword_index.get_documents(unique_ids)}
+        frontier = []
+        for i, step, page, chunk_ids in targets:
+            page_docs = [localize(by_id[chunk_id], [page]) for chunk_id in chunk_ids if chunk_id in by_id]
+            results[i].extend(page_docs)
+            if page_docs:
+                frontier.append((i, step, page, page_docs[0].metadata))
+    return results
+
+def get_exact_match_documents(
+    uid: str,
+    query: str,
+    doc_name: Optional[str] = None,
+    page: Optional[int] = None,
+    limit: Optional[int] = None
+) -> List[Tuple[Document, float]]:
+    """
+    질문의 에러 코드 / 파라미터 번호 / 모델명을 정확 일치 인덱스로 조회하여 해당 청크를 (Document, BM25 점수)로 반환합니다.
+    코드가 목록/색인 페이지에 수십 번 등장해도 실제 설명 청크가 앞에 오도록, 질문 전체에 대한 BM25 점수 내림차순으로 정렬합니다.
+    (더 많은 질문 코드를 포함한 청크는 BM25 점수도 높으며, 동점은 정확 일치 인덱스 순서를 유지)
+    구독한 공유 코퍼스가 있으면 개인 인덱스 결과와 함께 정렬하며, 최대 limit개만 반환합니다.
+    코드가 없거나 일치하는 청크가 없으면 빈 리스트를 반환합니다.
+    """
+    codes = extract_codes(query.upper())
+    if not codes:
+        return []
+    scored = []
+    for search_uid in get_search_uids(uid, doc_name):
+        hits = get_exact_index(search_uid).lookup_many(codes, doc_name=doc_name, page=page)
+        if not hits:
+            continue
+        keyword_index = get_keyword_index(uid=search_uid)
+        scores = keyword_index.score_documents(query, (hit.chunk_id for hit in hits))
+        documents = keyword_index.get_documents(hit.chunk_id for hit in hits)
+        scored.extend((doc, scores.get(doc.metadata["doc_id"], 0.0)) for doc in documents)
+    scored.sort(key=lambda item: -item[1])
+    return scored[:limit] if limit else scored
+
+def add_documents_to_keyword_index(uid: str, documents: List[Document]) -> int:
+    """
+    인제스트된 청크만 키워드 인덱스와 코드 정확 일치 / 페이지 인덱스에 증분 추가하고 디스크에 반영합니다.
+    인덱스 매니페스트 버전도 함께 올리고, 해당 유저의 검색 캐시를 비웁니다.
+    """
+    index = get_keyword_index(uid=uid)
+    index_dir = _get_index_dir(uid)
+
+    # 이미 같은 원문으로 인덱싱된 청크(예: 최초 로드 시 벡터 스토어로부터 생성된 경우)는 건너뜀
+    current_texts = {doc.metadata["doc_id"]: index.get_text(doc.metadata["doc_id"]) for doc in documents if doc.metadata.get("doc_id")}
+    documents = [
+        doc for doc in documents
+        if doc.metadata.get("doc_id") and current_texts[doc.metadata["doc_id"]] != doc.page_content
+    ]
+    if not documents:
+        return 0
+    replaced = [
+        (doc.metadata["doc_id"], current_texts[doc.metadata["doc_id"]])
+        for doc in documents if current_texts[doc.metadata["doc_id"]] is not None
+    ]
+    tokens = tokenize_batch([doc.page_content for doc in documents], mode=index.tokenizer_name)
+    added = index.add_documents(documents, tokens=tokens)
+
+    manifest = bump_manifest(
+        index_dir,
+        added=[(doc.metadata["doc_id"], doc.page_content) for doc in documents],
+        removed=replaced
+    )
+    index.version = manifest.version
+    index.save(index_dir)
+    _update_exact_index(uid, manifest.version, added=documents)
+    _update_page_index(uid, manifest.version, added=documents)
+    _update_page_summary_index(uid, manifest.version, added=documents)
+    invalidate_tenant(uid)
+    print(f"키워드 인덱스 증분 추가: {added}개 청크 (UID: {uid}, 총 {len(index)}개, v{index.version})")
+    return added
+
+def remove_document_from_keyword_index(uid: str, doc_name: str) -> int:
+    """
+    지정된 문서의 청크만 키워드 인덱스와 코드 정확 일치 / 페이지 인덱스에서 제거하고 디스크에 반영합니다.
+    인덱스 매니페스트 버전도 함께 올리고, 해당 유저의 검색 캐시를 비웁니다.
+    """
+    index = get_keyword_index(uid=uid)
+    index_dir = _get_index_dir(uid)
+    removed_entries = list(index.iter_entries(doc_name=doc_name))
+    removed = index.remove_documents(chunk_id for chunk_id, _ in removed_entries)
+
+    manifest = bump_manifest(index_dir, removed=removed_entries)
+    index.version = manifest.version
+    index.save(index_dir)
+    removed_ids = [chunk_id for chunk_id, _ in removed_entries]
+    _update_exact_index(uid, manifest.version, removed_ids=removed_ids)
+    _update_page_index(uid, manifest.version, removed_ids=removed_ids)
+    _update_page_summary_index(uid, manifest.version)
+    invalidate_tenant(uid)
+    print(f"키워드 인덱스 증분 삭제: {removed}개 청크 (UID: {uid}, 총 {len(index)}개, v{index.version})")
+    return removed
+
+class HybridRetriever(BaseRetriever):
+    """
+    키워드(BM25) 레그와 벡터 레그의 후보를 fusion 엔진으로 합치는 하이브리드 리트리버입니다.
+    EnsembleRetriever와 달리 청크 ID 기준으로 중복을 제거하고, 레그별 점수/순위를 요청별 파라미터로 융합합니다.
+    retrieval_planner로 여러 서브 쿼리의 레그를 동시에 실행한 뒤 결과를 한 번에 융합할 수도 있습니다.
+    공유 코퍼스를 구독한 유저이면 각 레그가 개인 인덱스와 구독 코퍼스 인덱스를 함께 검색하고 점수 순으로 병합합니다.
+    """
+
+    keyword_index: Any = None
+    vector_store: Any
+    k: int = 40
+    # 검색 범위 제한 (doc_name / page 키 지원)
+    metadata_filter: Dict[str, Any] = {}
+    fusion_params: FusionParams = Field(default_factory=FusionParams)
+    # 2단계 벡터 검색용 페이지 요약 인덱스 (설정 시 상위 페이지의 청크 안에서만 벡터 검색)
+    page_summary_index: Any = None
+    # 구독한 공유 코퍼스 문서 (doc_name -> 코퍼스 UID)
+    subscriptions: Dict[str, str] = {}
+
+    def tiers(self) -> List["HybridRetriever"]:
+        """
+        검색할 계층별 리트리버 목록: 자신(개인 인덱스) + 구독 코퍼스 리트리버.
+        문서명 필터가 있으면 해당 문서가 있는 계층 하나만 검색합니다.
+        """
+        if not self.subscriptions:
+            return [self]
+        doc_name = self.metadata_filter.get("doc_name")
+        if doc_name:
+            if doc_name not in self.subscriptions:
+                return [self]
+            corpus_uids = [self.subscriptions[doc_name]]
+        else:
+            corpus_uids = list(dict.fromkeys(self.subscriptions.values()))
+        corpus_tiers = [
+            get_corpus_retriever(corpus_uid).model_copy(update={"k": self.k, "metadata_filter": self.metadata_filter})
+            for corpus_uid in corpus_uids
+        ]
+        return corpus_tiers if doc_name else [self] + corpus_tiers
+
+    def keyword_hits(self, query: str) -> List[Tuple[Document, float]]:
+        tiers = self.tiers()
+        if len(tiers) == 1:
+            return tiers[0].local_keyword_hits(query)
+        return merge_hits([tier.local_keyword_hits(query) for tier in tiers], self.k)
+
+    def local_keyword_hits(self, query: str) -> List[Tuple[Document, float]]:
+        if self.keyword_index is None or len(self.keyword_index) == 0:
+            return []
+        return self.keyword_index.search_with_scores(query, k=self.k, **self.metadata_filter)
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        return embed_queries(queries, self.vector_store.embeddings)
+
+    def _alias_ids(self, doc_name: Optional[str], page: int) -> List[str]:
+        """페이지에 근사 중복 병합된 대표 청크 ID (키워드 인덱스의 별칭 페이지 기준)"""
+        return self.keyword_index.alias_ids(page, doc_name) if self.keyword_index is not None else []
+
+    def search_filter(self) -> Dict[str, Any]:
+        """metadata_filter에 해당하는 벡터 레그 where 필터 (페이지 조건에는 해당 페이지에 병합된 대표 청크 포함)"""
+        page = self.metadata_filter.get("page")
+        alias_ids = self._alias_ids(self.metadata_filter.get("doc_name"), page) if page is not None else ()
+        return build_search_filter(**self.metadata_filter, alias_ids=alias_ids)
+
+    def vector_filters(self, embeddings: List[List[float]]) -> List[Dict[str, Any]]:
+        """
+        쿼리 벡터별 벡터 레그 where 필터를 반환합니다.
+        페이지 요약 인덱스가 있으면 (페이지 필터가 없을 때) 1단계로 상위 페이지를 골라 해당 페이지로 범위를 좁힙니다.
+        """
+        search_filter = self.search_filter()
+        if self.page_summary_index is None or "page" in self.metadata_filter:
+            return [search_filter for _ in embeddings]
+        page_lists = self.page_summary_index.search(
+            embeddings, settings.PAGE_SUMMARY_TOP_PAGES, doc_name=self.metadata_filter.get("doc_name")
+        )
+        return [
+            build_pages_filter(pages, {key: self._alias_ids(*key) for key in pages}) if pages else search_filter
+            for pages in page_lists
+        ]
+
+    def vector_hits_by_vector(self, embedding: List[float]) -> List[Tuple[Document, float]]:
+        """임베딩 벡터로 벡터 레그를 검색합니다. 점수는 -거리(클수록 유사)입니다."""
+        tiers = self.tiers()
+        if len(tiers) == 1:
+            return tiers[0].local_vector_hits_by_vector(embedding)
+        return merge_hits([tier.local_vector_hits_by_vector(embedding) for tier in tiers], self.k)
+
+    def local_vector_hits_by_vector(self, embedding: List[float]) -> List[Tuple[Document, float]]:
+        search_kwargs: Dict[str, Any] = {}
+        search_filter = self.vector_filters([embedding])[0]
+        if search_filter:
+            search_kwargs["filter"] = search_filter
+        hits = self.vector_store.similarity_search_by_vector_with_relevance_scores(embedding, k=self.k, **search_kwargs)
+        return [(doc, -distance) for doc, distance in hits]
+
+    @property
+    def batch_vector_search(self) -> bool:
+        """벡터 스토어가 여러 쿼리 벡터를 한 번에 검색할 수 있는지 여부 (인프로세스 ANN 백엔드)"""
+        return hasattr(self.vector_store, "similarity_search_by_vectors_with_relevance_scores")
+
+    def vector_hits_batch(self, embeddings: List[List[float]]) -> List[List[Tuple[Document, float]]]:
+        """
+        여러 임베딩 벡터로 벡터 레그를 한 번에 검색합니다. 점수는 -거리입니다.
+        2단계 검색이면 쿼리마다 선택된 페이지가 다르므로 쿼리별 필터로 검색합니다.
+        """
+        tiers = self.tiers()
+        tier_results = [
+            tier.local_vector_hits_batch(embeddings) if tier.batch_vector_search
+            else [tier.local_vector_hits_by_vector(embedding) for embedding in embeddings]
+            for tier in tiers
+        ]
+        if len(tier_results) == 1:
+            return tier_results[0]
+        return [merge_hits(hit_lists, self.k) for hit_lists in zip(*tier_results)]
+
+    def local_vector_hits_batch(self, embeddings: List[List[float]]) -> List[List[Tuple[Document, float]]]:
+        search = self.vector_store.similarity_search_by_vectors_with_relevance_scores
+        if self.page_summary_index is None:
+            results = search(embeddings, k=self.k, filter=self.search_filter() or None)
+        else:
+            results = [
+                search([embedding], k=self.k, filter=search_filter or None)[0]
+                for embedding, search_filter in zip(embeddings, self.vector_filters(embeddings))
+            ]
+        return [[(doc, -distance) for doc, distance in hits] for hits in results]
+
+    def vector_hits(self, query: str) -> List[Tuple[Document, float]]:
+        return self.vector_hits_by_vector(self.embed_queries([query])[0])
+
+    def ranked_lists(self, query: str) -> List[RankedList]:
+        """한 쿼리에 대한 레그별 (Document, 점수) 후보 리스트를 반환합니다. (키워드/벡터 레그 동시 실행)"""
+        return retrieve_ranked_lists(self, [query])
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return fuse(self.ranked_lists(query), self.fusion_params, top_n=self.fusion_params.top_n or self.k)
+
+def merge_hits(hit_lists: List[List[Tuple[Document, float]]], k: int) -> List[Tuple[Document, float]]:
+    """여러 계층(개인 인덱스 / 공유 코퍼스)의 같은 레그 결과를 점수 내림차순 상위 k개로 병합합니다."""
+    return heapq.nlargest(k, (hit for hits in hit_lists for hit in hits), key=lambda hit: hit[1])
+
+def get_corpus_retriever(corpus_uid: str) -> HybridRetriever:
+    """
+    공유 코퍼스의 리트리버를 반환합니다. (캐싱 사용)
+    코퍼스 인덱스 버전이 바뀌면(재인덱싱) 다시 만들며, 코퍼스도 일반 유저처럼 테넌트 캐시가 LRU/유휴 TTL로 제거합니다.
+    """
+    retriever = _corpus_retrievers.get(corpus_uid)
+    if retriever is not None and retriever.keyword_index.version == get_index_version(corpus_uid):
+        tenant_cache.touch(corpus_uid)
+        return retriever
+    retriever = get_retriever(uid=corpus_uid)
+    _corpus_retrievers[corpus_uid] = retriever
+    return retriever
 
 def get_retriever(
     uid: str = "default",
     collection_name: str = settings.COLLECTION_NAME,
-    search_kwargs: Dict[str, Any] = {"k": 40},
-    ensemble_weights: List[float] = [0.5, 0.5],
+    search_kwargs: Optional[Dict[str, Any]] = None,
+    ensemble_weights: Optional[List[float]] = None,
     force_update: bool = False
-) -> BaseRetriever:
+) -> HybridRetriever:
     """
-    유저 UID별 EnsembleRetriever를 반환합니다.
-    BM25 인덱스는 {CHROMA_DB_DIR}/{uid}/bm25_index.pkl 에 저장됩니다.
+    유저 UID별 HybridRetriever(BM25 + 벡터)를 반환합니다.
+    키워드 인덱스는 {CHROMA_DB_DIR}/{uid}/keyword_index/ 에 메모리 매핑 형식으로 저장되며,
+    인덱스 매니페스트 버전이 바뀌었거나 force_update인 경우에만 재생성합니다.
+    ensemble_weights는 [키워드, 벡터] 레그의 융합 가중치입니다. (기본값: RETRIEVAL_K / ENSEMBLE_WEIGHTS 설정)
+    SHARED_CORPUS_ENABLED이면 유저의 구독 목록을 함께 담아 구독 코퍼스까지 검색합니다.
     """
     # 유저별 전용 경로 설정
-    db_path = os.path.join(settings.CHROMA_DB_DIR, uid)
-    bm25_path = Path(db_path) / "bm25_index.pkl"
-    
+    db_path = _get_index_dir(uid)
     vector_store = get_vector_store(uid=uid, collection_name=collection_name, db_path=db_path)
-    
-    # Vector Retriever 초기화
-    vector_retriever = vector_store.as_retriever(
-        search_kwargs=search_kwargs
-    )
+    keyword_index = get_keyword_index(uid=uid, collection_name=collection_name, force_update=force_update)
 
-    bm25_retriever = None
-
-    # 1. 캐시된 BM25 인덱스 로드 시도 (force_update가 아닐 때)
-    if not force_update and bm25_path.exists():
+    # 큰 테넌트는 페이지 요약 인덱스로 후보 페이지를 먼저 고르는 2단계 벡터 검색 사용
+    page_summary_index = None
+    if settings.PAGE_SUMMARY_ENABLED and len(keyword_index) >= settings.PAGE_SUMMARY_MIN_CHUNKS:
         try:
-            with open(bm25_path, "rb") as f:
-                bm25_retriever = pickle.load(f)
-            bm25_retriever.k = search_kwargs.get("k", 20)
+            page_summary_index = get_page_summary_index(uid)
         except Exception as e:
-            print(f"BM25 인덱스 로드 실패 (재생성 진행): {e}")
-
-    # 2. 인덱스가 없거나 강제 업데이트인 경우 재생성 로직
-    if bm25_retriever is None:
-        print("BM25 인덱스 재/생성 절차를 시작합니다.")
-        
-        # 모든 문서 가져오기 (Source of Truth)
-        collection_data = vector_store.get(include=["metadatas", "documents"])
-        ids = collection_data.get("ids", [])
-        texts = collection_data.get("documents", [])
-        metadatas = collection_data.get("metadatas", [])
-        
-        # 문서가 없으면 Vector Retriever만 반환
-        if not texts:
-            return vector_retriever
-
-        # (최적화) 기존 인덱스가 있고, 문서 ID 집합이 동일하면 재생성 스킵
-        if bm25_path.exists():
-            try:
-                with open(bm25_path, "rb") as f:
-                    cached_retriever = pickle.load(f)
-                
-                # 'doc_id'가 메타데이터에 있는지 확인하고 ID 집합 생성
-                cached_ids = {doc.metadata['doc_id'] for doc in cached_retriever.docs if 'doc_id' in doc.metadata}
-                current_ids = set(ids)
-                
-                if cached_ids == current_ids:
-                    print(f"BM25 인덱스가 이미 최신 상태입니다. ({len(current_ids)}개 문서) 생성을 건너뜜 (UID: {uid})")
-                    bm25_retriever = cached_retriever
-                    bm25_retriever.k = search_kwargs.get("k", 20)
-                else:
-                    print(f"문서 변경이 감지되어 BM25 인덱스를 재생성합니다. (UID: {uid})")
-            except Exception as e:
-                print(f"캐시된 BM25 인덱스 비교 중 오류 발생 (재생성 진행): {e}")
-
-    # 3. 최종적으로 BM25 리트리버가 없으면 생성
-    if bm25_retriever is None:
-        # LangChain Document 객체 리스트로 변환 (doc_id를 메타데이터에 포함)
-        documents = [
-            Document(page_content=texts[i], metadata={**metadatas[i], "doc_id": ids[i]}) 
-            for i in range(len(ids))
-        ]
+            print(f"페이지 요약 인덱스 준비 실패 (단일 단계 검색 사용): {e}")
 
-        print(f"BM25 인덱스 생성을 시작합니다 ({len(documents)}개 문서)...")
-        
-        # BM25 Retriever 초기화 (전역 토크나이저 사용)
-        bm25_retriever = BM25Retriever.from_documents(
-            documents=tqdm(documents, desc="BM25 인덱싱"),
-            preprocess_func=BM25_PREPROCESS_FUNC
-        )
-        bm25_retriever.k = search_kwargs.get("k", 20)
-        
-        # 인덱스 저장
-        try:
-            bm25_path.parent.mkdir(parents=True, exist_ok=True)
-            with open(bm25_path, "wb") as f:
-                pickle.dump(bm25_retriever, f)
-            print(f"BM25 인덱스가 '{bm25_path}'에 저장되었습니다.")
-        except Exception as e:
-            print(f"BM25 인덱스 저장 실패: {e}")
+    search_kwargs = search_kwargs or {}
+    ensemble_weights = ensemble_weights or settings.ENSEMBLE_WEIGHTS
+    subscriptions = {}
+    if settings.SHARED_CORPUS_ENABLED and not is_corpus_uid(uid):
+        subscriptions = read_subscriptions(uid).documents
 
-    # Ensemble Retriever 생성
-    ensemble_retriever = EnsembleRetriever(
-        retrievers=[bm25_retriever, vector_retriever],
-        weights=ensemble_weights
+    return HybridRetriever(
+        keyword_index=keyword_index,
+        vector_store=vector_store,
+        k=search_kwargs.get("k", settings.RETRIEVAL_K),
+        fusion_params=FusionParams(weights={"keyword": ensemble_weights[0], "vector": ensemble_weights[1]}),
+        page_summary_index=page_summary_index,
+        subscriptions=subscriptions
     )
 
-    return ensemble_retriever
+def build_search_filter(
+    doc_name: Optional[str] = None,
+    page: Optional[int] = None,
+    alias_ids: Sequence[str] = ()
+) -> Dict[str, Any]:
+    """
+    문서명/페이지 조건을 ChromaDB where 필터로 변환합니다. 조건이 없으면 빈 딕셔너리를 반환합니다.
+    alias_ids는 근사 중복 병합으로 이 페이지에도 등장하는 대표 청크 ID이며, 페이지 조건에 $or로 함께 포함됩니다.
+    """
+    conditions = []
+    if doc_name:
+        conditions.append({"doc_name": {"$eq": doc_name}})
+    if page is not None:
+        page_condition = {"page": {"$eq": int(page)}}
+        if alias_ids:
+            page_condition = {"$or": [page_condition, {"doc_id": {"$in": list(alias_ids)}}]}
+        conditions.append(page_condition)
+    if not conditions:
+        return {}
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+def build_pages_filter(
+    pages: List[Tuple[Optional[str], int]],
+    aliases: Optional[Dict[Tuple[Optional[str], int], List[str]]] = None
+) -> Dict[str, Any]:
+    """
+    (doc_name, page) 목록 중 하나에 속하는 청크를 찾는 ChromaDB where 필터를 만듭니다.
+    aliases는 (doc_name, page) -> 해당 페이지에 병합된 대표 청크 ID입니다.
+    """
+    aliases = aliases or {}
+    conditions = [
+        build_search_filter(doc_name=doc_name, page=page, alias_ids=aliases.get((doc_name, page), ()))
+        for doc_name, page in dict.fromkeys(pages)
+    ]
+    return conditions[0] if len(conditions) == 1 else {"$or": conditions}
+
+def get_filtered_retriever(
+    uid: str = "default",
+    doc_name: Optional[str] = None,
+    page: Optional[int] = None,
+    k: int = None,
+    collection_name: str = settings.COLLECTION_NAME,
+    ensemble_weights: Optional[List[float]] = None
+) -> HybridRetriever:
+    """
+    문서명/페이지 필터가 적용된 하이브리드(BM25 + 벡터) 리트리버를 반환합니다.
+    키워드 레그는 인덱스의 메타데이터 열 마스크로, 벡터 레그는 Chroma where 필터로 같은 범위를 검색하므로
+    범위를 좁힌 상태에서도 에러 코드 같은 정확 일치 검색이 유지됩니다.
+    """
+    metadata_filter: Dict[str, Any] = {}
+    if doc_name:
+        metadata_filter["doc_name"] = doc_name
+    if page is not None:
+        metadata_filter["page"] = int(page)
+
+    retriever = get_retriever(uid=uid, collection_name=collection_name, ensemble_weights=ensemble_weights)
+    return retriever.model_copy(update={"k": k or settings.FILTERED_SEARCH_K, "metadata_filter": metadata_filter})
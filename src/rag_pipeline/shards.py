@@ -0,0 +1,222 @@
+"""
+문서별 벡터 인덱스 샤딩 모듈입니다.
+
+기본 구성에서는 한 유저의 모든 문서가 Chroma 컬렉션 하나를 공유하므로,
+doc_name 필터는 검색 내부의 메타데이터 조건으로, 문서 삭제는 컬렉션 전체에 대한 delete(where=...)로 처리됩니다.
+INDEX_SHARDING=document이면 같은 Chroma 클라이언트 안에서 문서마다 컬렉션(샤드)을 따로 만들고,
+유저별 라우터(ShardedVectorStore)가 필터를 보고 검색할 샤드를 고릅니다.
+
+    - doc_name 필터 검색 : 해당 문서 샤드만 검색 (필터에서 doc_name 조건 제거)
+    - 페이지 목록($or) 필터 : 조건에 등장하는 문서 샤드만 검색
+    - 필터 없는 검색 : 모든 샤드를 검색한 뒤 거리 기준으로 병합
+    - 문서 삭제 : 샤드 컬렉션 삭제 (다른 문서 청크는 건드리지 않음)
+
+샤딩 전에 만들어진 공용 컬렉션(COLLECTION_NAME)이 있으면 레거시 샤드로 함께 검색/삭제하므로 재인제스트 없이 전환할 수 있습니다.
+"""
+import hashlib
+import heapq
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+
+SHARD_SEPARATOR = "-doc-"
+
+ShardRoute = Tuple[Chroma, Optional[Dict[str, Any]]]
+
+
+def shard_collection_name(collection_name: str, doc_name: str) -> str:
+    """문서 샤드 컬렉션 이름 (Chroma 이름 규칙에 맞도록 문서명 해시 사용)"""
+    return f"{collection_name}{SHARD_SEPARATOR}{hashlib.sha1(doc_name.encode('utf-8')).hexdigest()[:16]}"
+
+
+def _doc_name_of(condition: Dict[str, Any]) -> Optional[str]:
+    """{"doc_name": x} 또는 {"doc_name": {"$eq": x}} 조건이면 문서명을 반환합니다."""
+    if len(condition) != 1 or "doc_name" not in condition:
+        return None
+    value = condition["doc_name"]
+    if isinstance(value, dict):
+        return value.get("$eq") if list(value) == ["$eq"] else None
+    return value
+
+
+def split_doc_filter(search_filter: Optional[Dict[str, Any]]) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    """
+    where 필터를 (문서명, 나머지 필터)로 나눕니다.
+    문서명 조건이 없거나 나눌 수 없는 형태이면 (None, 원래 필터)를 반환합니다.
+    """
+    if not search_filter:
+        return None, None
+    doc_name = _doc_name_of(search_filter)
+    if doc_name is not None:
+        return doc_name, None
+    conditions = search_filter.get("$and") if list(search_filter) == ["$and"] else None
+    if conditions:
+        doc_names = [_doc_name_of(condition) for condition in conditions]
+        if sum(name is not None for name in doc_names) == 1:
+            rest = [condition for condition, name in zip(conditions, doc_names) if name is None]
+            doc_name = next(name for name in doc_names if name is not None)
+            return doc_name, (rest[0] if len(rest) == 1 else {"$and": rest}) if rest else None
+    return None, search_filter
+
+
+class ShardedVectorStore:
+    """
+    유저별 문서 샤드 라우터. Chroma와 같은 이름의 메서드(get / add_documents /
+    similarity_search_by_vector_with_relevance_scores / embeddings)를 제공하므로 기존 호출 코드는 그대로 동작합니다.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        collection_name: str,
+        embedding_function: Any,
+        shard_metadata: Optional[Dict[str, Any]] = None
+    ):
+        self.client = client
+        self.collection_name = collection_name
+        self._embedding_function = embedding_function
+        # 새 샤드 컬렉션 메타데이터에 함께 기록할 값 (공유 저장소의 소유 uid 등)
+        self._shard_metadata = shard_metadata or {}
+        self._shards: Dict[str, Chroma] = {}
+        self._lock = threading.Lock()
+        self._legacy: Optional[Chroma] = None
+        self._load_shards()
+
+    @property
+    def embeddings(self) -> Any:
+        return self._embedding_function
+
+    def _chroma(self, name: str, metadata: Optional[Dict[str, Any]] = None) -> Chroma:
+        return Chroma(
+            collection_name=name,
+            client=self.client,
+            embedding_function=self._embedding_function,
+            collection_metadata=metadata
+        )
+
+    def _load_shards(self):
+        """클라이언트의 컬렉션 목록에서 문서 샤드(컬렉션 메타데이터의 doc_name)와 레거시 컬렉션을 찾습니다."""
+        prefix = f"{self.collection_name}{SHARD_SEPARATOR}"
+        for collection in self.client.list_collections():
+            if collection.name == self.collection_name:
+                self._legacy = self._chroma(collection.name)
+            elif collection.name.startswith(prefix) and (collection.metadata or {}).get("doc_name"):
+                self._shards[collection.metadata["doc_name"]] = self._chroma(collection.name)
+
+    def doc_names(self) -> List[str]:
+        return sorted(self._shards)
+
+    def _shard(self, doc_name: str) -> Chroma:
+        with self._lock:
+            shard = self._shards.get(doc_name)
+            if shard is None:
+                shard = self._shards[doc_name] = self._chroma(
+                    shard_collection_name(self.collection_name, doc_name),
+                    metadata={**self._shard_metadata, "doc_name": doc_name}
+                )
+            return shard
+
+    def shards(self) -> List[Chroma]:
+        """레거시 컬렉션을 포함한 모든 샤드"""
+        return list(self._shards.values()) + ([self._legacy] if self._legacy is not None else [])
+
+    def route(self, search_filter: Optional[Dict[str, Any]] = None) -> List[ShardRoute]:
+        """where 필터를 (검색할 샤드, 샤드 안에서 적용할 필터) 목록으로 변환합니다."""
+        legacy = [(self._legacy, search_filter)] if self._legacy is not None else []
+        if search_filter and list(search_filter) == ["$or"]:
+            by_doc: Dict[str, List[Optional[Dict[str, Any]]]] = {}
+            for condition in search_filter["$or"]:
+                doc_name, rest = split_doc_filter(condition)
+                if doc_name is None:
+                    by_doc = {}
+                    break
+                by_doc.setdefault(doc_name, []).append(rest)
+            if by_doc:
+                routes = []
+                for doc_name, rests in by_doc.items():
+                    if doc_name not in self._shards:
+                        continue
+                    if any(rest is None for rest in rests):
+                        routes.append((self._shards[doc_name], None))
+                    else:
+                        routes.append((self._shards[doc_name], rests[0] if len(rests) == 1 else {"$or": rests}))
+                return routes + legacy
+
+        doc_name, rest = split_doc_filter(search_filter)
+        if doc_name is not None:
+            return ([(self._shards[doc_name], rest)] if doc_name in self._shards else []) + legacy
+        return [(shard, search_filter) for shard in self._shards.values()] + legacy
+
+    # --- 쓰기 ---
+
+    def add_documents(self, documents: List[Document], ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        """청크를 메타데이터의 doc_name별 샤드에 나누어 추가합니다."""
+        ids = ids or [doc.metadata.get("doc_id") for doc in documents]
+        groups: Dict[str, Tuple[List[Document], List[str]]] = {}
+        for doc, chunk_id in zip(documents, ids):
+            group = groups.setdefault(doc.metadata.get("doc_name") or "unknown_doc", ([], []))
+            group[0].append(doc)
+            group[1].append(chunk_id)
+        added = []
+        for doc_name, (group_documents, group_ids) in groups.items():
+            added.extend(self._shard(doc_name).add_documents(documents=group_documents, ids=group_ids, **kwargs))
+        return added
+
+    def delete_document(self, doc_name: str) -> int:
+        """문서 샤드를 삭제하고 삭제된 청크 수를 반환합니다. 레거시 컬렉션에 남은 청크도 함께 지웁니다."""
+        deleted = 0
+        with self._lock:
+            shard = self._shards.pop(doc_name, None)
+        if shard is not None:
+            deleted += shard._collection.count()
+            self.client.delete_collection(shard._collection.name)
+        if self._legacy is not None:
+            collection = self._legacy._collection
+            legacy_ids = collection.get(where={"doc_name": doc_name}, include=[]).get("ids", [])
+            if legacy_ids:
+                collection.delete(ids=legacy_ids)
+                deleted += len(legacy_ids)
+        return deleted
+
+    # --- 읽기 ---
+
+    def count(self) -> int:
+        """레거시 컬렉션을 포함한 모든 샤드의 청크 수 합계"""
+        return sum(shard._collection.count() for shard in self.shards())
+
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        include: Optional[List[str]] = None,
+        **kwargs: Any
+    ) -> Dict[str, Any]:
+        """선택된 샤드의 get 결과를 이어 붙여 반환합니다. (샤드 순서, 샤드 안에서는 Chroma 순서)"""
+        include = ["metadatas", "documents"] if include is None else include
+        merged: Dict[str, List[Any]] = {"ids": [], **{key: [] for key in include}}
+        for shard, shard_filter in self.route(where):
+            result = shard.get(ids=ids, where=shard_filter, include=include, **kwargs)
+            merged["ids"].extend(result.get("ids", []))
+            for key in include:
+                values = result.get(key)
+                merged[key].extend(values if values is not None else [])
+        return merged
+
+    def similarity_search_by_vector_with_relevance_scores(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        """필터로 고른 샤드만 검색하고, 여러 샤드이면 거리 기준 상위 k개로 병합합니다."""
+        routes = self.route(filter)
+        if len(routes) == 1:
+            shard, shard_filter = routes[0]
+            return shard.similarity_search_by_vector_with_relevance_scores(embedding, k=k, filter=shard_filter, **kwargs)
+        hits = []
+        for shard, shard_filter in routes:
+            hits.extend(shard.similarity_search_by_vector_with_relevance_scores(embedding, k=k, filter=shard_filter, **kwargs))
+        return heapq.nsmallest(k, hits, key=lambda hit: hit[1])
@@ -0,0 +1,182 @@
+"""
+공유 문서(코퍼스) 계층 모듈입니다.
+
+여러 유저가 같은 벤더 매뉴얼을 올리면 기존에는 유저마다 파싱 / 임베딩 / 저장 / BM25 인덱싱 / GCS 동기화를 반복했습니다.
+SHARED_CORPUS_ENABLED이고 업로드 시 공유를 명시(share=true)한 PDF는 내용 해시(SHA-256)로 식별하여 코퍼스 UID(corpus-{해시})에 한 번만 인덱싱하고,
+유저는 해당 코퍼스를 구독(참조)만 합니다. 공유를 명시하지 않은 업로드는 코퍼스를 조회하지 않으므로 다른 유저의 보유 여부가 드러나지 않습니다. 코퍼스는 일반 유저와 같은 UID별 저장 구조
+(벡터 스토어, 키워드/정확 일치/페이지 인덱스, 매니페스트, 테넌트 캐시, GCS 동기화)를 그대로 사용합니다.
+
+    - {CHROMA_DB_DIR}/{corpus_uid}/corpus.json : 코퍼스 문서 정보 (인덱싱 완료 표시)
+    - {CHROMA_DB_DIR}/{corpus_uid}/subscribers.json : 코퍼스 구독자 UID 목록 (참조 카운트, 마지막 구독자가 해제하면 코퍼스 삭제)
+    - {CHROMA_DB_DIR}/{uid}/subscriptions.json : 유저의 구독 목록 (doc_name -> corpus_uid, 변경마다 version 증가)
+
+검색 시 리트리버는 유저 개인 인덱스와 구독한 코퍼스 인덱스를 함께 검색(fan-out)한 뒤 레그별로 병합합니다.
+같은 PDF는 내용 해시가 같으므로 인기 매뉴얼의 저장/인제스트 비용은 구독자 수와 무관하게 한 번입니다.
+"""
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+from src.config import settings
+
+CORPUS_UID_PREFIX = "corpus-"
+CORPUS_FILENAME = "corpus.json"
+SUBSCRIPTIONS_FILENAME = "subscriptions.json"
+SUBSCRIBERS_FILENAME = "subscribers.json"
+
+_lock = threading.Lock()
+
+
+class CorpusInfo(BaseModel):
+    doc_name: str = Field(..., description="코퍼스 문서 이름 (처음 업로드한 파일명 기준)")
+    title: Optional[str] = Field(None, description="추출된 문서 제목")
+    total_pages: int = Field(0, description="페이지 수")
+    created_at: Optional[str] = Field(None, description="인덱싱 완료 시각 (UTC ISO 8601)")
+
+
+class Subscriptions(BaseModel):
+    version: int = Field(0, description="구독 변경마다 1씩 증가하는 버전")
+    documents: Dict[str, str] = Field(default_factory=dict, description="구독 문서 이름 -> 코퍼스 UID")
+
+
+def _uid_dir(uid: str) -> str:
+    return os.path.join(settings.CHROMA_DB_DIR, uid)
+
+
+def corpus_uid_for_file(file_path: str) -> str:
+    """PDF 내용 해시로 코퍼스 UID를 만듭니다. (같은 파일이면 파일명과 무관하게 같은 UID)"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return f"{CORPUS_UID_PREFIX}{digest.hexdigest()[:32]}"
+
+
+def is_corpus_uid(uid: str) -> bool:
+    return uid.startswith(CORPUS_UID_PREFIX)
+
+
+def _write_json(path: str, data: dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def read_corpus_info(corpus_uid: str) -> Optional[CorpusInfo]:
+    """코퍼스 정보를 읽습니다. 인덱싱이 끝나지 않았거나 없는 코퍼스이면 None을 반환합니다."""
+    try:
+        with open(os.path.join(_uid_dir(corpus_uid), CORPUS_FILENAME), "r", encoding="utf-8") as f:
+            return CorpusInfo(**json.load(f))
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"코퍼스 정보 읽기 실패 ({corpus_uid}): {e}")
+        return None
+
+
+def write_corpus_info(corpus_uid: str, info: CorpusInfo):
+    """코퍼스 인덱싱 완료 후 문서 정보를 기록합니다."""
+    info.created_at = info.created_at or datetime.utcnow().isoformat()
+    _write_json(os.path.join(_uid_dir(corpus_uid), CORPUS_FILENAME), info.model_dump())
+
+
+def read_subscriptions(uid: str) -> Subscriptions:
+    """유저의 구독 목록을 읽습니다. 파일이 없으면 빈 목록(버전 0)을 반환합니다."""
+    try:
+        with open(os.path.join(_uid_dir(uid), SUBSCRIPTIONS_FILENAME), "r", encoding="utf-8") as f:
+            return Subscriptions(**json.load(f))
+    except FileNotFoundError:
+        return Subscriptions()
+    except Exception as e:
+        print(f"구독 목록 읽기 실패 (UID: {uid}): {e}")
+        return Subscriptions()
+
+
+def subscribers_path(corpus_uid: str) -> str:
+    return os.path.join(_uid_dir(corpus_uid), SUBSCRIBERS_FILENAME)
+
+
+def corpus_subscribers(corpus_uid: str) -> List[str]:
+    """
+    코퍼스 구독자 UID 목록을 읽습니다.
+    구독자 목록이 없는 기존 코퍼스는 로컬 유저들의 구독 목록을 훑어 초기화합니다.
+    """
+    try:
+        with open(subscribers_path(corpus_uid), "r", encoding="utf-8") as f:
+            return list(json.load(f).get("uids", []))
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"코퍼스 구독자 목록 읽기 실패 ({corpus_uid}): {e}")
+        return []
+    if not os.path.isdir(settings.CHROMA_DB_DIR):
+        return []
+    return sorted(
+        uid for uid in os.listdir(settings.CHROMA_DB_DIR)
+        if not is_corpus_uid(uid) and corpus_uid in read_subscriptions(uid).documents.values()
+    )
+
+
+def _set_subscriber(corpus_uid: str, uid: str, subscribed: bool):
+    uids = [existing for existing in corpus_subscribers(corpus_uid) if existing != uid]
+    if subscribed:
+        uids.append(uid)
+    _write_json(subscribers_path(corpus_uid), {"uids": uids})
+
+
+def subscribe(uid: str, doc_name: str, corpus_uid: str) -> Subscriptions:
+    """코퍼스 문서를 유저의 구독 목록과 코퍼스 구독자 목록에 추가합니다. (이미 같은 구독이면 그대로 반환)"""
+    with _lock:
+        subscriptions = read_subscriptions(uid)
+        previous = subscriptions.documents.get(doc_name)
+        if previous == corpus_uid:
+            return subscriptions
+        subscriptions.documents[doc_name] = corpus_uid
+        subscriptions.version += 1
+        _write_json(os.path.join(_uid_dir(uid), SUBSCRIPTIONS_FILENAME), subscriptions.model_dump())
+        _set_subscriber(corpus_uid, uid, True)
+        if previous is not None and previous not in subscriptions.documents.values():
+            _set_subscriber(previous, uid, False)
+        return subscriptions
+
+
+def unsubscribe(uid: str, doc_name: str) -> bool:
+    """
+    구독을 해제합니다. 구독 중이 아니었으면 False를 반환합니다.
+    유저가 해당 코퍼스를 더 이상 참조하지 않으면 코퍼스 구독자 목록에서도 제거합니다. (고아 코퍼스는 claim_orphaned_corpus로 회수)
+    """
+    with _lock:
+        subscriptions = read_subscriptions(uid)
+        corpus_uid = subscriptions.documents.pop(doc_name, None)
+        if corpus_uid is None:
+            return False
+        subscriptions.version += 1
+        _write_json(os.path.join(_uid_dir(uid), SUBSCRIPTIONS_FILENAME), subscriptions.model_dump())
+        if corpus_uid not in subscriptions.documents.values():
+            _set_subscriber(corpus_uid, uid, False)
+        return True
+
+
+def claim_orphaned_corpus(corpus_uid: str) -> bool:
+    """
+    구독자가 없는 코퍼스를 삭제 대상으로 확보합니다.
+    구독자가 남아 있거나 이미 회수된 코퍼스이면 False를 반환하고, 확보하면 corpus.json을 지워 새 구독이 붙지 않게 합니다.
+    """
+    with _lock:
+        info_path = os.path.join(_uid_dir(corpus_uid), CORPUS_FILENAME)
+        if corpus_subscribers(corpus_uid) or not os.path.exists(info_path):
+            return False
+        os.remove(info_path)
+        return True
+
+
+def subscribed_corpora(uid: str) -> List[str]:
+    """유저가 구독한 코퍼스 UID 목록 (중복 제거, 구독 순서)"""
+    return list(dict.fromkeys(read_subscriptions(uid).documents.values()))
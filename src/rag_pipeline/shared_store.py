@@ -0,0 +1,102 @@
+"""
+멀티테넌트 통합 벡터 저장소 모듈입니다.
+
+기본 구성(STORAGE_LAYOUT=per_user)에서는 유저마다 {CHROMA_DB_DIR}/{uid}/ 에 독립된 Chroma 디렉토리를 두므로
+유저 수에 비례해 Chroma 클라이언트(SQLite 연결, 파일 핸들, 백그라운드 스레드)와 GCS 동기화 대상 파일이 늘어납니다.
+STORAGE_LAYOUT=shared이면 모든 유저가 {CHROMA_DB_DIR}/_shared/ 의 Chroma 클라이언트 하나(SQLite 파일 하나)를 공유하고,
+유저별 데이터는 유저 전용 컬렉션(파티션)으로 나눕니다.
+
+    - 컬렉션 이름 : {COLLECTION_NAME}-t-{sha1(uid) 앞 16자리} (문서별 샤딩 시 샤드도 이 접두사를 사용)
+    - 격리 : 검색/조회는 항상 유저 컬렉션의 HNSW 세그먼트 안에서만 수행되므로 where 필터 누락으로 다른 유저의 청크가 섞이지 않으며,
+      컬렉션 메타데이터의 uid가 요청 UID와 다르면(해시 충돌 등) 열지 않고 에러를 냅니다.
+    - 메모리 : 공유 클라이언트의 세그먼트 캐시를 LRU(SHARED_STORE_SEGMENT_CACHE_MB)로 제한하여
+      오래 쓰지 않은 유저의 HNSW 세그먼트를 Chroma가 직접 내립니다.
+
+키워드 인덱스, 매니페스트 등 파생 인덱스는 메모리 매핑 파일이므로 기존처럼 {CHROMA_DB_DIR}/{uid}/ 에 둡니다.
+"""
+import hashlib
+import os
+import threading
+from typing import Any, List, Optional
+
+import chromadb
+from chromadb.config import Settings as ChromaSettings
+
+from src.config import settings
+
+SHARED_STORE_DIRNAME = "_shared"
+TENANT_SEPARATOR = "-t-"
+
+# HNSW 노드당 링크/레벨 정보 등 벡터 외 추정 오버헤드 (바이트)
+_HNSW_NODE_OVERHEAD_BYTES = 160
+
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+
+def shared_store_path() -> str:
+    return os.path.join(settings.CHROMA_DB_DIR, SHARED_STORE_DIRNAME)
+
+
+def tenant_collection_name(collection_name: str, uid: str) -> str:
+    """유저 파티션 컬렉션 이름 (Chroma 이름 규칙에 맞도록 UID 해시 사용)"""
+    return f"{collection_name}{TENANT_SEPARATOR}{hashlib.sha1(uid.encode('utf-8')).hexdigest()[:16]}"
+
+
+def get_shared_client() -> Any:
+    """모든 유저가 공유하는 Chroma 클라이언트를 반환합니다. (프로세스당 하나, 세그먼트 캐시 LRU 제한)"""
+    global _shared_client
+    if _shared_client is None:
+        with _shared_client_lock:
+            if _shared_client is None:
+                _shared_client = chromadb.PersistentClient(
+                    path=shared_store_path(),
+                    settings=ChromaSettings(
+                        chroma_segment_cache_policy="LRU",
+                        chroma_memory_limit_bytes=settings.SHARED_STORE_SEGMENT_CACHE_MB * 2**20,
+                        anonymized_telemetry=False
+                    )
+                )
+    return _shared_client
+
+
+def is_shared_client(client: Any) -> bool:
+    return client is not None and client is _shared_client
+
+
+def check_tenant_collection(collection: Any, uid: str):
+    """컬렉션 메타데이터의 uid가 요청 UID와 같은지 확인합니다. 다르면 다른 유저의 파티션이므로 ValueError를 냅니다."""
+    owner = (collection.metadata or {}).get("uid")
+    if owner != uid:
+        raise ValueError(f"컬렉션 '{collection.name}'의 소유 UID가 요청 UID와 다릅니다.")
+
+
+def tenant_collections(client: Any, collection_name: str, uid: str) -> List[Any]:
+    """공유 클라이언트에서 유저 파티션 컬렉션(문서 샤드 포함)을 찾습니다."""
+    prefix = tenant_collection_name(collection_name, uid)
+    return [
+        collection for collection in client.list_collections()
+        if collection.name == prefix or collection.name.startswith(f"{prefix}-")
+    ]
+
+
+def delete_tenant_collections(uid: str, collection_name: str = settings.COLLECTION_NAME, client: Optional[Any] = None) -> int:
+    """유저 파티션 컬렉션을 모두 삭제하고 삭제된 컬렉션 수를 반환합니다. (유저 데이터 초기화용)"""
+    client = client or get_shared_client()
+    collections = tenant_collections(client, collection_name, uid)
+    for collection in collections:
+        client.delete_collection(collection.name)
+    return len(collections)
+
+
+def collection_memory_bytes(collection: Any) -> int:
+    """
+    컬렉션 HNSW 세그먼트의 추정 메모리 사용량(바이트).
+    공유 클라이언트에서는 세그먼트 파일이 유저별 디렉토리로 나뉘지 않으므로 청크 수 x (벡터 + 노드 오버헤드)로 추정합니다.
+    """
+    count = collection.count()
+    if not count:
+        return 0
+    embeddings = collection.get(limit=1, include=["embeddings"]).get("embeddings")
+    dim = len(embeddings[0]) if embeddings is not None and len(embeddings) else 0
+    return count * (dim * 4 + _HNSW_NODE_OVERHEAD_BYTES)
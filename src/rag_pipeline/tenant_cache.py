@@ -0,0 +1,202 @@
+"""
+유저(테넌트)별 인메모리 리소스 캐시 관리 모듈입니다.
+
+벡터 스토어(Chroma 클라이언트), 키워드 인덱스, 파생 인덱스, API의 리트리버는 모두 UID를 키로 하는
+모듈 전역 딕셔너리에 캐싱되는데, 한 번이라도 요청한 유저가 계속 남아 장시간 실행되는 API 파드의 메모리가 계속 늘어납니다.
+각 딕셔너리를 TenantCache에 등록하면 유저 단위로 사용 시각과 메모리 사용량을 추적하고,
+    - 유휴 시간이 TENANT_CACHE_IDLE_TTL_SECONDS를 넘은 유저
+    - 메모리 예산(TENANT_CACHE_MEMORY_BUDGET_MB) 또는 최대 유저 수를 넘을 때 가장 오래 사용하지 않은 유저(LRU)
+의 리소스를 모든 딕셔너리에서 함께 제거하고 클라이언트를 닫습니다. 제거된 유저는 다음 요청 시 다시 지연 로드됩니다.
+인제스트 / 질의 처리 중인 유저는 `with tenant_cache.use(uid):`로 임대(lease)하며, 임대 중인 유저의 리소스는
+TTL / 예산 / 직접 제거 어느 경우에도 닫지 않습니다. (임대가 모두 끝나면 그 시각을 마지막 사용 시각으로 기록)
+방금 사용된 유저(TENANT_CACHE_MIN_IDLE_SECONDS 이내)도 LRU 제거 대상에서 제외합니다.
+"""
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from src.config import settings
+
+# 유저별 메모리 사용량 재측정 주기 (초)
+_SIZE_REFRESH_SECONDS = 10.0
+
+
+class _Resource(NamedTuple):
+    store: Dict[str, Any]
+    size: Optional[Callable[[Any], int]]
+    close: Optional[Callable[[Any], None]]
+
+
+class TenantCache:
+    """UID별 리소스 딕셔너리들의 LRU + 유휴 TTL + 메모리 예산 관리자 (스레드 안전)"""
+
+    def __init__(
+        self,
+        memory_budget_bytes: int,
+        idle_ttl_seconds: float,
+        max_tenants: int,
+        min_idle_seconds: float = 5.0
+    ):
+        self.memory_budget_bytes = memory_budget_bytes
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.max_tenants = max_tenants
+        self.min_idle_seconds = min_idle_seconds
+        self._resources: Dict[str, _Resource] = {}
+        self._last_used: "OrderedDict[str, float]" = OrderedDict()
+        # uid -> (측정 시각, {리소스 이름: 바이트})
+        self._sizes: Dict[str, tuple] = {}
+        # uid -> 진행 중인 임대 수 (인제스트 / 질의 처리)
+        self._leases: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        self.evictions = 0
+
+    def register(
+        self,
+        name: str,
+        store: Dict[str, Any],
+        size: Optional[Callable[[Any], int]] = None,
+        close: Optional[Callable[[Any], None]] = None
+    ):
+        """UID를 키로 하는 리소스 딕셔너리를 등록합니다. size는 메모리 추정 함수, close는 제거 시 정리 함수입니다."""
+        with self._lock:
+            self._resources[name] = _Resource(store, size, close)
+
+    def __len__(self) -> int:
+        return len(self._last_used)
+
+    def acquire(self, *uids: Optional[str]):
+        """유저들을 임대합니다. 임대 중인 유저의 리소스는 제거하지 않습니다. (None은 무시)"""
+        with self._lock:
+            for uid in filter(None, uids):
+                self._leases[uid] = self._leases.get(uid, 0) + 1
+
+    def release(self, *uids: Optional[str]):
+        """acquire한 임대를 반납합니다. 반납 시각을 마지막 사용 시각으로 기록하여 긴 작업 직후 바로 제거되지 않게 합니다."""
+        with self._lock:
+            now = time.monotonic()
+            for uid in filter(None, uids):
+                count = self._leases.get(uid, 0) - 1
+                if count > 0:
+                    self._leases[uid] = count
+                else:
+                    self._leases.pop(uid, None)
+                if uid in self._last_used:
+                    self._last_used[uid] = now
+                    self._last_used.move_to_end(uid)
+
+    @contextmanager
+    def use(self, *uids: Optional[str]):
+        """with 블록 동안 유저들을 임대합니다. (예: with tenant_cache.use(uid): ...)"""
+        self.acquire(*uids)
+        try:
+            yield
+        finally:
+            self.release(*uids)
+
+    def is_leased(self, uid: str) -> bool:
+        return self._leases.get(uid, 0) > 0
+
+    def touch(self, uid: str) -> List[str]:
+        """유저 사용을 기록하고 예산/TTL을 적용합니다. 제거된 UID 리스트를 반환합니다. (uid 자신은 제거하지 않음)"""
+        with self._lock:
+            self._last_used[uid] = time.monotonic()
+            self._last_used.move_to_end(uid)
+            return self.enforce(keep=uid)
+
+    def enforce(self, keep: Optional[str] = None) -> List[str]:
+        """
+        유휴 TTL이 지난 유저를 제거한 뒤, 메모리 예산과 최대 유저 수를 넘는 동안 LRU 순서로 제거합니다.
+        임대 중인 유저는 건너뜁니다.
+        """
+        with self._lock:
+            now = time.monotonic()
+            evicted = [
+                uid for uid, used in self._last_used.items()
+                if uid != keep and not self.is_leased(uid) and now - used > self.idle_ttl_seconds
+            ]
+            for uid in evicted:
+                self.evict(uid)
+
+            self._refresh_sizes(now)
+            total = sum(sum(breakdown.values()) for _, breakdown in self._sizes.values())
+            for uid in list(self._last_used):
+                if total <= self.memory_budget_bytes and len(self._last_used) <= self.max_tenants:
+                    break
+                if uid == keep or self.is_leased(uid) or now - self._last_used[uid] < self.min_idle_seconds:
+                    continue
+                total -= self.memory_bytes(uid)
+                self.evict(uid)
+                evicted.append(uid)
+            return evicted
+
+    def evict(self, uid: str) -> bool:
+        """유저의 리소스를 등록된 모든 딕셔너리에서 제거하고 close 함수를 호출합니다. 임대 중이면 제거하지 않고 False를 반환합니다."""
+        with self._lock:
+            if self.is_leased(uid):
+                print(f"테넌트 캐시 제거 보류 (사용 중): UID {uid}")
+                return False
+            self._last_used.pop(uid, None)
+            self._sizes.pop(uid, None)
+            for name, resource in self._resources.items():
+                value = resource.store.pop(uid, None)
+                if value is not None and resource.close is not None:
+                    try:
+                        resource.close(value)
+                    except Exception as e:
+                        print(f"테넌트 리소스 정리 실패 ({name}, UID: {uid}): {e}")
+            self.evictions += 1
+        print(f"테넌트 캐시 제거: UID {uid}")
+        return True
+
+    def _refresh_sizes(self, now: float):
+        for uid in self._last_used:
+            measured = self._sizes.get(uid)
+            if measured is None or now - measured[0] > _SIZE_REFRESH_SECONDS:
+                self._sizes[uid] = (now, self._measure(uid))
+
+    def _measure(self, uid: str) -> Dict[str, int]:
+        breakdown = {}
+        for name, resource in self._resources.items():
+            value = resource.store.get(uid)
+            if value is None or resource.size is None:
+                continue
+            try:
+                breakdown[name] = int(resource.size(value))
+            except Exception as e:
+                print(f"테넌트 메모리 측정 실패 ({name}, UID: {uid}): {e}")
+        return breakdown
+
+    def memory_bytes(self, uid: str) -> int:
+        measured = self._sizes.get(uid)
+        return sum(measured[1].values()) if measured else 0
+
+    def stats(self, uid: Optional[str] = None) -> Dict[str, Any]:
+        """로드된 유저 수 / 추정 메모리 / 예산 / 제거 횟수를 반환합니다. uid를 주면 해당 유저의 리소스별 메모리도 포함합니다."""
+        with self._lock:
+            self._refresh_sizes(time.monotonic())
+            stats = {
+                "tenants": len(self._last_used),
+                "max_tenants": self.max_tenants,
+                "memory_bytes": sum(self.memory_bytes(tenant) for tenant in self._last_used),
+                "memory_budget_bytes": self.memory_budget_bytes,
+                "idle_ttl_seconds": self.idle_ttl_seconds,
+                "evictions": self.evictions,
+                "leased_tenants": len(self._leases),
+            }
+            if uid is not None:
+                measured = self._sizes.get(uid)
+                stats["tenant_loaded"] = uid in self._last_used
+                stats["tenant_memory_bytes"] = self.memory_bytes(uid)
+                stats["tenant_breakdown"] = dict(measured[1]) if measured else {}
+        return stats
+
+
+# 프로세스 전역 테넌트 캐시
+tenant_cache = TenantCache(
+    memory_budget_bytes=settings.TENANT_CACHE_MEMORY_BUDGET_MB * 2**20,
+    idle_ttl_seconds=settings.TENANT_CACHE_IDLE_TTL_SECONDS,
+    max_tenants=settings.TENANT_CACHE_MAX_TENANTS,
+    min_idle_seconds=settings.TENANT_CACHE_MIN_IDLE_SECONDS
+)
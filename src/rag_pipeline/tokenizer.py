@@ -0,0 +1,130 @@
+"""
+BM25 키워드 인덱스용 한국어 토크나이저 모듈입니다.
+
+지원 모드 (settings.KEYWORD_TOKENIZER):
+    - "okt"   : KoNLPy Okt 형태소 분석 (JVM 필요, 가장 정확하지만 느림)
+    - "ngram" : 순수 Python 문자 바이그램 (JVM 불필요, 빠른 인덱스 빌드용)
+
+인덱스 빌드 시에는 tokenize_batch가 프로세스 풀로 병렬 토크나이징하고,
+쿼리는 tokenize_query의 LRU 캐시를 거쳐 같은 질문을 반복 분석하지 않습니다.
+LLM 컨텍스트 크기 측정용으로 API 호출 없이 입력 토큰 수를 추정하는 estimate_tokens도 제공합니다.
+"""
+import math
+import multiprocessing
+import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Callable, List, Optional, Tuple
+
+from src.config import settings
+
+# --- KoNLPy Okt 토크나이저 (프로세스별 전역) ---
+_okt = None
+
+def get_okt():
+    global _okt
+    if _okt is None:
+        try:
+            from konlpy.tag import Okt
+            # KoNLPy 내부적으로 init_jvm()을 호출하므로 직접 jpype를 시작할 필요가 없습니다.
+            # Java 환경(Jar 파일 로출 등) 이슈로 에러 발생 시 조용히 폴백합니다.
+            _okt = Okt()
+            print("KoNLPy Okt 토크나이저 활성화.")
+        except Exception as e:
+            # 에러 로그를 한 번만 출력하고, 다음부터는 'FAILED' 상태를 유지하여 재시도를 건너뜁니다.
+            print(f"KoNLPy 로드 실패 (기본 토크나이저 전환): {e}")
+            _okt = "FAILED"
+            return None
+
+    if _okt == "FAILED":
+        return None
+    return _okt
+
+def korean_tokenizer(text: str) -> List[str]:
+    """Okt를 사용한 전역 한국어 토크나이저 (지연 로드 방식)"""
+    okt = get_okt()
+    if okt:
+        try:
+            return okt.morphs(text)
+        except Exception as e:
+            print(f"Okt 토크나이징 오류: {e}")
+            return text.split()
+    return text.split()
+
+# 한글 연속 구간, 또는 영숫자 코드(E1236, Pr.22, HPPF-12 등)를 하나의 단어로 취급
+_WORD_PATTERN = re.compile(r"[가-힣]+|[A-Za-z0-9]+(?:[.\-][A-Za-z0-9]+)*")
+
+def char_ngram_tokenizer(text: str) -> List[str]:
+    """
+    JVM 없이 동작하는 문자 바이그램 토크나이저입니다.
+    한글 단어는 2글자 단위로 겹쳐 자르고(조사/어미 변형에 강함), 영숫자 코드는 통째로 유지합니다.
+    """
+    tokens = []
+    for word in _WORD_PATTERN.findall(text):
+        if word[0] >= "가" and len(word) > 2:
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word.lower())
+    return tokens
+
+TOKENIZERS = {
+    "okt": korean_tokenizer,
+    "ngram": char_ngram_tokenizer,
+}
+
+def get_tokenizer(mode: Optional[str] = None) -> Callable[[str], List[str]]:
+    """모드 이름에 해당하는 토크나이저 함수를 반환합니다. (기본값: settings.KEYWORD_TOKENIZER)"""
+    mode = mode or settings.KEYWORD_TOKENIZER
+    if mode not in TOKENIZERS:
+        raise ValueError(f"지원하지 않는 토크나이저 모드입니다: {mode} (가능: {', '.join(TOKENIZERS)})")
+    return TOKENIZERS[mode]
+
+def _tokenize_with_mode(args: Tuple[str, str]) -> List[str]:
+    """프로세스 풀 워커용 함수 (모듈 최상위에 있어야 pickle 가능)"""
+    text, mode = args
+    return TOKENIZERS[mode](text)
+
+def tokenize_batch(texts: List[str], mode: Optional[str] = None, workers: Optional[int] = None) -> List[List[str]]:
+    """
+    여러 청크를 한 번에 토크나이징합니다.
+    배치가 충분히 크면 프로세스 풀로 병렬 처리하고, 실패 시 순차 처리로 폴백합니다.
+    """
+    mode = mode or settings.KEYWORD_TOKENIZER
+    tokenizer = get_tokenizer(mode)
+    workers = settings.TOKENIZER_WORKERS if workers is None else workers
+
+    if workers <= 1 or len(texts) < settings.TOKENIZER_POOL_MIN_BATCH:
+        return [tokenizer(text) for text in texts]
+
+    try:
+        # Okt(JVM)는 fork 이후 안전하지 않으므로 spawn 컨텍스트를 사용합니다.
+        context = multiprocessing.get_context("spawn")
+        chunksize = max(1, len(texts) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            return list(executor.map(_tokenize_with_mode, [(text, mode) for text in texts], chunksize=chunksize))
+    except Exception as e:
+        print(f"병렬 토크나이징 실패 (순차 처리로 전환): {e}")
+        return [tokenizer(text) for text in texts]
+
+@lru_cache(maxsize=4096)
+def _cached_query_tokens(query: str, mode: str) -> Tuple[str, ...]:
+    return tuple(get_tokenizer(mode)(query))
+
+def tokenize_query(query: str) -> List[str]:
+    """검색 쿼리용 토크나이저 (LRU 캐시 적용). 같은 질문/서브 쿼리는 다시 분석하지 않습니다."""
+    return list(_cached_query_tokens(query, settings.KEYWORD_TOKENIZER))
+
+# --- LLM 입력 토큰 수 추정 ---
+_HANGUL_PATTERN = re.compile(r"[가-힣]")
+_HANGUL_CHARS_PER_TOKEN = 1.5
+_OTHER_CHARS_PER_TOKEN = 4.0
+
+def estimate_tokens(text: str) -> int:
+    """
+    LLM(Gemini) 입력 토큰 수를 API 호출 없이 추정합니다.
+    SentencePiece 계열 토크나이저 기준으로 한글은 음절 약 1.5개, 그 밖의 글자(영숫자/기호/공백)는 약 4글자가 1토큰입니다.
+    """
+    if not text:
+        return 0
+    hangul = len(_HANGUL_PATTERN.findall(text))
+    return math.ceil(hangul / _HANGUL_CHARS_PER_TOKEN + (len(text) - hangul) / _OTHER_CHARS_PER_TOKEN)
@@ -1,18 +1,81 @@
 import os
-from typing import List
+from pathlib import Path
+from typing import Any, List, Optional
 
+import chromadb
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_chroma import Chroma
 from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
 from src.rag_pipeline.schema import PageContent
+from src.rag_pipeline.ann_index import AnnVectorStore
+from src.rag_pipeline.shards import ShardedVectorStore
+from src.rag_pipeline.shared_store import (
+    check_tenant_collection,
+    collection_memory_bytes,
+    get_shared_client,
+    is_shared_client,
+    tenant_collection_name,
+)
+from src.rag_pipeline.tenant_cache import tenant_cache
+from src.rag_pipeline.tokenizer import estimate_tokens
 from src.config import settings
 
-# 유저별 벡터 스토어 인스턴스를 캐싱 (UID: Chroma)
+# 유저별 벡터 스토어 인스턴스를 캐싱 (UID: Chroma). 테넌트 캐시가 LRU/유휴 TTL로 제거하고 클라이언트를 닫습니다.
 _vector_stores = {}
 _embedding_function = None
 
+
+def _chroma_client(vector_store: Any) -> Any:
+    store = getattr(vector_store, "store", vector_store)  # AnnVectorStore 래퍼
+    return getattr(store, "client", None) or getattr(store, "_client", None)
+
+
+def _collections(vector_store: Any) -> List[Any]:
+    """벡터 스토어가 사용하는 Chroma 컬렉션 목록 (문서 샤드 포함)"""
+    store = getattr(vector_store, "store", vector_store)  # AnnVectorStore 래퍼
+    if isinstance(store, ShardedVectorStore):
+        return [shard._collection for shard in store.shards()]
+    return [store._collection]
+
+
+def count_chunks(vector_store: Any) -> int:
+    """벡터 스토어에 저장된 청크 수 (문서 샤드 / 레거시 컬렉션 합계)"""
+    return sum(collection.count() for collection in _collections(vector_store))
+
+
+def vector_store_memory_bytes(vector_store: Any) -> int:
+    """
+    벡터 스토어의 대략적인 메모리 사용량(바이트).
+    Chroma는 쿼리 시 컬렉션의 HNSW 세그먼트 파일(*.bin)을 메모리에 올리므로 그 크기로 추정하고
+    (공유 저장소이면 유저 컬렉션의 청크 수로 추정), ANN 백엔드이면 인프로세스 인덱스의 상주 배열 크기를 더합니다.
+    """
+    total = 0
+    client = _chroma_client(vector_store)
+    persist_directory = client.get_settings().persist_directory if client is not None else None
+    if is_shared_client(client):
+        total += sum(collection_memory_bytes(collection) for collection in _collections(vector_store))
+    elif persist_directory and os.path.isdir(persist_directory):
+        total += sum(path.stat().st_size for path in Path(persist_directory).glob("*/*.bin"))
+    ann_index = getattr(vector_store, "_index", None)
+    if ann_index is not None:
+        total += ann_index.memory_bytes()
+    return total
+
+
+def close_vector_store(vector_store: Any):
+    """
+    벡터 스토어의 Chroma 클라이언트를 닫아 SQLite 연결과 HNSW 세그먼트 메모리를 해제합니다.
+    공유 저장소의 클라이언트는 다른 유저도 사용하므로 닫지 않습니다. (세그먼트 메모리는 Chroma LRU 캐시가 관리)
+    """
+    client = _chroma_client(vector_store)
+    if client is not None and not is_shared_client(client) and hasattr(client, "close"):
+        client.close()
+
+
+tenant_cache.register("vector_store", _vector_stores, size=vector_store_memory_bytes, close=close_vector_store)
+
 def get_embedding_function():
     """Google Generative AI 임베딩 함수를 반환합니다. (캐싱 사용)"""
     global _embedding_function
@@ -23,30 +86,86 @@ def get_embedding_function():
         )
     return _embedding_function
 
+def embed_queries(queries: List[str], embedding_function=None) -> List[List[float]]:
+    """
+    여러 검색 쿼리를 한 번에 임베딩합니다.
+    Google 임베딩은 RETRIEVAL_QUERY 태스크로 배치 요청 한 번에 처리하고, 그 밖의 임베딩은 쿼리별로 호출합니다.
+    """
+    if not queries:
+        return []
+    embedding_function = embedding_function or get_embedding_function()
+    if isinstance(embedding_function, GoogleGenerativeAIEmbeddings):
+        return embedding_function.embed_documents(queries, task_type="RETRIEVAL_QUERY")
+    return [embedding_function.embed_query(query) for query in queries]
+
 def get_vector_store(
     uid: str = "default",
     collection_name: str = settings.COLLECTION_NAME, 
     db_path: str = None
 ) -> Chroma:
-    """유저 UID별 Chroma 벡터 스토어 클라이언트를 반환합니다. (캐싱 사용)"""
+    """
+    유저 UID별 Chroma 벡터 스토어 클라이언트를 반환합니다. (캐싱 사용)
+    STORAGE_LAYOUT이 shared이면 유저별 디렉토리 대신 공유 클라이언트의 유저 전용 컬렉션(파티션)을 사용하며,
+    INDEX_SHARDING이 document이면 문서별 컬렉션을 라우팅하는 ShardedVectorStore를 사용하며,
+    VECTOR_BACKEND가 ann이면 유사도 검색만 인프로세스 ANN 인덱스로 처리하는 AnnVectorStore로 감싸서 반환합니다.
+    """
     global _vector_stores
     
     if db_path is None:
         # 유저별 독립된 DB 경로 설정
         db_path = os.path.join(settings.CHROMA_DB_DIR, uid)
     
+    tenant_cache.touch(uid)
     if uid not in _vector_stores:
-        _vector_stores[uid] = Chroma(
-            collection_name=collection_name,
-            persist_directory=db_path,
-            embedding_function=get_embedding_function()
-        )
+        shared = settings.STORAGE_LAYOUT == "shared"
+        if shared:
+            client = get_shared_client()
+            collection_name = tenant_collection_name(collection_name, uid)
+            collection_metadata = {"uid": uid}
+        else:
+            client = chromadb.PersistentClient(path=db_path)
+            collection_metadata = None
+        if settings.INDEX_SHARDING == "document":
+            vector_store = ShardedVectorStore(
+                client,
+                collection_name=collection_name,
+                embedding_function=get_embedding_function(),
+                shard_metadata=collection_metadata
+            )
+        else:
+            vector_store = Chroma(
+                collection_name=collection_name,
+                client=client,
+                embedding_function=get_embedding_function(),
+                collection_metadata=collection_metadata
+            )
+        if shared:
+            for collection in _collections(vector_store):
+                check_tenant_collection(collection, uid)
+        if settings.VECTOR_BACKEND == "ann":
+            vector_store = AnnVectorStore(vector_store, uid=uid, index_dir=db_path)
+        _vector_stores[uid] = vector_store
     return _vector_stores[uid]
 
-def create_documents_from_page_content(page_content: PageContent, page_num: int, thumbnail_path: str, document_title: str = None) -> List[Document]:
+def delete_document_chunks(vector_store: Any, doc_name: str) -> int:
+    """
+    문서의 청크를 벡터 스토어에서 삭제하고 삭제된 청크 수를 반환합니다.
+    문서별 샤드 구성이면 샤드 컬렉션을 삭제하고, 공용 컬렉션이면 doc_name 조건으로 삭제합니다.
+    """
+    if hasattr(vector_store, "delete_document"):
+        return vector_store.delete_document(doc_name)
+    collection = vector_store._collection
+    doc_ids = collection.get(where={"doc_name": doc_name}, include=[]).get("ids", [])
+    if doc_ids:
+        collection.delete(ids=doc_ids)
+    return len(doc_ids)
+
+def create_documents_from_page_content(page_content: PageContent, page_num: int, thumbnail_path: str, document_title: str = None, continues_to_next: Optional[bool] = None, continues_from_prev: Optional[bool] = None) -> List[Document]:
     """
     파싱된 PageContent 객체를 기반으로 LangChain Document 객체 리스트를 생성합니다.
     의미 기반 청킹(semantic chunking) 로직과 메타데이터 보강이 포함되어 있습니다.
+    continues_to_next / continues_from_prev는 인제스트 시 감지한 페이지 간 연속(표/절차) 연결입니다.
+    None(연속 감지를 하지 않음)이면 메타데이터에 넣지 않으므로, 검색 시 연결 여부를 모르는 청크로 취급됩니다.
     """
     documents = []
     
@@ -71,13 +190,17 @@ def create_documents_from_page_content(page_content: PageContent, page_num: int,
         "summary": page_content.summary if page_content.summary else "",
         "title": document_title if document_title else "",
     }
+    if continues_to_next is not None:
+        base_metadata["continues_to_next"] = bool(continues_to_next)
+    if continues_from_prev is not None:
+        base_metadata["continues_from_prev"] = bool(continues_from_prev)
 
     # 1. 텍스트 콘텐츠 추가 (Advanced Chunking 적용)
     if page_content.text and len(page_content.text.strip()) > 10:
         # RecursiveCharacterTextSplitter를 사용하여 텍스트를 의미 단위로 분할
         text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=800,      # 청크 크기 (한국어 고려하여 적절히 조절)
-            chunk_overlap=100,   # 중첩 크기 (문맥 유지)
+            chunk_size=settings.CHUNK_SIZE,        # 청크 크기 (한국어 고려하여 적절히 조절)
+            chunk_overlap=settings.CHUNK_OVERLAP,  # 중첩 크기 (문맥 유지)
             separators=["\n\n", "\n", " ", ""], # 분할 우선순위
             keep_separator=False
         )
@@ -114,21 +237,47 @@ def create_documents_from_page_content(page_content: PageContent, page_num: int,
     return documents
 
 
-def add_page_content_to_vector_db(page_content: PageContent, page_num: int, thumbnail_path: str, vector_store: Chroma, document_title: str = None):
+def build_page_documents(page_content: PageContent, page_num: int, thumbnail_path: str, document_title: str = None, continues_to_next: Optional[bool] = None, continues_from_prev: Optional[bool] = None) -> List[Document]:
     """
-    파싱된 PageContent를 Document 리스트로 변환하고, 각 Document에 고유 ID를 부여하여 벡터 스토어에 추가합니다.
+    파싱된 PageContent를 Document 리스트로 변환하고, 각 Document의 메타데이터에 고유 ID(doc_id)와 컨텍스트 패킹용 토큰 수(token_count)를 부여합니다.
+    ID 형식: {doc_name}_p{page}_chunk_{i}
     """
-    documents = create_documents_from_page_content(page_content, page_num, thumbnail_path, document_title)
+    documents = create_documents_from_page_content(
+        page_content, page_num, thumbnail_path, document_title,
+        continues_to_next=continues_to_next, continues_from_prev=continues_from_prev
+    )
     
     if not documents:
-        return
+        return []
 
     # 문서 이름은 이미 메타데이터에 있으므로 첫 번째 문서에서 가져옵니다.
     doc_name = documents[0].metadata.get("doc_name", "unknown_doc")
-    ids = [f"{doc_name}_p{page_num}_chunk_{i}" for i in range(len(documents))]
 
-    # 각 문서의 메타데이터에 'doc_id' 추가
+    # 각 문서의 메타데이터에 'doc_id'와 본문 토큰 수 추가 (질문마다 다시 세지 않도록 인제스트 시 계산)
     for i, doc in enumerate(documents):
-        doc.metadata["doc_id"] = ids[i]
+        doc.metadata["doc_id"] = f"{doc_name}_p{page_num}_chunk_{i}"
+        doc.metadata["token_count"] = estimate_tokens(doc.page_content)
+    return documents
 
-    vector_store.add_documents(documents=documents, ids=ids)
\ No newline at end of file
+
+def add_documents_to_vector_db(documents: List[Document], vector_store: Chroma, batch_size: int = 1000) -> List[Document]:
+    """ID가 부여된 Document 리스트를 배치 단위로 벡터 스토어에 추가하고, 추가된 리스트를 반환합니다."""
+    for start in range(0, len(documents), batch_size):
+        batch = documents[start:start + batch_size]
+        vector_store.add_documents(documents=batch, ids=[doc.metadata["doc_id"] for doc in batch])
+    return documents
+
+
+def add_page_content_to_vector_db(page_content: PageContent, page_num: int, thumbnail_path: str, vector_store: Chroma, document_title: str = None, continues_to_next: Optional[bool] = None, continues_from_prev: Optional[bool] = None) -> List[Document]:
+    """
+    파싱된 PageContent를 Document 리스트로 변환하고, 각 Document에 고유 ID를 부여하여 벡터 스토어에 추가합니다.
+    추가된 Document 리스트를 반환합니다. (키워드 인덱스 증분 갱신용)
+    """
+    documents = build_page_documents(
+        page_content, page_num, thumbnail_path, document_title,
+        continues_to_next=continues_to_next, continues_from_prev=continues_from_prev
+    )
+    if not documents:
+        return []
+    vector_store.add_documents(documents=documents, ids=[doc.metadata["doc_id"] for doc in documents])
+    return documents
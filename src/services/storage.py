@@ -1,7 +1,12 @@
 import os
+import time
 from google.cloud import storage
 from google.oauth2 import service_account
 from src.config import settings
+from src.rag_pipeline.shared_store import SHARED_STORE_DIRNAME, shared_store_path
+
+# 공유 저장소(STORAGE_LAYOUT=shared)의 GCS 경로
+SHARED_REMOTE_PREFIX = f"{SHARED_STORE_DIRNAME}/vector_db"
 
 class StorageManager:
     """
@@ -25,6 +30,9 @@ class StorageManager:
             print(f"GCS 클라이언트 초기화 에러: {e}")
             self.client = None
             self.bucket = None
+        # 공유 저장소 동기화 상태 (마지막 업로드 시각, 이 프로세스에서 다운로드했는지 여부)
+        self._shared_uploaded_at = 0.0
+        self._shared_downloaded = False
 
     def upload_file(self, local_path: str, remote_path: str) -> str:
         """로컬 파일을 GCS로 업로드합니다."""
@@ -44,14 +52,16 @@ class StorageManager:
         blob = self.bucket.blob(remote_path)
         blob.download_to_filename(local_path)
 
-    def upload_directory(self, local_dir: str, remote_prefix: str):
-        """로컬 디렉토리 전체를 GCS로 업로드합니다. (ChromaDB 동기화용)"""
+    def upload_directory(self, local_dir: str, remote_prefix: str, modified_after: float = 0.0):
+        """로컬 디렉토리 전체를 GCS로 업로드합니다. (ChromaDB 동기화용, modified_after 이후 수정된 파일만)"""
         if not self.bucket or not os.path.exists(local_dir):
             return
 
         for root, _, files in os.walk(local_dir):
             for file in files:
                 local_path = os.path.join(root, file)
+                if modified_after and os.path.getmtime(local_path) <= modified_after:
+                    continue
                 relative_path = os.path.relpath(local_path, local_dir)
                 remote_path = os.path.join(remote_prefix, relative_path)
                 self.upload_file(local_path, remote_path)
@@ -81,16 +91,30 @@ class StorageManager:
         print(f"GCS path '{remote_prefix}' and its contents deleted.")
 
     def sync_db_to_gcs(self, uid: str):
-        """유저의 로컬 ChromaDB를 GCS로 업로드합니다."""
+        """
+        유저의 로컬 ChromaDB를 GCS로 업로드합니다.
+        공유 저장소 구성이면 유저 디렉토리(파생 인덱스)와 함께 공유 저장소에서 마지막 업로드 이후 바뀐 파일만 올립니다.
+        """
         local_db_path = os.path.join(settings.CHROMA_DB_DIR, uid)
         remote_prefix = f"{uid}/vector_db"
         self.upload_directory(local_db_path, remote_prefix)
+        if settings.STORAGE_LAYOUT == "shared":
+            started_at = time.time()
+            self.upload_directory(shared_store_path(), SHARED_REMOTE_PREFIX, modified_after=self._shared_uploaded_at)
+            self._shared_uploaded_at = started_at
 
     def sync_db_from_gcs(self, uid: str):
-        """유저의 GCS에서 로컬로 ChromaDB를 다운로드합니다."""
+        """
+        유저의 GCS에서 로컬로 ChromaDB를 다운로드합니다.
+        공유 저장소 구성이면 공유 저장소는 로컬에 없을 때 프로세스당 한 번만 내려받습니다.
+        """
         local_db_path = os.path.join(settings.CHROMA_DB_DIR, uid)
         remote_prefix = f"{uid}/vector_db"
         self.download_directory(remote_prefix, local_db_path)
+        if settings.STORAGE_LAYOUT == "shared" and not self._shared_downloaded:
+            if not os.path.exists(shared_store_path()):
+                self.download_directory(SHARED_REMOTE_PREFIX, shared_store_path())
+            self._shared_downloaded = True
 
 # 싱글톤 인스턴스 노출
 storage_manager = StorageManager()
@@ -0,0 +1,29 @@
+from typing import Callable, Optional
+
+import pytest
+from langchain_core.documents import Document
+
+
+@pytest.fixture
+def make_doc() -> Callable[..., Document]:
+    """
+    테스트용 청크 Document 팩토리를 반환합니다.
+    doc_id를 생략하면 "{doc_name}_p{page}"로 만들고, page가 None이면 page 메타데이터를 넣지 않습니다.
+    with_image=True이면 페이지 이미지 경로(images/{doc_name}/page_{page:03d}.png)를 넣으며, 나머지 키워드 인자는 메타데이터에 그대로 추가합니다.
+    """
+    def _make_doc(
+        text: str,
+        doc_id: Optional[str] = None,
+        doc_name: str = "manual",
+        page: Optional[int] = 1,
+        with_image: bool = False,
+        **metadata
+    ) -> Document:
+        base = {"doc_id": doc_id or f"{doc_name}_p{page}", "doc_name": doc_name}
+        if page is not None:
+            base["page"] = page
+        if with_image:
+            base["image_path"] = f"images/{doc_name}/page_{page:03d}.png"
+        return Document(page_content=text, metadata={**base, **metadata})
+
+    return _make_doc
@@ -0,0 +1,149 @@
+import threading
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+
+from src.rag_pipeline.ann_index import AnnIndex, AnnVectorStore, parse_search_filter
+from src.rag_pipeline.index_manifest import IndexManifest
+from src.rag_pipeline.retriever import build_search_filter
+
+
+def _index(n: int = 50, dim: int = 8, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, dim)).astype(np.float32)
+    ids = [f"c{i}" for i in range(n)]
+    metadatas = [{"doc_name": "manual" if i % 2 == 0 else "other", "page": i % 5} for i in range(n)]
+    index = AnnIndex()
+    index.add(ids, vectors, metadatas)
+    return index, vectors, ids
+
+
+def test_ann_index_batch_search_matches_exact_l2_with_filters():
+    """배치 전수 검색이 NumPy 정확 거리와 같고, 문서명 비트셋/페이지 필터가 적용되는지 테스트"""
+    index, vectors, ids = _index()
+    queries = vectors[:3] + 0.01
+    results = index.search(queries, k=5)
+    for query, hits in zip(queries, results):
+        expected = np.argsort(((vectors - query) ** 2).sum(axis=1), kind="stable")[:5]
+        assert [chunk_id for chunk_id, _ in hits] == [ids[i] for i in expected]
+        assert np.allclose([d for _, d in hits], ((vectors[expected] - query) ** 2).sum(axis=1), atol=1e-4)
+
+    hits = index.search(queries[:1], k=100, doc_name="manual", page=2)[0]
+    assert {chunk_id for chunk_id, _ in hits} == {f"c{i}" for i in range(50) if i % 2 == 0 and i % 5 == 2}
+    assert index.search(queries[:1], k=5, doc_name="없는 문서") == [[]]
+
+
+def test_ann_index_remove_add_and_mmap_roundtrip(tmp_path):
+    """삭제 표시 / 같은 ID 재추가 / 압축 저장 후 메모리 매핑 로드 결과가 같은지 테스트"""
+    index, vectors, ids = _index(n=20)
+    index.remove(["c0", "c1", "c2", "c3", "c4"])
+    index.add(["c5"], vectors[:1], [{"doc_name": "manual", "page": 9}])  # c5 벡터 교체
+    assert len(index) == 15
+    assert index.search(vectors[:1], k=1)[0][0][0] == "c5"
+
+    index.version = 3
+    index.save(str(tmp_path))  # 삭제 비율 > ANN_COMPACT_RATIO → 압축
+    loaded = AnnIndex.load(str(tmp_path))
+    assert loaded.version == 3 and len(loaded.ids) == 15
+    assert isinstance(np.load(tmp_path / "ann_index" / "vectors.npy", mmap_mode="r"), np.memmap)
+    assert loaded.search(vectors[:4], k=3) == index.search(vectors[:4], k=3)
+    assert loaded.search(vectors[:1], k=10, doc_name="manual", page=9)[0][0][0] == "c5"
+
+    loaded.remove(["c5"])  # 읽기 전용 매핑 배열도 갱신 가능
+    assert "c5" not in {chunk_id for chunk_id, _ in loaded.search(vectors[:1], k=15)[0]}
+    assert AnnIndex.load(str(tmp_path / "없음")) is None
+
+
+def test_parse_search_filter():
+    """Chroma where 필터 중 문서명/페이지 조건만 인덱스 필터로 변환하는지 테스트"""
+    assert parse_search_filter(None) == {}
+    assert parse_search_filter(build_search_filter(doc_name="manual", page=3)) == {"doc_name": "manual", "page": 3}
+    assert parse_search_filter({"doc_name": {"$eq": "manual"}}) == {"doc_name": "manual"}
+    assert parse_search_filter({"page": {"$gte": 3}}) is None
+    assert parse_search_filter({"chapter": "설정"}) is None
+
+
+def test_ann_vector_store_syncs_incrementally_from_chroma(tmp_path):
+    """매니페스트 버전이 바뀌면 Chroma에서 새 청크 벡터만 가져오고 사라진 청크는 삭제하는지 테스트"""
+    vectors = {f"c{i}": [float(i), 0.0] for i in range(4)}
+    store_ids = ["c0", "c1", "c2"]
+
+    def get(ids=None, include=None):
+        ids = store_ids if ids is None else ids
+        return {
+            "ids": ids,
+            "embeddings": [vectors[chunk_id] for chunk_id in ids],
+            "metadatas": [{"doc_name": "manual", "page": 1} for _ in ids],
+        }
+
+    chroma = MagicMock()
+    chroma.get.side_effect = get
+    store = AnnVectorStore(chroma, uid="u", index_dir=str(tmp_path))
+    with patch("src.rag_pipeline.ann_index.read_manifest", return_value=IndexManifest(version=1)):
+        assert store.get_index().search([[2.1, 0.0]], k=1)[0][0][0] == "c2"
+        assert store.get_index().version == 1
+    assert chroma.get.call_count == 2
+
+    store_ids[:] = ["c0", "c2", "c3"]
+    with patch("src.rag_pipeline.ann_index.read_manifest", return_value=IndexManifest(version=2)):
+        index = store.get_index()
+    assert sorted(index.rows) == ["c0", "c2", "c3"]
+    assert chroma.get.call_args_list[-1].kwargs["ids"] == ["c3"]
+    assert AnnIndex.load(str(tmp_path)).version == 2
+
+
+def test_ann_vector_store_sync_waits_for_running_searches(tmp_path):
+    """진행 중인 검색(읽기 락)이 끝날 때까지 동기화가 인덱스를 제자리 갱신하지 않는지 테스트"""
+    store_ids = ["c0", "c1"]
+
+    def get(ids=None, include=None):
+        ids = store_ids if ids is None else ids
+        return {"ids": ids, "embeddings": [[float(chunk_id[1:]), 0.0] for chunk_id in ids], "metadatas": [{} for _ in ids]}
+
+    chroma = MagicMock()
+    chroma.get.side_effect = get
+    store = AnnVectorStore(chroma, uid="u", index_dir=str(tmp_path))
+    with patch("src.rag_pipeline.ann_index.read_manifest", return_value=IndexManifest(version=1)):
+        index = store.get_index()
+
+    store_ids[:] = ["c0", "c2"]
+    with patch("src.rag_pipeline.ann_index.read_manifest", return_value=IndexManifest(version=2)):
+        with store._rw.read():
+            sync = threading.Thread(target=store.get_index)
+            sync.start()
+            sync.join(timeout=0.3)
+            # 동기화 스레드는 Chroma 조회까지만 끝내고 쓰기 락을 기다림
+            assert sync.is_alive()
+            assert sorted(index.rows) == ["c0", "c1"] and index.version == 1
+        sync.join(timeout=5)
+    assert not sync.is_alive()
+    assert sorted(index.rows) == ["c0", "c2"] and index.version == 2
+
+
+def test_quantized_index_rescoring_recall_and_memory(tmp_path):
+    """int8/PQ 코드로 후보를 고르고 원본 벡터로 재점수한 결과의 recall@10과 상주 메모리 감소를 테스트"""
+    rng = np.random.default_rng(1)
+    centers = rng.normal(size=(50, 64))
+    vectors = (centers[rng.integers(0, 50, 3000)] + 0.3 * rng.normal(size=(3000, 64))).astype(np.float32)
+    ids = [f"c{i}" for i in range(3000)]
+    metadatas = [{"doc_name": "manual", "page": i % 10} for i in range(3000)]
+    queries = vectors[rng.choice(3000, 20, replace=False)] + 0.1 * rng.normal(size=(20, 64)).astype(np.float32)
+
+    exact = AnnIndex(quantization="none")
+    exact.add(ids, vectors, metadatas)
+    truth = [{chunk_id for chunk_id, _ in hits} for hits in exact.search(queries, k=10)]
+
+    for quantization, min_recall, min_ratio in (("int8", 0.95, 3.0), ("pq", 0.8, 8.0)):
+        index = AnnIndex(quantization=quantization)
+        index.add(ids, vectors, metadatas)
+        index.save(str(tmp_path / quantization))
+        loaded = AnnIndex.load(str(tmp_path / quantization))
+        assert loaded.quantization == quantization and loaded.codes is not None
+
+        results = loaded.search(queries, k=10)
+        recall = np.mean([len({chunk_id for chunk_id, _ in hits} & expected) / 10 for hits, expected in zip(results, truth)])
+        assert recall >= min_recall
+        # 재점수 후 거리는 원본 벡터 기준 정확한 값
+        chunk_id, distance = results[0][0]
+        assert np.isclose(distance, ((vectors[ids.index(chunk_id)] - queries[0]) ** 2).sum(), rtol=1e-4)
+        assert exact.memory_bytes() / loaded.memory_bytes() >= min_ratio
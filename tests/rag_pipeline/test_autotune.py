@@ -0,0 +1,56 @@
+import numpy as np
+from langchain_core.documents import Document
+
+from src.rag_pipeline.autotune import (
+    HashingEmbeddings,
+    first_relevant_rank,
+    pareto_front,
+    recommend,
+    summarize_trial,
+    to_profile,
+)
+from src.rag_pipeline.tokenizer import estimate_tokens
+
+
+def _trial(name: str, ranks, tokens, latency):
+    return summarize_trial({"CHUNK_SIZE": name, "ENSEMBLE_WEIGHTS": [0.5, 0.5]}, ranks, [tokens], [latency], [1, 5])
+
+
+def test_relevance_metrics_and_local_embedding():
+    """정답 포함 청크의 순위로 recall@k / MRR을 계산하고, 로컬 임베딩이 같은 토큰을 공유하는 텍스트를 가깝게 두는지 테스트"""
+    docs = [
+        Document(page_content="원점 복귀 절차"),
+        Document(page_content="QD77MS16 모듈 1축당 대기 시간: 0.88 ms"),
+    ]
+    assert first_relevant_rank(docs, "0.88ms") == 2
+    assert first_relevant_rank(docs, "엔코더 통신 이상") is None
+
+    result = summarize_trial({}, [2, None, 1, 7], [100, 300, 200, 400], [0.01, 0.02], [1, 5])
+    assert result.recall == {1: 0.25, 5: 0.5}
+    assert result.mrr == (0.5 + 1.0 + 1 / 7) / 4
+    assert result.tokens == 250.0
+
+    embeddings = HashingEmbeddings(dim=64)
+    query, near, far = np.array(embeddings.embed_documents(["알람 E1236 엔코더", "엔코더 알람 E1236 원인", "원점 복귀 절차"]))
+    assert query @ near > query @ far
+    assert estimate_tokens("") == 0 and estimate_tokens("서보 앰프 P2-01") == 5
+
+
+def test_pareto_front_and_profile():
+    """지배되는 설정을 제외하고, 품질 우선으로 고른 설정을 .env 프로필로 출력하는지 테스트"""
+    best = _trial(800, [1], 3000, 0.010)
+    cheap = _trial(500, [3], 1000, 0.005)
+    dominated = _trial(1200, [3], 4000, 0.020)
+
+    front = pareto_front([best, cheap, dominated])
+    assert front == [best, cheap]
+    assert recommend(front) is best
+
+    profile = to_profile(best, front, comment="튜닝 결과")
+    assert profile.splitlines()[:4] == [
+        "# 튜닝 결과",
+        "# recall@1=1.00 recall@5=1.00 MRR=1.000 tokens=3000 p50=10.0ms p95=10.0ms",
+        "CHUNK_SIZE=800",
+        "ENSEMBLE_WEIGHTS=[0.5, 0.5]",
+    ]
+    assert "# CHUNK_SIZE=500 ENSEMBLE_WEIGHTS=[0.5, 0.5] | recall@1=0.00" in profile
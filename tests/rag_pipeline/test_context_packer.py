@@ -0,0 +1,37 @@
+from langchain_core.documents import Document
+
+from src.rag_pipeline.context_packer import chunk_tokens, pack_context, resolve_citations
+
+
+def test_pack_context_fills_budget_by_rank_and_groups_pages(make_doc):
+    """순위대로 토큰 예산까지 채우고(넘는 청크는 건너뜀), 같은 페이지 청크는 헤더 하나로 묶는지 테스트"""
+    docs = [
+        make_doc("알람 E1236 엔코더 통신 이상", page=12, with_image=True, token_count=100),
+        make_doc("반복 경고문", page=3, with_image=True, token_count=50, duplicate_pages="3, 12, 37"),
+        make_doc("긴 파라미터 표", page=40, with_image=True, token_count=1000),
+        make_doc("케이블 연결 상태를 확인하십시오", page=12, with_image=True, token_count=80),
+    ]
+    packed = pack_context(docs, token_budget=300)
+
+    assert [doc.page_content for doc in packed.documents] == [docs[0].page_content, docs[1].page_content, docs[3].page_content]
+    assert packed.text == (
+        "[S1] manual p.12\n알람 E1236 엔코더 통신 이상\n케이블 연결 상태를 확인하십시오\n\n"
+        "[S2] manual p.3, 12, 37\n반복 경고문"
+    )
+    assert packed.citations == {"S1": "images/manual/page_012.png", "S2": "images/manual/page_003.png"}
+    assert 230 < packed.tokens <= 300
+
+    # 1순위 청크는 예산보다 커도 포함, 예산 0은 제한 없음
+    assert [doc.metadata["page"] for doc in pack_context(docs[2:], token_budget=10).documents] == [40]
+    assert len(pack_context(docs, token_budget=0).documents) == 4
+    assert chunk_tokens(Document(page_content="서보 앰프 P2-01")) == 5
+
+
+def test_resolve_citations_maps_ids_to_image_paths():
+    """인용 ID를 이미지 경로로 바꾸고 태그를 답변에서 제거하는지 테스트 (직접 적힌 경로도 허용)"""
+    citations = {"S1": "img/p12.png", "S2": "img/p3.png"}
+    assert resolve_citations("E1236은 엔코더 이상입니다. [[Cited Images: S2, [S1], S9]]", citations) == \
+        ("E1236은 엔코더 이상입니다.", ["img/p12.png", "img/p3.png"])
+    assert resolve_citations("답변 [[Cited Images: /img/p1.png]]", citations) == ("답변", ["/img/p1.png"])
+    assert resolve_citations("답변 [[Cited Images: None]]", citations) == ("답변", [])
+    assert resolve_citations("태그 없는 답변", citations) == ("태그 없는 답변", [])
@@ -0,0 +1,71 @@
+from unittest.mock import patch
+
+from langchain_core.documents import Document
+
+from src.rag_pipeline.continuation import detect_continuation, detect_continuations
+from src.rag_pipeline.keyword_index import KeywordIndex
+from src.rag_pipeline.schema import PageContent
+from src.rag_pipeline.vector_db import build_page_documents
+
+TABLE = "| 코드 | 내용 |\n|---|---|\n| E1236 | 과전류 |"
+
+
+def test_detect_continuation_rules():
+    """표 헤더 반복, 헤더 없는 표 이어짐, 연속 표시 문구를 감지하고 일반 페이지는 무시하는지 테스트"""
+    assert detect_continuation(PageContent(text="", tables=[TABLE]), PageContent(text="", tables=[TABLE])) == "table_header"
+    assert detect_continuation(
+        PageContent(text="", tables=[TABLE]), PageContent(text="", tables=["| E1237 | 과전압 |"])
+    ) == "table_unterminated"
+    assert detect_continuation(PageContent(text="절차 1~3 (다음 페이지에 계속)"), PageContent(text="4. 전원 재투입")) == "marker"
+    assert detect_continuation(PageContent(text="알람 목록"), PageContent(text="(계속) 알람 목록")) == "marker"
+    assert detect_continuation(PageContent(text="배선 순서는 다음 페이지에 계속됩니다."), PageContent(text="5. 접지")) == "marker"
+    assert detect_continuation(PageContent(text="개요"), PageContent(text="표 3-2 알람 목록 (계속)\n| E1237 |")) == "marker"
+    assert detect_continuation(PageContent(text="Wiring"), PageContent(text="Continued from previous page")) == "marker"
+    assert detect_continuation(
+        PageContent(text="개요", tables=[TABLE]), PageContent(text="사양", tables=["| 항목 | 값 |\n|---|---|\n| 전압 | 200V |"])
+    ) is None
+
+    # 연속 표시가 아닌 일반 문장 (줄 끝이 아닌 문구, 괄호 없는 "이어서", "동작이 계속됩니다")
+    assert detect_continuation(PageContent(text="정지 신호 전까지 모터 동작이 계속됩니다."), PageContent(text="3. 정지")) is None
+    assert detect_continuation(PageContent(text="원점 복귀"), PageContent(text="이어서 파라미터 P2-01을 설정합니다.")) is None
+    assert detect_continuation(PageContent(text="다음 페이지에 계속 표시되는 항목은 선택 사양입니다.\n끝"), PageContent(text="사양")) is None
+    assert detect_continuation(PageContent(text="개요"), PageContent(text="경고가 계속) 표시되면 전원을 차단하십시오.")) is None
+
+    pages = [(3, PageContent(text="", tables=[TABLE])), (1, PageContent(text="표지")), (2, PageContent(text="", tables=[TABLE])), (4, None)]
+    assert detect_continuations(pages) == {2: "table_header"}
+
+
+def test_neighbor_expansion_follows_only_links():
+    """주변 페이지 확장이 연속 연결이 있는 페이지만 따라가고, 연결 정보가 없는 청크는 항상 확장하는지 테스트"""
+    from src.rag_pipeline import retriever
+
+    def doc(doc_id, page, **links):
+        return Document(page_content=f"p{page}", metadata={"doc_id": doc_id, "doc_name": "manual", "page": page, **links})
+
+    keyword_index = KeywordIndex(preprocess_func=str.split)
+    keyword_index.add_documents([
+        doc("p1", 1, continues_to_next=True, continues_from_prev=False),
+        doc("p2", 2, continues_to_next=True, continues_from_prev=True),
+        doc("p3", 3, continues_to_next=False, continues_from_prev=True),
+        doc("p4", 4, continues_to_next=False, continues_from_prev=False),
+        doc("legacy5", 5),
+        doc("legacy6", 6),
+    ])
+    top_docs = keyword_index.get_documents(["p1", "p3", "legacy5"])
+    with patch.object(retriever, "get_keyword_index", return_value=keyword_index), \
+         patch.object(retriever, "_page_indexes", {}):
+        linked = retriever.get_neighbor_documents("user1", top_docs, direction="next", radius=3, follow_links=True)
+        blanket = retriever.get_neighbor_documents("user1", top_docs[1:2], direction="next", radius=1)
+
+    assert [[d.metadata["doc_id"] for d in group] for group in linked] == [["p2", "p3"], [], ["legacy6"]]
+    assert [d.metadata["doc_id"] for d in blanket[0]] == ["p4"]
+
+
+def test_page_documents_omit_links_when_not_analysed():
+    """연속 감지를 하지 않은 청크는 연결 키를 넣지 않아(연결 여부 모름) 주변 페이지 확장에서 연결된 것으로 취급되는지 테스트"""
+    page = PageContent(text="서보 앰프 배선 순서와 주의 사항을 설명합니다.")
+    unknown = build_page_documents(page, 3, "images/manual/page_003.png")[0].metadata
+    assert "continues_to_next" not in unknown and "continues_from_prev" not in unknown
+
+    linked = build_page_documents(page, 3, "images/manual/page_003.png", continues_to_next=False, continues_from_prev=True)[0].metadata
+    assert (linked["continues_to_next"], linked["continues_from_prev"]) == (False, True)
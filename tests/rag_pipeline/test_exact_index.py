@@ -0,0 +1,59 @@
+from unittest.mock import patch
+
+from src.rag_pipeline import retriever
+from src.rag_pipeline.exact_index import ExactHit, ExactMatchIndex, extract_codes
+from src.rag_pipeline.keyword_index import KeywordIndex
+
+
+def test_extract_codes_alarm_parameter_and_model():
+    """알람 코드, 파라미터 번호, 모델명을 추출하고 일반 단어/약어는 제외하는지 테스트"""
+    codes = extract_codes("E1236이 발생하면 Pr.22와 Pr. 22를 확인하세요. (QD77MS16, MR-J4-70A, Fig.3, A4, CPU)")
+    assert codes == ["E1236", "QD77MS16", "MR-J4-70A", "PR.22"]
+    assert extract_codes("e1236 알람 pr.22".upper()) == ["E1236", "PR.22"]
+
+
+def test_exact_index_lookup_remove_and_persist(tmp_path, make_doc):
+    """토큰 → (doc_name, page, chunk_id) 조회, 삭제/교체, 저장 후 로드를 테스트"""
+    index = ExactMatchIndex(version=1)
+    index.add_documents([
+        make_doc("E1236 알람 목록", "a", page=10),
+        make_doc("E1236 조치: Pr.22 설정", "b", page=11),
+        make_doc("QD77MS16 사양", "c", doc_name="other", page=2),
+    ])
+    assert index.lookup("E1236") == [ExactHit("manual", 10, "a"), ExactHit("manual", 11, "b")]
+    assert [hit.chunk_id for hit in index.lookup_many(["PR.22", "E1236"])] == ["b", "a"]
+    assert [hit.chunk_id for hit in index.lookup_many(["E1236"], page=10)] == ["a"]
+    assert index.lookup_many(["QD77MS16"], doc_name="manual") == []
+
+    index.add_documents([make_doc("그리퍼 설정", "b", page=11)])  # 같은 ID 교체
+    assert "PR.22" not in index
+    assert index.remove_documents(["c"]) == 1
+    assert index.lookup("QD77MS16") == []
+
+    index.save(str(tmp_path))
+    loaded = ExactMatchIndex.load(str(tmp_path))
+    assert loaded.version == 1
+    assert loaded.lookup("E1236") == [ExactHit("manual", 10, "a")]
+    assert ExactMatchIndex.load(str(tmp_path / "missing")) is None
+
+
+def test_exact_match_documents_ranked_by_bm25_score(make_doc):
+    """정확 일치 청크를 등장 순서가 아닌 질문 BM25 점수 순으로 정렬하고 limit개만 반환하는지 테스트"""
+    docs = [
+        make_doc("알람 목록 E1235 E1236 E1237 E1238 E1239 E1240", "index", page=2),
+        make_doc("E1236 엔코더 통신 이상 원인", "cause", page=40),
+        make_doc("E1236 엔코더 통신 이상 조치 케이블 연결 확인", "action", page=41),
+    ]
+    exact_index = ExactMatchIndex()
+    exact_index.add_documents(docs)
+    keyword_index = KeywordIndex(preprocess_func=str.split)
+    keyword_index.add_documents(docs)
+
+    with patch.object(retriever, "get_search_uids", return_value=["user1"]), \
+         patch.object(retriever, "get_exact_index", return_value=exact_index), \
+         patch.object(retriever, "get_keyword_index", return_value=keyword_index):
+        hits = retriever.get_exact_match_documents("user1", "E1236 엔코더 통신 이상 조치")
+        assert [doc.metadata["doc_id"] for doc, _ in hits] == ["action", "cause", "index"]
+        assert [score for _, score in hits] == sorted((score for _, score in hits), reverse=True)
+        assert len(retriever.get_exact_match_documents("user1", "E1236 조치", limit=2)) == 2
+        assert retriever.get_exact_match_documents("user1", "엔코더 조치") == []
@@ -0,0 +1,127 @@
+import random
+
+import pytest
+
+from langchain_core.documents import Document
+
+from src.rag_pipeline.fusion import (
+    FusionParams,
+    RankedList,
+    adaptive_cutoff,
+    adaptive_truncate,
+    fuse,
+    fuse_with_scores,
+    raw_score_profile,
+)
+
+
+def _hits(*ids, scores=None):
+    scores = scores or [1.0 / (i + 1) for i in range(len(ids))]
+    return [(Document(page_content=f"text {chunk_id}", metadata={"doc_id": chunk_id}), score) for chunk_id, score in zip(ids, scores)]
+
+
+def test_rrf_dedupes_by_chunk_id_and_applies_weights():
+    """여러 레그/서브 쿼리에 나온 청크가 ID 기준으로 합쳐지고 레그 가중치가 반영되는지 테스트"""
+    lists = [
+        RankedList("keyword", _hits("a", "b")),
+        RankedList("vector", _hits("b", "c")),
+        RankedList("vector", _hits("c", "b")),
+    ]
+    docs = fuse(lists, FusionParams(early_stop=False))
+    assert [doc.metadata["doc_id"] for doc in docs] == ["b", "c", "a"]
+
+    keyword_only = FusionParams(weights={"keyword": 1.0, "vector": 0.0}, early_stop=False)
+    assert [doc.metadata["doc_id"] for doc in fuse(lists, keyword_only)][:2] == ["a", "b"]
+
+
+def test_score_fusion_uses_normalized_scores():
+    """score 방식이 리스트별 min-max 정규화 점수의 가중합으로 순위를 매기는지 테스트"""
+    lists = [
+        RankedList("keyword", _hits("a", "b", "c", scores=[30.0, 29.0, 1.0])),
+        RankedList("vector", _hits("c", "b", "a", scores=[0.9, 0.8, 0.1])),
+    ]
+    fused = fuse_with_scores(lists, FusionParams(method="score"))
+    assert [doc.metadata["doc_id"] for doc, _ in fused] == ["b", "a", "c"]
+    assert fused[0][1] == pytest.approx(0.5 * (28 / 29) + 0.5 * (0.7 / 0.8))
+
+
+def test_early_stop_matches_full_fusion():
+    """상위 N개가 확정되어 일찍 멈춰도 전체 누적 결과와 같은지 테스트"""
+    rng = random.Random(7)
+    pool = [f"c{i}" for i in range(200)]
+    lists = [
+        RankedList(leg, _hits(*rng.sample(pool, 40)))
+        for leg in ("keyword", "vector", "keyword", "vector")
+    ]
+    for method in ("rrf", "score"):
+        full = fuse_with_scores(lists, FusionParams(method=method, early_stop=False), top_n=5)
+        early = fuse_with_scores(lists, FusionParams(method=method), top_n=5)
+        assert [doc.metadata["doc_id"] for doc, _ in early] == [doc.metadata["doc_id"] for doc, _ in full]
+        assert [score for _, score in early] == [score for _, score in full]
+
+
+def test_adaptive_cutoff_shrinks_precise_queries_and_keeps_broad_ones():
+    """점수 간격이 큰 질문은 하한까지 줄고, 고르게 퍼진 질문은 누적 점수 기준으로 많이 남기며, 상한/하한을 지키는지 테스트"""
+    precise = [1.0, 0.2] + [0.2 - 0.001 * i for i in range(1, 60)]
+    assert adaptive_cutoff(precise, min_k=3, max_k=40) == 3
+
+    elbow = [1.0 - 0.01 * i for i in range(12)] + [0.3 - 0.001 * i for i in range(50)]
+    assert adaptive_cutoff(elbow, min_k=3, max_k=40) == 12
+
+    broad = [1.0 - 0.01 * i for i in range(100)]
+    assert adaptive_cutoff(broad, min_k=3, max_k=40) == 40
+    assert 3 < adaptive_cutoff(broad, min_k=3, max_k=100) < 100
+
+    assert adaptive_cutoff([0.5] * 30, min_k=3, max_k=20) == 20
+    assert adaptive_cutoff([0.9, 0.1], min_k=3, max_k=20) == 2
+
+
+def _legs(num_legs: int, pinned: bool):
+    """서브 쿼리 x 레그 순위 리스트 (레그당 40개, 60개 청크 풀에서 겹쳐 등장, pinned이면 "E1236"이 모든 레그 1위)"""
+    lists = []
+    for leg_index in range(num_legs):
+        leg = "keyword" if leg_index % 2 == 0 else "vector"
+        ids = [f"c{(leg_index * 7 + i * 3) % 60}" for i in range(40)]
+        scores = [6.0 - 0.1 * i for i in range(40)] if leg == "keyword" else [0.75 - 0.005 * i for i in range(40)]
+        if pinned:
+            ids = ["E1236"] + ids[:39]
+            scores = [15.0 if leg == "keyword" else 0.86] + scores[1:]
+        lists.append(RankedList(leg, _hits(*ids, scores=scores)))
+    return lists
+
+
+@pytest.mark.parametrize("num_legs", [2, 4, 6])
+def test_adaptive_cutoff_on_fused_rrf_output(num_legs):
+    """실제 RRF 융합 결과에서: 모든 레그 1위가 압도적인 질문은 하한까지 줄고, 고른 질문은 많이 남는지 테스트"""
+    pinned = _legs(num_legs, pinned=True)
+    fused = fuse_with_scores(pinned, top_n=100)
+    assert fused[0][0].metadata["doc_id"] == "E1236"
+    assert len(adaptive_truncate(fused, raw_score_profile(pinned, fused), min_k=8, max_k=100)) == 8
+
+    broad = _legs(num_legs, pinned=False)
+    fused = fuse_with_scores(broad, top_n=100)
+    assert len(adaptive_truncate(fused, raw_score_profile(broad, fused), min_k=8, max_k=100)) >= len(fused) // 2
+
+
+
+def test_adaptive_truncate_keeps_top_raw_scores_in_fused_order():
+    """RRF 순위와 원 점수 순위가 다를 때 원 점수 상위 k개를 남기고(RRF 순서 유지) 원 점수가 낮은 청크를 자르는지 테스트"""
+    # "exact"는 키워드 점수가 압도적이고 벡터 유사도도 1위와 거의 같지만 벡터 순위가 3위라 RRF로는 2위
+    filler = [f"f{i}" for i in range(8)]
+    vector_ids = ["f0", "f1", "exact", *filler[2:]]
+    vector_scores = [0.800, 0.799, 0.798] + [0.6 - 0.01 * i for i in range(6)]
+    lists = [
+        RankedList("keyword", _hits("exact", *filler, scores=[30.0] + [1.2 - 0.1 * i for i in range(8)])),
+        RankedList("vector", _hits(*vector_ids, scores=vector_scores)),
+        RankedList("vector", _hits(*vector_ids, scores=vector_scores)),
+    ]
+    fused = fuse_with_scores(lists, top_n=20)
+    profile = raw_score_profile(lists, fused)
+    ids = [doc.metadata["doc_id"] for doc, _ in fused]
+    assert ids[0] == "f0" and ids.index("exact") > 0
+    assert profile[ids.index("exact")] == max(profile)
+
+    kept = adaptive_truncate(fused, profile, min_k=1, max_k=20)
+    assert [doc.metadata["doc_id"] for doc, _ in kept] == ["exact"]  # 융합 순위로 자르면 f0만 남음
+    kept = [doc.metadata["doc_id"] for doc, _ in adaptive_truncate(fused, profile, min_k=3, max_k=20)]
+    assert kept == [chunk_id for chunk_id in ids if chunk_id in kept] and "exact" in kept
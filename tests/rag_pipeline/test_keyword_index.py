@@ -0,0 +1,213 @@
+import pytest
+from unittest.mock import patch, MagicMock
+
+from src.rag_pipeline.keyword_index import KeywordIndex, KeywordIndexRetriever
+from src.rag_pipeline.tokenizer import char_ngram_tokenizer, tokenize_batch
+from src.rag_pipeline.index_manifest import bump_manifest, rebuild_manifest, read_manifest
+
+
+@pytest.fixture
+def index(make_doc):
+    index = KeywordIndex(preprocess_func=str.split)
+    index.add_documents([
+        make_doc("E1236 알람 조치 방법", "a"),
+        make_doc("그리퍼 설정 방법", "b", page=2),
+        make_doc("E1236 E1236 원점 복귀", "c", doc_name="other"),
+    ])
+    return index
+
+
+def test_search_ranks_matching_chunks(index):
+    """쿼리 용어를 포함한 청크만 점수 순으로 반환되는지 테스트"""
+    hits = index.search("E1236", k=10)
+    assert [chunk_id for chunk_id, _ in hits] == ["c", "a"]
+    assert all(score > 0 for _, score in hits)
+
+
+def test_remove_updates_postings_and_stats(index):
+    """청크 삭제 시 포스팅과 문서 길이 통계가 함께 갱신되는지 테스트"""
+    assert index.remove_where(doc_name="other") == 1
+    assert len(index) == 2
+    assert index.total_len == 7
+    assert index.get_postings("E1236") == {"a": 1}
+    assert index.get_postings("원점") == {}
+    assert [chunk_id for chunk_id, _ in index.search("E1236")] == ["a"]
+
+
+def test_add_existing_id_replaces_chunk(index, make_doc):
+    """같은 ID로 다시 추가하면 이전 내용이 교체(upsert)되는지 테스트"""
+    index.add_documents([make_doc("서보 앰프 배선", "a")])
+    assert len(index) == 3
+    assert "a" not in index.get_postings("E1236")
+    assert index.search("배선")[0][0] == "a"
+
+
+def test_save_and_load_memory_mapped(index, tmp_path, make_doc):
+    """증분 저장 후 메모리 매핑으로 로드한 인덱스가 동일한 결과를 반환하는지 테스트"""
+    index.save(str(tmp_path), compact=True)
+    index.add_documents([make_doc("파라미터 Pr.22 설정", "d", page=3)])
+    index.remove_documents(["b"])
+    index.save(str(tmp_path))
+    assert len(list((tmp_path / "keyword_index").glob("seg_*"))) == 2
+
+    loaded = KeywordIndex.load(str(tmp_path), preprocess_func=str.split)
+    assert not loaded.segments[0].matrix.indices.flags.writeable  # 메모리 매핑된 읽기 전용 배열
+    assert {chunk_id for chunk_id, _ in loaded.iter_entries()} == {"a", "c", "d"}
+    assert loaded.total_len == index.total_len
+    assert loaded.search("설정") == index.search("설정")
+    assert loaded.get_text("d") == "파라미터 Pr.22 설정"
+    assert [chunk_id for chunk_id, _ in loaded.iter_entries(doc_name="manual", page=3)] == ["d"]
+
+
+def test_search_with_metadata_filter(index):
+    """doc_name / page 필터가 메타데이터 열 마스크로 후보를 제한하는지 테스트"""
+    assert [chunk_id for chunk_id, _ in index.search("E1236", k=10, doc_name="manual")] == ["a"]
+    assert [chunk_id for chunk_id, _ in index.search("방법", k=10, page=2)] == ["b"]
+    assert index.search("E1236", k=10, doc_name="manual", page=2) == []
+    assert index.search("E1236", k=10, doc_name="unknown") == []
+
+    retriever = KeywordIndexRetriever(index=index, k=5, metadata_filter={"doc_name": "other"})
+    assert [doc.metadata["doc_id"] for doc in retriever.invoke("E1236")] == ["c"]
+
+
+def test_score_documents_limits_candidates_to_ids(index):
+    """주어진 청크만 BM25로 채점하고, 쿼리 용어가 없는 청크와 모르는 ID는 제외하는지 테스트"""
+    scores = index.score_documents("E1236 조치", ["a", "b", "missing"])
+    assert list(scores) == ["a"]
+    assert scores["a"] == pytest.approx(dict(index.search("E1236 조치", k=3))["a"])
+    assert index.score_documents("E1236", []) == {}
+
+
+def test_build_search_filter():
+    """문서명/페이지 조건이 Chroma where 필터로 변환되는지 테스트"""
+    from src.rag_pipeline.retriever import build_search_filter
+
+    assert build_search_filter() == {}
+    assert build_search_filter(doc_name="manual") == {"doc_name": {"$eq": "manual"}}
+    assert build_search_filter(doc_name="manual", page=3) == {
+        "$and": [{"doc_name": {"$eq": "manual"}}, {"page": {"$eq": 3}}]
+    }
+
+
+def test_retriever_returns_documents_with_ids(index):
+    """KeywordIndexRetriever가 doc_id 메타데이터가 포함된 Document를 반환하는지 테스트"""
+    retriever = KeywordIndexRetriever(index=index, k=1)
+    docs = retriever.invoke("그리퍼")
+    assert len(docs) == 1
+    assert docs[0].metadata["doc_id"] == "b"
+    assert docs[0].page_content == "그리퍼 설정 방법"
+
+
+def test_segments_merge_and_keep_results(index, make_doc):
+    """증분 추가로 세그먼트가 쌓여도 병합 후 검색 결과가 동일한지 테스트"""
+    for i in range(KeywordIndex.MAX_SEGMENTS + 2):
+        index.add_documents([make_doc(f"노이즈 {i} 설정", f"n{i}", page=10 + i)])
+    before = index.search("E1236 설정", k=5)
+    assert len(index.segments) <= KeywordIndex.MAX_SEGMENTS
+    index.merge_segments()
+    assert len(index.segments) == 1
+    assert index.search("E1236 설정", k=5) == before
+
+
+# --- 토크나이저 테스트 ---
+
+def test_char_ngram_tokenizer_keeps_codes():
+    """ngram 모드가 한글은 바이그램으로, 에러 코드/파라미터는 통째로 토크나이징하는지 테스트"""
+    tokens = char_ngram_tokenizer("E1236 알람이 발생하면 Pr.22 확인")
+    assert "e1236" in tokens and "pr.22" in tokens
+    assert tokens[1:3] == ["알람", "람이"]
+    assert "확인" in tokens
+
+
+def test_tokenize_batch_process_pool_matches_sequential():
+    """프로세스 풀 토크나이징 결과가 순차 처리 결과와 동일한지 테스트"""
+    texts = [f"서보 앰프 {i}번 축 알람 E{1000 + i}" for i in range(300)]
+    pooled = tokenize_batch(texts, mode="ngram", workers=2)
+    assert pooled == [char_ngram_tokenizer(text) for text in texts]
+
+
+@patch('src.rag_pipeline.retriever.tokenize_batch', wraps=tokenize_batch)
+def test_rebuild_reuses_stored_tokens(mock_tokenize_batch, make_doc):
+    """재생성 시 이전 인덱스에 저장된 용어 빈도를 재사용하고 새 청크만 토크나이징하는지 테스트"""
+    from src.rag_pipeline import retriever
+
+    previous = KeywordIndex(preprocess_func=str.split, tokenizer_name="ngram")
+    previous.add_documents([make_doc("E1236 알람 조치", "a")], tokens=[["e1236", "알람", "조치"]])
+
+    mock_store = MagicMock()
+    mock_store.get.return_value = {
+        "ids": ["a", "b"],
+        "documents": ["E1236 알람 조치", "그리퍼 설정"],
+        "metadatas": [{"doc_name": "manual"}, {"doc_name": "manual"}],
+    }
+    with patch.object(retriever.settings, "KEYWORD_TOKENIZER", "ngram"):
+        index = retriever.build_keyword_index_from_store(mock_store, previous=previous)
+
+    mock_tokenize_batch.assert_called_once_with(["그리퍼 설정"], mode="ngram")
+    assert index.get_postings("e1236") == {"a": 1}
+    assert index.get_postings("그리") == {"b": 1}
+
+
+# --- 인덱스 매니페스트 테스트 ---
+
+def test_manifest_incremental_digest_matches_rebuild(tmp_path):
+    """증분 갱신한 다이제스트가 전체 재계산 결과와 같고, 버전은 매번 증가하는지 테스트"""
+    bump_manifest(str(tmp_path), added=[("a", "알람"), ("b", "설정")])
+    bump_manifest(str(tmp_path), added=[("c", "배선"), ("a", "알람 v2")], removed=[("a", "알람")])
+    incremental = bump_manifest(str(tmp_path), removed=[("b", "설정")])
+    assert incremental.version == 3
+    assert incremental.chunk_count == 2
+
+    rebuilt = rebuild_manifest(str(tmp_path), [("c", "배선"), ("a", "알람 v2")])
+    assert rebuilt.digest == incremental.digest
+    assert rebuilt.version == 4
+    assert read_manifest(str(tmp_path)) == rebuilt
+
+
+def test_get_keyword_index_reloads_only_when_version_moves(tmp_path, make_doc):
+    """매니페스트 버전이 그대로면 캐시를 쓰고, 바뀌면 디스크의 인덱스를 다시 읽는지 테스트"""
+    from src.rag_pipeline import retriever
+
+    index_dir = tmp_path / "user1"
+    disk_index = KeywordIndex(preprocess_func=str.split, tokenizer_name=retriever.settings.KEYWORD_TOKENIZER)
+    disk_index.add_documents([make_doc("E1236 알람", "a")])
+    disk_index.version = bump_manifest(str(index_dir), added=[("a", "E1236 알람")]).version
+    disk_index.save(str(index_dir), compact=True)
+
+    with patch.object(retriever.settings, "CHROMA_DB_DIR", str(tmp_path)), \
+         patch.object(retriever, "_keyword_indexes", {}), \
+         patch.object(retriever, "get_vector_store") as mock_get_vector_store:
+        first = retriever.get_keyword_index(uid="user1")
+        assert retriever.get_keyword_index(uid="user1") is first
+
+        # 다른 워커가 청크를 추가한 상황
+        disk_index.add_documents([make_doc("그리퍼 설정", "b")])
+        disk_index.version = bump_manifest(str(index_dir), added=[("b", "그리퍼 설정")]).version
+        disk_index.save(str(index_dir))
+
+        reloaded = retriever.get_keyword_index(uid="user1")
+        assert reloaded is not first
+        assert reloaded.version == 2 and len(reloaded) == 2
+        mock_get_vector_store.assert_not_called()
+
+
+def test_get_keyword_index_removes_stale_bm25_pickle(tmp_path, make_doc):
+    """키워드 인덱스를 재생성해 저장한 뒤 유저 디렉토리에 남은 이전 BM25 피클을 삭제하는지 테스트"""
+    from src.rag_pipeline import retriever
+
+    index_dir = tmp_path / "user1"
+    index_dir.mkdir()
+    legacy_path = index_dir / retriever.LEGACY_BM25_FILENAME
+    legacy_path.write_bytes(b"stale")
+    rebuilt = KeywordIndex(preprocess_func=str.split, tokenizer_name=retriever.settings.KEYWORD_TOKENIZER)
+    rebuilt.add_documents([make_doc("E1236 알람", "a")])
+
+    with patch.object(retriever.settings, "CHROMA_DB_DIR", str(tmp_path)), \
+         patch.object(retriever, "_keyword_indexes", {}), \
+         patch.object(retriever, "get_vector_store"), \
+         patch.object(retriever, "build_keyword_index_from_store", return_value=rebuilt):
+        index = retriever.get_keyword_index(uid="user1")
+
+    assert index is rebuilt and index.version == 1
+    assert (index_dir / "keyword_index").exists()
+    assert not legacy_path.exists()
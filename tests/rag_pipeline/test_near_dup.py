@@ -0,0 +1,89 @@
+from unittest.mock import patch
+
+from src.rag_pipeline.ann_index import AnnIndex, parse_search_filter
+from src.rag_pipeline.exact_index import ExactMatchIndex
+from src.rag_pipeline.generator import format_docs
+from src.rag_pipeline.keyword_index import KeywordIndex
+from src.rag_pipeline.near_dup import alias_pages, collapse_near_duplicates
+from src.rag_pipeline.page_index import PageIndex
+from src.rag_pipeline.retriever import build_pages_filter, build_search_filter
+
+WARNING = "경고: 전원을 차단한 후 5분 이상 기다린 다음 서보 앰프의 충전 램프가 꺼진 것을 확인하고 배선 작업을 하십시오. 감전의 위험이 있습니다."
+
+
+def test_collapse_near_duplicates_keeps_first_copy_with_page_list(make_doc):
+    """반복 경고문(공백/문장부호가 조금 다른 사본 포함)을 첫 청크 하나로 병합하고 등장 페이지를 기록하는지 테스트"""
+    docs = [
+        make_doc(WARNING, page=3),
+        make_doc("원점 복귀 절차: 파라미터 P2-01을 1로 설정한 뒤 원점 복귀 버튼을 누릅니다.", page=4),
+        make_doc(WARNING.replace("  ", " ") + " ", page=12),
+        make_doc(WARNING.replace("하십시오.", "하십시오"), page=37),
+        make_doc(WARNING, page=40, chunk_type="table"),
+        make_doc("알람 E1236은 엔코더 통신 이상입니다. 케이블 연결 상태를 확인하십시오.", page=58),
+    ]
+    kept, removed = collapse_near_duplicates(docs, threshold=0.8)
+
+    assert removed == 2
+    assert [doc.metadata["page"] for doc in kept] == [3, 4, 40, 58]
+    assert kept[0].metadata["duplicate_pages"] == "3, 12, 37"
+    assert kept[0].metadata["duplicate_count"] == 3
+    assert alias_pages(kept[0].metadata) == [12, 37]
+    assert "duplicate_pages" not in kept[1].metadata
+    assert "Page: 3, 12, 37," in format_docs(kept[:1])
+
+    assert collapse_near_duplicates(docs[:1]) == (docs[:1], 0)
+
+
+def test_collapsed_chunk_stays_reachable_from_duplicate_pages(make_doc):
+    """병합된 대표 청크가 별칭 페이지의 페이지 라우터 / 키워드·정확 일치 page 필터 / 벡터 where 필터 / 주변 페이지 확장에 포함되는지 테스트"""
+    from src.rag_pipeline import retriever
+
+    docs = [
+        make_doc(WARNING + " E1236", page=3, with_image=True),
+        make_doc(WARNING + " E1236", page=12, with_image=True),
+        make_doc("알람 목록 표", page=36, with_image=True),
+        make_doc(WARNING + " E1236", page=37, with_image=True),
+        make_doc("배선 작업 순서", page=38, with_image=True),
+    ]
+    kept, _ = collapse_near_duplicates(docs, threshold=0.8)
+    canonical = kept[0].metadata["doc_id"]
+
+    keyword_index = KeywordIndex(preprocess_func=str.split)
+    keyword_index.add_documents(kept)
+    assert keyword_index.alias_ids(37, "manual") == [canonical]
+    assert [chunk_id for chunk_id, _ in keyword_index.search("감전의", k=5, page=37)] == [canonical]
+
+    page_index = PageIndex.from_locations(keyword_index.iter_locations(), page_aliases=keyword_index.page_aliases)
+    assert page_index.get_chunks("manual", 37) == [canonical]
+    assert page_index.route(37, radius=1) == [canonical, "manual_p38", "manual_p36"]
+    assert page_index.page_of(canonical) == ("manual", 3)
+    assert [chunk_ids for _, chunk_ids in page_index.iter_pages()][0] == [canonical]  # 페이지 요약은 자기 페이지만
+    page_index.remove([canonical])
+    assert page_index.route(37) == []
+
+    exact_index = ExactMatchIndex()
+    exact_index.add_documents(kept)
+    assert [hit.chunk_id for hit in exact_index.lookup_many(["E1236"], page=12)] == [canonical]
+
+    # 벡터 레그 where 필터: 페이지 조건에 대표 청크 ID를 $or로 포함하고, 인프로세스 ANN 인덱스도 같은 조건으로 거름
+    search_filter = build_search_filter(doc_name="manual", page=37, alias_ids=[canonical])
+    assert search_filter == {"$and": [
+        {"doc_name": {"$eq": "manual"}},
+        {"$or": [{"page": {"$eq": 37}}, {"doc_id": {"$in": [canonical]}}]},
+    ]}
+    conditions = parse_search_filter(search_filter)
+    assert conditions == {"doc_name": "manual", "page": 37, "alias_ids": [canonical]}
+    ann = AnnIndex(quantization="none")
+    ann.add([doc.metadata["doc_id"] for doc in kept], [[1.0, float(i)] for i in range(len(kept))], [doc.metadata for doc in kept])
+    assert [chunk_id for chunk_id, _ in ann.search([[1.0, 0.0]], 5, **conditions)[0]] == [canonical]
+    pages_conditions = parse_search_filter(build_pages_filter([("manual", 12), ("manual", 38)], {("manual", 12): [canonical]}))
+    assert {chunk_id for chunk_id, _ in ann.search([[1.0, 0.0]], 5, **pages_conditions)[0]} == {canonical, "manual_p38"}
+
+    # 페이지 라우터 / 주변 페이지 확장은 대표 청크를 요청 페이지의 page / image_path로 바꿔 반환
+    with patch.object(retriever, "get_keyword_index", return_value=keyword_index), \
+         patch.object(retriever, "_page_indexes", {}):
+        routed = retriever.get_page_documents("user1", "37페이지 경고", 37, doc_name="manual")
+        neighbors = retriever.get_neighbor_documents("user1", keyword_index.get_documents(["manual_p36"]))
+    assert [(doc.metadata["doc_id"], doc.metadata["page"]) for doc in routed] == [(canonical, 37)]
+    assert routed[0].metadata["image_path"] == "images/manual/page_037.png"
+    assert [(doc.metadata["doc_id"], doc.metadata["page"]) for doc in neighbors[0]] == [(canonical, 37)]
@@ -0,0 +1,63 @@
+import pytest
+from unittest.mock import patch
+
+from src.rag_pipeline.keyword_index import KeywordIndex
+from src.rag_pipeline.page_index import PageIndex
+
+
+@pytest.fixture
+def keyword_index(make_doc):
+    index = KeywordIndex(preprocess_func=str.split)
+    index.add_documents([
+        make_doc("서보 개요", "a", page=122),
+        make_doc("E1236 알람 목록", "b", page=123),
+        make_doc("그리퍼 설정", "c", page=123),
+        make_doc("원점 복귀", "d", page=124),
+        make_doc("다른 매뉴얼 123페이지", "e", doc_name="other", page=123),
+    ])
+    return index
+
+
+def test_page_index_route_with_radius_and_updates(keyword_index):
+    """(doc_name, page) 조회, 문서명 없는 페이지 질문, 주변 페이지 포함, 증분 삭제를 테스트"""
+    index = PageIndex.from_locations(keyword_index.iter_locations())
+    assert index.get_chunks("manual", 123) == ["b", "c"]
+    assert index.route(123) == ["b", "c", "e"]
+    assert index.route(123, doc_name="manual", radius=1) == ["b", "c", "d", "a"]
+    assert index.neighbors("manual", 123, direction="previous") == ["a"]
+    assert index.neighbors("manual", 122, direction="next", radius=2) == ["b", "c", "d"]
+
+    index.remove(["e"])
+    assert index.route(123) == ["b", "c"]
+    index.add("c", "manual", 125)  # 같은 ID 위치 교체
+    assert index.get_chunks("manual", 123) == ["b"]
+    assert index.page_of("c") == ("manual", 125)
+
+
+def test_get_page_documents_skips_vector_search(keyword_index):
+    """페이지 라우터가 벡터 스토어 없이 페이지 청크를 키워드 점수 순으로 반환하는지 테스트"""
+    from src.rag_pipeline import retriever
+
+    with patch.object(retriever, "get_keyword_index", return_value=keyword_index), \
+         patch.object(retriever, "_page_indexes", {}), \
+         patch.object(retriever, "get_vector_store") as mock_get_vector_store:
+        docs = retriever.get_page_documents("user1", "123페이지 그리퍼", 123, doc_name="manual")
+        assert [doc.metadata["doc_id"] for doc in docs] == ["c", "b"]
+        assert retriever.get_page_documents("user1", "없는 페이지", 999) == []
+    mock_get_vector_store.assert_not_called()
+
+
+def test_get_neighbor_documents_resolves_pages_in_one_batch(keyword_index):
+    """상위 결과들의 주변 페이지를 한 번의 배치 조회로 찾아 결과 순서대로 반환하는지 테스트"""
+    from src.rag_pipeline import retriever
+
+    top_docs = keyword_index.get_documents(["a", "b", "e"])
+    with patch.object(retriever, "get_keyword_index", return_value=keyword_index), \
+         patch.object(retriever, "_page_indexes", {}), \
+         patch.object(keyword_index, "get_documents", wraps=keyword_index.get_documents) as mock_get_documents:
+        neighbors = retriever.get_neighbor_documents("user1", top_docs, direction="next", radius=1)
+        both = retriever.get_neighbor_documents("user1", top_docs[1:2], direction="both", radius=1)
+
+    assert [[doc.metadata["doc_id"] for doc in group] for group in neighbors] == [["b", "c"], ["d"], []]
+    assert [doc.metadata["doc_id"] for doc in both[0]] == ["d", "a"]
+    assert mock_get_documents.call_count == 2
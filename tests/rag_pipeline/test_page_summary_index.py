@@ -0,0 +1,91 @@
+from unittest.mock import MagicMock
+
+from langchain_core.documents import Document
+
+from src.rag_pipeline.ann_index import AnnIndex, parse_search_filter
+from src.rag_pipeline.page_index import PageIndex
+from src.rag_pipeline.page_summary_index import PageSummaryIndex, page_summary_text
+from src.rag_pipeline.retriever import HybridRetriever, build_pages_filter
+
+# 요약 문구별 고정 임베딩 (테스트용)
+_TOPICS = {"알람": [1.0, 0.0, 0.0], "그리퍼": [0.0, 1.0, 0.0], "원점": [0.0, 0.0, 1.0]}
+
+
+def _embed(texts):
+    return [next(vector for topic, vector in _TOPICS.items() if topic in text) for text in texts]
+
+
+def _page(doc_name: str, page: int, summary: str) -> Document:
+    return Document(
+        page_content="본문",
+        metadata={"doc_id": f"{doc_name}_p{page}_chunk_0", "doc_name": doc_name, "page": page,
+                  "chapter_path": "3장 > 유지보수", "summary": summary, "keywords": "E1236, 서보"}
+    )
+
+
+def test_page_summary_index_updates_only_changed_pages(tmp_path):
+    """요약이 바뀐 페이지만 다시 임베딩하고, 청크가 없어진 페이지는 삭제하며, 저장/로드 후 같은 페이지를 찾는지 테스트"""
+    assert page_summary_text(_page("manual", 1, "알람 조치")) == "3장 > 유지보수\n알람 조치\nKeywords: E1236, 서보"
+    assert page_summary_text(Document(page_content="요약 없는 본문", metadata={})) == "요약 없는 본문"
+
+    pages = {("manual", 1): _page("manual", 1, "알람 조치"), ("manual", 2): _page("manual", 2, "그리퍼 설정"),
+             ("other", 7): _page("other", 7, "원점 복귀")}
+    page_index = PageIndex()
+    for (doc_name, page), doc in pages.items():
+        page_index.add(doc.metadata["doc_id"], doc_name, page)
+
+    embed = MagicMock(side_effect=_embed)
+    index = PageSummaryIndex()
+    assert index.update(pages, embed, page_index=page_index) == (3, 0)
+    assert index.update(pages, embed, page_index=page_index) == (0, 0)
+    assert embed.call_count == 1
+
+    pages[("manual", 2)] = _page("manual", 2, "원점 설정")
+    page_index.remove(["other_p7_chunk_0"])
+    assert index.update({("manual", 2): pages[("manual", 2)]}, embed, page_index=page_index) == (1, 1)
+    assert embed.call_args.args[0] == [page_summary_text(pages[("manual", 2)])]
+
+    assert index.search([[0.0, 0.0, 1.0], [1.0, 0.1, 0.0]], top_pages=1) == [[("manual", 2)], [("manual", 1)]]
+    index.version = 4
+    index.save(str(tmp_path))
+    loaded = PageSummaryIndex.load(str(tmp_path))
+    assert loaded.version == 4 and len(loaded) == 2
+    assert loaded.search([[0.0, 0.0, 1.0]], top_pages=2) == [[("manual", 2), ("manual", 1)]]
+
+
+def test_pages_filter_restricts_ann_rows():
+    """페이지 목록 필터가 Chroma where($or)와 ANN 행 마스크 양쪽으로 같은 범위를 가리키는지 테스트"""
+    search_filter = build_pages_filter([("manual", 1), ("other", 3), ("manual", 1)])
+    assert search_filter == {"$or": [
+        {"$and": [{"doc_name": {"$eq": "manual"}}, {"page": {"$eq": 1}}]},
+        {"$and": [{"doc_name": {"$eq": "other"}}, {"page": {"$eq": 3}}]},
+    ]}
+    conditions = parse_search_filter(search_filter)
+    assert conditions == {"pages": [("manual", 1), ("other", 3)]}
+
+    index = AnnIndex(quantization="none")
+    index.add(
+        ["a", "b", "c", "d"], [[0.0], [1.0], [2.0], [3.0]],
+        [{"doc_name": "manual", "page": 1}, {"doc_name": "manual", "page": 3},
+         {"doc_name": "other", "page": 3}, {"doc_name": "other", "page": 1}]
+    )
+    assert [chunk_id for chunk_id, _ in index.search([[3.0]], k=4, **conditions)[0]] == ["c", "a"]
+
+
+def test_hybrid_retriever_two_stage_vector_filters():
+    """페이지 요약 인덱스가 있으면 벡터 레그가 쿼리별 상위 페이지 필터로 검색하는지 테스트"""
+    page_summary_index = MagicMock()
+    page_summary_index.search.return_value = [[("manual", 5), ("manual", 9)], []]
+    vector_store = MagicMock()
+    vector_store.similarity_search_by_vectors_with_relevance_scores.return_value = [[]]
+    retriever = HybridRetriever(vector_store=vector_store, page_summary_index=page_summary_index,
+                                metadata_filter={"doc_name": "manual"})
+
+    retriever.vector_hits_batch([[0.1], [0.2]])
+    page_summary_index.search.assert_called_once_with([[0.1], [0.2]], 20, doc_name="manual")
+    filters = [call.kwargs["filter"] for call in vector_store.similarity_search_by_vectors_with_relevance_scores.call_args_list]
+    assert filters == [build_pages_filter([("manual", 5), ("manual", 9)]), {"doc_name": {"$eq": "manual"}}]
+
+    # 페이지 필터가 이미 있으면 1단계를 건너뜀
+    paged = retriever.model_copy(update={"metadata_filter": {"doc_name": "manual", "page": 3}})
+    assert paged.vector_filters([[0.1]]) == [{"$and": [{"doc_name": {"$eq": "manual"}}, {"page": {"$eq": 3}}]}]
@@ -0,0 +1,31 @@
+from unittest.mock import MagicMock, patch
+
+from langchain_core.documents import Document
+
+from src.rag_pipeline import reranker
+
+
+def _docs(*ids):
+    return [Document(page_content=f"text {chunk_id}", metadata={"doc_id": chunk_id}) for chunk_id in ids]
+
+
+def test_rerank_keeps_top_n_by_cross_encoder_score():
+    """크로스 인코더 점수 순으로 정렬하고 상위 N개만 남기는지, 동점은 기존 순서를 유지하는지 테스트"""
+    model = MagicMock()
+    model.predict.return_value = [0.1, 0.9, 0.5, 0.9]
+    docs = _docs("a", "b", "c", "d")
+
+    with patch.object(reranker, "_cross_encoder", model):
+        result = reranker.rerank("질문", docs, top_n=3)
+
+    assert [doc.metadata["doc_id"] for doc in result] == ["b", "d", "c"]
+    pairs = model.predict.call_args.args[0]
+    assert pairs[0] == ("질문", "text a")
+    assert model.predict.call_args.kwargs["batch_size"] == reranker.settings.RERANK_BATCH_SIZE
+
+
+def test_rerank_falls_back_when_model_unavailable():
+    """크로스 인코더를 사용할 수 없으면 융합 순서를 그대로 반환하는지 테스트"""
+    docs = _docs("a", "b", "c")
+    with patch.object(reranker, "_cross_encoder", "FAILED"):
+        assert reranker.rerank("질문", docs, top_n=2) == docs
@@ -7,45 +7,41 @@ from langchain_core.retrievers import BaseRetriever
 from langchain_chroma import Chroma
 
 # 테스트 대상 모듈 임포트
-from src.rag_pipeline.retriever import get_retriever
+from src.rag_pipeline.retriever import get_retriever, HybridRetriever
 from src.rag_pipeline.generator import generate_answer_with_rag, format_docs, get_image_paths
 
 # --- get_retriever 테스트 ---
 
 @patch('src.rag_pipeline.retriever.get_vector_store')
-@patch('src.rag_pipeline.retriever.BM25Retriever')
-@patch('src.rag_pipeline.retriever.EnsembleRetriever')
-def test_get_retriever_success(mock_ensemble_retriever, mock_bm25_retriever, mock_get_vector_store):
-    """Retriever 생성 성공 테스트 (EnsembleRetriever)"""
+def test_get_retriever_success(mock_get_vector_store, tmp_path):
+    """Retriever 생성 성공 테스트 (HybridRetriever)"""
     mock_vector_store = MagicMock(spec=Chroma)
-    mock_vector_retriever = MagicMock(spec=BaseRetriever)
-    mock_vector_store.as_retriever.return_value = mock_vector_retriever
     
     # Mock collection data for BM25
     mock_vector_store.get.return_value = {
+        "ids": ["id1", "id2"],
         "documents": ["doc1", "doc2"],
         "metadatas": [{"source": "1"}, {"source": "2"}]
     }
-    
+    mock_vector_store.embeddings.embed_query.return_value = [0.1, 0.2]
+    mock_vector_store.similarity_search_by_vector_with_relevance_scores.return_value = [
+        (Document(page_content="doc2", metadata={"doc_id": "id2"}), 0.1)
+    ]
     mock_get_vector_store.return_value = mock_vector_store
-    
-    # Mock BM25 return
-    mock_bm25_instance = MagicMock()
-    mock_bm25_retriever.from_documents.return_value = mock_bm25_instance
 
-    # Mock Ensemble return
-    mock_ensemble_instance = MagicMock()
-    mock_ensemble_retriever.return_value = mock_ensemble_instance
-    
     # 함수 실행
-    retriever = get_retriever(force_update=True)
+    with patch('src.rag_pipeline.retriever.settings.CHROMA_DB_DIR', str(tmp_path)):
+        retriever = get_retriever(force_update=True)
     
     # Assertions
-    mock_get_vector_store.assert_called_once()
     mock_vector_store.get.assert_called_once()
-    mock_bm25_retriever.from_documents.assert_called_once()
-    mock_ensemble_retriever.assert_called_once()
-    assert retriever == mock_ensemble_instance
+    assert isinstance(retriever, HybridRetriever)
+    assert len(retriever.keyword_index) == 2
+    assert (tmp_path / "default" / "keyword_index" / "meta.json").exists()
+
+    # 키워드 레그와 벡터 레그에 모두 나온 청크는 한 번만, 가장 앞에 반환
+    docs = retriever.invoke("doc2")
+    assert [doc.metadata["doc_id"] for doc in docs] == ["id2"]
 
 
 # --- generate_answer_with_rag 테스트 ---
@@ -0,0 +1,68 @@
+import time
+
+from src.rag_pipeline.fusion import FusionParams
+from src.rag_pipeline.retrieval_cache import RetrievalCache, make_cache_key
+
+
+def test_cache_key_normalizes_query_and_tracks_version():
+    """공백/대소문자만 다른 질문은 같은 키가 되고, 인덱스 버전·필터·융합 파라미터가 다르면 다른 키가 되는지 테스트"""
+    key = make_cache_key("u1", "E1236  알람 조치", index_version=3)
+    assert key == make_cache_key("u1", "e1236 알람 조치 ", index_version=3)
+    assert key != make_cache_key("u1", "E1236 알람 조치", index_version=4)
+    assert key != make_cache_key("u1", "E1236 알람 조치", index_version=3, doc_name="manual")
+    assert key != make_cache_key("u1", "E1236 알람 조치", index_version=3, fusion_params=FusionParams(method="score"))
+    assert key != make_cache_key("u2", "E1236 알람 조치", index_version=3)
+
+
+def test_cache_lru_ttl_and_invalidation():
+    """LRU 제거, TTL 만료, 유저별 무효화와 적중률/메모리 집계를 테스트"""
+    cache = RetrievalCache(max_entries=2, ttl_seconds=60)
+    k1, k2, k3 = (make_cache_key("u1", q, 1) for q in ("a", "b", "c"))
+    cache.put(k1, ["c1", "c2"], "a+")
+    cache.put(k2, ["c3"], "b+")
+    assert cache.get(k1).chunk_ids == ("c1", "c2")  # k1을 최근 사용으로 갱신
+    cache.put(k3, ["c4"], "c+")  # 가장 오래 사용하지 않은 k2 제거
+    assert cache.get(k2) is None
+    assert cache.evictions == 1
+
+    stats = cache.stats(uid="u1")
+    assert stats["hits"] == 1 and stats["misses"] == 1 and stats["hit_ratio"] == 0.5
+    assert stats["memory_bytes"] > 0 and stats["tenant_entries"] == 2
+
+    assert cache.invalidate("u1") == 2
+    assert len(cache) == 0 and cache.memory_bytes == 0
+
+    cache.ttl_seconds = 0.01
+    cache.put(k1, ["c1"], "a+")
+    time.sleep(0.02)
+    assert cache.get(k1) is None
+
+
+def test_cache_hit_restores_alias_page_of_collapsed_chunk(make_doc):
+    """별칭 페이지로 반환된 근사 중복 대표 청크가 캐시 적중 시에도 같은 page / image_path로 복원되는지 테스트"""
+    from unittest.mock import patch
+
+    from src.rag_pipeline import generator, retriever
+    from src.rag_pipeline.keyword_index import KeywordIndex
+    from src.rag_pipeline.near_dup import collapse_near_duplicates, localize
+
+    warning = "경고: 전원을 차단한 후 5분 이상 기다린 다음 충전 램프가 꺼진 것을 확인하고 배선 작업을 하십시오."
+    kept, _ = collapse_near_duplicates(
+        [make_doc(warning, page=3, with_image=True), make_doc(warning, page=37, with_image=True)], threshold=0.8
+    )
+    keyword_index = KeywordIndex(preprocess_func=str.split)
+    keyword_index.add_documents(kept)
+    routed = localize(kept[0], [37])
+
+    with patch.object(generator.settings, "RETRIEVAL_CACHE_ENABLED", True), \
+         patch.object(generator, "retrieval_cache", RetrievalCache()), \
+         patch.object(generator, "get_search_version", return_value=1), \
+         patch.object(generator, "retrieve_documents", return_value=[routed]) as mock_retrieve, \
+         patch.object(retriever, "get_search_uids", return_value=["user1"]), \
+         patch.object(retriever, "get_keyword_index", return_value=keyword_index):
+        miss, _ = generator.retrieve_with_cache("37페이지 경고", lambda: "37페이지 경고", None, uid="user1")
+        hit, _ = generator.retrieve_with_cache("37페이지 경고", lambda: "37페이지 경고", None, uid="user1")
+
+    assert mock_retrieve.call_count == 1
+    assert [doc.metadata for doc in hit] == [doc.metadata for doc in miss]
+    assert (hit[0].metadata["page"], hit[0].metadata["image_path"]) == (37, "images/manual/page_037.png")
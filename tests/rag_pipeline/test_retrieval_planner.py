@@ -0,0 +1,42 @@
+import time
+from unittest.mock import MagicMock
+
+from langchain_core.documents import Document
+
+from src.rag_pipeline.retrieval_planner import plan_sub_queries, retrieve_ranked_lists
+
+
+def test_plan_sub_queries_dedupes_normalized_queries():
+    """정제/확장/원본 쿼리 중 공백·대소문자만 다른 쿼리가 제거되는지 테스트"""
+    assert plan_sub_queries("E1236 알람 해결", "E1236  알람 해결") == ["E1236", "E1236 알람 해결"]
+    assert plan_sub_queries("그리퍼 설정", "그리퍼 설정") == ["그리퍼 설정"]
+    assert plan_sub_queries("e1236 조치", "") == ["E1236", "e1236 조치"]
+
+
+def test_retrieve_ranked_lists_runs_legs_concurrently():
+    """모든 서브 쿼리의 레그가 동시에 실행되고, 임베딩은 한 번의 배치로 요청되는지 테스트"""
+    delay = 0.2
+
+    def keyword_hits(query):
+        time.sleep(delay)
+        return [(Document(page_content=f"kw {query}", metadata={"doc_id": f"k-{query}"}), 1.0)]
+
+    def vector_hits_by_vector(embedding):
+        time.sleep(delay)
+        return [(Document(page_content=f"vec {embedding[0]}", metadata={"doc_id": f"v-{embedding[0]}"}), -0.1)]
+
+    retriever = MagicMock()
+    retriever.keyword_hits.side_effect = keyword_hits
+    retriever.vector_hits_by_vector.side_effect = vector_hits_by_vector
+    retriever.embed_queries.side_effect = lambda queries: [[i] for i in range(len(queries))]
+
+    start = time.perf_counter()
+    ranked_lists = retrieve_ranked_lists(retriever, ["a", "b", "c"])
+    elapsed = time.perf_counter() - start
+
+    retriever.embed_queries.assert_called_once_with(["a", "b", "c"])
+    assert [ranked.leg for ranked in ranked_lists] == ["keyword", "vector"] * 3
+    assert ranked_lists[2].hits[0][0].metadata["doc_id"] == "k-b"
+    assert ranked_lists[5].hits[0][0].metadata["doc_id"] == "v-2"
+    # 6개 레그를 순차 실행하면 1.2초, 동시 실행하면 가장 느린 레그 수준
+    assert elapsed < delay * 3
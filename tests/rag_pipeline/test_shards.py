@@ -0,0 +1,48 @@
+import chromadb
+from langchain_chroma import Chroma
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from src.rag_pipeline.retriever import build_pages_filter, build_search_filter
+from src.rag_pipeline.shards import ShardedVectorStore, split_doc_filter
+from src.rag_pipeline.vector_db import count_chunks, delete_document_chunks
+
+
+def test_split_doc_filter():
+    """where 필터에서 문서명 조건을 분리하는지 테스트"""
+    assert split_doc_filter(None) == (None, None)
+    assert split_doc_filter(build_search_filter(doc_name="a")) == ("a", None)
+    assert split_doc_filter(build_search_filter(doc_name="a", page=3)) == ("a", {"page": {"$eq": 3}})
+    assert split_doc_filter({"page": {"$eq": 3}}) == (None, {"page": {"$eq": 3}})
+
+
+def test_sharded_store_routes_filters_and_drops_shard_on_delete(tmp_path, make_doc):
+    """문서별 샤드 추가 / 문서 필터 시 해당 샤드만 검색 / 필터 없는 검색 병합 / 샤드 삭제 / 레거시 컬렉션 포함을 테스트"""
+    embedding = DeterministicFakeEmbedding(size=8)
+    client = chromadb.PersistentClient(path=str(tmp_path))
+    legacy = Chroma(collection_name="manual_rag", client=client, embedding_function=embedding)
+    legacy.add_documents([make_doc("레거시 청크", doc_name="old", page=1)], ids=["old_p1"])
+
+    store = ShardedVectorStore(client, collection_name="manual_rag", embedding_function=embedding)
+    docs = [make_doc("서보 알람", doc_name="a", page=1), make_doc("그리퍼 설정", doc_name="a", page=2), make_doc("원점 복귀", doc_name="b", page=1)]
+    store.add_documents(docs, ids=[doc.metadata["doc_id"] for doc in docs])
+    assert store.doc_names() == ["a", "b"]
+    assert sorted(store.get(include=[])["ids"]) == ["a_p1", "a_p2", "b_p1", "old_p1"]
+    assert store.count() == count_chunks(store) == 4
+
+    routes = store.route(build_search_filter(doc_name="a", page=2))
+    assert [(shard._collection.name, shard_filter) for shard, shard_filter in routes][0][1] == {"page": {"$eq": 2}}
+    assert len(store.route(build_pages_filter([("a", 1), ("b", 1)]))) == 3  # a, b 샤드 + 레거시
+
+    query = embedding.embed_query("원점 복귀")
+    assert store.similarity_search_by_vector_with_relevance_scores(query, k=1)[0][0].metadata["doc_id"] == "b_p1"
+    hits = store.similarity_search_by_vector_with_relevance_scores(query, k=5, filter=build_search_filter(doc_name="a"))
+    assert {doc.metadata["doc_id"] for doc, _ in hits} == {"a_p1", "a_p2"}
+
+    # 새 라우터도 컬렉션 메타데이터로 기존 샤드를 찾음
+    reopened = ShardedVectorStore(client, collection_name="manual_rag", embedding_function=embedding)
+    assert reopened.doc_names() == ["a", "b"]
+    assert delete_document_chunks(reopened, "a") == 2
+    assert delete_document_chunks(reopened, "old") == 1
+    assert reopened.doc_names() == ["b"]
+    assert reopened.get(include=[])["ids"] == ["b_p1"]
+    assert delete_document_chunks(reopened, "a") == 0
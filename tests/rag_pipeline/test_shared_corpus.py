@@ -0,0 +1,119 @@
+import os
+from unittest.mock import MagicMock, patch
+
+from src.api import services
+from src.rag_pipeline import retriever
+from src.rag_pipeline.retriever import HybridRetriever
+from src.rag_pipeline.shared_corpus import (
+    CorpusInfo,
+    claim_orphaned_corpus,
+    corpus_subscribers,
+    corpus_uid_for_file,
+    is_corpus_uid,
+    read_corpus_info,
+    read_subscriptions,
+    subscribe,
+    subscribed_corpora,
+    subscribers_path,
+    unsubscribe,
+    write_corpus_info,
+)
+
+
+def _tier(keyword_hits, vector_hits) -> HybridRetriever:
+    keyword_index = MagicMock()
+    keyword_index.__len__.return_value = len(keyword_hits)
+    keyword_index.search_with_scores.return_value = keyword_hits
+    vector_store = MagicMock(spec=["similarity_search_by_vector_with_relevance_scores", "embeddings"])
+    vector_store.similarity_search_by_vector_with_relevance_scores.return_value = vector_hits
+    return HybridRetriever(keyword_index=keyword_index, vector_store=vector_store, k=3)
+
+
+def test_subscriptions_and_content_addressed_corpus_uid(tmp_path):
+    """같은 내용의 PDF는 파일명과 무관하게 같은 코퍼스 UID가 되고, 구독 변경마다 버전이 오르는지 테스트"""
+    (tmp_path / "a.pdf").write_bytes(b"%PDF vendor manual")
+    (tmp_path / "b.pdf").write_bytes(b"%PDF vendor manual")
+    (tmp_path / "c.pdf").write_bytes(b"%PDF other manual")
+    corpus_uid = corpus_uid_for_file(str(tmp_path / "a.pdf"))
+    assert is_corpus_uid(corpus_uid) and corpus_uid == corpus_uid_for_file(str(tmp_path / "b.pdf"))
+    assert corpus_uid != corpus_uid_for_file(str(tmp_path / "c.pdf"))
+
+    with patch.object(retriever.settings, "CHROMA_DB_DIR", str(tmp_path / "db")), \
+            patch.object(retriever.settings, "SHARED_CORPUS_ENABLED", True), \
+            patch.object(retriever, "get_index_version", side_effect=lambda uid: 3):
+        assert read_subscriptions("user1").version == 0
+        version = retriever.get_search_version("user1")
+        subscribe("user1", "vendor", corpus_uid)
+        assert subscribe("user1", "vendor", corpus_uid).version == 1
+        assert subscribed_corpora("user1") == [corpus_uid]
+        assert retriever.get_search_uids("user1") == ["user1", corpus_uid]
+        assert retriever.get_search_uids("user1", doc_name="vendor") == [corpus_uid]
+        assert retriever.get_search_uids("user1", doc_name="private") == ["user1"]
+        assert retriever.get_search_version("user1") != version
+
+        assert unsubscribe("user1", "vendor") and not unsubscribe("user1", "vendor")
+        assert read_subscriptions("user1").version == 2
+        assert retriever.get_search_uids("user1") == ["user1"]
+
+
+def test_hybrid_retriever_fans_out_over_subscribed_corpora(make_doc):
+    """개인 인덱스와 구독 코퍼스의 레그 결과를 점수 순으로 병합하고, 문서명 필터는 해당 계층만 검색하는지 테스트"""
+    mine_p1, mine_p2 = (make_doc(f"mine_p{page}", doc_name="mine", page=page) for page in (1, 2))
+    vendor_p7, vendor_p8 = (make_doc(f"vendor_p{page}", doc_name="vendor", page=page) for page in (7, 8))
+    own = _tier([(mine_p1, 5.0), (mine_p2, 1.0)], [(mine_p1, 0.4)])
+    corpus = _tier([(vendor_p7, 3.0), (vendor_p8, 2.0)], [(vendor_p7, 0.1)])
+    own = own.model_copy(update={"subscriptions": {"vendor": "corpus-x"}})
+
+    with patch.object(retriever, "get_corpus_retriever", return_value=corpus) as get_corpus:
+        assert [doc.metadata["doc_id"] for doc, _ in own.keyword_hits("알람")] == ["mine_p1", "vendor_p7", "vendor_p8"]
+        assert [(doc.metadata["doc_id"], score) for doc, score in own.vector_hits_by_vector([0.1])] == \
+            [("vendor_p7", -0.1), ("mine_p1", -0.4)]
+        assert [[doc.metadata["doc_id"] for doc, _ in hits] for hits in own.vector_hits_batch([[0.1], [0.2]])] == \
+            [["vendor_p7", "mine_p1"], ["vendor_p7", "mine_p1"]]
+        get_corpus.assert_called_with("corpus-x")
+
+        scoped = own.model_copy(update={"metadata_filter": {"doc_name": "vendor"}})
+        assert [doc.metadata["doc_id"] for doc, _ in scoped.keyword_hits("알람")] == ["vendor_p7", "vendor_p8"]
+        corpus.keyword_index.search_with_scores.assert_called_with("알람", k=3, doc_name="vendor")
+
+        private = own.model_copy(update={"metadata_filter": {"doc_name": "mine"}})
+        assert private.tiers() == [private]
+
+
+def test_corpus_subscribers_are_reference_counted(tmp_path):
+    """구독/해제가 코퍼스 구독자 목록을 갱신하고, 마지막 구독자가 해제한 코퍼스만 한 번 회수되는지 테스트"""
+    with patch.object(retriever.settings, "CHROMA_DB_DIR", str(tmp_path / "db")):
+        write_corpus_info("corpus-x", CorpusInfo(doc_name="vendor", total_pages=3))
+        subscribe("user1", "vendor", "corpus-x")
+        subscribe("user2", "vendor", "corpus-x")
+        assert corpus_subscribers("corpus-x") == ["user1", "user2"]
+
+        # 구독자 목록이 없는 기존 코퍼스는 로컬 유저 구독 목록으로 초기화
+        os.remove(subscribers_path("corpus-x"))
+        assert corpus_subscribers("corpus-x") == ["user1", "user2"]
+
+        subscribe("user1", "vendor", "corpus-y")
+        assert corpus_subscribers("corpus-x") == ["user2"] and corpus_subscribers("corpus-y") == ["user1"]
+        assert unsubscribe("user2", "vendor") and corpus_subscribers("corpus-x") == []
+        assert claim_orphaned_corpus("corpus-x") and not claim_orphaned_corpus("corpus-x")
+        assert read_corpus_info("corpus-x") is None
+
+
+def test_delete_document_removes_orphaned_corpus_data(tmp_path, monkeypatch):
+    """마지막 구독자가 문서를 삭제하면 코퍼스 인덱스/썸네일까지 지우고, 구독자가 남아 있으면 유지하는지 테스트"""
+    monkeypatch.chdir(tmp_path)
+    thumbnail_dir = tmp_path / "assets" / "images" / "corpus-x" / "vendor"
+    thumbnail_dir.mkdir(parents=True)
+    with patch.object(retriever.settings, "CHROMA_DB_DIR", str(tmp_path / "db")), \
+            patch.object(retriever.settings, "SHARED_CORPUS_ENABLED", True):
+        write_corpus_info("corpus-x", CorpusInfo(doc_name="vendor", total_pages=3))
+        subscribe("user1", "vendor", "corpus-x")
+        subscribe("user2", "vendor", "corpus-x")
+
+        result = services.delete_document("user1", "vendor", app_state=object())
+        assert result["corpus_uid"] == "corpus-x" and not result["corpus_deleted"]
+        assert read_corpus_info("corpus-x") is not None and thumbnail_dir.is_dir()
+
+        result = services.delete_document("user2", "vendor", app_state=object())
+        assert result["corpus_deleted"] and result["thumbnail_deleted"]
+        assert not (tmp_path / "db" / "corpus-x").exists() and not thumbnail_dir.exists()
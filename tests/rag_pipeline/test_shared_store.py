@@ -0,0 +1,52 @@
+from unittest.mock import patch
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from src.rag_pipeline import shared_store, vector_db
+from src.rag_pipeline.retriever import build_search_filter
+from src.rag_pipeline.shared_store import delete_tenant_collections, tenant_collection_name
+
+
+@pytest.fixture
+def shared_layout(tmp_path):
+    embedding = DeterministicFakeEmbedding(size=8)
+    with patch.object(vector_db.settings, "CHROMA_DB_DIR", str(tmp_path)), \
+            patch.object(vector_db.settings, "STORAGE_LAYOUT", "shared"), \
+            patch.object(vector_db, "get_embedding_function", return_value=embedding), \
+            patch.object(vector_db, "_vector_stores", {}), \
+            patch.object(shared_store, "_shared_client", None):
+        yield embedding
+
+
+@pytest.mark.parametrize("sharding", ["none", "document"])
+def test_shared_layout_isolates_tenants_in_one_client(shared_layout, sharding, make_doc):
+    """공유 저장소에서 유저별 컬렉션 파티션으로 조회/검색/삭제가 격리되고, 클라이언트는 하나만 열리는지 테스트"""
+    with patch.object(vector_db.settings, "INDEX_SHARDING", sharding):
+        store_a = vector_db.get_vector_store(uid="a")
+        store_b = vector_db.get_vector_store(uid="b")
+        assert vector_db._chroma_client(store_a) is vector_db._chroma_client(store_b)
+
+        store_a.add_documents([make_doc("서보 알람", page=1), make_doc("그리퍼 설정", page=2)], ids=["manual_p1", "manual_p2"])
+        store_b.add_documents([make_doc("원점 복귀", page=1)], ids=["manual_p1"])
+
+        assert sorted(store_a.get(include=[])["ids"]) == ["manual_p1", "manual_p2"]
+        assert store_b.get(include=["documents"])["documents"] == ["원점 복귀"]
+        query = shared_layout.embed_query("서보 알람")
+        hits = store_b.similarity_search_by_vector_with_relevance_scores(query, k=5, filter=build_search_filter(doc_name="manual"))
+        assert [doc.page_content for doc, _ in hits] == ["원점 복귀"]
+        assert vector_db.vector_store_memory_bytes(store_a) > vector_db.vector_store_memory_bytes(store_b) > 0
+
+        # 공유 클라이언트는 유저 제거 시 닫지 않음
+        vector_db.close_vector_store(store_a)
+        assert vector_db.delete_document_chunks(store_a, "manual") == 2
+        assert store_b.get(include=[])["ids"] == ["manual_p1"]
+        assert delete_tenant_collections("b", client=vector_db._chroma_client(store_b)) >= 1
+
+
+def test_shared_layout_rejects_collection_owned_by_another_uid(shared_layout):
+    """유저 컬렉션 이름의 메타데이터 uid가 요청 UID와 다르면 열지 않는지 테스트"""
+    client = shared_store.get_shared_client()
+    client.create_collection(tenant_collection_name(vector_db.settings.COLLECTION_NAME, "a"), metadata={"uid": "other"})
+    with pytest.raises(ValueError):
+        vector_db.get_vector_store(uid="a")
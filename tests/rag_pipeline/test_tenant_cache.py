@@ -0,0 +1,91 @@
+from unittest.mock import MagicMock, patch
+
+from src.rag_pipeline.tenant_cache import TenantCache
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_tenant_cache_evicts_lru_over_budget_and_idle_tenants():
+    """메모리 예산 초과 시 LRU 유저를, 유휴 TTL이 지나면 유휴 유저를 모든 리소스에서 제거하고 close를 호출하는지 테스트"""
+    clock = _Clock()
+    stores, retrievers = {}, {}
+    close = MagicMock()
+    cache = TenantCache(memory_budget_bytes=250, idle_ttl_seconds=600, max_tenants=10, min_idle_seconds=5)
+    cache.register("vector_store", stores, size=lambda value: value, close=close)
+    cache.register("retriever", retrievers)
+
+    with patch("src.rag_pipeline.tenant_cache.time.monotonic", clock):
+        evicted = []
+        for uid in ("a", "b", "c"):
+            stores[uid] = 100
+            retrievers[uid] = object()
+            evicted.append(cache.touch(uid))
+            clock.now += 10
+        # c 로드 후 300 > 250 이므로 LRU(a) 제거
+        assert evicted == [[], [], ["a"]]
+        assert "a" not in stores and "a" not in retrievers
+        close.assert_called_once_with(100)
+
+        stats = cache.stats(uid="b")
+        assert stats["tenants"] == 2 and stats["memory_bytes"] == 200 and stats["evictions"] == 1
+        assert stats["tenant_breakdown"] == {"vector_store": 100}
+
+        # c만 유휴 TTL 초과 (b는 방금 사용)
+        clock.now += 590
+        cache.touch("b")
+        clock.now += 15
+        assert cache.touch("b") == ["c"]
+        assert list(stores) == ["b"]
+
+
+def test_tenant_cache_keeps_recently_used_tenants_and_respects_max_tenants():
+    """최대 유저 수 초과 시에도 방금 사용된 유저는 제거하지 않는지 테스트"""
+    clock = _Clock()
+    stores = {}
+    cache = TenantCache(memory_budget_bytes=10**9, idle_ttl_seconds=600, max_tenants=1, min_idle_seconds=5)
+    cache.register("vector_store", stores)
+
+    with patch("src.rag_pipeline.tenant_cache.time.monotonic", clock):
+        stores["a"] = object()
+        cache.touch("a")
+        stores["b"] = object()
+        assert cache.touch("b") == []  # a는 5초 이내에 사용됨
+        clock.now += 6
+        stores["c"] = object()
+        assert cache.touch("c") == ["a", "b"]
+        assert list(stores) == ["c"]
+
+
+def test_tenant_cache_never_closes_leased_tenants():
+    """임대(use) 중인 유저는 유휴 TTL / 예산 초과 / 직접 제거 어느 경우에도 닫지 않고, 반납 후에만 제거하는지 테스트"""
+    clock = _Clock()
+    stores = {}
+    close = MagicMock()
+    cache = TenantCache(memory_budget_bytes=150, idle_ttl_seconds=600, max_tenants=10, min_idle_seconds=5)
+    cache.register("vector_store", stores, size=lambda value: value, close=close)
+
+    with patch("src.rag_pipeline.tenant_cache.time.monotonic", clock):
+        stores["ingesting"] = 100
+        cache.touch("ingesting")
+        with cache.use("ingesting"):
+            with cache.use("ingesting"):
+                clock.now += 700
+                stores["b"] = 100
+                assert cache.touch("b") == []  # TTL과 예산을 모두 넘었지만 임대 중
+                assert cache.evict("ingesting") is False
+            assert cache.is_leased("ingesting")
+            assert cache.stats()["leased_tenants"] == 1
+        close.assert_not_called()
+        assert "ingesting" in stores and not cache.is_leased("ingesting")
+
+        # 반납 시각이 마지막 사용 시각이므로 바로 제거되지 않고, 이후 LRU로 제거됨
+        assert cache.touch("b") == []
+        clock.now += 6
+        assert cache.touch("b") == ["ingesting"]
+        close.assert_called_once_with(100)